@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Sortie audio en mémoire pour la synthèse vocale.
+
+`PcmAudio` transporte un tampon PCM int16 (sans fichier) et `PcmPlayer`
+le joue via un flux de sortie sounddevice persistant (ouvert une fois par
+format), avec repli sur `pygame.mixer.Sound` construit depuis le tampon.
+Les lectures passent par une file et un unique thread de lecture : elles
+sont jouées dans l'ordre des appels, bloquants ou non.
+"""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0",
+#   "sounddevice>=0.4.5",
+# ]
+# ///
+
+import io
+import logging
+import queue
+import threading
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import sounddevice as sd
+    SD_AVAILABLE = True
+except Exception:
+    SD_AVAILABLE = False
+
+try:
+    import pygame
+    PYGAME_AVAILABLE = True
+except ImportError:
+    PYGAME_AVAILABLE = False
+
+
+@dataclass
+class PcmAudio:
+    """Audio PCM 16 bits en mémoire."""
+    pcm: bytes
+    sample_rate: int
+    channels: int = 1
+
+    @property
+    def duration(self) -> float:
+        """Durée en secondes."""
+        return len(self.pcm) / (2 * self.channels * self.sample_rate) if self.sample_rate else 0.0
+
+    @classmethod
+    def from_wav_bytes(cls, data: bytes) -> "PcmAudio":
+        """Construit l'audio depuis le contenu d'un fichier WAV (en mémoire)."""
+        with wave.open(io.BytesIO(data), 'rb') as wav_file:
+            return cls(
+                pcm=wav_file.readframes(wav_file.getnframes()),
+                sample_rate=wav_file.getframerate(),
+                channels=wav_file.getnchannels(),
+            )
+
+    def to_wav_bytes(self) -> bytes:
+        """Encode l'audio au format WAV (en mémoire)."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.pcm)
+        return buffer.getvalue()
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Écrit l'audio dans un fichier WAV."""
+        path = Path(path)
+        path.write_bytes(self.to_wav_bytes())
+        return path
+
+
+class PcmPlayer:
+    """Lecteur PCM à flux de sortie persistant, interruptible par `stop()`."""
+
+    def __init__(self, volume: float = 1.0, block_ms: int = 100):
+        """
+        Initialise le lecteur (le flux est ouvert à la première lecture).
+
+        Args:
+            volume (float): Gain appliqué aux échantillons (0.0-1.0)
+            block_ms (int): Taille des blocs écrits (granularité de l'arrêt)
+        """
+        self.volume = volume
+        self.block_ms = block_ms
+        self._stream = None
+        self._stream_format: Optional[Tuple[int, int]] = None
+        self._play_lock = threading.Lock()
+        self._generation = 0
+        # (audio, génération, événement de fin, résultat) ; None arrête le thread de lecture
+        self._requests: "queue.Queue[Any]" = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def is_playing(self) -> bool:
+        """Indique si une lecture est en cours ou en attente."""
+        return self._pending > 0
+
+    def _get_stream(self, sample_rate: int, channels: int):
+        """Retourne le flux de sortie pour ce format (réouvert si le format change)."""
+        if self._stream is not None and self._stream_format == (sample_rate, channels):
+            return self._stream
+        self._close_stream()
+        self._stream = sd.OutputStream(samplerate=sample_rate, channels=channels, dtype='int16')
+        self._stream.start()
+        self._stream_format = (sample_rate, channels)
+        return self._stream
+
+    def _close_stream(self) -> None:
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception as e:
+                logger.debug(f"Fermeture flux de sortie: {e}")
+        self._stream = None
+        self._stream_format = None
+
+    def _scaled(self, audio: PcmAudio) -> np.ndarray:
+        samples = np.frombuffer(audio.pcm, dtype=np.int16).reshape(-1, audio.channels)
+        if self.volume != 1.0:
+            samples = (samples.astype(np.float32) * self.volume).clip(-32768, 32767).astype(np.int16)
+        return samples
+
+    def play(self, audio: PcmAudio, wait: bool = True) -> bool:
+        """
+        Joue un tampon PCM (après les lectures déjà en file).
+
+        Args:
+            audio (PcmAudio): Audio à jouer
+            wait (bool): Bloquer jusqu'à la fin (sinon retour dès la mise en file)
+
+        Returns:
+            bool: True si la lecture a été mise en file/terminée
+        """
+        done = threading.Event() if wait else None
+        result: List[bool] = []
+        with self._pending_lock:
+            self._pending += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._playback_loop, name="pcm-play", daemon=True)
+                self._worker.start()
+            self._requests.put((audio, self._generation, done, result))
+        if done is None:
+            return True
+        done.wait()
+        return bool(result and result[0])
+
+    def _playback_loop(self) -> None:
+        """Thread de lecture : joue les requêtes de la file une à une."""
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            audio, generation, done, result = request
+            try:
+                result.append(self._play_blocking(audio, generation))
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
+                if done is not None:
+                    done.set()
+
+    def _play_blocking(self, audio: PcmAudio, generation: int) -> bool:
+        with self._play_lock:
+            if generation != self._generation:
+                return False  # stop() appelé entre-temps
+            try:
+                if SD_AVAILABLE:
+                    return self._play_sounddevice(audio, generation)
+                if PYGAME_AVAILABLE:
+                    return self._play_pygame(audio, generation)
+                logger.warning("Aucune sortie audio disponible (sounddevice/pygame)")
+                return False
+            except Exception as e:
+                if generation != self._generation:
+                    return False  # écriture interrompue par stop()
+                logger.error(f"Erreur lecture PCM: {e}")
+                self._close_stream()
+                if PYGAME_AVAILABLE:
+                    return self._play_pygame(audio, generation)
+                return False
+
+    def _play_sounddevice(self, audio: PcmAudio, generation: int) -> bool:
+        stream = self._get_stream(audio.sample_rate, audio.channels)
+        samples = self._scaled(audio)
+        block = max(int(audio.sample_rate * self.block_ms / 1000), 1)
+        for start in range(0, len(samples), block):
+            if generation != self._generation:
+                return False
+            stream.write(samples[start:start + block])
+        return True
+
+    def _play_pygame(self, audio: PcmAudio, generation: int) -> bool:
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(frequency=audio.sample_rate, channels=audio.channels)
+        # Le mixer convertit le WAV (fréquence/canaux) vers son format de sortie
+        sound = pygame.mixer.Sound(file=io.BytesIO(audio.to_wav_bytes()))
+        sound.set_volume(self.volume)
+        channel = sound.play()
+        while channel is not None and channel.get_busy():
+            if generation != self._generation:
+                channel.stop()
+                return False
+            pygame.time.wait(20)
+        return True
+
+    def stop(self) -> None:
+        """Interrompt la lecture en cours et les lectures en attente."""
+        self._generation += 1
+        if self._stream is not None:
+            try:
+                # Vider le tampon du périphérique (le flux reste réutilisable)
+                self._stream.abort()
+                self._stream.start()
+            except Exception:
+                self._close_stream()
+
+    def close(self) -> None:
+        """Arrête le thread de lecture et ferme le flux de sortie."""
+        self.stop()
+        with self._pending_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._requests.put(None)
+            worker.join(timeout=1.0)
+        with self._play_lock:
+            self._close_stream()
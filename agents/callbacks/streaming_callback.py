@@ -20,16 +20,27 @@ Note:
 
 from langchain_core.callbacks import BaseCallbackHandler
 from interface.events.event_bus import event_bus
+from utils.text_processor import StreamingTokenFilter
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Générations en flux filtrées et publiées par leur consommateur (`process_query_stream`) :
+# le callback les ignore, chaque token ne traverse qu'un seul filtre
+CONSUMER_FILTERED_TAG = "qaia:consumer_filtered"
+
+
+def _consumer_filtered(kwargs: dict) -> bool:
+    """Vrai si la génération porte le tag `CONSUMER_FILTERED_TAG`."""
+    return CONSUMER_FILTERED_TAG in (kwargs.get("tags") or ())
+
 
 class StreamingCallback(BaseCallbackHandler):
     """
     Callback Langchain pour streaming LLM.
-    Émet événements 'llm.token' pour chaque token généré.
+    Émet événements 'llm.token' pour chaque token généré (hors générations
+    marquées `CONSUMER_FILTERED_TAG`).
     """
     
     def __init__(self):
@@ -37,7 +48,7 @@ class StreamingCallback(BaseCallbackHandler):
         super().__init__()
         self._start_time = None
         self._token_count = 0
-        self._token_buffer = ""  # Buffer pour détecter préfixes multi-tokens
+        self._filter = StreamingTokenFilter()  # Préfixes multi-tokens et balises Phi-3
         
         logger.debug("StreamingCallback initialisé")
     
@@ -50,9 +61,11 @@ class StreamingCallback(BaseCallbackHandler):
             prompts: Liste des prompts
             **kwargs: Arguments additionnels
         """
+        if _consumer_filtered(kwargs):
+            return
         self._start_time = time.time()
         self._token_count = 0
-        self._token_buffer = ""  # Réinitialiser le buffer
+        self._filter.reset()
         
         # Émettre événement début génération
         event_bus.emit('llm.start', {
@@ -70,71 +83,19 @@ class StreamingCallback(BaseCallbackHandler):
             token: Token généré
             **kwargs: Arguments additionnels
         """
-        # Accumuler dans le buffer pour détecter préfixes multi-tokens
-        self._token_buffer += token
-        
-        # Vérifier si le buffer contient un préfixe indésirable
-        try:
-            from utils.text_processor import filter_streaming_token
-            import re
-            
-            # Vérifier si le buffer commence par un préfixe
-            buffer_clean = self._token_buffer.strip()
-            
-            # Patterns de préfixes à détecter (insensible à la casse)
-            prefix_patterns = [
-                r'^\(\d{1,2}:\d{2}\)\s*QAIA\s*:?\s*',  # "(17:30) QAIA:" ou "(17:30) QAIA"
-                r'^\(\d{1,2}:\d{2}\)\s*',  # "(17:30)"
-                r'^QAIA\s*:?\s*',  # "QAIA:" ou "QAIA"
-            ]
-            
-            # Vérifier si le buffer commence par un préfixe
-            is_prefix = False
-            prefix_length = 0
-            
-            for pattern in prefix_patterns:
-                match = re.match(pattern, buffer_clean, re.IGNORECASE)
-                if match:
-                    is_prefix = True
-                    prefix_length = len(match.group(0))
-                    logger.debug(f"Préfixe détecté dans buffer: '{match.group(0)}'")
-                    break
-            
-            # Si c'est un préfixe complet, ignorer tous les tokens jusqu'à présent
-            if is_prefix:
-                # Vérifier si on a atteint la fin du préfixe (espace ou fin)
-                if len(buffer_clean) == prefix_length or buffer_clean[prefix_length:prefix_length+1] in [' ', '\n', '\t']:
-                    logger.debug(f"Préfixe complet détecté, réinitialisation buffer")
-                    self._token_buffer = buffer_clean[prefix_length:].lstrip()
-                    # Ne pas émettre ce token ni les précédents
-                    return
-            
-            # Filtrer le token individuel
-            filtered_token = filter_streaming_token(token)
-            
-            # Si le token est filtré (None), ne pas l'émettre
-            if filtered_token is None:
-                logger.debug(f"Token filtré et ignoré: '{token}'")
-                # Réinitialiser le buffer si token filtré
-                if len(self._token_buffer) <= len(token):
-                    self._token_buffer = ""
-                else:
-                    self._token_buffer = self._token_buffer[:-len(token)]
-                return
-        except Exception as e:
-            logger.warning(f"Erreur filtrage token: {e}, utilisation token original")
-            filtered_token = token
-        
-        # Réinitialiser le buffer après avoir émis un token valide
-        # (on garde seulement les derniers caractères pour détection préfixes)
-        if len(self._token_buffer) > 20:
-            self._token_buffer = self._token_buffer[-20:]
-        
+        if _consumer_filtered(kwargs):
+            return
+        # Filtrage incrémental (unique étage de filtrage des tokens de cette génération)
+        filtered_token = self._filter.feed(token)
+        if filtered_token is None:
+            return
+        self._emit_token(filtered_token)
+    
+    def _emit_token(self, token: str) -> None:
+        """Émet un token filtré sur l'Event Bus."""
         self._token_count += 1
-        
-        # Émettre événement token (déjà filtré)
         event_bus.emit('llm.token', {
-            'token': filtered_token,
+            'token': token,
             'timestamp': time.time(),
             'token_index': self._token_count
         })
@@ -147,6 +108,13 @@ class StreamingCallback(BaseCallbackHandler):
             response: Réponse complète du LLM
             **kwargs: Arguments additionnels
         """
+        if _consumer_filtered(kwargs):
+            return
+        # Texte retenu par le filtre (préfixe jamais complété)
+        remaining = self._filter.flush()
+        if remaining:
+            self._emit_token(remaining)
+        
         end_time = time.time()
         latency = end_time - self._start_time if self._start_time else 0
         
@@ -178,6 +146,8 @@ class StreamingCallback(BaseCallbackHandler):
             error: Exception levée
             **kwargs: Arguments additionnels
         """
+        if _consumer_filtered(kwargs):
+            return
         # Émettre événement erreur
         event_bus.emit('llm.error', {
             'timestamp': time.time(),
@@ -231,6 +231,79 @@ class ConversationContext:
         self.start_time = datetime.now()
         self.logger.info("Contexte réinitialisé")
     
+    def to_dict(self) -> Dict[str, Any]:
+        """Sérialise le contexte (persistance des sessions de conversation)."""
+        def turn_dict(turn: Turn) -> Dict[str, Any]:
+            return {
+                "role": turn.role,
+                "content": turn.content,
+                "timestamp": turn.timestamp.isoformat(),
+                "metadata": turn.metadata,
+            }
+
+        return {
+            "max_recent_turns": self.max_recent_turns,
+            "max_summary_turns": self.max_summary_turns,
+            "recent_history": [turn_dict(t) for t in self.recent_history],
+            "summary": self.summary,
+            "summary_history": [turn_dict(t) for t in self.summary_history],
+            "entities": [
+                {
+                    "name": e.name,
+                    "entity_type": e.entity_type,
+                    "mentions": e.mentions,
+                    "first_seen": e.first_seen.isoformat(),
+                    "last_seen": e.last_seen.isoformat(),
+                }
+                for e in self.entities.values()
+            ],
+            "facts": [
+                {"content": f.content, "confidence": f.confidence, "timestamp": f.timestamp.isoformat()}
+                for f in self.facts
+            ],
+            "topic": self.topic,
+            "start_time": self.start_time.isoformat(),
+            "turn_count": self.turn_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationContext":
+        """Reconstruit un contexte sérialisé par `to_dict()`."""
+        def turn(item: Dict[str, Any]) -> Turn:
+            return Turn(
+                role=item["role"],
+                content=item["content"],
+                timestamp=datetime.fromisoformat(item["timestamp"]),
+                metadata=item.get("metadata") or {},
+            )
+
+        context = cls(
+            max_recent_turns=data.get("max_recent_turns", 10),
+            max_summary_turns=data.get("max_summary_turns", 50),
+        )
+        context.recent_history = [turn(t) for t in data.get("recent_history", [])]
+        context.summary = data.get("summary", "")
+        context.summary_history = [turn(t) for t in data.get("summary_history", [])]
+        context.entities = {
+            e["name"]: Entity(
+                name=e["name"],
+                entity_type=e["entity_type"],
+                mentions=e["mentions"],
+                first_seen=datetime.fromisoformat(e["first_seen"]),
+                last_seen=datetime.fromisoformat(e["last_seen"]),
+            )
+            for e in data.get("entities", [])
+        }
+        context.facts = [
+            Fact(content=f["content"], confidence=f["confidence"], timestamp=datetime.fromisoformat(f["timestamp"]))
+            for f in data.get("facts", [])
+        ]
+        context.topic = data.get("topic")
+        if data.get("start_time"):
+            context.start_time = datetime.fromisoformat(data["start_time"])
+        context.turn_count = data.get("turn_count", len(context.recent_history))
+        return context
+
     def get_stats(self) -> Dict[str, Any]:
         """Retourne statistiques du contexte."""
         duration = (datetime.now() - self.start_time).total_seconds()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Remplissage du contexte LLM par budget de tokens.
+
+Le prompt conversationnel est composé de segments dont le nombre de tokens
+est mesuré avec le tokenizer du modèle (mis en cache par tour, voir
+`agents/prompt_templates.py`). Le budget disponible pour le contexte
+(n_ctx - max_tokens - bloc système - message courant, éventuellement
+plafonné par configuration) est rempli par ordre de priorité :
+
+1. `recent`  : derniers tours (échange en cours)
+2. `summary` : résumé de la conversation (ContextManager)
+3. `speaker` : contexte du locuteur (conversations récentes en base)
+4. `history` : tours plus anciens, du plus récent au plus ancien
+
+Chaque assemblage émet la métrique `context.packed` (tokens par segment).
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from config.system_config import MODEL_CONFIG
+from agents.prompt_templates import (
+    AssembledPrompt,
+    CONTEXT_TEMPLATE,
+    MESSAGE_TEMPLATE,
+    PromptSegment,
+    TOKEN_SAFETY_MARGIN,
+    TURN_TEMPLATES,
+    count_tokens,
+    render_turn,
+    system_block,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITIES = ("recent", "summary", "speaker", "history")
+
+SUMMARY_HEADER = "Résumé conversation précédente: "
+SPEAKER_HEADER = "Contexte conversationnel récent:\n"
+_SUMMARY_SEPARATOR = " | "
+_SPEAKER_SEPARATOR = "\n---\n"
+
+
+def _fit_parts(
+    header: str, parts: List[str], separator: str, budget: int, drop_from_start: bool = False
+) -> Optional[PromptSegment]:
+    """
+    Garde le plus grand nombre de parties qui tient dans le budget.
+
+    Args:
+        header (str): En-tête du segment
+        parts (List[str]): Parties du segment
+        separator (str): Séparateur entre parties
+        budget (int): Tokens disponibles
+        drop_from_start (bool): Retirer d'abord les premières parties (sinon les dernières)
+
+    Returns:
+        Optional[PromptSegment]: Segment (texte sans gabarit) ou None si rien ne tient
+    """
+    while parts:
+        text = header + separator.join(parts)
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            return PromptSegment(text, tokens)
+        parts = parts[1:] if drop_from_start else parts[:-1]
+    return None
+
+
+class ContextPacker:
+    """Sélectionne les segments de contexte qui tiennent dans le budget de tokens."""
+
+    def __init__(
+        self,
+        budget_tokens: Optional[int] = None,
+        priorities: Sequence[str] = DEFAULT_PRIORITIES,
+        min_recent_turns: int = 2,
+    ):
+        """
+        Initialise le packer.
+
+        Args:
+            budget_tokens (Optional[int]): Plafond de tokens pour le contexte (None = tout l'espace libre)
+            priorities (Sequence[str]): Ordre de remplissage des segments
+            min_recent_turns (int): Nombre de tours couverts par le segment `recent`
+        """
+        self.budget_tokens = budget_tokens
+        self.priorities = tuple(priorities)
+        self.min_recent_turns = min_recent_turns
+
+    def pack(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        summary: str = "",
+        speaker_context: str = "",
+        is_first_interaction: bool = False,
+        max_turns: Optional[int] = None,
+        n_ctx: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AssembledPrompt:
+        """
+        Assemble le prompt Phi-3 complet dans la limite du budget.
+
+        Ordre dans le prompt : système, historique, contexte (résumé + locuteur),
+        message. Le système et l'historique restent ainsi un préfixe stable
+        d'un tour à l'autre (réutilisation du cache KV).
+
+        Args:
+            message (str): Message de l'utilisateur
+            conversation_history (Optional[List[Dict[str, str]]]): Historique (déjà sanitizé)
+            summary (str): Résumé de la conversation
+            speaker_context (str): Contexte du locuteur
+            is_first_interaction (bool): Variante première interaction
+            max_turns (Optional[int]): Limite supplémentaire en nombre de tours
+            n_ctx (Optional[int]): Fenêtre de contexte (défaut: configuration LLM)
+            max_tokens (Optional[int]): Tokens réservés à la génération (défaut: configuration LLM)
+
+        Returns:
+            AssembledPrompt: Texte du prompt et tokens par segment
+        """
+        llm_config = MODEL_CONFIG.get("llm", {})
+        n_ctx = int(n_ctx or llm_config.get("n_ctx", 2048))
+        max_tokens = int(max_tokens or llm_config.get("max_tokens", 512))
+
+        turns: List[Dict[str, str]] = []
+        for turn in conversation_history or []:
+            if turn.get("role") in TURN_TEMPLATES:
+                turns.append(turn)
+            elif turn.get("role") == "system" and not summary:
+                # Résumé transmis dans l'historique (get_context_for_llm(include_summary=True))
+                summary = turn.get("content", "")
+        if summary.startswith(SUMMARY_HEADER):
+            summary = summary[len(SUMMARY_HEADER):]
+        speaker_context = speaker_context.strip()
+        if speaker_context.startswith(SPEAKER_HEADER.strip()):
+            speaker_context = speaker_context[len(SPEAKER_HEADER.strip()):].strip()
+
+        # Le DialogueManager ajoute le message courant à l'historique avant l'appel :
+        # ne pas le répéter (sinon le préfixe diverge du tour précédent).
+        if turns and turns[-1].get("role") == "user" and turns[-1].get("content", "").strip() == message.strip():
+            turns = turns[:-1]
+        if max_turns is not None:
+            turns = turns[-max_turns:] if max_turns > 0 else []
+
+        system = system_block(is_first_interaction)
+        message_text = MESSAGE_TEMPLATE.format(content=message)
+        message_tokens = count_tokens(message_text)
+        available = n_ctx - max_tokens - system.tokens - message_tokens - TOKEN_SAFETY_MARGIN
+        if self.budget_tokens is not None:
+            available = min(available, int(self.budget_tokens))
+        budget = max(available, 0)
+
+        # Gabarit du bloc contexte compté une fois s'il est utilisé
+        wrapper_tokens = count_tokens(CONTEXT_TEMPLATE.format(content=""))
+        selected_turns: Dict[int, PromptSegment] = {}
+        blocks: Dict[str, PromptSegment] = {}
+        used: Dict[str, int] = {name: 0 for name in self.priorities}
+        next_turn = len(turns) - 1
+
+        for name in self.priorities:
+            if name in ("recent", "history"):
+                stop = max(len(turns) - self.min_recent_turns, 0) if name == "recent" else 0
+                while next_turn >= stop:
+                    segment = render_turn(turns[next_turn])
+                    if segment.tokens > budget:
+                        next_turn = -1  # l'historique reste contigu: on s'arrête au premier trou
+                        break
+                    selected_turns[next_turn] = segment
+                    budget -= segment.tokens
+                    used[name] += segment.tokens
+                    next_turn -= 1
+            elif name in ("summary", "speaker"):
+                text = summary if name == "summary" else speaker_context
+                if not text:
+                    continue
+                overhead = 0 if blocks else wrapper_tokens
+                if name == "summary":
+                    # Résumé chronologique: les parties les plus anciennes sont retirées d'abord
+                    segment = _fit_parts(
+                        SUMMARY_HEADER, text.split(_SUMMARY_SEPARATOR), _SUMMARY_SEPARATOR,
+                        budget - overhead, drop_from_start=True,
+                    )
+                else:
+                    # Conversations du locuteur triées de la plus récente à la plus ancienne
+                    segment = _fit_parts(
+                        SPEAKER_HEADER, text.split(_SPEAKER_SEPARATOR), _SPEAKER_SEPARATOR,
+                        budget - overhead,
+                    )
+                if segment is None:
+                    continue
+                blocks[name] = segment
+                budget -= segment.tokens + overhead
+                used[name] += segment.tokens + overhead
+
+        history_segments = [selected_turns[i] for i in sorted(selected_turns)]
+        context_text = ""
+        if blocks:
+            ordered = [blocks[name].text for name in ("summary", "speaker") if name in blocks]
+            context_text = CONTEXT_TEMPLATE.format(content="\n\n".join(ordered))
+
+        turns_dropped = len(turns) - len(history_segments)
+        if available < 0:
+            logger.warning(f"Prompt au-delà de n_ctx={n_ctx} (message trop long: {message_tokens} tokens)")
+        elif turns_dropped:
+            logger.debug(f"Historique tronqué: {turns_dropped} tour(s) hors budget")
+
+        packed = AssembledPrompt(
+            text=system.text + "".join(s.text for s in history_segments) + context_text + message_text,
+            system_tokens=system.tokens,
+            message_tokens=message_tokens,
+            history_tokens=[s.tokens for s in history_segments],
+            turns_dropped=turns_dropped,
+            context_tokens=sum(used.get(name, 0) for name in ("summary", "speaker")),
+            segments={"system": system.tokens, "message": message_tokens, **used},
+        )
+        self._emit_metrics(packed, max(available, 0))
+        return packed
+
+    @staticmethod
+    def _emit_metrics(packed: AssembledPrompt, budget: int) -> None:
+        """Publie la métrique `context.packed` (tokens par segment)."""
+        try:
+            from utils.monitoring import record_metric
+            for name, tokens in packed.segments.items():
+                record_metric(f"context.packed.{name}", tokens, "tokens")
+            record_metric("context.packed.total", packed.total_tokens, "tokens")
+        except Exception:
+            pass
+        try:
+            from interface.events.event_bus import event_bus
+            event_bus.emit("context.packed", {
+                "timestamp": time.time(),
+                "budget": budget,
+                "total": packed.total_tokens,
+                "segments": dict(packed.segments),
+                "turns_dropped": packed.turns_dropped,
+            })
+        except Exception:
+            pass
+
+
+def _build_default_packer() -> ContextPacker:
+    """Instancie le packer à partir de `MODEL_CONFIG["llm"]["context_packing"]`."""
+    config: Dict[str, Any] = MODEL_CONFIG.get("llm", {}).get("context_packing", {})
+    return ContextPacker(
+        budget_tokens=config.get("budget_tokens"),
+        priorities=config.get("priorities", DEFAULT_PRIORITIES),
+        min_recent_turns=config.get("min_recent_turns", 2),
+    )
+
+
+context_packer = _build_default_packer()
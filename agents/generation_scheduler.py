@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Ordonnanceur des générations LLM (file bornée, priorités, annulation).
+
+Le runtime llama.cpp (`agents/llm_runtime.py`) ne sert qu'une génération à
+la fois. Les requêtes en attente sont servies par priorité puis par ordre
+d'arrivée :
+
+    VOICE (tour vocal PTT) > TEXT (saisie UI) > API (FastAPI) > BATCH
+
+Chaque requête porte un `CancellationToken`, vérifié entre deux tokens
+générés : une nouvelle prise de parole ou `stop_tts` abandonne la
+génération en cours. La file est bornée : au-delà de `max_queue`, la
+requête la moins prioritaire est refusée (`GenerationQueueFull`).
+
+La priorité et le jeton sont transmis implicitement (contextvar) par
+`generation_scheduler.request(...)` autour de l'appel de haut niveau
+(`process_message`), sans modifier les signatures intermédiaires.
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.system_config import MODEL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priorité d'une génération (plus petit = servi d'abord)."""
+    VOICE = 0
+    TEXT = 1
+    API = 2
+    BATCH = 3
+
+
+class GenerationCancelled(Exception):
+    """La génération a été annulée (jeton annulé)."""
+
+
+class GenerationQueueFull(RuntimeError):
+    """La file de génération est pleine."""
+
+
+class CancellationToken:
+    """Jeton d'annulation d'une requête, vérifié entre deux tokens générés."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = ""
+
+    def cancel(self, reason: str = "annulée") -> None:
+        """Annule la requête (sans effet si déjà annulée)."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """Lève `GenerationCancelled` si la requête est annulée."""
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason)
+
+
+@dataclass
+class RequestContext:
+    """Priorité et jeton de la requête en cours (propagés par contextvar)."""
+    priority: Priority
+    token: CancellationToken
+    source: str = ""
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    token: CancellationToken = field(compare=False)
+    source: str = field(compare=False, default="")
+    enqueued: float = field(compare=False, default=0.0)
+    rejected: bool = field(compare=False, default=False)
+
+
+_current_request: "contextvars.ContextVar[Optional[RequestContext]]" = contextvars.ContextVar(
+    "qaia_generation_request", default=None
+)
+
+
+class GenerationScheduler:
+    """File prioritaire devant l'unique instance llama.cpp."""
+
+    def __init__(self, max_queue: int = 8, preempt_batch: bool = True):
+        """
+        Initialise l'ordonnanceur.
+
+        Args:
+            max_queue (int): Nombre maximal de requêtes en attente
+            preempt_batch (bool): Annuler une génération BATCH en cours quand une
+                requête interactive (VOICE/TEXT) attend
+        """
+        self.max_queue = max_queue
+        self.preempt_batch = preempt_batch
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._active: Optional[_Ticket] = None
+        self._seq = itertools.count()
+        self._stats: Dict[str, Dict[str, float]] = {
+            p.name.lower(): {"requests": 0, "total_wait": 0.0, "max_wait": 0.0, "rejected": 0, "cancelled": 0}
+            for p in Priority
+        }
+
+    # ---------- Contexte de requête ----------
+    @contextmanager
+    def request(
+        self,
+        priority: Priority,
+        token: Optional[CancellationToken] = None,
+        source: str = "",
+    ) -> Iterator[CancellationToken]:
+        """
+        Déclare la priorité et le jeton des générations effectuées dans ce bloc.
+
+        Args:
+            priority (Priority): Priorité de la requête
+            token (Optional[CancellationToken]): Jeton (créé si None)
+            source (str): Origine (logs et métriques)
+
+        Yields:
+            CancellationToken: Jeton de la requête
+        """
+        context = RequestContext(Priority(priority), token or CancellationToken(), source)
+        reset = _current_request.set(context)
+        try:
+            yield context.token
+        finally:
+            _current_request.reset(reset)
+
+    @staticmethod
+    def current() -> Optional[RequestContext]:
+        """Contexte de la requête en cours dans ce thread (ou None)."""
+        return _current_request.get()
+
+    # ---------- Accès au modèle ----------
+    @contextmanager
+    def slot(
+        self,
+        source: str = "llm",
+        priority: Optional[Priority] = None,
+        token: Optional[CancellationToken] = None,
+    ) -> Iterator[CancellationToken]:
+        """
+        Attend son tour puis réserve le modèle pour une génération.
+
+        Args:
+            source (str): Origine de la requête
+            priority (Optional[Priority]): Priorité (défaut: contexte courant, sinon TEXT)
+            token (Optional[CancellationToken]): Jeton (défaut: contexte courant)
+
+        Yields:
+            CancellationToken: Jeton à vérifier entre deux tokens générés
+
+        Raises:
+            GenerationQueueFull: File pleine (requête refusée ou évincée)
+            GenerationCancelled: Requête annulée pendant l'attente
+        """
+        context = self.current()
+        if priority is None:
+            priority = context.priority if context else Priority.TEXT
+        if token is None:
+            token = context.token if context else CancellationToken()
+        priority = Priority(priority)
+        name = priority.name.lower()
+        token.raise_if_cancelled()
+
+        ticket = _Ticket(int(priority), next(self._seq), token, source, time.time())
+        with self._cond:
+            if self._active is not None or self._waiting:
+                self._admit(ticket)
+                self._maybe_preempt(priority)
+                try:
+                    while not (self._active is None and self._waiting[0] is ticket):
+                        if ticket.rejected:
+                            self._stats[name]["rejected"] += 1
+                            raise GenerationQueueFull("Requête évincée par une requête plus prioritaire")
+                        if token.cancelled:
+                            self._stats[name]["cancelled"] += 1
+                            raise GenerationCancelled(token.reason)
+                        # Réveil périodique: l'annulation d'un jeton ne notifie pas la condition
+                        self._cond.wait(0.05)
+                except BaseException:
+                    if ticket in self._waiting:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise
+                heapq.heappop(self._waiting)
+            self._active = ticket
+            wait = time.time() - ticket.enqueued
+            stats = self._stats[name]
+            stats["requests"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+        if wait > 0.05:
+            logger.info(f"Génération '{source}' ({name}) servie après {wait:.2f}s d'attente")
+        try:
+            from utils.monitoring import record_timing
+            record_timing("llm", f"queue_wait_{name}", wait)
+        except Exception:
+            pass
+
+        try:
+            yield token
+        finally:
+            if token.cancelled:
+                with self._cond:
+                    self._stats[name]["cancelled"] += 1
+                logger.info(f"Génération '{source}' annulée ({token.reason})")
+            with self._cond:
+                self._active = None
+                self._cond.notify_all()
+
+    def _admit(self, ticket: _Ticket) -> None:
+        """Ajoute un ticket à la file bornée (verrou tenu)."""
+        if len(self._waiting) >= self.max_queue:
+            worst = max(self._waiting)
+            if worst.priority <= ticket.priority:
+                self._stats[Priority(ticket.priority).name.lower()]["rejected"] += 1
+                raise GenerationQueueFull(f"File de génération pleine ({self.max_queue} en attente)")
+            # Évincer la requête la moins prioritaire (la plus récente à priorité égale)
+            self._waiting.remove(worst)
+            heapq.heapify(self._waiting)
+            worst.rejected = True
+            self._cond.notify_all()
+        heapq.heappush(self._waiting, ticket)
+
+    def _maybe_preempt(self, priority: Priority) -> None:
+        """Annule une génération BATCH en cours si une requête interactive attend (verrou tenu)."""
+        active = self._active
+        if (
+            self.preempt_batch
+            and active is not None
+            and active.priority == Priority.BATCH
+            and priority <= Priority.TEXT
+        ):
+            active.token.cancel("préemptée par une requête interactive")
+
+    def is_saturated(self, priority: Priority) -> bool:
+        """Indique si une requête de cette priorité serait refusée maintenant."""
+        with self._cond:
+            if len(self._waiting) < self.max_queue:
+                return False
+            return max(self._waiting).priority <= int(priority)
+
+    def cancel_all(self, reason: str = "annulée", max_priority: Priority = Priority.BATCH) -> int:
+        """
+        Annule la génération en cours et les requêtes en attente.
+
+        Args:
+            reason (str): Motif (journalisé)
+            max_priority (Priority): Priorité la plus basse concernée (BATCH = toutes)
+
+        Returns:
+            int: Nombre de requêtes annulées
+        """
+        with self._cond:
+            tickets = list(self._waiting) + ([self._active] if self._active else [])
+            count = 0
+            for ticket in tickets:
+                if ticket.priority <= max_priority and not ticket.token.cancelled:
+                    ticket.token.cancel(reason)
+                    count += 1
+            self._cond.notify_all()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requête active, profondeur de file et attentes par priorité."""
+        with self._cond:
+            per_priority = {}
+            for name, stats in self._stats.items():
+                requests = stats["requests"]
+                per_priority[name] = {
+                    "requests": int(requests),
+                    "avg_wait_s": stats["total_wait"] / requests if requests else 0.0,
+                    "max_wait_s": stats["max_wait"],
+                    "rejected": int(stats["rejected"]),
+                    "cancelled": int(stats["cancelled"]),
+                }
+            return {
+                "active": self._active.source if self._active else None,
+                "active_priority": Priority(self._active.priority).name.lower() if self._active else None,
+                "queued": len(self._waiting),
+                "max_queue": self.max_queue,
+                "priorities": per_priority,
+            }
+
+
+def _build_default_scheduler() -> GenerationScheduler:
+    """Instancie l'ordonnanceur à partir de `MODEL_CONFIG["llm"]["scheduler"]`."""
+    config: Dict[str, Any] = MODEL_CONFIG.get("llm", {}).get("scheduler", {})
+    return GenerationScheduler(
+        max_queue=int(config.get("max_queue", 8)),
+        preempt_batch=bool(config.get("preempt_batch", True)),
+    )
+
+
+generation_scheduler = _build_default_scheduler()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Index lexical BM25 des chunks RAG et recherche hybride en deux étages.
+
+L'index inversé (terme → {ligne: fréquence}) couvre les mêmes chunks que
+la base Chroma : il est mis à jour par `DocumentIngestor` à chaque upsert
+ou suppression, puis persisté en JSON à côté de la base vectorielle.
+
+Recherche (`hybrid_search`) :
+
+1. Passe lexicale BM25 (sans modèle) ; une requête de type mot-clé
+   (identifiant, code d'erreur, requête courte) entièrement couverte par
+   le meilleur chunk est servie directement ;
+2. Sinon, recherche vectorielle puis fusion des deux classements par
+   rang réciproque (RRF).
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from utils.monitoring import record_timing
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "lexical_index.json"
+_INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+(?:[-_./]\w+)*")
+_SEPARATORS_RE = re.compile(r"[-_./]")
+_STOPWORDS = frozenset(
+    "a au aux avec ce ces dans de des du elle en est et eux il ils je la le les leur lui ma mais me "
+    "meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi "
+    "ton tu un une vos votre vous c d j l n s t y ete etre avoir comment quel quelle quels quelles "
+    "quoi the of and to in is for".split()
+)
+
+
+def _hybrid_config() -> Dict[str, Any]:
+    try:
+        from config.system_config import RAG_CONFIG
+        return RAG_CONFIG.get("hybrid", {})
+    except ImportError:
+        return {}
+
+
+@lru_cache(maxsize=65536)
+def _fold(token: str) -> str:
+    """Minuscules sans accents (mémorisé : le vocabulaire se répète)."""
+    return "".join(c for c in unicodedata.normalize("NFD", token.lower()) if not unicodedata.combining(c))
+
+
+def is_identifier(token: str) -> bool:
+    """Terme de type identifiant (code produit, code d'erreur, version)."""
+    return any(char.isdigit() for char in token) or bool(_SEPARATORS_RE.search(token))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes indexés.
+
+    Les identifiants composés (`ERR-404`, `v2.3.0`) sont gardés entiers et
+    leurs parties ajoutées ; mots vides et lettres isolées sont ignorés.
+
+    Args:
+        text (str): Texte
+
+    Returns:
+        List[str]: Termes (minuscules, sans accents)
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(text):
+        token = _fold(match.group())
+        if _SEPARATORS_RE.search(token):
+            terms.append(token)
+            terms.extend(part for part in _SEPARATORS_RE.split(token) if part and part not in _STOPWORDS)
+        elif token not in _STOPWORDS and (len(token) > 1 or token.isdigit()):
+            terms.append(token)
+    return terms
+
+
+@dataclass
+class Chunk:
+    """Chunk retrouvé (mêmes attributs que le `Document` langchain utilisés par le RAG)."""
+
+    id: str
+    page_content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ScoredChunk:
+    """Résultat de `hybrid_search` : chunk et score de chaque passe qui l'a retrouvé (échelles distinctes)."""
+
+    doc: Any
+    vector_score: Optional[float] = None  # Pertinence vectorielle (0-1)
+    bm25_score: Optional[float] = None    # Score BM25 brut
+
+
+class LexicalIndex:
+    """Index inversé BM25 des chunks de la base vectorielle."""
+
+    def __init__(self, path: Optional[Path] = None, k1: Optional[float] = None, b: Optional[float] = None):
+        """
+        Args:
+            path (Optional[Path]): Fichier de persistance JSON (None = index en mémoire seulement)
+            k1 (Optional[float]): Saturation de la fréquence des termes (défaut RAG_CONFIG["hybrid"])
+            b (Optional[float]): Normalisation par la longueur du chunk
+        """
+        config = _hybrid_config()
+        self.path = Path(path) if path else None
+        self.k1 = float(k1 if k1 is not None else config.get("bm25_k1", 1.2))
+        self.b = float(b if b is not None else config.get("bm25_b", 0.75))
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._chunks: Dict[int, Chunk] = {}
+        self._rows: Dict[str, int] = {}
+        self._by_source: Dict[Any, Set[int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._terms: Dict[int, Counter] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._next_row = 0
+        self._dirty = False
+
+    # ---------- Mise à jour ----------
+    def add(self, ids: Sequence[str], docs: Sequence[Any]) -> None:
+        """
+        Ajoute ou remplace des chunks.
+
+        Args:
+            ids (Sequence[str]): Identifiants (ceux de la base vectorielle)
+            docs (Sequence[Any]): Documents (`page_content`, `metadata`)
+        """
+        with self._lock:
+            for chunk_id, doc in zip(ids, docs):
+                self._remove_row(self._rows.get(chunk_id))
+                row = self._next_row
+                self._next_row += 1
+                terms = Counter(tokenize(doc.page_content))
+                chunk = Chunk(chunk_id, doc.page_content, dict(doc.metadata or {}))
+                self._chunks[row] = chunk
+                self._rows[chunk_id] = row
+                self._by_source.setdefault(chunk.metadata.get("source"), set()).add(row)
+                self._terms[row] = terms
+                length = sum(terms.values())
+                self._lengths[row] = length
+                self._total_length += length
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[row] = tf
+            self._dirty = True
+
+    def remove_source(self, source: str) -> int:
+        """
+        Retire tous les chunks d'un document (métadonnée `source`).
+
+        Returns:
+            int: Nombre de chunks retirés
+        """
+        with self._lock:
+            rows = list(self._by_source.get(source, ()))
+            for row in rows:
+                self._remove_row(row)
+            self._dirty = self._dirty or bool(rows)
+            return len(rows)
+
+    def _remove_row(self, row: Optional[int]) -> None:
+        if row is None:
+            return
+        chunk = self._chunks.pop(row)
+        del self._rows[chunk.id]
+        source_rows = self._by_source[chunk.metadata.get("source")]
+        source_rows.discard(row)
+        if not source_rows:
+            del self._by_source[chunk.metadata.get("source")]
+        self._total_length -= self._lengths.pop(row)
+        for term in self._terms.pop(row):
+            postings = self._postings[term]
+            del postings[row]
+            if not postings:
+                del self._postings[term]
+
+    def rebuild(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Optional[Dict[str, Any]]]) -> None:
+        """Reconstruit l'index à partir du contenu complet de la collection."""
+        with self._lock:
+            self._reset()
+            self.add(ids, [Chunk(i, text or "", meta or {}) for i, text, meta in zip(ids, texts, metadatas)])
+
+    def sync_with_collection(self, collection: Any) -> bool:
+        """
+        Reconstruit l'index si son contenu diffère de la collection Chroma.
+
+        Args:
+            collection (Any): Collection Chroma (`count`, `get`)
+
+        Returns:
+            bool: True si l'index a été reconstruit
+        """
+        with self._lock:
+            if len(self) == collection.count():
+                return False
+            start = time.time()
+            data = collection.get(include=["documents", "metadatas"])
+            self.rebuild(data["ids"], data["documents"], data["metadatas"])
+            logger.info(f"Index lexical reconstruit: {len(self)} chunks en {time.time() - start:.2f}s")
+            self.save()
+            return True
+
+    # ---------- Persistance ----------
+    def save(self) -> None:
+        """Écrit l'index (chunks et métadonnées ; les postings sont recalculés au chargement)."""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                chunks = [[c.id, c.page_content, c.metadata] for c in self._chunks.values()]
+                tmp.write_text(json.dumps({"version": _INDEX_VERSION, "chunks": chunks}, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Index lexical non sauvegardé: {e}")
+
+    @classmethod
+    def load(cls, path: Path, **kwargs: Any) -> "LexicalIndex":
+        """
+        Charge l'index persisté (index vide si absent ou illisible).
+
+        Args:
+            path (Path): Fichier JSON
+
+        Returns:
+            LexicalIndex: Index prêt
+        """
+        index = cls(path, **kwargs)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            if data.get("version") == _INDEX_VERSION:
+                chunks = [Chunk(*entry) for entry in data["chunks"]]
+                index.add([c.id for c in chunks], chunks)
+                index._dirty = False
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Index lexical illisible ({e}), reconstruction")
+        return index
+
+    # ---------- Recherche ----------
+    def search(self, query: str, k: int = 10) -> List[Tuple[Chunk, float]]:
+        """
+        Recherche BM25.
+
+        Args:
+            query (str): Requête
+            k (int): Nombre de chunks retournés
+
+        Returns:
+            List[Tuple[Chunk, float]]: (chunk, score BM25) par score décroissant
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            # Identifiant connu tel quel : ses parties (`err`, `404`), très fréquentes, sont ignorées
+            for term in [t for t in terms if _SEPARATORS_RE.search(t) and t in self._postings]:
+                terms.difference_update(_SEPARATORS_RE.split(term))
+                terms.add(term)
+            n_docs = len(self._chunks)
+            if not terms or not n_docs:
+                return []
+            avg_length = self._total_length / n_docs or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, tf in postings.items():
+                    norm = tf + self.k1 * (1.0 - self.b + self.b * self._lengths[row] / avg_length)
+                    scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1.0) / norm
+            best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+            return [(self._chunks[row], score) for row, score in best]
+
+    def coverage(self, query: str, chunk: Chunk) -> float:
+        """
+        Part des termes clés de la requête présents dans un chunk (0-1).
+
+        Termes clés : les identifiants s'il y en a (`code ERR-404` → `err-404`),
+        sinon tous les termes.
+        """
+        terms = set(tokenize(query))
+        identifiers = {term for term in terms if is_identifier(term)}
+        terms = identifiers or terms
+        if not terms:
+            return 0.0
+        with self._lock:
+            row = self._rows.get(chunk.id)
+            present = self._terms.get(row, {}) if row is not None else {}
+            return sum(1 for term in terms if term in present) / len(terms)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._chunks)
+
+
+def _doc_key(doc: Any) -> Tuple[Any, str]:
+    """Identité d'un chunk commune aux deux classements (source + contenu)."""
+    return (doc.metadata.get("source") if doc.metadata else None, doc.page_content)
+
+
+def is_keyword_query(query: str, max_terms: Optional[int] = None) -> bool:
+    """
+    Requête de type mot-clé : identifiant présent ou peu de termes.
+
+    Args:
+        query (str): Requête
+        max_terms (Optional[int]): Nombre de termes au-delà duquel la requête est en langage naturel
+
+    Returns:
+        bool: True si la passe lexicale peut suffire
+    """
+    if max_terms is None:
+        max_terms = int(_hybrid_config().get("keyword_max_terms", 3))
+    terms = tokenize(query)
+    return any(is_identifier(term) for term in terms) or 0 < len(set(terms)) <= max_terms
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[Any]], k: int, rrf_k: int = 60) -> List[Any]:
+    """
+    Fusionne des classements par rang réciproque (insensible à l'échelle des scores).
+
+    Args:
+        rankings (Iterable[Sequence[Any]]): Classements de documents (meilleur en premier)
+        k (int): Nombre de documents retournés
+        rrf_k (int): Constante d'atténuation des rangs
+
+    Returns:
+        List[Any]: Documents fusionnés
+    """
+    scores: Dict[Tuple[Any, str], float] = {}
+    docs: Dict[Tuple[Any, str], Any] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = _doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    ordered = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [docs[key] for key in ordered]
+
+
+def hybrid_search(
+    query: str,
+    k: int,
+    lexical_index: Optional[LexicalIndex],
+    vector_search: Any,
+    config: Optional[Dict[str, Any]] = None,
+) -> List[ScoredChunk]:
+    """
+    Recherche en deux étages : BM25, puis vecteurs seulement si nécessaire, puis fusion.
+
+    Les résultats suivent l'ordre de classement (RRF si les deux passes ont
+    servi) et gardent le score de chaque passe sur sa propre échelle :
+    pertinence vectorielle (`similarity_search_with_relevance_scores`) et
+    score BM25, à comparer chacun à son seuil (voir `agents/rag_context.py`).
+
+    Args:
+        query (str): Requête
+        k (int): Nombre de chunks retournés
+        lexical_index (Optional[LexicalIndex]): Index BM25 (None = recherche vectorielle seule)
+        vector_search (Callable[[str, int], List[Tuple[Any, float]]]): Recherche vectorielle avec
+            pertinence, ex. `vector_db.similarity_search_with_relevance_scores`
+        config (Optional[Dict[str, Any]]): Réglages (défaut: RAG_CONFIG["hybrid"])
+
+    Returns:
+        List[ScoredChunk]: Chunks (avec `page_content`/`metadata`) dans l'ordre de classement
+    """
+    config = _hybrid_config() if config is None else config
+    if lexical_index is None or not config.get("enabled", True) or not len(lexical_index):
+        return [ScoredChunk(doc, vector_score=float(score)) for doc, score in vector_search(query, k=k)]
+
+    start = time.time()
+    candidates = int(config.get("candidates", 20))
+    lexical = lexical_index.search(query, k=max(k, candidates))
+    record_timing("rag", "retrieval_lexical", time.time() - start)
+    if (
+        lexical
+        and is_keyword_query(query, config.get("keyword_max_terms"))
+        and lexical_index.coverage(query, lexical[0][0]) >= float(config.get("keyword_coverage", 1.0))
+    ):
+        logger.debug(f"Recherche lexicale seule ({len(lexical)} candidats)")
+        return [ScoredChunk(chunk, bm25_score=score) for chunk, score in lexical[:k]]
+
+    vector_start = time.time()
+    vector = list(vector_search(query, k=max(k, candidates)))
+    record_timing("rag", "retrieval_vector", time.time() - vector_start)
+    fused = reciprocal_rank_fusion(
+        [[doc for doc, _ in vector], [chunk for chunk, _ in lexical]], k, int(config.get("rrf_k", 60))
+    )
+    vector_scores = {_doc_key(doc): float(score) for doc, score in vector}
+    bm25_scores = {_doc_key(chunk): score for chunk, score in lexical}
+    return [
+        ScoredChunk(doc, vector_score=vector_scores.get(_doc_key(doc)), bm25_score=bm25_scores.get(_doc_key(doc)))
+        for doc in fused
+    ]
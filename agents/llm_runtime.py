@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Service d'exécution llama.cpp unique (un seul modèle GGUF résident).
+
+`QAIACore` (repli du DialogueManager) et le moteur RAG (`LLMAgent` via
+`process_query` / `process_query_stream`) chargeaient chacun une copie de
+Phi-3 : deux mmaps, deux caches KV et deux pools de threads en concurrence
+sur les 4 cœurs physiques. Le runtime s'appuie sur le générateur du moteur
+RAG (`LlamaCpp`, dont `.client` est le `llama_cpp.Llama`) et sert une seule
+génération à la fois ; l'ordre d'accès (priorités, file bornée, annulation
+entre deux tokens) est confié à `agents/generation_scheduler.py`.
+"""
+
+# /// script
+# dependencies = [
+#   "psutil>=5.9.0",
+# ]
+# ///
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.system_config import MODEL_CONFIG
+from agents.generation_scheduler import (
+    CancellationToken,
+    GenerationScheduler,
+    Priority,
+    generation_scheduler,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LlamaRuntime:
+    """Propriétaire de l'instance llama.cpp partagée ; sérialise les générations."""
+
+    def __init__(self, scheduler: Optional[GenerationScheduler] = None):
+        """
+        Initialise le runtime (aucun modèle chargé).
+
+        Args:
+            scheduler (Optional[GenerationScheduler]): Ordonnanceur (défaut: instance partagée)
+        """
+        self.scheduler = scheduler or generation_scheduler
+        self._state_lock = threading.Lock()
+        self._standalone = None
+
+    # ---------- Modèle ----------
+    @property
+    def model_path(self) -> Path:
+        return Path(MODEL_CONFIG.get("llm", {}).get("model_path", ""))
+
+    def available(self) -> bool:
+        """Indique si un modèle GGUF est configuré (sans le charger)."""
+        path = self.model_path
+        return path.is_file() and path.suffix.lower() == ".gguf"
+
+    @property
+    def generator(self) -> Any:
+        """Générateur LangChain `LlamaCpp` du moteur RAG (chargé au premier accès)."""
+        try:
+            from agents.rag_agent import rag_engine
+        except ImportError as e:
+            logger.warning(f"Moteur RAG indisponible ({e}), llama.cpp autonome")
+            return None
+        return rag_engine.generator
+
+    @property
+    def llm(self) -> Any:
+        """
+        Instance `llama_cpp.Llama` partagée.
+
+        Celle du générateur RAG ; à défaut (LangChain indisponible), une
+        instance autonome chargée une seule fois.
+        """
+        generator = self.generator
+        if generator is not None:
+            return generator.client
+        if self._standalone is None:
+            with self._state_lock:
+                if self._standalone is None:
+                    self._standalone = self._load_standalone()
+        return self._standalone
+
+    def _load_standalone(self) -> Any:
+        """Charge `llama_cpp.Llama` directement (générateur LangChain indisponible)."""
+        if not self.available():
+            return None
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            logger.warning("llama-cpp-python non disponible")
+            return None
+        llm_config = MODEL_CONFIG.get("llm", {})
+        logger.info(f"Chargement llama.cpp autonome: {self.model_path.name}")
+        return Llama(
+            model_path=str(self.model_path),
+            n_gpu_layers=llm_config.get("n_gpu_layers", -1),
+            n_ctx=llm_config.get("n_ctx", 2048),
+            n_threads=llm_config.get("n_threads", 6),
+            verbose=False,
+        )
+
+    # ---------- Sérialisation ----------
+    @contextmanager
+    def session(
+        self,
+        source: str = "llm",
+        priority: Optional[Priority] = None,
+        token: Optional[CancellationToken] = None,
+    ) -> Iterator[CancellationToken]:
+        """
+        Réserve le modèle pour une génération (les autres appelants attendent leur tour).
+
+        Args:
+            source (str): Origine de la requête (logs et métriques)
+            priority (Optional[Priority]): Priorité (défaut: contexte de requête courant)
+            token (Optional[CancellationToken]): Jeton d'annulation (défaut: contexte courant)
+
+        Yields:
+            CancellationToken: Jeton à vérifier entre deux tokens générés
+        """
+        with self.scheduler.slot(source, priority, token) as request_token:
+            yield request_token
+
+    def __call__(self, **kwargs) -> Dict[str, Any]:
+        """
+        Complétion brute (API `llama_cpp.Llama.__call__`), sérialisée.
+
+        Utilisée par le repli du DialogueManager (`models["language"]`). La
+        génération est lue en flux pour vérifier l'annulation entre deux tokens.
+
+        Returns:
+            Dict[str, Any]: Réponse llama.cpp ({"choices": [{"text": ...}]})
+        """
+        llm = self.llm
+        if llm is None:
+            raise RuntimeError("Modèle LLM non disponible")
+        kwargs.pop("stream", None)
+        parts = []
+        with self.session("dialogue_fallback") as token:
+            for chunk in llm(stream=True, **kwargs):
+                if token.cancelled:
+                    break
+                parts.append(chunk["choices"][0].get("text", ""))
+        return {"choices": [{"text": "".join(parts)}]}
+
+    def stream(self, prompt: str, source: str = "rag", tags: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Génère en flux via le générateur LangChain (callbacks `llm.token`), sérialisé.
+
+        Le modèle est libéré à la fin du flux, à la fermeture du générateur ou
+        dès que la requête est annulée.
+
+        Args:
+            prompt (str): Prompt complet
+            source (str): Origine de la requête
+            tags (Optional[List[str]]): Tags LangChain transmis aux callbacks de la génération
+
+        Yields:
+            str: Fragments générés
+        """
+        generator = self.generator
+        if generator is None:
+            raise RuntimeError("Générateur LLM non disponible")
+        with self.session(source) as token:
+            chunks = generator.stream(prompt, config={"tags": tags}) if tags else generator.stream(prompt)
+            for chunk in chunks:
+                if token.cancelled:
+                    break
+                yield chunk
+
+    # ---------- Rapport ----------
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Mémoire résidente du processus et part du modèle GGUF mappé.
+
+        Returns:
+            Dict[str, float]: rss_mb, model_rss_mb (Linux), model_file_mb
+        """
+        usage: Dict[str, float] = {}
+        path = self.model_path
+        if path.is_file():
+            usage["model_file_mb"] = path.stat().st_size / 1024**2
+        try:
+            import psutil
+            process = psutil.Process(os.getpid())
+            usage["rss_mb"] = process.memory_info().rss / 1024**2
+            try:
+                resolved = str(path.resolve())
+                usage["model_rss_mb"] = sum(
+                    m.rss for m in process.memory_maps(grouped=True) if m.path == resolved
+                ) / 1024**2
+            except Exception:
+                pass
+        except Exception as e:
+            logger.debug(f"Mesure mémoire indisponible: {e}")
+        return usage
+
+    def get_stats(self) -> Dict[str, Any]:
+        """File de génération, état du modèle et mémoire résidente (publiée en métrique)."""
+        stats: Dict[str, Any] = self.scheduler.get_stats()
+        try:
+            from agents.rag_agent import rag_engine
+            stats["loaded"] = rag_engine.is_loaded("generator") or self._standalone is not None
+        except Exception:
+            stats["loaded"] = self._standalone is not None
+        stats.update(self.memory_usage())
+        if "rss_mb" in stats:
+            try:
+                from utils.monitoring import record_metric
+                record_metric("llm.runtime.rss", stats["rss_mb"], "MB")
+            except Exception:
+                pass
+        return stats
+
+
+llm_runtime = LlamaRuntime()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Cache de préfixe KV (session) pour llama.cpp.
+
+Le prompt système Phi-3 représente la majeure partie des tokens de chaque
+requête. Ce module attache un `LlamaRAMCache` au modèle llama.cpp et
+amorce l'état KV du préfixe système statique : à chaque tour, llama.cpp
+restaure l'état du plus long préfixe déjà évalué (système + tours déjà
+vus) et n'évalue que la suite (nouveau message utilisateur).
+
+Le temps jusqu'au premier token (TTFT) est mesuré séparément pour les
+requêtes servies avec et sans préfixe en cache.
+"""
+
+# /// script
+# dependencies = [
+#   "llama-cpp-python>=0.2.71",
+# ]
+# ///
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from config.system_config import MODEL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCache:
+    """Cache d'états KV llama.cpp indexé par préfixe de tokens."""
+
+    def __init__(self, capacity_bytes: int, enabled: bool = True, history_size: int = 100):
+        """
+        Initialise le cache (aucun modèle attaché).
+
+        Args:
+            capacity_bytes (int): Taille maximale des états KV conservés en RAM
+            enabled (bool): Activer le cache (False = mesure de référence sans cache)
+            history_size (int): Nombre de mesures TTFT conservées par mode
+        """
+        self.enabled = enabled
+        self.capacity_bytes = capacity_bytes
+        self._client = None
+        self._prefix: Optional[str] = None
+        self._lock = threading.Lock()
+        self._ttft = {
+            "cached": deque(maxlen=history_size),
+            "uncached": deque(maxlen=history_size),
+        }
+        self.prime_time: Optional[float] = None
+
+    @staticmethod
+    def _client_of(generator: Any) -> Any:
+        """Retourne l'instance `llama_cpp.Llama` (langchain LlamaCpp expose `.client`)."""
+        return getattr(generator, "client", generator)
+
+    def attach(self, generator: Any) -> bool:
+        """
+        Attache un cache RAM au modèle llama.cpp.
+
+        Args:
+            generator (Any): `LlamaCpp` langchain ou `llama_cpp.Llama`
+
+        Returns:
+            bool: True si le cache est actif
+        """
+        if not self.enabled:
+            logger.info("Cache de préfixe KV désactivé (configuration)")
+            return False
+        try:
+            from llama_cpp import LlamaRAMCache
+            client = self._client_of(generator)
+            client.set_cache(LlamaRAMCache(capacity_bytes=self.capacity_bytes))
+            self._client = client
+            logger.info(f"Cache de préfixe KV attaché ({self.capacity_bytes / (1024**2):.0f} MB)")
+            return True
+        except Exception as e:
+            logger.warning(f"Cache de préfixe KV indisponible: {e}")
+            self._client = None
+            return False
+
+    def prime(self, prefix: str) -> bool:
+        """
+        Évalue une fois le préfixe statique et enregistre son état KV.
+
+        Doit être appelé avant toute génération concurrente (llama.cpp n'est
+        pas thread-safe), typiquement juste après le chargement du modèle.
+
+        Args:
+            prefix (str): Préfixe commun (bloc système Phi-3)
+
+        Returns:
+            bool: True si le préfixe a été évalué et mis en cache
+        """
+        if self._client is None or not prefix or prefix == self._prefix:
+            return False
+        with self._lock:
+            try:
+                start = time.time()
+                client = self._client
+                tokens = client.tokenize(prefix.encode("utf-8"), special=True)
+                client.reset()
+                client.eval(tokens)
+                client.cache[tokens] = client.save_state()
+                self._prefix = prefix
+                self.prime_time = time.time() - start
+                logger.info(
+                    f"Préfixe système mis en cache ({len(tokens)} tokens, {self.prime_time:.2f}s)"
+                )
+                return True
+            except Exception as e:
+                logger.warning(f"Amorçage du préfixe KV impossible: {e}")
+                return False
+
+    def is_cached(self, prompt: str) -> bool:
+        """Indique si le prompt commence par le préfixe déjà évalué."""
+        return bool(self._client is not None and self._prefix and prompt.startswith(self._prefix))
+
+    def record_ttft(self, ttft: float, cached: bool) -> None:
+        """
+        Enregistre un temps jusqu'au premier token.
+
+        Args:
+            ttft (float): Durée en secondes
+            cached (bool): Requête servie avec préfixe en cache
+        """
+        mode = "cached" if cached else "uncached"
+        self._ttft[mode].append(ttft)
+        logger.info(f"TTFT {'avec' if cached else 'sans'} cache de préfixe: {ttft:.2f}s")
+        try:
+            from utils.monitoring import record_timing
+            record_timing("llm", f"ttft_{mode}", ttft)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne l'état du cache et les TTFT moyens par mode."""
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "attached": self._client is not None,
+            "prefix_chars": len(self._prefix) if self._prefix else 0,
+            "prime_time": self.prime_time,
+        }
+        for mode, values in self._ttft.items():
+            stats[f"ttft_{mode}_count"] = len(values)
+            stats[f"ttft_{mode}_avg"] = sum(values) / len(values) if values else None
+        if self._client is not None and getattr(self._client, "cache", None) is not None:
+            try:
+                stats["cache_bytes"] = self._client.cache.cache_size
+            except Exception:
+                pass
+        return stats
+
+
+_llm_config = MODEL_CONFIG.get("llm", {})
+prompt_cache = PromptCache(
+    capacity_bytes=int(_llm_config.get("prompt_cache_capacity_mb", 384)) * 1024 * 1024,
+    enabled=bool(_llm_config.get("prompt_cache", True)),
+)
@@ -21,16 +21,10 @@
 # ///
 
 import os
-import pickle
-import hashlib
 import logging
 from datetime import datetime
-import chromadb
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import LlamaCpp
 from langchain_community.document_loaders import (
-    DirectoryLoader,
+    UnstructuredFileLoader,
     PyMuPDFLoader,
     UnstructuredHTMLLoader,
     UnstructuredMarkdownLoader,
@@ -43,6 +37,7 @@ import shutil
 from typing import List, Dict, Any, Optional
 import gc
 import time
+import threading
 import traceback
 import re
 
@@ -55,6 +50,7 @@ from config.system_config import (
     VECTOR_DB_DIR,
     RAG_CONFIG
 )
+from utils.embedding_cache import CachedEmbeddings
 
 # ======================
 # CONFIGURATION UTILISANT system_config
@@ -104,14 +100,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Support de formats multiples
+# Support de formats multiples (classe de loader par extension, chargement fichier par fichier)
 LOADERS_MAPPING = {
-    ".txt": DirectoryLoader(str(DOC_DIR), glob="**/*.txt"),
-    ".pdf": DirectoryLoader(str(DOC_DIR), glob="**/*.pdf", loader_cls=PyMuPDFLoader),
-    ".html": DirectoryLoader(str(DOC_DIR), glob="**/*.html", loader_cls=UnstructuredHTMLLoader),
-    ".htm": DirectoryLoader(str(DOC_DIR), glob="**/*.htm", loader_cls=UnstructuredHTMLLoader),
-    ".md": DirectoryLoader(str(DOC_DIR), glob="**/*.md", loader_cls=UnstructuredMarkdownLoader),
-    ".docx": DirectoryLoader(str(DOC_DIR), glob="**/*.docx", loader_cls=Docx2txtLoader),
+    ".txt": UnstructuredFileLoader,
+    ".pdf": PyMuPDFLoader,
+    ".html": UnstructuredHTMLLoader,
+    ".htm": UnstructuredHTMLLoader,
+    ".md": UnstructuredMarkdownLoader,
+    ".docx": Docx2txtLoader,
 }
 
 # ====================
@@ -179,32 +175,8 @@ class DataSources:
 # ====================
 # CACHE DES EMBEDDINGS
 # ====================
-class EmbeddingCache:
-    def __init__(self, model):
-        self.model = model
-        os.makedirs(CACHE_DIR, exist_ok=True)
-
-    def get_embedding(self, text: str):
-        """Retourne l'embedding d'un texte avec un cache local."""
-        try:
-            hash_key = hashlib.md5(text.encode()).hexdigest()
-            cache_path = os.path.join(CACHE_DIR, f"{hash_key}.pkl")
-            
-            if os.path.exists(cache_path):
-                with open(cache_path, "rb") as f:
-                    logger.debug(f"Cache hit pour: {text[:50]}...")
-                    return pickle.load(f)
-            
-            embedding = self.model.embed_query(text)
-            with open(cache_path, "wb") as f:
-                pickle.dump(embedding, f)
-            
-            logger.debug(f"Nouveau cache d'embedding: {text[:50]}...")
-            return embedding
-            
-        except Exception as e:
-            logger.error(f"Erreur d'embedding: {str(e)}")
-            return None
+# Cache unique (utils.embedding_cache) ; nom conservé pour les imports existants
+EmbeddingCache = CachedEmbeddings
 
 # =========================
 # CHARGEMENT DES DOCUMENTS
@@ -217,16 +189,28 @@ def load_all_documents():
         logger.warning("Aucun document trouvé dans 'data/documents/' ! Vérifiez le chemin.")
         return []
     
+    # Chargement en parallèle si le lot est assez grand (RAG_CONFIG["ingestion"]["workers"], "pool_min_files")
+    from agents.rag_ingestion import iter_parsed_files
+    paths = sorted(
+        path for path in Path(DOC_DIR).rglob("*")
+        if path.is_file() and path.suffix.lower() in LOADERS_MAPPING
+    )
+    loaded = {}
+    for path, docs, error in iter_parsed_files(paths, LOADERS_MAPPING):
+        if error is not None:
+            logger.error(f"Erreur lors du chargement de {path.name}: {error}")
+        elif docs:
+            loaded[path] = docs
+
     extensions_found = set()
-    for ext, loader in LOADERS_MAPPING.items():
-        try:
-            docs = loader.load()
-            if docs:
-                logger.info(f"Chargé {len(docs)} documents avec l'extension {ext}")
-                all_documents.extend(docs)
-                extensions_found.add(ext)
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement des documents {ext}: {e}")
+    counts: Dict[str, int] = {}
+    for path in sorted(loaded):
+        all_documents.extend(loaded[path])
+        ext = path.suffix.lower()
+        counts[ext] = counts.get(ext, 0) + len(loaded[path])
+        extensions_found.add(ext)
+    for ext, count in counts.items():
+        logger.info(f"Chargé {count} documents avec l'extension {ext}")
     
     if not extensions_found:
         logger.warning(f"Aucun document supporté trouvé. Formats supportés: {', '.join(LOADERS_MAPPING.keys())}")
@@ -236,66 +220,189 @@ def load_all_documents():
     return all_documents
 
 # ==================
-# INITIALISATION
+# MOTEUR RAG (INITIALISATION PARESSEUSE)
 # ==================
-logger.info("Initialisation des modèles...")
-
-try:
-    # Configuration du modèle LLM
-    DEFAULT_MODEL_PATH = str(MODEL_PATH)
-    LLM_CONFIG = {
-    "model_path": MODEL_PATH_STR,
-    "n_ctx": MODEL_CONFIG["llm"]["n_ctx"],
-    "n_threads": MODEL_CONFIG["llm"]["n_threads"],
-    "n_gpu_layers": MODEL_CONFIG["llm"]["n_gpu_layers"],
-    "n_batch": MODEL_CONFIG["llm"]["n_batch"],
-    "temperature": MODEL_CONFIG["llm"]["temperature"],
-    "top_p": MODEL_CONFIG["llm"]["top_p"],
-    "max_tokens": MODEL_CONFIG["llm"]["max_tokens"],
-    "verbose": False}
-
-    # Détection et configuration GPU
-    if torch.cuda.is_available():
-        try:
-            gpu_name = torch.cuda.get_device_name(0)
-            vram_mb = torch.cuda.get_device_properties(0).total_memory / (1024**2)
-            logger.info(f"GPU détecté: {gpu_name} avec {vram_mb:.2f} MB VRAM")
-            
-            # Pour GTX 1050 avec 2GB VRAM - forcer le mode CPU
-            # Les couches GPU sont définies comme 0 dans LLM_CONFIG
-            if "GTX 1050" in gpu_name or vram_mb < 3000:
-                logger.info("GPU avec peu de VRAM détecté, utilisation du CPU uniquement")
-            else:
-                # Nombre de couches dynamique en fonction de la VRAM disponible
-                gpu_layers = min(int(vram_mb / 500), 32)  # ~500MB par couche
-                LLM_CONFIG["n_gpu_layers"] = gpu_layers
-                logger.info(f"Utilisation de {gpu_layers} couches sur GPU")
-        except Exception as e:
-            logger.error(f"Erreur lors de la configuration GPU: {e}")
-            logger.error(traceback.format_exc())
+class RagEngine:
+    """
+    Moteur RAG à initialisation paresseuse.
 
-    # Initialisation du modèle LLM avec traitement d'exceptions amélioré
-    logger.info(f"Initialisation du modèle avec {LLM_CONFIG['n_threads']} threads et {LLM_CONFIG['n_gpu_layers']} couches GPU")
+    Trois composants indépendants, chargés au premier besoin :
+        - generator : modèle LlamaCpp (génération)
+        - embedder : modèle d'embedding HuggingFace
+        - vector_store : base Chroma persistante (+ ingestion incrémentale)
+
+    La génération directe (k_results=0) ne charge ni embeddings ni index.
+    Chaque composant enregistre son temps de chargement (`load_times`).
+    """
+
+    COMPONENTS = ("generator", "embedder", "vector_store")
+
+    def __init__(self, doc_dir: Path = DOC_DIR, persist_dir: Path = PERSIST_DIR):
+        """
+        Initialise le moteur sans charger de modèle.
+
+        Args:
+            doc_dir (Path): Répertoire des documents à indexer
+            persist_dir (Path): Répertoire de persistance Chroma
+        """
+        self.doc_dir = Path(doc_dir)
+        self.persist_dir = Path(persist_dir)
+        self.logger = logging.getLogger(__name__)
+        self._components: Dict[str, Any] = {}
+        self._failed: Dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in self.COMPONENTS}
+        self.load_times: Dict[str, float] = {}
+        self.ingestion_stats: Dict[str, Any] = {}
+        self.lexical_index = None  # Index BM25 des chunks (chargé avec vector_store)
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+
+    # ---------- Accès paresseux ----------
+    def _get(self, name: str, loader) -> Any:
+        """Retourne le composant `name`, en le chargeant au premier appel (thread-safe)."""
+        if name in self._components:
+            return self._components[name]
+        with self._locks[name]:
+            if name in self._components:
+                return self._components[name]
+            if name in self._failed:
+                return None
+            start = time.time()
+            try:
+                component = loader()
+            except Exception as e:
+                self.logger.error(f"Erreur lors du chargement RAG ({name}): {e}")
+                self.logger.error(traceback.format_exc())
+                self._failed[name] = str(e)
+                component = None
+            elapsed = time.time() - start
+            self.load_times[name] = elapsed
+            self.logger.info(f"Composant RAG '{name}' chargé en {elapsed:.2f}s")
+            try:
+                from utils.monitoring import record_timing
+                record_timing("rag", f"load_{name}", elapsed)
+            except Exception:
+                pass
+            if component is not None:
+                self._components[name] = component
+            return component
+
+    @property
+    def generator(self):
+        """Modèle LlamaCpp (None si indisponible)."""
+        return self._get("generator", self._load_generator)
+
+    @property
+    def embedder(self):
+        """Modèle d'embedding HuggingFace (None si indisponible)."""
+        return self._get("embedder", self._load_embedder)
+
+    @property
+    def vector_store(self):
+        """Base vectorielle Chroma synchronisée avec `doc_dir` (None si indisponible)."""
+        return self._get("vector_store", self._load_vector_store)
+
+    def search(self, query: str, k: int) -> List[Any]:
+        """
+        Recherche hybride : BM25 d'abord, vecteurs seulement si la passe lexicale ne suffit pas.
+
+        Args:
+            query (str): Requête
+            k (int): Nombre de chunks
+
+        Returns:
+            List[ScoredChunk]: Chunks classés avec le score de chaque passe, vide si la base est indisponible
+        """
+        vector_db = self.vector_store
+        if vector_db is None:
+            return []
+        from agents.lexical_index import hybrid_search
+        return hybrid_search(query, k, self.lexical_index, vector_db.similarity_search_with_relevance_scores)
+
+    def is_loaded(self, name: str) -> bool:
+        """Indique si un composant est déjà chargé."""
+        return name in self._components
+
+    def warmup(self, components=("generator",)) -> None:
+        """
+        Précharge des composants (ex: depuis un thread d'arrière-plan).
+
+        Args:
+            components (Iterable[str]): Noms des composants à charger
+        """
+        for name in components:
+            getattr(self, name)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retourne l'état de chargement et les temps de chargement par composant."""
+        return {
+            name: {
+                "loaded": name in self._components,
+                "load_time": self.load_times.get(name),
+                "error": self._failed.get(name),
+            }
+            for name in self.COMPONENTS
+        }
+
+    # ---------- Chargeurs ----------
+    def _build_llm_config(self) -> Dict[str, Any]:
+        """Construit la configuration LlamaCpp depuis system_config (+ détection GPU)."""
+        llm_config = {
+            "model_path": MODEL_PATH_STR,
+            "n_ctx": MODEL_CONFIG["llm"]["n_ctx"],
+            "n_threads": MODEL_CONFIG["llm"]["n_threads"],
+            "n_gpu_layers": MODEL_CONFIG["llm"]["n_gpu_layers"],
+            "n_batch": MODEL_CONFIG["llm"]["n_batch"],
+            "temperature": MODEL_CONFIG["llm"]["temperature"],
+            "top_p": MODEL_CONFIG["llm"]["top_p"],
+            "max_tokens": MODEL_CONFIG["llm"]["max_tokens"],
+            "verbose": False}
+
+        # Détection et configuration GPU
+        if torch.cuda.is_available():
+            try:
+                gpu_name = torch.cuda.get_device_name(0)
+                vram_mb = torch.cuda.get_device_properties(0).total_memory / (1024**2)
+                self.logger.info(f"GPU détecté: {gpu_name} avec {vram_mb:.2f} MB VRAM")
+
+                # Pour GTX 1050 avec 2GB VRAM - forcer le mode CPU
+                if "GTX 1050" in gpu_name or vram_mb < 3000:
+                    self.logger.info("GPU avec peu de VRAM détecté, utilisation du CPU uniquement")
+                else:
+                    # Nombre de couches dynamique en fonction de la VRAM disponible
+                    gpu_layers = min(int(vram_mb / 500), 32)  # ~500MB par couche
+                    llm_config["n_gpu_layers"] = gpu_layers
+                    self.logger.info(f"Utilisation de {gpu_layers} couches sur GPU")
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la configuration GPU: {e}")
+                self.logger.error(traceback.format_exc())
+        return llm_config
+
+    def _load_generator(self):
+        """Charge le modèle LlamaCpp."""
+        from langchain_community.llms import LlamaCpp
+        from agents.callbacks.streaming_callback import StreamingCallback
+
+        llm_config = self._build_llm_config()
+        self.logger.info(
+            f"Initialisation du modèle avec {llm_config['n_threads']} threads "
+            f"et {llm_config['n_gpu_layers']} couches GPU"
+        )
 
-    try:
         # Vérifier si le fichier du modèle existe
-        model_path = LLM_CONFIG["model_path"]
+        model_path = llm_config["model_path"]
         if not os.path.exists(model_path):
-            logger.error(f"Fichier modèle introuvable: {model_path}")
+            self.logger.error(f"Fichier modèle introuvable: {model_path}")
             raise FileNotFoundError(f"Modèle LLM non trouvé: {model_path}")
-        
-        # Import du callback streaming
-        from agents.callbacks.streaming_callback import StreamingCallback
-        
-        llm = LlamaCpp(
+
+        generator = LlamaCpp(
             model_path=model_path,
-            n_gpu_layers=LLM_CONFIG["n_gpu_layers"],
+            n_gpu_layers=llm_config["n_gpu_layers"],
             n_batch=512,  # OPTIMISÉ: Traite 512 tokens en parallèle (accélère génération 5-10×)
-            n_ctx=LLM_CONFIG["n_ctx"],
-            verbose=LLM_CONFIG["verbose"],
-            temperature=LLM_CONFIG["temperature"],
-            max_tokens=LLM_CONFIG["max_tokens"],
-            n_threads=LLM_CONFIG["n_threads"],
+            n_ctx=llm_config["n_ctx"],
+            verbose=llm_config["verbose"],
+            temperature=llm_config["temperature"],
+            max_tokens=llm_config["max_tokens"],
+            n_threads=llm_config["n_threads"],
             streaming=True,  # ✅ Activé pour streaming temps réel
             stop=[
                 "<|end|>", "<|endoftext|>", "\n\n\n",
@@ -306,62 +413,104 @@ try:
             ],  # CRITIQUE: Arrêter génération aux balises Phi-3 et fragments suspects
             callbacks=[StreamingCallback()]  # Callback pour Event Bus
         )
-        
+
+        # Cache de préfixe KV: le bloc système est évalué une seule fois,
+        # les tours suivants ne réévaluent que les nouveaux tokens
+        from agents.prompt_cache import prompt_cache
+        from agents.prompt_templates import set_token_counter, system_prefix
+        client = generator.client
+        # Comptage exact des tokens par segment de prompt (ajustement à n_ctx)
+        set_token_counter(
+            lambda text: len(client.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+        )
+        if prompt_cache.attach(generator):
+            prompt_cache.prime(system_prefix(False))
+
         # Forcer la libération de la mémoire CUDA
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
             gc.collect()
-    except Exception as e:
-        logger.error(f"Erreur lors de l'initialisation : {e}")
-        llm = None  # Gestion gracieuse de l'échec
-
-    # 2. Chargement de tous les documents supportés
-    documents = load_all_documents()
-    logger.info(f"Nombre total de documents chargés: {len(documents)}")
-
-    # 3. Découpage du texte (évite les tokens excessifs)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-    texts = text_splitter.split_documents(documents) if documents else []
-    
-    # 4. Création de la base vectorielle
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    
-    # Client Chroma persistant explicite (évite tenant/database en conteneur avec Chroma 0.4+)
-    _chroma_client = chromadb.PersistentClient(path=str(PERSIST_DIR))
-    
-    # Création ou récupération de la base vectorielle
-    if texts:
-        logger.info(f"Création/mise à jour de la base vectorielle avec {len(texts)} chunks")
-        vector_db = Chroma.from_documents(
-            documents=texts,
-            embedding=embeddings,
-            client=_chroma_client,
+        return generator
+
+    def _load_embedder(self):
+        """Charge le modèle d'embedding."""
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedder = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        if RAG_CONFIG.get("embedding_cache", {}).get("enabled", True):
+            # Seuls les chunks et requêtes absents du cache passent par le modèle
+            return CachedEmbeddings(embedder, model_name=EMBEDDING_MODEL)
+        return embedder
+
+    def _load_vector_store(self):
+        """Ouvre la base Chroma persistante puis applique l'ingestion incrémentale."""
+        embeddings = self.embedder
+        if embeddings is None:
+            raise RuntimeError("Modèle d'embedding indisponible")
+
+        import chromadb
+        from langchain_community.vectorstores import Chroma
+
+        # Client Chroma persistant explicite (évite tenant/database en conteneur avec Chroma 0.4+)
+        chroma_client = chromadb.PersistentClient(path=str(self.persist_dir))
+        vector_db = Chroma(
+            client=chroma_client,
+            embedding_function=embeddings,
         )
-        logger.info("Base vectorielle créée dans Chroma")
-    else:
-        # Si aucun document, tenter de charger une base existante, sinon créer une base vide
-        logger.warning("Aucun document à vectoriser, tentative de chargement d'une base existante")
+
+        # Ingestion incrémentale: seuls les fichiers nouveaux/modifiés sont vectorisés,
+        # les chunks des fichiers supprimés sont retirés (manifeste dans la table `documents`)
+        from agents.lexical_index import INDEX_FILE, LexicalIndex
+        lexical_index = LexicalIndex.load(self.persist_dir / INDEX_FILE)
+        try:
+            from data.database import Database
+            from agents.rag_ingestion import DocumentIngestor
+            self.ingestion_stats = DocumentIngestor(
+                self.doc_dir, Database(), self.text_splitter, LOADERS_MAPPING,
+                lexical_index=lexical_index,
+            ).sync(vector_db)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'ingestion incrémentale des documents: {e}")
+            self.logger.error(traceback.format_exc())
+        # Index BM25 absent ou désynchronisé (base créée avant l'index) : reconstruit depuis Chroma
         try:
-            vector_db = Chroma(
-                client=_chroma_client,
-                embedding_function=embeddings,
-            )
-            logger.info("Base vectorielle existante chargée")
+            lexical_index.sync_with_collection(vector_db._collection)
+            self.lexical_index = lexical_index
         except Exception as e:
-            logger.warning(f"Impossible de charger une base existante: {e}")
-            logger.info("Création d'une base vectorielle vide")
-            vector_db = Chroma.from_documents(
-                documents=[],
-                embedding=embeddings,
-                client=_chroma_client,
-            )
-
-except Exception as e:
-    # Ne jamais empêcher QAIA de démarrer si RAG échoue à s'initialiser.
-    # On logue l'erreur et on laisse vector_db/llm éventuellement à None.
-    logger.error(f"Erreur lors de l'initialisation de l'agent RAG : {str(e)}")
-    logger.error(traceback.format_exc())
-    vector_db = None
+            self.logger.error(f"Index lexical indisponible, recherche vectorielle seule: {e}")
+        self.logger.info(f"Base vectorielle chargée ({vector_db._collection.count()} chunks)")
+        return vector_db
+
+
+# Instance partagée (aucun modèle chargé à l'import)
+rag_engine = RagEngine()
+
+
+def _generate(llm, prompt: str) -> str:
+    """
+    Génère une réponse complète en mesurant le temps jusqu'au premier token.
+
+    Args:
+        llm: Générateur LlamaCpp
+        prompt (str): Prompt complet
+
+    Returns:
+        str: Texte généré
+    """
+    from agents.llm_runtime import llm_runtime
+    from agents.prompt_cache import prompt_cache
+    chunks = []
+    # Modèle unique partagé : une génération à la fois, par priorité (ordonnanceur)
+    with llm_runtime.session("process_query") as token:
+        cached = prompt_cache.is_cached(prompt)
+        start = time.time()
+        for chunk in llm.stream(prompt):
+            if not chunks:
+                prompt_cache.record_ttft(time.time() - start, cached)
+            if token.cancelled:
+                # Requête abandonnée (nouvelle prise de parole, stop) : arrêt entre deux tokens
+                break
+            chunks.append(chunk)
+    return "".join(chunks)
 
 # ==============
 # FONCTION PRINCIPALE
@@ -375,7 +524,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
     Args:
         query (str): La requête/prompt de l'utilisateur
         k_results (int): Nombre de documents à récupérer (0 = génération sans RAG)
-        min_similarity (float): Seuil de similarité minimum
+        min_similarity (float): Pertinence minimale d'un chunk (0-1)
         
     Returns:
         str: Réponse générée
@@ -397,6 +546,9 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
     try:
         logger.info(f"Traitement requête (k={k_results}): {query[:50]}...")
         
+        # Générateur chargé au premier besoin (embeddings/index non requis ici)
+        llm = rag_engine.generator
+        
         # CAS 1: Génération sans RAG (k_results=0)
         # Utilisé pour conversation pure sans recherche documentaire
         if k_results == 0:
@@ -408,7 +560,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
             
             # Génération directe avec le prompt fourni
             # stop_sequences déjà définies dans constructeur LlamaCpp (ligne 306)
-            response = llm.invoke(query)
+            response = _generate(llm, query)
             
             logger.info("Réponse générée (sans RAG)")
             
@@ -454,11 +606,12 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
         except Exception:
             pass
         
+        vector_db = rag_engine.vector_store
         if not vector_db:
             logger.warning("Base vectorielle non initialisée, génération sans RAG")
             if llm is None:
                 return "Base de données vectorielle non initialisée."
-            response = llm.invoke(query)
+            response = _generate(llm, query)
             final_response = response.strip() if isinstance(response, str) else str(response).strip()
             # Émettre événement agent.state_change pour RAG (ACTIF)
             try:
@@ -480,7 +633,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
             logger.warning("Base vectorielle vide, génération sans RAG")
             if llm is None:
                 return "Aucun document n'est indexé dans la base."
-            response = llm.invoke(query)
+            response = _generate(llm, query)
             final_response = response.strip() if isinstance(response, str) else str(response).strip()
             # Émettre événement agent.state_change pour RAG (ACTIF)
             try:
@@ -497,14 +650,14 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
                 pass
             return final_response
 
-        # Recherche sémantique
-        docs = vector_db.similarity_search(query, k=k_results)
+        # Recherche hybride (BM25, puis vecteurs si nécessaire)
+        docs = rag_engine.search(query, k_results)
 
         if not docs:
             logger.warning("Aucun document trouvé, génération sans RAG")
             if llm is None:
                 return "Aucun document pertinent trouvé."
-            response = llm.invoke(query)
+            response = _generate(llm, query)
             final_response = response.strip() if isinstance(response, str) else str(response).strip()
             # Émettre événement agent.state_change pour RAG (ACTIF)
             try:
@@ -521,17 +674,15 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
                 pass
             return final_response
 
-        # Filtrage par similarité
-        context = []
-        for d in docs:
-            if d.metadata.get("similarity", 1.0) >= min_similarity:
-                context.append(d.page_content)
+        # Seuil de pertinence, déduplication et phrases entières dans le budget de tokens
+        from agents.rag_context import assemble_context
+        context = assemble_context(docs, min_similarity)
 
         if not context:
             logger.warning("Aucun document au-dessus du seuil, génération sans RAG")
             if llm is None:
                 return "Aucun document pertinent (seuil similarité)."
-            response = llm.invoke(query)
+            response = _generate(llm, query)
             final_response = response.strip() if isinstance(response, str) else str(response).strip()
             # Émettre événement agent.state_change pour RAG (ACTIF)
             try:
@@ -549,8 +700,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
             return final_response
 
         # Construction prompt avec contexte RAG
-        context_text = "\n".join(context)
-        prompt = f"Question: {query}\nContexte: {context_text[:1500]}"
+        prompt = f"Question: {query}\nContexte: {context.text}"
 
         logger.debug(f"Prompt RAG généré: {prompt[:100]}...")
         
@@ -558,7 +708,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
             logger.info("LLM indisponible, retour prompt-contexte")
             return prompt
         
-        response = llm.invoke(prompt)
+        response = _generate(llm, prompt)
 
         logger.info("Réponse générée avec RAG")
         
@@ -581,7 +731,7 @@ def process_query(query: str, k_results: int = 3, min_similarity: float = 0.4):
                 'name': 'RAG',
                 'status': 'ACTIF',
                 'activity_percentage': 100.0,
-                'details': f'Requête RAG traitée (réponse: {len(final_response)} caractères, {len(context)} docs)',
+                'details': f'Requête RAG traitée (réponse: {len(final_response)} caractères, {context.chunks_used} docs, {context.tokens} tokens)',
                 'last_update': time.time()
             })
         except Exception:
@@ -604,10 +754,10 @@ def process_query_stream(query: str, k_results: int = 3, min_similarity: float =
     Args:
         query (str): La requête/prompt de l'utilisateur
         k_results (int): Nombre de documents à récupérer (0 = génération sans RAG)
-        min_similarity (float): Seuil de similarité minimum
+        min_similarity (float): Pertinence minimale d'un chunk (0-1)
         
     Yields:
-        str: Tokens générés un par un
+        str: Tokens générés un par un, déjà filtrés (publiés sur l'Event Bus par l'appelant)
     """
     try:
         logger.info(f"Traitement streaming requête (k={k_results}): {query[:50]}...")
@@ -615,19 +765,18 @@ def process_query_stream(query: str, k_results: int = 3, min_similarity: float =
         # Préparer le prompt (même logique que process_query)
         final_prompt = query
         
-        if k_results > 0 and vector_db and vector_db._collection.count() > 0:
-            # Recherche RAG
-            docs = vector_db.similarity_search(query, k=k_results)
+        # Base vectorielle chargée uniquement si une recherche est demandée
+        vector_db = rag_engine.vector_store if k_results > 0 else None
+        if vector_db and vector_db._collection.count() > 0:
+            # Recherche RAG hybride
+            docs = rag_engine.search(query, k_results)
             
             if docs:
-                context = []
-                for d in docs:
-                    if d.metadata.get("similarity", 1.0) >= min_similarity:
-                        context.append(d.page_content)
+                from agents.rag_context import assemble_context
+                context = assemble_context(docs, min_similarity)
                 
                 if context:
-                    context_text = "\n".join(context)
-                    final_prompt = f"Question: {query}\nContexte: {context_text[:1500]}"
+                    final_prompt = f"Question: {query}\nContexte: {context.text}"
                     logger.info("Génération streaming avec RAG")
                 else:
                     logger.info("Génération streaming sans RAG (seuil non atteint)")
@@ -636,37 +785,34 @@ def process_query_stream(query: str, k_results: int = 3, min_similarity: float =
         else:
             logger.info("Génération streaming directe (sans RAG)")
         
+        llm = rag_engine.generator
         if llm is None:
             logger.error("LLM non disponible pour streaming")
             yield "Erreur: LLM non initialisé."
             return
         
-        # Streaming avec llama.cpp
-        for token in llm.stream(final_prompt):
-            # Nettoyer artefacts (centralisé)
-            try:
-                from utils.text_processor import clean_phi3_artifacts, filter_streaming_token
-                clean_token = clean_phi3_artifacts(token)
-            except Exception:
-                clean_token = token
-                filter_streaming_token = None
-            
-            if clean_token:  # Ne yield que si non vide après nettoyage
-                # Filtrer les tokens de préfixes AVANT yield (évite doublons)
-                try:
-                    if filter_streaming_token is None:
-                        raise RuntimeError("Filtrage streaming indisponible")
-                    filtered_token = filter_streaming_token(clean_token)
-                    
-                    # Si le token est filtré (None), ne pas le yield
-                    if filtered_token is None:
-                        logger.debug(f"Token filtré et ignoré: '{clean_token}'")
-                        continue
-                    
-                    yield filtered_token
-                except Exception as e:
-                    logger.debug(f"Erreur filtrage token: {e}, utilisation token original")
-                yield clean_token
+        # Streaming avec llama.cpp via le runtime partagé (TTFT mesuré au premier token)
+        from agents.callbacks.streaming_callback import CONSUMER_FILTERED_TAG
+        from agents.llm_runtime import llm_runtime
+        from agents.prompt_cache import prompt_cache
+        from utils.text_processor import StreamingTokenFilter
+        start = time.time()
+        first_token = True
+        # Filtrage unique et incrémental (balises Phi-3, préfixes "(HH:MM) QAIA:" sur plusieurs tokens) ;
+        # le tag écarte StreamingCallback de cette génération (publication par l'appelant)
+        token_filter = StreamingTokenFilter()
+        for token in llm_runtime.stream(
+            final_prompt, source="process_query_stream", tags=[CONSUMER_FILTERED_TAG]
+        ):
+            if first_token:
+                prompt_cache.record_ttft(time.time() - start, prompt_cache.is_cached(final_prompt))
+                first_token = False
+            filtered_token = token_filter.feed(token)
+            if filtered_token is not None:
+                yield filtered_token
+        remaining = token_filter.flush()
+        if remaining:
+            yield remaining
         
         logger.info("Streaming terminé")
         
@@ -677,7 +823,6 @@ def process_query_stream(query: str, k_results: int = 3, min_similarity: float =
         # CRITIQUE: Ne pas yield d'erreur comme token, émettre événement erreur (TODO-10)
         try:
             from interface.events.event_bus import event_bus
-            import time
             event_bus.emit('llm.error', {'error': str(e), 'timestamp': time.time()})
         except Exception:
             pass
@@ -704,4 +849,4 @@ if __name__ == "__main__":
         logger.info("Agent RAG arrêté.")
 
 # Assurez-vous que les classes sont disponibles pour l'import
-__all__ = ["DataSources", "EmbeddingCache", "load_all_documents"]
+__all__ = ["DataSources", "EmbeddingCache", "RagEngine", "rag_engine", "load_all_documents"]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Assemblage du contexte RAG par pertinence et budget de tokens.
+
+Les chunks retrouvés (`agents.lexical_index.ScoredChunk`) sont filtrés par
+seuil, chaque passe sur sa propre échelle (pertinence vectorielle 0-1,
+score BM25 brut), puis découpés en phrases. Les phrases sont ajoutées dans
+l'ordre de classement reçu (fusion RRF) tant qu'elles tiennent dans le budget (tokens
+mesurés par `agents.prompt_templates.count_tokens`) : aucune phrase n'est
+coupée, et les phrases déjà présentes (recouvrement entre chunks voisins
+du découpeur, doublons entre documents) ne sont ajoutées qu'une fois.
+
+La longueur du prompt, donc le préremplissage sur CPU, suit ce qui est
+réellement pertinent au lieu d'un tronquage fixe à 1500 caractères.
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from agents.prompt_templates import count_tokens
+from utils.monitoring import record_metric
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_RE = re.compile(r"[^.!?…\n]+(?:[.!?…]+[\"»)\]]*|\n|$)")
+_SPACES_RE = re.compile(r"\s+")
+CHUNK_SEPARATOR = "\n"
+
+
+def _rag_config() -> Dict[str, Any]:
+    try:
+        from config.system_config import RAG_CONFIG
+        return RAG_CONFIG
+    except ImportError:
+        return {}
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Découpe un chunk en phrases (ponctuation finale ou fin de ligne).
+
+    Args:
+        text (str): Texte du chunk
+
+    Returns:
+        List[str]: Phrases non vides, espaces normalisés
+    """
+    sentences = []
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = _SPACES_RE.sub(" ", match.group()).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def _normalize(text: str) -> str:
+    return _SPACES_RE.sub(" ", text).strip().lower()
+
+
+@dataclass
+class RagContext:
+    """Contexte RAG assemblé."""
+
+    text: str = ""
+    tokens: int = 0
+    sources: List[str] = field(default_factory=list)
+    chunks_used: int = 0
+    chunks_below_threshold: int = 0
+    duplicate_sentences: int = 0
+    truncated: bool = False  # Phrases pertinentes laissées hors budget
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+
+def is_relevant(result: Any, min_similarity: float, min_bm25: float) -> bool:
+    """
+    Un chunk est retenu si l'une des passes qui l'a retrouvé atteint son propre seuil.
+
+    Args:
+        result (Any): `ScoredChunk` (`vector_score`, `bm25_score`, None si la passe ne l'a pas retrouvé)
+        min_similarity (float): Pertinence vectorielle minimale (0-1)
+        min_bm25 (float): Score BM25 minimal
+
+    Returns:
+        bool: True si le chunk est assez pertinent
+    """
+    return (result.vector_score is not None and result.vector_score >= min_similarity) or (
+        result.bm25_score is not None and result.bm25_score >= min_bm25
+    )
+
+
+def assemble_context(
+    results: Sequence[Any],
+    min_similarity: float,
+    min_bm25: Optional[float] = None,
+    budget_tokens: Optional[int] = None,
+) -> RagContext:
+    """
+    Construit le contexte : seuil par passe, déduplication, phrases entières dans le budget.
+
+    Args:
+        results (Sequence[Any]): `ScoredChunk` dans l'ordre de classement (`hybrid_search`)
+        min_similarity (float): Pertinence vectorielle minimale d'un chunk (0-1)
+        min_bm25 (Optional[float]): Score BM25 minimal (défaut: RAG_CONFIG["hybrid"]["bm25_min_score"])
+        budget_tokens (Optional[int]): Tokens maximum du contexte (défaut: RAG_CONFIG["context"])
+
+    Returns:
+        RagContext: Texte du contexte et statistiques (texte vide si rien n'est pertinent)
+    """
+    config = _rag_config()
+    if min_bm25 is None:
+        min_bm25 = float(config.get("hybrid", {}).get("bm25_min_score", 1.5))
+    if budget_tokens is None:
+        budget_tokens = int(config.get("context", {}).get("budget_tokens", 450))
+    context = RagContext()
+    # Ordre de classement conservé : le meilleur rang fusionné est placé en premier
+    relevant = [result.doc for result in results if is_relevant(result, min_similarity, min_bm25)]
+    context.chunks_below_threshold = len(results) - len(relevant)
+
+    seen_sentences = set()
+    packed_by_source: Dict[Any, List[str]] = {}
+    parts: List[List[str]] = []
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+    for doc in relevant:
+        source = (doc.metadata or {}).get("source")
+        chunk_sentences = []
+        for sentence in split_sentences(doc.page_content):
+            norm = _normalize(sentence)
+            # Recouvrement du découpeur : la phrase (ou son fragment) figure déjà pour cette source
+            if norm in seen_sentences or any(norm in packed for packed in packed_by_source.get(source, ())):
+                context.duplicate_sentences += 1
+                continue
+            tokens = count_tokens(sentence) + separator_tokens
+            if context.tokens + tokens > budget_tokens:
+                context.truncated = True
+                continue
+            seen_sentences.add(norm)
+            chunk_sentences.append(sentence)
+            context.tokens += tokens
+        if chunk_sentences:
+            parts.append(chunk_sentences)
+            packed_by_source.setdefault(source, []).append(_normalize(" ".join(chunk_sentences)))
+            context.chunks_used += 1
+            if source and source not in context.sources:
+                context.sources.append(source)
+
+    # Compte exact du texte final (les comptes par phrase ne sont additifs qu'à quelques tokens près)
+    context.text = CHUNK_SEPARATOR.join(" ".join(sentences) for sentences in parts)
+    context.tokens = count_tokens(context.text)
+    while context.tokens > budget_tokens and parts:
+        parts[-1].pop()
+        if not parts[-1]:
+            parts.pop()
+        context.truncated = True
+        context.text = CHUNK_SEPARATOR.join(" ".join(sentences) for sentences in parts)
+        context.tokens = count_tokens(context.text)
+    context.chunks_used = len(parts)
+    if context.text:
+        record_metric("rag.context.tokens", context.tokens, "tokens")
+    record_metric("rag.context.chunks_dropped", context.chunks_below_threshold, "chunks")
+    logger.debug(
+        f"Contexte RAG: {context.chunks_used} chunk(s), {context.tokens} tokens, "
+        f"{context.chunks_below_threshold} sous le seuil, {context.duplicate_sentences} phrase(s) en double"
+    )
+    return context
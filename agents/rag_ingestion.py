@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Ingestion incrémentale des documents RAG.
+
+Compare le contenu de `data/documents` au manifeste stocké dans la table
+`documents` (chemin, mtime, taille, empreinte SHA-256) et ne charge,
+découpe et vectorise que les fichiers nouveaux ou modifiés. Les chunks
+des fichiers supprimés sont retirés de la base vectorielle.
+
+Pipeline d'indexation en trois étages :
+
+1. Chargement et découpage dans un petit pool de processus (PDF, HTML,
+   DOCX analysés en parallèle) quand le lot est assez grand pour amortir
+   le lancement du pool, en série sinon ;
+2. File bornée de lots de taille fixe (`embed_batch_size` chunks), remplie
+   pendant que l'étage suivant vectorise ;
+3. Vectorisation d'un lot en un appel `embed_documents` puis `upsert` groupé
+   dans la collection Chroma.
+
+Progression et débit (chunks/s) sont journalisés et publiés via
+`utils.monitoring`.
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from utils.document_parsing import init_worker, parse_file, parse_in_worker
+from utils.monitoring import record_metric, record_timing
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1 << 20  # 1 Mo par lecture pour l'empreinte
+PROGRESS_INTERVAL_S = 5.0  # Journalisation de la progression
+AUTO_WORKERS_MAX = 4       # Plafond de `workers: 0` (chaque processus coûte son interpréteur et ses loaders)
+POOL_MIN_FILES = 16        # En deçà, le lancement du pool coûte plus que le chargement en série
+
+_DONE = object()
+
+
+def _ingestion_config() -> Dict[str, Any]:
+    try:
+        from config.system_config import RAG_CONFIG
+        return RAG_CONFIG.get("ingestion", {})
+    except ImportError:
+        return {}
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """
+    Nombre de processus de chargement (0 = un par cœur, au plus `AUTO_WORKERS_MAX`).
+
+    Args:
+        workers (Optional[int]): Valeur demandée (défaut: RAG_CONFIG["ingestion"]["workers"])
+
+    Returns:
+        int: Nombre de processus (1 = chargement dans le processus courant)
+    """
+    if workers is None:
+        workers = _ingestion_config().get("workers", 2)
+    return max(1, int(workers) or min(os.cpu_count() or 1, AUTO_WORKERS_MAX))
+
+
+def compute_file_hash(path: Path) -> str:
+    """
+    Calcule l'empreinte SHA-256 du contenu d'un fichier.
+
+    Args:
+        path (Path): Fichier à hacher
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids_for(rel_path: str, count: int) -> List[str]:
+    """
+    Génère des identifiants de chunks déterministes pour un document.
+
+    Args:
+        rel_path (str): Chemin relatif du document
+        count (int): Nombre de chunks
+
+    Returns:
+        List[str]: Identifiants stables (ré-indexation idempotente)
+    """
+    prefix = hashlib.md5(rel_path.encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+@dataclass
+class FileState:
+    """État d'un fichier source sur disque."""
+
+    rel_path: str
+    path: Path
+    mtime: float
+    size: int
+    content_hash: Optional[str] = None
+
+
+@dataclass
+class IngestionPlan:
+    """Différence entre le répertoire des documents et le manifeste."""
+
+    to_index: List[FileState] = field(default_factory=list)
+    touched: List[FileState] = field(default_factory=list)  # mtime changé, contenu identique
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.to_index or self.touched or self.deleted)
+
+
+def scan_documents(
+    doc_dir: Path,
+    manifest: Dict[str, Dict[str, Any]],
+    extensions: Tuple[str, ...],
+) -> IngestionPlan:
+    """
+    Compare le répertoire des documents au manifeste d'ingestion.
+
+    Le hachage n'est calculé que si (mtime, taille) diffère du manifeste :
+    un démarrage sans modification ne relit aucun fichier.
+
+    Args:
+        doc_dir (Path): Répertoire racine des documents
+        manifest (Dict[str, Dict[str, Any]]): Manifeste {chemin relatif: état}
+        extensions (Tuple[str, ...]): Extensions supportées (minuscules, avec le point)
+
+    Returns:
+        IngestionPlan: Fichiers à indexer, à mettre à jour et à supprimer
+    """
+    plan = IngestionPlan()
+    seen = set()
+    doc_dir = Path(doc_dir)
+
+    for path in sorted(doc_dir.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in extensions:
+            continue
+        rel_path = path.relative_to(doc_dir).as_posix()
+        seen.add(rel_path)
+        stat = path.stat()
+        state = FileState(rel_path=rel_path, path=path, mtime=stat.st_mtime, size=stat.st_size)
+        entry = manifest.get(rel_path)
+
+        if entry and entry.get("mtime") == state.mtime and entry.get("size") == state.size:
+            plan.unchanged += 1
+            continue
+
+        state.content_hash = compute_file_hash(path)
+        if entry and entry.get("content_hash") == state.content_hash:
+            plan.touched.append(state)
+        else:
+            plan.to_index.append(state)
+
+    plan.deleted = sorted(rel for rel in manifest if rel not in seen)
+    return plan
+
+
+# ---------- Étage 1 : chargement et découpage (pool de processus) ----------
+def iter_parsed_files(
+    paths: Iterable[Path],
+    loaders: Dict[str, Callable[[str], Any]],
+    text_splitter: Any = None,
+    workers: Optional[int] = None,
+    pool_min_files: Optional[int] = None,
+) -> Iterator[Tuple[Path, List[Any], Optional[Exception]]]:
+    """
+    Charge (et découpe) des fichiers, en parallèle sur plusieurs processus.
+
+    Les résultats arrivent dans l'ordre de fin de traitement ; au plus deux
+    fichiers par processus sont en cours pour borner la mémoire. Un lot de
+    moins de `pool_min_files` fichiers est chargé en série.
+
+    Args:
+        paths (Iterable[Path]): Fichiers à charger
+        loaders (Dict[str, Callable[[str], Any]]): Classe de loader par extension
+        text_splitter (Any): Découpeur langchain (None = documents non découpés)
+        workers (Optional[int]): Nombre de processus (voir `resolve_workers`)
+        pool_min_files (Optional[int]): Fichiers minimum pour lancer le pool
+            (défaut: RAG_CONFIG["ingestion"]["pool_min_files"])
+
+    Yields:
+        Tuple[Path, List[Any], Optional[Exception]]: (fichier, documents ou chunks, erreur)
+    """
+    paths = [Path(path) for path in paths]
+    if pool_min_files is None:
+        pool_min_files = _ingestion_config().get("pool_min_files", POOL_MIN_FILES)
+    workers = min(resolve_workers(workers), len(paths))
+    if workers <= 1 or len(paths) < pool_min_files:
+        for path in paths:
+            try:
+                yield path, parse_file(str(path), loaders, text_splitter), None
+            except Exception as e:
+                yield path, [], e
+        return
+
+    # Pas de fork du processus courant (torch, llama, Tk, threads du bus) : risque d'interblocage
+    start_method = _ingestion_config().get("start_method") or "forkserver"
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = "spawn"
+    pending: Dict[Future, Path] = {}
+    remaining = iter(paths)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=init_worker,
+        initargs=(loaders, text_splitter),
+    ) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                pending[executor.submit(parse_in_worker, str(path))] = path
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    yield path, future.result(), None
+                except Exception as e:
+                    yield path, [], e
+
+
+# ---------- Étage 2 : lots de taille fixe ----------
+@dataclass
+class EmbeddingBatch:
+    """Lot de chunks à vectoriser, avec les fichiers qui y commencent ou s'y terminent."""
+
+    docs: List[Any] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    files: Set[str] = field(default_factory=set)              # fichiers ayant des chunks dans le lot
+    started: List[FileState] = field(default_factory=list)    # anciens chunks à supprimer avant l'upsert
+    completed: List[Tuple[FileState, int]] = field(default_factory=list)  # (fichier entièrement écrit, chunks)
+    failed: List[Tuple[FileState, Exception]] = field(default_factory=list)
+
+
+class DocumentIngestor:
+    """Synchronise la base vectorielle avec le répertoire des documents."""
+
+    def __init__(
+        self,
+        doc_dir: Path,
+        database: Any,
+        text_splitter: Any,
+        loaders: Dict[str, Callable[[str], Any]],
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        queue_batches: Optional[int] = None,
+        lexical_index: Any = None,
+        pool_min_files: Optional[int] = None,
+    ) -> None:
+        """
+        Initialise l'ingesteur.
+
+        Args:
+            doc_dir (Path): Répertoire des documents
+            database (Any): Instance `data.database.Database` (manifeste)
+            text_splitter (Any): Découpeur langchain (`split_documents`)
+            loaders (Dict[str, Callable[[str], Any]]): Classe de loader par extension
+            workers (Optional[int]): Processus de chargement (défaut: RAG_CONFIG["ingestion"])
+            batch_size (Optional[int]): Chunks par lot de vectorisation
+            queue_batches (Optional[int]): Lots prêts en attente au maximum (file bornée)
+            lexical_index (Any): Index BM25 (`agents.lexical_index.LexicalIndex`) tenu à jour avec la base
+            pool_min_files (Optional[int]): Fichiers à indexer minimum pour lancer le pool de processus
+        """
+        config = _ingestion_config()
+        self.doc_dir = Path(doc_dir)
+        self.database = database
+        self.text_splitter = text_splitter
+        self.loaders = loaders
+        self.workers = workers if workers is not None else config.get("workers", 2)
+        self.batch_size = max(1, int(batch_size or config.get("embed_batch_size", 64)))
+        self.queue_batches = max(1, int(queue_batches or config.get("queue_batches", 4)))
+        self.lexical_index = lexical_index
+        self.pool_min_files = pool_min_files
+
+    def _source_for(self, rel_path: str) -> str:
+        """Valeur de la métadonnée `source` posée par les loaders langchain."""
+        return str(self.doc_dir / rel_path)
+
+    def _delete_chunks(self, vector_db: Any, rel_path: str) -> None:
+        """Supprime tous les chunks d'un document (y compris doublons hérités)."""
+        vector_db._collection.delete(where={"source": self._source_for(rel_path)})
+        if self.lexical_index is not None:
+            self.lexical_index.remove_source(self._source_for(rel_path))
+
+    def load_file(self, path: Path) -> List[Any]:
+        """
+        Charge un fichier avec le loader associé à son extension.
+
+        Args:
+            path (Path): Fichier à charger
+
+        Returns:
+            List[Any]: Documents langchain
+        """
+        return parse_file(str(path), self.loaders, None)
+
+    def sync(self, vector_db: Any) -> Dict[str, Any]:
+        """
+        Applique les changements du répertoire des documents à la base vectorielle.
+
+        Args:
+            vector_db (Any): Store langchain Chroma
+
+        Returns:
+            Dict[str, Any]: Statistiques (added, updated, deleted, unchanged, chunks, duration)
+        """
+        start = time.time()
+        manifest = self.database.get_document_manifest()
+        plan = scan_documents(self.doc_dir, manifest, tuple(self.loaders.keys()))
+        stats = {
+            "indexed": 0,
+            "touched": len(plan.touched),
+            "deleted": 0,
+            "unchanged": plan.unchanged,
+            "failed": 0,
+            "chunks": 0,
+        }
+
+        for rel_path in plan.deleted:
+            try:
+                self._delete_chunks(vector_db, rel_path)
+                self.database.remove_document(rel_path, commit=False)
+                stats["deleted"] += 1
+                logger.info(f"Document supprimé de l'index: {rel_path}")
+            except Exception as e:
+                logger.error(f"Erreur suppression chunks {rel_path}: {e}")
+
+        for state in plan.touched:
+            entry = manifest.get(state.rel_path, {})
+            self.database.upsert_document(
+                state.rel_path, state.path.name, state.mtime, state.size,
+                state.content_hash, entry.get("chunk_count", 0), commit=False,
+            )
+
+        if plan.to_index:
+            self._index_files(vector_db, plan.to_index, stats)
+
+        self.database.commit()
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+        stats["duration"] = time.time() - start
+        logger.info(
+            f"Ingestion RAG: {stats['indexed']} indexés, {stats['deleted']} supprimés, "
+            f"{stats['unchanged']} inchangés, {stats['chunks']} chunks en {stats['duration']:.2f}s"
+            + (f" ({stats['chunks_per_s']:.1f} chunks/s)" if "chunks_per_s" in stats else "")
+        )
+        return stats
+
+    def _produce_batches(self, states: List[FileState], batches: "queue.Queue[Any]", stop: threading.Event) -> None:
+        """Étages 1-2 : fichiers chargés en parallèle, chunks regroupés en lots de taille fixe."""
+        by_path = {state.path: state for state in states}
+        batch = EmbeddingBatch()
+        try:
+            for path, chunks, error in iter_parsed_files(
+                list(by_path), self.loaders, self.text_splitter, self.workers, self.pool_min_files
+            ):
+                if stop.is_set():
+                    return
+                state = by_path[path]
+                if error is not None:
+                    batch.failed.append((state, error))
+                    continue
+                batch.started.append(state)
+                ids = chunk_ids_for(state.rel_path, len(chunks))
+                offset = 0
+                while True:
+                    room = self.batch_size - len(batch.docs)
+                    batch.docs.extend(chunks[offset:offset + room])
+                    batch.ids.extend(ids[offset:offset + room])
+                    batch.files.add(state.rel_path)
+                    offset += room
+                    if offset >= len(chunks):
+                        batch.completed.append((state, len(chunks)))
+                    if len(batch.docs) < self.batch_size:
+                        break
+                    batches.put(batch)  # bloque si la vectorisation est en retard
+                    batch = EmbeddingBatch()
+                    if offset >= len(chunks):
+                        break
+            if batch.docs or batch.started or batch.failed:
+                batches.put(batch)
+        except Exception as e:
+            logger.error(f"Erreur chargement des documents: {e}")
+        finally:
+            batches.put(_DONE)
+
+    def _upsert(self, vector_db: Any, docs: List[Any], ids: List[str]) -> None:
+        """Étage 3 : vectorisation d'un lot en un appel puis upsert groupé."""
+        embedder = getattr(vector_db, "embeddings", None)
+        collection = getattr(vector_db, "_collection", None)
+        if embedder is None or not hasattr(collection, "upsert"):
+            vector_db.add_documents(docs, ids=ids)
+        else:
+            self._embed_and_upsert(embedder, collection, docs, ids)
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, docs)
+
+    @staticmethod
+    def _embed_and_upsert(embedder: Any, collection: Any, docs: List[Any], ids: List[str]) -> None:
+        texts = [doc.page_content for doc in docs]
+        embed_start = time.time()
+        embeddings = embedder.embed_documents(texts)
+        record_timing("rag", "ingestion_embed_batch", time.time() - embed_start)
+        collection.upsert(
+            ids=ids, embeddings=embeddings, documents=texts, metadatas=[doc.metadata for doc in docs]
+        )
+
+    def _index_files(self, vector_db: Any, states: List[FileState], stats: Dict[str, Any]) -> None:
+        """Indexe les fichiers nouveaux ou modifiés (pipeline chargement → lots → upsert)."""
+        start = time.time()
+        batches: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_batches)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_batches, args=(states, batches, stop), name="rag-ingestion", daemon=True
+        )
+        producer.start()
+        failed: Set[str] = set()
+        last_progress = start
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                for state, error in batch.failed:
+                    failed.add(state.rel_path)
+                    stats["failed"] += 1
+                    logger.error(f"Erreur indexation {state.rel_path}: {error}")
+                try:
+                    for state in batch.started:
+                        self._delete_chunks(vector_db, state.rel_path)
+                    if batch.docs:
+                        self._upsert(vector_db, batch.docs, batch.ids)
+                except Exception as e:
+                    # Fichiers du lot absents du manifeste : réindexés à la prochaine synchronisation
+                    for rel_path in sorted(batch.files - failed):
+                        failed.add(rel_path)
+                        stats["failed"] += 1
+                        logger.error(f"Erreur indexation {rel_path}: {e}")
+                    continue
+                stats["chunks"] += len(batch.docs)
+                for state, chunk_count in batch.completed:
+                    if state.rel_path in failed:
+                        continue
+                    self.database.upsert_document(
+                        state.rel_path, state.path.name, state.mtime, state.size,
+                        state.content_hash, chunk_count, commit=False,
+                    )
+                    stats["indexed"] += 1
+                    logger.info(f"Document indexé: {state.rel_path} ({chunk_count} chunks)")
+                now = time.time()
+                if now - last_progress >= PROGRESS_INTERVAL_S:
+                    last_progress = now
+                    logger.info(
+                        f"Ingestion RAG: {stats['indexed']}/{len(states)} documents, "
+                        f"{stats['chunks']} chunks ({stats['chunks'] / (now - start):.1f} chunks/s)"
+                    )
+        finally:
+            stop.set()
+            # Débloque le producteur si la boucle s'est interrompue
+            while producer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        elapsed = time.time() - start
+        if stats["chunks"] and elapsed > 0:
+            stats["chunks_per_s"] = stats["chunks"] / elapsed
+            record_metric("rag.ingestion.chunks_per_s", stats["chunks_per_s"], "chunks/s")
+        record_timing("rag", "ingestion", elapsed)
@@ -37,11 +37,14 @@ try:
 except ImportError as e:
     raise ImportError("sounddevice est manquant. Installez-le pour utiliser speaker_auth.") from e
 
+from agents.voice_identity.profile_index import get_profile_index
+
 # Importer la configuration système pour les chemins
 from config.system_config import (
     VOICE_PROFILES_DIR as QAIA_VOICE_PROFILES_DIR,
     LOGS_DIR as QAIA_LOGS_DIR,
-    MODELS_DIR as QAIA_MODELS_DIR # Au cas où le modèle d'embedding est stocké localement via config
+    MODELS_DIR as QAIA_MODELS_DIR, # Au cas où le modèle d'embedding est stocké localement via config
+    MODEL_CONFIG,
 )
 
 # Configuration des chemins (utilise system_config)
@@ -75,15 +78,15 @@ class SpeakerEmbeddingModel(nn.Module):
         self.logger = logging.getLogger("SPEAKER_AUTH.Model")
         
         try:
-            # Charger un modèle Wav2Vec2 depuis Transformers pour extraire des embeddings
-            from transformers import Wav2Vec2Processor, Wav2Vec2Model
+            # Encodeur Wav2Vec2 partagé avec le STT et l'identité vocale (registre)
+            from agents.wav2vec_encoder import wav2vec2_registry
             self.model_name = "jonatasgrosman/wav2vec2-large-xlsr-53-french" 
-            self.processor = Wav2Vec2Processor.from_pretrained(self.model_name)
-            self.model = Wav2Vec2Model.from_pretrained(self.model_name)
-            self.model.eval()
-            
-            if torch.cuda.is_available():
-                self.model = self.model.cuda()
+            gpu_audio = MODEL_CONFIG.get("gpu_audio", {})
+            use_gpu = bool(gpu_audio.get("USE_GPU_FOR_SPEAKER_AUTH")) and torch.cuda.is_available()
+            self.device = "cuda" if use_gpu else "cpu"
+            self.shared = wav2vec2_registry.acquire(self.model_name, self.device)
+            self.processor = self.shared.processor
+            self.model = self.shared.encoder
             
             self.logger.info("Modèle Wav2Vec2 (Transformers) chargé avec succès pour les embeddings")
             
@@ -123,7 +126,7 @@ class SpeakerEmbeddingModel(nn.Module):
             audio_1d = waveform.squeeze(0).cpu().numpy()
             inputs = self.processor(audio_1d, sampling_rate=sample_rate, return_tensors="pt", padding=True)
             
-            if torch.cuda.is_available():
+            if self.device == "cuda":
                 inputs = {k: v.cuda() for k, v in inputs.items()}
             
             # Passage dans le modèle pour obtenir les représentations cachées
@@ -133,7 +136,7 @@ class SpeakerEmbeddingModel(nn.Module):
                 # Pooling temporel (moyenne) pour obtenir un vecteur fixe
                 embedding = hidden.mean(dim=1).squeeze(0)  # [feat]
             
-            return embedding.detach().cpu() if not torch.cuda.is_available() else embedding
+            return embedding.detach().cpu() if self.device != "cuda" else embedding
             
         except Exception as e:
             self.logger.error(f"Erreur lors de l'extraction des caractéristiques: {e}")
@@ -175,9 +178,9 @@ class SpeakerAuth:
                 self.logger.error(f"Fichier audio non trouvé: {audio_path}")
                 return False
                 
-            # Chargement du profil
-            profile_path = self.data_dir / f"{speaker_id}.npy"
-            if not profile_path.exists():
+            # Profil de référence (matrice en mémoire partagée avec l'identité vocale)
+            reference_features = get_profile_index(self.data_dir).get(speaker_id)
+            if reference_features is None:
                 self.logger.error(f"Profil non trouvé: {speaker_id}")
                 return False
                 
@@ -186,9 +189,6 @@ class SpeakerAuth:
             if features is None:
                 return False
                 
-            # Chargement du profil de référence
-            reference_features = np.load(profile_path)
-            
             # Calcul de la similarité
             similarity = self._compute_similarity(features, reference_features)
             
@@ -225,6 +225,7 @@ class SpeakerAuth:
             # Sauvegarde du profil
             profile_path = self.data_dir / f"{speaker_id}.npy"
             np.save(profile_path, features.cpu().numpy())
+            get_profile_index(self.data_dir).upsert(speaker_id, features.cpu().numpy())
             
             self.logger.info(f"Profil enregistré: {speaker_id}")
             return True
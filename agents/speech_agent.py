@@ -88,6 +88,9 @@ class SpeechAgent:
             # Détection et initialisation moteur TTS
             self.use_piper = False
             self.piper_voice = None
+            self.piper_sample_rate = 22050
+            self._last_synthesis_time = 0.0
+            self._active_stream = None
             
             # Essayer d'initialiser Piper en priorité (qualité supérieure)
             if PIPER_AVAILABLE and self._init_piper():
@@ -150,9 +153,24 @@ class SpeechAgent:
             
             logger.info("Moteur de synthèse vocale initialisé avec succès")
             
-            # Cache des textes fréquents
-            self._speech_cache = {}
-            self._max_cache_size = 50
+            # Lecteur PCM en mémoire (flux de sortie persistant) pour Piper
+            from agents.audio_output import PcmPlayer
+            self._pcm_player = PcmPlayer(volume=float(QAIA_TTS_CONFIG.get('volume', 0.5)))
+            
+            # Cache persistant de l'audio des phrases fréquentes (Piper)
+            self.audio_cache = None
+            cache_config = QAIA_TTS_CONFIG.get('cache', {})
+            if self.use_piper and cache_config.get('enabled', True):
+                try:
+                    from agents.tts_cache import TtsAudioCache
+                    self.audio_cache = TtsAudioCache(
+                        AUDIO_DIR / "tts_cache",
+                        max_memory_bytes=int(cache_config.get('memory_mb', 32)) * 1024 * 1024,
+                        max_disk_bytes=int(cache_config.get('disk_mb', 256)) * 1024 * 1024,
+                        max_text_chars=int(cache_config.get('max_chars', 200)),
+                    )
+                except Exception as e:
+                    logger.warning(f"Cache audio TTS indisponible: {e}")
             
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du moteur de synthèse vocale: {e}")
@@ -173,6 +191,7 @@ class SpeechAgent:
             # Charger le modèle
             logger.info(f"Chargement modèle Piper: {piper_model_path}")
             self.piper_voice = PiperVoice.load(str(piper_model_path))
+            self.piper_voice_id = piper_model_path.stem
             
             # Configurer les paramètres
             self.piper_sample_rate = 22050  # Sample rate du modèle siwis
@@ -185,6 +204,106 @@ class SpeechAgent:
             logger.error(traceback.format_exc())
             return False
     
+    def synthesize(self, text):
+        """
+        Synthétise un texte avec Piper en mémoire, sans le jouer.
+        
+        Args:
+            text (str): Texte (déjà nettoyé) à synthétiser
+            
+        Returns:
+            PcmAudio|None: Audio PCM int16, None si Piper indisponible
+        """
+        if not (self.use_piper and self.piper_voice):
+            return None
+        import io
+        import wave
+        from agents.audio_output import PcmAudio
+        
+        # Configurer la vitesse via length_scale (1.3 = 25% plus lent pour vitesse naturelle)
+        length_scale = float(QAIA_TTS_CONFIG.get('length_scale', 1.2))
+        voice_id = getattr(self, 'piper_voice_id', 'piper')
+        
+        # Phrases fréquentes: audio déjà synthétisé (aucune inférence Piper)
+        audio_cache = getattr(self, 'audio_cache', None)
+        if audio_cache is not None:
+            cached = audio_cache.get(text, voice_id, length_scale)
+            if cached is not None:
+                self._last_synthesis_time = 0.0
+                logger.info(f"Piper: audio en cache pour '{text[:50]}'")
+                return cached
+        
+        logger.info(f"Piper: Génération audio '{text[:50]}...'")
+        t_start = time.time()
+        
+        # Synthétiser avec Piper dans un tampon WAV en mémoire (aucun fichier temporaire)
+        syn_config = SynthesisConfig(length_scale=length_scale) if SynthesisConfig else None
+        
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            if syn_config:
+                self.piper_voice.synthesize_wav(text, wav_file, syn_config=syn_config)
+            else:
+                self.piper_voice.synthesize_wav(text, wav_file)
+        audio = PcmAudio.from_wav_bytes(buffer.getvalue())
+        
+        self._last_synthesis_time = time.time() - t_start
+        logger.info(f"Piper: Audio généré en {self._last_synthesis_time:.2f}s ({audio.duration:.1f}s d'audio)")
+        if audio_cache is not None:
+            audio_cache.put(text, voice_id, length_scale, audio)
+        return audio
+    
+    def play_audio(self, audio, text="", wait=True):
+        """
+        Joue un audio synthétisé par `synthesize()` (pyttsx3 si aucun audio).
+        
+        Args:
+            audio (PcmAudio|None): Audio PCM en mémoire
+            text (str): Texte correspondant (fallback pyttsx3)
+            wait (bool): Attend la fin de la lecture
+            
+        Returns:
+            bool: True si succès
+        """
+        if audio is None:
+            return self._speak_sync(text) if text else False
+        logger.info("Piper: Lecture audio...")
+        # is_speaking suit le lecteur PCM (lecture bloquante ou non)
+        return self._pcm_player.play(audio, wait=wait)
+    
+    @property
+    def is_speaking(self):
+        """Parole en cours : moteur pyttsx3 ou lecture PCM (Piper) en cours ou en attente."""
+        pcm_player = getattr(self, '_pcm_player', None)
+        return getattr(self, '_speaking', False) or (pcm_player is not None and pcm_player.is_playing)
+    
+    @is_speaking.setter
+    def is_speaking(self, value):
+        self._speaking = value
+    
+    def stop_playback(self):
+        """Interrompt l'audio Piper en cours de lecture (file de messages conservée)."""
+        pcm_player = getattr(self, '_pcm_player', None)
+        if pcm_player is not None:
+            pcm_player.stop()
+    
+    def create_stream(self):
+        """
+        Ouvre une session de synthèse en flux (phrase par phrase).
+        
+        Les tokens sont fournis par `feed()`, `finish()` prononce la fin.
+        Une session précédente encore active est interrompue.
+        
+        Returns:
+            SpeechStream: Session démarrée
+        """
+        from agents.speech_stream import SpeechStream
+        previous = getattr(self, '_active_stream', None)
+        if previous is not None:
+            previous.cancel()
+        self._active_stream = SpeechStream(self).start()
+        return self._active_stream
+    
     def _speak_piper(self, text, save_to_file=None, wait=True):
         """
         Synthétise avec Piper TTS (qualité professionnelle).
@@ -198,83 +317,40 @@ class SpeechAgent:
             bool: True si succès
         """
         try:
-            import wave
-            
-            # Générer l'audio
-            logger.info(f"Piper: Génération audio '{text[:50]}...'")
-            t_start = time.time()
-            
-            # Déterminer fichier de sortie
-            if save_to_file:
-                output_file = save_to_file
-            else:
-                output_file = AUDIO_DIR / f"piper_temp_{int(time.time())}.wav"
-            
-            # Synthétiser avec Piper (CORRECTION: utiliser wave.open)
-            # Configurer la vitesse via length_scale (1.3 = 25% plus lent pour vitesse naturelle)
-            syn_config = SynthesisConfig(length_scale=1.2) if SynthesisConfig else None
+            audio = self.synthesize(text)
+            t_synth = self._last_synthesis_time
             
-            with wave.open(str(output_file), 'wb') as wav_file:
-                if syn_config:
-                    self.piper_voice.synthesize_wav(text, wav_file, syn_config=syn_config)
-                else:
-                    self.piper_voice.synthesize_wav(text, wav_file)
-            
-            t_synth = time.time() - t_start
-            logger.info(f"Piper: Audio généré en {t_synth:.2f}s")
-            
-            # Si sauvegarde uniquement, retourner
+            # Écriture disque uniquement sur demande explicite
             if save_to_file:
+                audio.save(save_to_file)
                 logger.info(f"Piper: Audio sauvegardé dans {save_to_file}")
                 return True
             
-            # Lire l'audio avec pygame
-            if PYGAME_AVAILABLE:
-                try:
-                    # Initialiser pygame mixer si nécessaire
-                    if not pygame.mixer.get_init():
-                        pygame.mixer.init(frequency=self.piper_sample_rate)
-                    
-                    # Lire avec volume configuré
-                    logger.info("Piper: Lecture audio...")
-                    pygame.mixer.music.load(str(output_file))
-                    volume = float(QAIA_TTS_CONFIG.get('volume', 0.5))
-                    pygame.mixer.music.set_volume(volume)
-                    pygame.mixer.music.play()
-                    
-                    if wait:
-                        while pygame.mixer.music.get_busy():
-                            time.sleep(0.1)
-                    
-                    # Nettoyer fichier temporaire
-                    try:
-                        Path(output_file).unlink()
-                    except Exception as e_clean:
-                        logger.warning(f"Impossible de supprimer fichier temp: {e_clean}")
-                    
-                    logger.info("✅ Piper: Synthèse terminée")
-                    
-                    # Émettre événement agent.state_change pour TTS (ACTIF après synthèse Piper)
-                    try:
-                        from interface.events.event_bus import event_bus
-                        event_bus.emit('agent.state_change', {
-                            'name': 'TTS',
-                            'status': 'ACTIF',
-                            'activity_percentage': 100.0,
-                            'details': f'Synthèse vocale terminée (Piper, {len(text)} caractères, {t_synth:.2f}s)',
-                            'last_update': time.time()
-                        })
-                    except Exception:
-                        pass
-                    
-                    return True
-                    
-                except Exception as e:
-                    logger.error(f"Erreur lecture audio Piper: {e}")
-                    logger.error(traceback.format_exc())
+            # Lecture depuis la mémoire (flux de sortie persistant)
+            try:
+                if not self.play_audio(audio, wait=wait):
                     return False
-            else:
-                logger.warning("Pygame non disponible, impossible de lire l'audio Piper")
+                
+                logger.info("✅ Piper: Synthèse terminée")
+                
+                # Émettre événement agent.state_change pour TTS (ACTIF après synthèse Piper)
+                try:
+                    from interface.events.event_bus import event_bus
+                    event_bus.emit('agent.state_change', {
+                        'name': 'TTS',
+                        'status': 'ACTIF',
+                        'activity_percentage': 100.0,
+                        'details': f'Synthèse vocale terminée (Piper, {len(text)} caractères, {t_synth:.2f}s)',
+                        'last_update': time.time()
+                    })
+                except Exception:
+                    pass
+                
+                return True
+                
+            except Exception as e:
+                logger.error(f"Erreur lecture audio Piper: {e}")
+                logger.error(traceback.format_exc())
                 return False
                 
         except Exception as e:
@@ -673,6 +749,8 @@ class SpeechAgent:
     def _split_text(self, text):
         """Découpe un texte long en segments plus petits."""
         # Découper aux points, aux virgules ou aux espaces selon la longueur
+        # (règles partagées avec le découpage en flux, agents/speech_stream.py)
+        from agents.speech_stream import find_cut_point
         try:
             max_segment = int(QAIA_TTS_CONFIG.get('segment_max_chars', 280))
         except Exception:
@@ -681,24 +759,7 @@ class SpeechAgent:
         
         remaining = text
         while len(remaining) > max_segment:
-            # Trouver un bon point de coupure (point, virgule, espace)
-            cut_point = max_segment
-            
-            # Chercher un point dans la zone de recherche
-            period_pos = remaining[:cut_point].rfind('. ')
-            if period_pos > max_segment * 0.6:  # Au moins 60% de la longueur max
-                cut_point = period_pos + 1  # Inclure le point
-            else:
-                # Chercher une virgule
-                comma_pos = remaining[:cut_point].rfind(', ')
-                if comma_pos > max_segment * 0.7:  # Au moins 70% de la longueur max
-                    cut_point = comma_pos + 1  # Inclure la virgule
-                else:
-                    # Chercher un espace
-                    space_pos = remaining[:cut_point].rfind(' ')
-                    if space_pos > 0:
-                        cut_point = space_pos
-            
+            cut_point = find_cut_point(remaining, max_segment)
             segments.append(remaining[:cut_point].strip())
             remaining = remaining[cut_point:].strip()
         
@@ -731,14 +792,6 @@ class SpeechAgent:
             # Log pour diagnostiquer
             logger.info(f"Début synthèse vocale asynchrone: '{text[:50]}{'...' if len(text) > 50 else ''}'")
             
-            # Ajouter à la cache si pas trop long
-            if len(text) < 100 and text not in self._speech_cache:
-                # Gérer la taille du cache
-                if len(self._speech_cache) >= self._max_cache_size:
-                    # Supprimer une entrée aléatoire (simple)
-                    if self._speech_cache:
-                        self._speech_cache.pop(next(iter(self._speech_cache)))
-                self._speech_cache[text] = True
             
             # Vérifier si le thread de synthèse vocale est actif
             if not self.speech_thread or not self.speech_thread.is_alive():
@@ -787,14 +840,6 @@ class SpeechAgent:
                         pause_s = 0.12
                     time.sleep(pause_s)
                 return True
-            # Ajouter à la cache si pas trop long
-            if len(text) < 100 and text not in self._speech_cache:
-                # Gérer la taille du cache
-                if len(self._speech_cache) >= self._max_cache_size:
-                    # Supprimer une entrée aléatoire (simple)
-                    if self._speech_cache:
-                        self._speech_cache.pop(next(iter(self._speech_cache)))
-                self._speech_cache[text] = True
             
             # Ajuster le volume de sortie si une modification a été demandée
             original_volume = None
@@ -925,6 +970,12 @@ class SpeechAgent:
                     return True
             except Exception:
                 pass
+            # Interrompre la synthèse en flux en cours
+            active_stream = getattr(self, '_active_stream', None)
+            if active_stream is not None:
+                active_stream.cancel()
+                self._active_stream = None
+            
             # Vider la file d'attente pour stopper les messages en attente
             while not self.speech_queue.empty():
                 try:
@@ -939,6 +990,11 @@ class SpeechAgent:
             except Exception as e:
                 logger.warning(f"Erreur lors de l'arrêt du moteur pyttsx3: {e}")
             
+            # Interrompre la lecture PCM (Piper)
+            pcm_player = getattr(self, '_pcm_player', None)
+            if pcm_player is not None:
+                pcm_player.stop()
+            
             # Si un fichier est en cours de lecture avec pygame
             if PYGAME_AVAILABLE and hasattr(pygame.mixer, 'music') and pygame.mixer.music.get_busy():
                 try:
@@ -982,6 +1038,10 @@ class SpeechAgent:
                 except Exception as e:
                     logger.warning(f"Erreur lors du nettoyage du moteur pyttsx3: {e}")
             
+            # Fermer le flux de sortie PCM
+            if getattr(self, '_pcm_player', None) is not None:
+                self._pcm_player.close()
+            
             # Nettoyer pygame si utilisé
             if PYGAME_AVAILABLE and hasattr(pygame.mixer, 'music'):
                 try:
@@ -990,9 +1050,10 @@ class SpeechAgent:
                 except Exception as e:
                     logger.warning(f"Erreur lors du nettoyage pygame: {e}")
             
-            # Vider les caches
-            if hasattr(self, '_speech_cache'):
-                self._speech_cache.clear()
+            # Terminer les écritures différées puis vider le niveau mémoire du cache audio (le disque est conservé)
+            if getattr(self, 'audio_cache', None) is not None:
+                self.audio_cache.flush()
+                self.audio_cache.clear_memory()
             
             logger.info("Nettoyage de l'agent de synthèse vocale terminé")
             return True
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Capture vocale en flux pilotée par le VAD, transcrite au fil de la parole.
+
+Deux étages reliés par des files :
+
+1. Capture : les blocs du callback `sounddevice` sont redécoupés en trames
+   VAD et passés à `VADEngine.stream_process`. Chaque pause interne
+   (`segment_pause_ms`) clôt un segment de parole ; la fin de parole VAD
+   (`max_silence_duration_ms` du profil) termine la capture sans appui
+   sur le bouton.
+2. Transcription : un thread lance la passe wav2vec2 de chaque segment
+   terminé pendant que l'utilisateur continue de parler.
+
+Le délai entre la fin de parole et le texte passe de « transcription de
+tout l'énoncé » à « transcription du dernier segment ».
+"""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0"
+# ]
+# ///
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.monitoring import record_timing
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class StreamingCapture:
+    """Session de capture PTT : VAD, découpage en segments et transcription en parallèle."""
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray, int], Tuple[str, float]],
+        vad: Any = None,
+        sample_rate: int = 16000,
+        vad_profile: str = "normal",
+        segment_pause_ms: int = 300,
+        min_segment_s: float = 1.0,
+        max_duration_s: float = 7.0,
+        on_end_of_speech: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initialise la session (threads démarrés par `start()`).
+
+        Args:
+            transcribe (Callable): Transcription d'un tampon float32 mono, ex. `Wav2VecVoiceAgent.transcribe_array`
+            vad (Any): VADEngine à utiliser (None = `create_vad(vad_profile, sample_rate)`)
+            sample_rate (int): Fréquence des blocs reçus par `feed()`
+            vad_profile (str): Profil VAD ("rapide", "normal", "qualite")
+            segment_pause_ms (int): Pause interne qui clôt un segment
+            min_segment_s (float): Durée minimale d'un segment (plus court : rattaché au suivant)
+            max_duration_s (float): Durée maximale de capture
+            on_end_of_speech (Optional[Callable]): Appelé (thread de capture) quand la capture s'arrête d'elle-même
+        """
+        if vad is None:
+            from agents.vad_engine import create_vad
+            vad = create_vad(profile=vad_profile, sample_rate=sample_rate)
+        if vad.sample_rate != sample_rate:
+            raise ValueError(f"Fréquence VAD {vad.sample_rate} différente de la capture {sample_rate}")
+        self.transcribe = transcribe
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.max_duration_s = max_duration_s
+        self.on_end_of_speech = on_end_of_speech
+        self._pause_frames = max(1, int(segment_pause_ms / 1000.0 / vad.frame_duration_s))
+        self._min_segment_frames = int(min_segment_s / vad.frame_duration_s)
+
+        self._blocks: "queue.Queue[Any]" = queue.Queue()
+        self._segments: "queue.Queue[Any]" = queue.Queue()
+        self._raw: List[np.ndarray] = []
+        self._cut_index = 0
+        self._speech_since_cut = False
+        self._stopped = threading.Event()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._results: List[Tuple[str, float, int]] = []
+        self._segment_audio: List[np.ndarray] = []
+        self._end_time: Optional[float] = None
+        self.audio: Optional[np.ndarray] = None
+        self.auto_stopped = False
+        self.eos_to_text: Optional[float] = None
+
+    def start(self) -> "StreamingCapture":
+        """Démarre les threads de capture et de transcription."""
+        for target, name in ((self._capture_worker, "stt-capture"), (self._transcription_worker, "stt-segments")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def feed(self, block: np.ndarray) -> None:
+        """Ajoute un bloc micro (appelé depuis le callback `sounddevice`, ne bloque pas)."""
+        if self._stopped.is_set():
+            return
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim > 1:
+            block = block[:, 0]
+        self._blocks.put(block.copy())
+
+    def stop(self, finalize: bool = True) -> None:
+        """
+        Termine la capture (bouton, délai maximal ou commande vocale).
+
+        Args:
+            finalize (bool): Transcrire la parole capturée (False : session abandonnée)
+        """
+        if not finalize:
+            self._cancelled.set()
+        self._stopped.set()
+        self._blocks.put(_STOP)
+
+    @property
+    def duration_s(self) -> float:
+        """Durée de parole capturée (secondes)."""
+        return 0.0 if self.audio is None else len(self.audio) / float(self.sample_rate)
+
+    @property
+    def longest_segment(self) -> Optional[np.ndarray]:
+        """Segment le plus long (identification du locuteur sur une passe déjà calculée)."""
+        if not self._segment_audio:
+            return self.audio
+        return max(self._segment_audio, key=len)
+
+    def result(self, timeout: Optional[float] = None) -> Tuple[str, float]:
+        """
+        Attend la transcription du dernier segment.
+
+        Args:
+            timeout (Optional[float]): Délai maximal (secondes)
+
+        Returns:
+            tuple: (texte des segments joints, confiance moyenne pondérée par la durée)
+        """
+        if not self._done.wait(timeout):
+            return "Erreur: transcription en flux non terminée", 0.0
+        texts = [text.strip() for text, _, _ in self._results if not text.lower().startswith("erreur")]
+        texts = [text for text in texts if text]
+        if not texts:
+            errors = [text for text, _, _ in self._results if text.lower().startswith("erreur")]
+            return (errors[0] if errors else ""), 0.0
+        valid = [(conf, n) for text, conf, n in self._results if text.strip() and not text.lower().startswith("erreur")]
+        total = sum(n for _, n in valid) or 1
+        confidence = sum(conf * n for conf, n in valid) / total
+        return " ".join(texts), float(confidence)
+
+    def _frames(self):
+        """Redécoupe les blocs reçus en trames VAD jusqu'à l'arrêt."""
+        frame_size = self.vad.frame_size
+        pending = np.zeros(0, dtype=np.float32)
+        while True:
+            block = self._blocks.get()
+            if block is _STOP:
+                return
+            self._raw.append(block)
+            pending = np.concatenate((pending, block)) if pending.size else block
+            offset = 0
+            while len(pending) - offset >= frame_size:
+                yield pending[offset:offset + frame_size]
+                offset += frame_size
+            pending = pending[offset:]
+
+    def _on_frame(self, frame: np.ndarray, is_speech: bool, speech_ended: bool) -> None:
+        """Clôt un segment à chaque pause interne suffisamment longue."""
+        vad = self.vad
+        if not vad.speech_started or self._cancelled.is_set():
+            return
+        if is_speech:
+            self._speech_since_cut = True
+            return
+        if (
+            self._speech_since_cut
+            and not speech_ended
+            and vad.consecutive_silence_frames == self._pause_frames
+            and len(vad.audio_buffer) - self._cut_index >= self._min_segment_frames
+        ):
+            self._submit(vad.audio_buffer[self._cut_index:])
+            self._cut_index = len(vad.audio_buffer)
+            self._speech_since_cut = False
+
+    def _submit(self, frames: List[np.ndarray]) -> None:
+        segment = np.concatenate(frames)
+        self._segment_audio.append(segment)
+        self._segments.put(segment)
+
+    def _capture_worker(self) -> None:
+        """Étage 1 : VAD sur le flux, segments envoyés à la transcription."""
+        vad = self.vad
+        try:
+            vad.stream_process(
+                self._frames(),
+                max_duration=self.max_duration_s,
+                callback=self._on_frame,
+            )
+        except Exception as e:
+            logger.error(f"Capture en flux: erreur VAD: {e}")
+        self._end_time = time.time()
+        # Fin de parole VAD ou durée maximale : personne n'a appelé stop()
+        self.auto_stopped = not self._stopped.is_set()
+        self._stopped.set()
+
+        if not self._cancelled.is_set():
+            if vad.speech_started:
+                # Silence final ramené au tampon post-parole
+                end = len(vad.audio_buffer) - max(0, vad.consecutive_silence_frames - vad.post_speech_frames)
+                end = max(end, self._cut_index)
+                if self._speech_since_cut and end > self._cut_index:
+                    self._submit(vad.audio_buffer[self._cut_index:end])
+                if end:
+                    self.audio = np.concatenate(vad.audio_buffer[:end])
+            elif self._raw:
+                # Aucune parole détectée par le VAD : tout l'audio est transcrit comme avant
+                self.audio = np.concatenate(self._raw)
+                self._submit([self.audio])
+        self._segments.put(_STOP)
+
+        if self.auto_stopped and self.on_end_of_speech is not None:
+            try:
+                self.on_end_of_speech()
+            except Exception as e:
+                logger.error(f"Capture en flux: erreur callback fin de parole: {e}")
+
+    def _transcription_worker(self) -> None:
+        """Étage 2 : passe wav2vec2 de chaque segment terminé, dans l'ordre."""
+        while True:
+            segment = self._segments.get()
+            if segment is _STOP:
+                break
+            if self._cancelled.is_set():
+                continue
+            try:
+                text, confidence = self.transcribe(segment, self.sample_rate)
+            except Exception as e:
+                logger.error(f"Transcription en flux: erreur segment: {e}")
+                text, confidence = f"Erreur: {e}", 0.0
+            self._results.append((text or "", float(confidence), len(segment)))
+        if self._end_time is not None and not self._cancelled.is_set():
+            self.eos_to_text = time.time() - self._end_time
+            logger.info(
+                f"STT flux: {len(self._results)} segment(s), texte {self.eos_to_text:.2f}s après la fin de parole"
+            )
+            record_timing("asr", "eos_to_text", self.eos_to_text)
+        self._done.set()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Synthèse vocale en flux (phrase par phrase) pendant la génération LLM.
+
+Trois étages reliés par des files :
+
+1. Découpage : les tokens `llm.token` sont accumulés et découpés en phrases
+   au fil de l'eau (mêmes règles que `SpeechAgent._split_text`).
+2. Synthèse : un thread synthétise chaque phrase (Piper) pendant que la
+   précédente est jouée.
+3. Lecture : un thread joue les phrases dans l'ordre.
+
+Le temps jusqu'au premier son passe de « latence LLM complète + synthèse
+complète » à « première phrase + une synthèse ».
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+from config.system_config import TTS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Fin de phrase suivie d'un blanc (le blanc confirme que le token suivant est arrivé)
+_SENTENCE_END = re.compile(r"[.!?…:;](?=\s)|\n")
+_STOP = object()
+
+
+def find_cut_point(text: str, max_segment: int) -> int:
+    """
+    Position de coupure d'un texte trop long (règles historiques de `_split_text`).
+
+    Priorité : point (au-delà de 60% de la longueur max), virgule (au-delà de 70%),
+    puis dernier espace.
+
+    Args:
+        text (str): Texte à couper (plus long que max_segment)
+        max_segment (int): Longueur maximale d'un segment
+
+    Returns:
+        int: Index de coupure
+    """
+    cut_point = max_segment
+
+    # Chercher un point dans la zone de recherche
+    period_pos = text[:cut_point].rfind('. ')
+    if period_pos > max_segment * 0.6:  # Au moins 60% de la longueur max
+        return period_pos + 1  # Inclure le point
+
+    # Chercher une virgule
+    comma_pos = text[:cut_point].rfind(', ')
+    if comma_pos > max_segment * 0.7:  # Au moins 70% de la longueur max
+        return comma_pos + 1  # Inclure la virgule
+
+    # Chercher un espace
+    space_pos = text[:cut_point].rfind(' ')
+    if space_pos > 0:
+        return space_pos
+    return cut_point
+
+
+class SentenceSegmenter:
+    """Découpe incrémentale d'un flux de tokens en phrases prononçables."""
+
+    def __init__(self, max_segment: Optional[int] = None, min_chars: Optional[int] = None):
+        """
+        Initialise le découpeur.
+
+        Args:
+            max_segment (Optional[int]): Longueur max d'un segment (défaut: TTS_CONFIG segment_max_chars)
+            min_chars (Optional[int]): Longueur min avant de couper sur une fin de phrase
+                (évite de prononcer « 1. » ou « M. » seuls)
+        """
+        self.max_segment = int(max_segment or TTS_CONFIG.get('segment_max_chars', 280))
+        self.min_chars = int(min_chars if min_chars is not None else TTS_CONFIG.get('stream_min_chars', 20))
+        self._buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """
+        Ajoute un token et retourne les phrases complètes.
+
+        Args:
+            token (str): Fragment de texte généré
+
+        Returns:
+            List[str]: Phrases prêtes à synthétiser (éventuellement vide)
+        """
+        if not token:
+            return []
+        self._buffer += token
+        sentences = []
+        while True:
+            cut = None
+            for match in _SENTENCE_END.finditer(self._buffer):
+                if match.end() >= self.min_chars:
+                    cut = match.end()
+                    break
+            if cut is None and len(self._buffer) > self.max_segment:
+                cut = find_cut_point(self._buffer, self.max_segment)
+            if cut is None:
+                break
+            sentence = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Retourne le reste du tampon (fin de génération)."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechStream:
+    """Session de synthèse en flux : découpage, synthèse et lecture en parallèle."""
+
+    def __init__(self, speech_agent: Any, segmenter: Optional[SentenceSegmenter] = None):
+        """
+        Initialise la session (threads démarrés par `start()`).
+
+        Args:
+            speech_agent (Any): SpeechAgent fournissant `_clean_text`, `synthesize`, `play_audio`
+                et `stop_playback`
+            segmenter (Optional[SentenceSegmenter]): Découpeur de phrases
+        """
+        self.agent = speech_agent
+        self.segmenter = segmenter or SentenceSegmenter()
+        self._lock = threading.Lock()
+        self._sentences: "queue.Queue[Any]" = queue.Queue()
+        self._audio: "queue.Queue[Any]" = queue.Queue(maxsize=2)  # synthèse au plus 2 phrases en avance
+        self._cancelled = threading.Event()
+        self._playing = False
+        self._finished = False
+        self._threads: List[threading.Thread] = []
+        self._start_time: Optional[float] = None
+        self.time_to_first_audio: Optional[float] = None
+        self.sentences_spoken = 0
+
+    def start(self) -> "SpeechStream":
+        """Démarre les threads de synthèse et de lecture."""
+        self._start_time = time.time()
+        for target, name in ((self._synthesis_worker, "tts-synth"), (self._playback_worker, "tts-play")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def feed(self, token: str) -> None:
+        """Ajoute un token généré (appelé depuis le callback `llm.token`)."""
+        if self._finished or self._cancelled.is_set():
+            return
+        with self._lock:
+            sentences = self.segmenter.feed(token)
+        for sentence in sentences:
+            self._sentences.put(sentence)
+
+    def finish(self) -> None:
+        """Termine le flux : la dernière phrase incomplète est prononcée."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            sentences = self.segmenter.flush()
+        for sentence in sentences:
+            self._sentences.put(sentence)
+        self._sentences.put(_STOP)
+
+    def cancel(self) -> None:
+        """Interrompt la session : phrase en cours de lecture coupée, phrases en attente abandonnées."""
+        self._cancelled.set()
+        with self._lock:
+            self._finished = True
+        for pending in (self._sentences, self._audio):
+            while True:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+        self._sentences.put(_STOP)
+        try:
+            self._audio.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        # Barge-in : couper aussi la phrase en cours, pas seulement les suivantes
+        if self._playing:
+            try:
+                self.agent.stop_playback()
+            except Exception as e:
+                logger.warning(f"Lecture en flux: arrêt impossible: {e}")
+
+    @property
+    def active(self) -> bool:
+        """Indique si des phrases restent à synthétiser ou à jouer."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend la fin de la lecture.
+
+        Args:
+            timeout (Optional[float]): Délai maximal (secondes)
+
+        Returns:
+            bool: True si la session est terminée
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            thread.join(remaining)
+        return not self.active
+
+    def _synthesis_worker(self) -> None:
+        """Étage 2 : nettoyage + synthèse de chaque phrase."""
+        while not self._cancelled.is_set():
+            sentence = self._sentences.get()
+            if sentence is _STOP:
+                break
+            try:
+                text = self.agent._clean_text(sentence)
+                if not text or not text.strip():
+                    continue
+                audio = self.agent.synthesize(text)
+                if not self._cancelled.is_set():
+                    self._audio.put((text, audio))
+            except Exception as e:
+                logger.error(f"Synthèse en flux: erreur sur '{sentence[:40]}': {e}")
+        if not self._cancelled.is_set():
+            self._audio.put(_STOP)
+
+    def _playback_worker(self) -> None:
+        """Étage 3 : lecture ordonnée des phrases synthétisées."""
+        while not self._cancelled.is_set():
+            item = self._audio.get()
+            # cancel() pendant l'attente : phrase synthétisée juste avant l'annulation
+            if item is _STOP or self._cancelled.is_set():
+                break
+            text, audio = item
+            if self.time_to_first_audio is None and self._start_time is not None:
+                self.time_to_first_audio = time.time() - self._start_time
+                logger.info(f"TTS flux: premier son après {self.time_to_first_audio:.2f}s")
+                try:
+                    from utils.monitoring import record_timing
+                    record_timing("tts", "time_to_first_audio", self.time_to_first_audio)
+                except Exception:
+                    pass
+            self._playing = True
+            try:
+                self.agent.play_audio(audio, text=text)
+                self.sentences_spoken += 1
+            except Exception as e:
+                logger.error(f"Lecture en flux: erreur: {e}")
+            finally:
+                self._playing = False
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Cache persistant de l'audio synthétisé (phrases fréquentes).
+
+Les phrases répétées (accueil, « Commande annulée. », messages d'erreur...)
+sont servies sans inférence Piper. La clé combine le texte normalisé, le
+modèle de voix et `length_scale`. Deux niveaux, bornés en octets avec
+éviction LRU :
+
+- mémoire : `PcmAudio` prêts à jouer ;
+- disque : un WAV par phrase dans `data/audio/tts_cache/` (persiste entre
+  les sessions, ordre LRU porté par la date de modification).
+
+L'écriture disque est différée (thread d'écriture) : `put()` ne fait que
+l'insertion mémoire, sans encodage WAV ni écriture sur le chemin du
+premier son.
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from agents.audio_output import PcmAudio
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalise un texte pour la clé de cache (Unicode NFC, blancs réduits)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_cache_key(text: str, voice: str, length_scale: float) -> str:
+    """
+    Calcule la clé d'une phrase synthétisée.
+
+    Args:
+        text (str): Texte prononcé
+        voice (str): Identifiant du modèle de voix
+        length_scale (float): Vitesse de synthèse Piper
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    payload = f"{voice}\x00{length_scale:.3f}\x00{normalize_text(text)}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class TtsAudioCache:
+    """Cache LRU à deux niveaux (mémoire, disque) d'audio PCM synthétisé."""
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        max_text_chars: int = 200,
+    ):
+        """
+        Initialise le cache et indexe les fichiers déjà présents sur disque.
+
+        Args:
+            cache_dir (Union[str, Path]): Répertoire des WAV en cache
+            max_memory_bytes (int): Taille max des PCM gardés en mémoire
+            max_disk_bytes (int): Taille max des WAV sur disque
+            max_text_chars (int): Longueur max d'une phrase mise en cache
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_text_chars = max_text_chars
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, PcmAudio]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._writes: "queue.Queue[Any]" = queue.Queue(maxsize=64)
+        self._writer: Optional[threading.Thread] = None
+
+        entries = []
+        for path in self.cache_dir.glob("*.wav"):
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        logger.info(f"Cache TTS: {len(self._disk)} phrases sur disque ({self._disk_bytes / 1024**2:.1f} MB)")
+
+    def cacheable(self, text: str) -> bool:
+        """Indique si la phrase est assez courte pour être mise en cache."""
+        return 0 < len(text) <= self.max_text_chars
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def get(self, text: str, voice: str, length_scale: float) -> Optional[PcmAudio]:
+        """
+        Retourne l'audio en cache pour cette phrase.
+
+        Args:
+            text (str): Texte prononcé
+            voice (str): Identifiant du modèle de voix
+            length_scale (float): Vitesse de synthèse
+
+        Returns:
+            Optional[PcmAudio]: Audio ou None (miss)
+        """
+        if not self.cacheable(text):
+            return None
+        key = make_cache_key(text, voice, length_scale)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.hits_memory += 1
+                self._count("tts.cache.hit")
+                return audio
+            on_disk = key in self._disk
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                audio = PcmAudio.from_wav_bytes(path.read_bytes())
+                os.utime(path)  # ordre LRU persistant
+            except Exception as e:
+                logger.warning(f"Cache TTS: entrée illisible {path.name}: {e}")
+                self._forget_disk(key)
+                audio = None
+            if audio is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._store_memory(key, audio)
+                    self.hits_disk += 1
+                self._count("tts.cache.hit")
+                return audio
+
+        with self._lock:
+            self.misses += 1
+        self._count("tts.cache.miss")
+        return None
+
+    def put(self, text: str, voice: str, length_scale: float, audio: PcmAudio) -> bool:
+        """
+        Enregistre l'audio d'une phrase (mémoire immédiatement, disque en différé).
+
+        Args:
+            text (str): Texte prononcé
+            voice (str): Identifiant du modèle de voix
+            length_scale (float): Vitesse de synthèse
+            audio (PcmAudio): Audio synthétisé
+
+        Returns:
+            bool: True si la phrase a été mise en cache
+        """
+        if not self.cacheable(text) or audio is None:
+            return False
+        key = make_cache_key(text, voice, length_scale)
+        with self._lock:
+            self._store_memory(key, audio)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_worker, name="tts-cache-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._writes.put_nowait((key, audio))
+        except queue.Full:
+            # Rafale d'écritures : la phrase reste en mémoire seulement
+            logger.debug("Cache TTS: file d'écriture pleine, entrée gardée en mémoire")
+        return True
+
+    def _write_worker(self) -> None:
+        """Écrit les WAV en attente (thread d'écriture)."""
+        while True:
+            key, audio = self._writes.get()
+            try:
+                self._write_disk(key, audio)
+            finally:
+                self._writes.task_done()
+
+    def _write_disk(self, key: str, audio: PcmAudio) -> None:
+        data = audio.to_wav_bytes()
+        path = self._path(key)
+        try:
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Cache TTS: écriture impossible ({e})")
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._evict_disk()
+
+    def flush(self) -> None:
+        """Attend la fin des écritures disque en attente."""
+        self._writes.join()
+
+    def _store_memory(self, key: str, audio: PcmAudio) -> None:
+        """Ajoute une entrée mémoire puis évince les moins récentes (verrou tenu)."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous.pcm)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio.pcm)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.pcm)
+
+    def _evict_disk(self) -> None:
+        """Supprime les WAV les moins récents au-delà du quota (verrou tenu)."""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def _forget_disk(self, key: str) -> None:
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    @staticmethod
+    def _count(counter: str) -> None:
+        try:
+            from utils.monitoring import performance_monitor
+            performance_monitor().increment_counter(counter)
+        except Exception:
+            pass
+
+    def clear_memory(self) -> None:
+        """Vide le niveau mémoire (le disque est conservé)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne tailles et compteurs hit/miss."""
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            }
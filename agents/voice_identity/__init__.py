@@ -16,11 +16,14 @@ Architecture en 3 couches : extraction d'empreinte, gestion de profils, service
 # ///
 
 from .embedding_extractor import VoiceEmbeddingExtractor
+from .profile_index import ProfileIndex, get_profile_index
 from .profile_manager import VoiceProfileManager
 from .identity_service import VoiceIdentityService
 
 __all__ = [
     'VoiceEmbeddingExtractor',
+    'ProfileIndex',
+    'get_profile_index',
     'VoiceProfileManager',
     'VoiceIdentityService',
 ]
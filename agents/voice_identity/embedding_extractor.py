@@ -9,7 +9,6 @@ Extrait un vecteur d'embedding à partir d'un fichier audio pour identifier un l
 # dependencies = [
 #   "torch>=2.0.0",
 #   "torchaudio>=0.10.0",  # Pour resampling audio
-#   "transformers>=4.26.0",
 #   "numpy>=1.22.0",
 #   "soundfile>=0.10.3",
 # ]
@@ -21,8 +20,7 @@ from typing import Optional
 import numpy as np
 import torch
 import soundfile as sf
-from transformers import Wav2Vec2Processor, Wav2Vec2Model
-from config.system_config import DEVICE
+from agents.wav2vec_encoder import audio_fingerprint, wav2vec2_registry
 
 logger = logging.getLogger(__name__)
 
@@ -49,16 +47,21 @@ class VoiceEmbeddingExtractor:
         self.device = torch.device("cuda" if self.use_gpu else "cpu")
         
         try:
-            self.processor = Wav2Vec2Processor.from_pretrained(self.model_name)
-            self.model = Wav2Vec2Model.from_pretrained(self.model_name)
-            self.model.eval()
-            self.model.to(self.device)
+            # Modèle partagé avec le STT (même checkpoint, une seule copie en mémoire)
+            self.shared = wav2vec2_registry.acquire(self.model_name, self.device.type)
+            self.processor = self.shared.processor
+            self.model = self.shared.encoder
             
             self.logger.info(f"Extracteur d'empreinte vocale initialisé (modèle: {self.model_name}, device: {self.device})")
         except Exception as e:
             self.logger.error(f"Erreur lors du chargement du modèle Wav2Vec2: {e}")
             raise
     
+    def release(self) -> None:
+        """Rend le modèle partagé au registre."""
+        wav2vec2_registry.release(getattr(self, 'shared', None))
+        self.shared = None
+    
     def extraire_empreinte(self, audio_path: str, pooling: str = "mean") -> Optional[np.ndarray]:
         """
         Extrait une empreinte vocale (embedding) à partir d'un fichier audio.
@@ -72,7 +75,34 @@ class VoiceEmbeddingExtractor:
         """
         try:
             # Charger l'audio
-            audio, sample_rate = sf.read(audio_path)
+            audio, sample_rate = sf.read(audio_path, dtype='float32')
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'extraction d'empreinte depuis {audio_path}: {e}")
+            return None
+        return self.extraire_empreinte_array(audio, sample_rate, pooling=pooling)
+    
+    def extraire_empreinte_array(self, audio: np.ndarray, sample_rate: int, pooling: str = "mean") -> Optional[np.ndarray]:
+        """
+        Extrait une empreinte vocale à partir d'un tampon audio en mémoire.
+        
+        Args:
+            audio (np.ndarray): Échantillons float32 (mono, ou [n, canaux])
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            pooling (str): Méthode de pooling ("mean" ou "attention")
+            
+        Returns:
+            Optional[np.ndarray]: Vecteur d'embedding normalisé L2, ou None en cas d'erreur
+        """
+        try:
+            audio = np.asarray(audio)
+            if pooling == "mean":
+                # Énoncé déjà transcrit : empreinte issue de la passe STT
+                pooled = self.shared.pooled_for(audio_fingerprint(audio, sample_rate))
+                if pooled is not None:
+                    self.logger.debug("Empreinte reprise de la passe STT")
+                    return pooled
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
             
             # Normaliser si nécessaire (amplitude entre -1.0 et 1.0)
             if audio.dtype != np.float32:
@@ -89,33 +119,14 @@ class VoiceEmbeddingExtractor:
                 audio = audio_tensor.squeeze(0).numpy()
                 sample_rate = 16000
             
-            # Traiter avec Wav2Vec2
-            inputs = self.processor(audio, sampling_rate=sample_rate, return_tensors="pt", padding=True)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                # Extraire les features (shape: [batch, seq_len, hidden_dim])
-                features = outputs.last_hidden_state
-                
-                # Pooling pour obtenir un vecteur fixe
-                if pooling == "mean":
-                    embedding = features.mean(dim=1).squeeze(0)  # [hidden_dim]
-                elif pooling == "attention":
-                    # Pooling attention simple (moyenne pondérée)
-                    attention_weights = torch.softmax(features.mean(dim=-1), dim=1)
-                    embedding = (features * attention_weights.unsqueeze(-1)).sum(dim=1).squeeze(0)
-                else:
-                    embedding = features.mean(dim=1).squeeze(0)
-            
-            # Convertir en numpy et normaliser
-            embedding_np = embedding.cpu().numpy()
-            embedding_np = embedding_np / (np.linalg.norm(embedding_np) + 1e-8)  # Normalisation L2
+            # Traiter avec l'encodeur Wav2Vec2 (sans tête CTC) puis pooling + normalisation L2
+            inputs = self.shared.prepare(audio, sample_rate)
+            embedding_np = self.shared.embed(inputs, pooling=pooling)
             
             self.logger.debug(f"Empreinte extraite: shape={embedding_np.shape}, norm={np.linalg.norm(embedding_np):.4f}")
             return embedding_np
             
         except Exception as e:
-            self.logger.error(f"Erreur lors de l'extraction d'empreinte depuis {audio_path}: {e}")
+            self.logger.error(f"Erreur lors de l'extraction d'empreinte: {e}")
             return None
 
@@ -50,10 +50,41 @@ class VoiceIdentityService:
         """
         try:
             # Identifier le locuteur
-            result = self.profile_manager.identifier_locuteur(audio_path)
-            if result is None:
-                return None
+            return self._construire_identite(self.profile_manager.identifier_locuteur(audio_path))
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'identification de locuteur: {e}")
+            return None
+    
+    def identify_array(self, audio, sample_rate: int) -> Optional[Dict[str, any]]:
+        """
+        Identifie un locuteur à partir d'un tampon audio en mémoire (capture PTT).
+        
+        Args:
+            audio (np.ndarray): Échantillons float32 dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            
+        Returns:
+            Optional[Dict[str, any]]: Même format que identifier_locuteur(), ou None
+        """
+        try:
+            return self._construire_identite(self.profile_manager.identify_array(audio, sample_rate))
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'identification de locuteur: {e}")
+            return None
+    
+    def _construire_identite(self, result: Optional[Tuple[str, float]]) -> Optional[Dict[str, any]]:
+        """
+        Complète un résultat (speaker_id, score) avec les métadonnées du profil.
+        
+        Args:
+            result (Optional[Tuple[str, float]]): Résultat du gestionnaire de profils
             
+        Returns:
+            Optional[Dict[str, any]]: Identité complète ou None
+        """
+        if result is None:
+            return None
+        try:
             speaker_id, score = result
             
             # Charger les métadonnées
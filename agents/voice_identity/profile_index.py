@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Matrice des profils vocaux en mémoire (identification vectorisée).
+
+Les empreintes `voice_profiles/*.npy` sont chargées une fois dans une
+matrice float32 [profils, dimension] normalisée L2. L'identification est
+un produit matrice-vecteur (top-k par `argpartition`), l'identification
+d'un lot d'énoncés un produit matrice-matrice : le coût ne dépend plus de
+lectures disque par profil.
+
+La matrice suit les enrôlements et suppressions faits via `upsert()` /
+`remove()`. Une écriture externe (autre processus, copie manuelle, y
+compris un ré-enrôlement qui réécrit `<id>.npy` en place) est détectée
+par l'empreinte des fichiers `*.npy` (nom, date de modification, taille),
+recalculée au plus une fois par `refresh_interval_s` : entre deux
+vérifications, une identification ne touche pas au disque. `reload()`
+force la relecture immédiate. Option : matrice consolidée dans un seul
+fichier (`.index/matrix.npy`) ouverte en `mmap` au démarrage.
+"""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0",
+# ]
+# ///
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INDEX_DIR = ".index"
+DEFAULT_REFRESH_INTERVAL_S = 5.0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalise des vecteurs (ligne par ligne) en float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+
+class ProfileIndex:
+    """Empreintes vocales normalisées d'un répertoire de profils, en une matrice."""
+
+    def __init__(
+        self,
+        profiles_dir: Path,
+        use_mmap: bool = False,
+        refresh_interval_s: float = DEFAULT_REFRESH_INTERVAL_S,
+    ):
+        """
+        Initialise l'index (chargé au premier accès).
+
+        Args:
+            profiles_dir (Path): Répertoire des profils `<speaker_id>.npy`
+            use_mmap (bool): Ouvrir la matrice consolidée en mmap (réécrite à chaque modification)
+            refresh_interval_s (float): Délai minimal entre deux recherches d'écritures externes
+        """
+        self.profiles_dir = Path(profiles_dir)
+        self.use_mmap = use_mmap
+        self.refresh_interval_s = refresh_interval_s
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._signature: Optional[str] = None
+        self._checked_at = 0.0
+
+    # ---------- Chargement ----------
+    def _dir_signature(self) -> Optional[str]:
+        """Empreinte des profils `*.npy` : (nom, mtime_ns, taille) de chaque fichier."""
+        try:
+            entries = []
+            with os.scandir(self.profiles_dir) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".npy") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            return None
+        return hashlib.blake2b(repr(sorted(entries)).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _ensure_loaded(self) -> None:
+        """Charge la matrice, ou la recharge si une écriture externe est détectée (au plus une vérification par intervalle)."""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.refresh_interval_s:
+            return
+        signature = self._dir_signature()
+        self._checked_at = now
+        if self._signature is not None and signature == self._signature:
+            return
+        if self.use_mmap and self._load_consolidated(signature):
+            return
+        ids, vectors = [], []
+        for profile_file in sorted(self.profiles_dir.glob("*.npy")):
+            try:
+                vector = np.load(profile_file).astype(np.float32).ravel()
+            except Exception as e:
+                logger.warning(f"Profil vocal illisible {profile_file.name}: {e}")
+                continue
+            if vectors and vector.shape != vectors[0].shape:
+                logger.warning(f"Profil {profile_file.stem} ignoré: dimension {vector.shape[0]} ≠ {vectors[0].shape[0]}")
+                continue
+            ids.append(profile_file.stem)
+            vectors.append(vector)
+        self._set(ids, _normalize(np.stack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32))
+        self._signature = signature
+        logger.info(f"Matrice des profils vocaux chargée: {len(ids)} profil(s)")
+        if self.use_mmap:
+            self._persist()
+
+    def _load_consolidated(self, signature: Optional[str]) -> bool:
+        """Ouvre la matrice consolidée si elle correspond à l'état du répertoire."""
+        index_dir = self.profiles_dir / _INDEX_DIR
+        try:
+            meta = json.loads((index_dir / "ids.json").read_text(encoding="utf-8"))
+            if meta.get("signature") != signature:
+                return False
+            matrix = np.load(index_dir / "matrix.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        self._set(list(meta["ids"]), matrix)
+        self._signature = signature
+        logger.info(f"Matrice des profils vocaux ouverte en mmap: {len(self._ids)} profil(s)")
+        return True
+
+    def _persist(self) -> None:
+        """Réécrit la matrice consolidée (mode mmap) puis la rouvre."""
+        index_dir = self.profiles_dir / _INDEX_DIR
+        try:
+            index_dir.mkdir(exist_ok=True)
+            tmp = index_dir / "matrix.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(self._matrix))
+            os.replace(tmp, index_dir / "matrix.npy")
+            self._matrix = np.load(index_dir / "matrix.npy", mmap_mode="r")
+            (index_dir / "ids.json").write_text(
+                json.dumps({"signature": self._signature, "ids": self._ids}), encoding="utf-8"
+            )
+        except OSError as e:
+            logger.warning(f"Matrice des profils non consolidée: {e}")
+
+    def _set(self, ids: List[str], matrix: np.ndarray) -> None:
+        self._ids = ids
+        self._rows = {speaker_id: i for i, speaker_id in enumerate(ids)}
+        self._matrix = matrix
+
+    # ---------- Mise à jour ----------
+    def upsert(self, speaker_id: str, embedding: np.ndarray) -> None:
+        """Ajoute ou remplace un profil (après écriture de ses fichiers : pas de rechargement)."""
+        vector = _normalize(np.ravel(embedding))
+        with self._lock:
+            if self._signature is None:
+                self._ensure_loaded()
+            if self._matrix.size and vector.shape[0] != self._matrix.shape[1]:
+                logger.warning(f"Profil {speaker_id} non indexé: dimension {vector.shape[0]} ≠ {self._matrix.shape[1]}")
+                return
+            row = self._rows.get(speaker_id)
+            if row is not None:
+                matrix = np.array(self._matrix)
+                matrix[row] = vector
+                self._matrix = matrix
+            else:
+                matrix = vector[None, :] if not self._matrix.size else np.vstack((self._matrix, vector))
+                self._set(self._ids + [speaker_id], matrix)
+            self._signature = self._dir_signature()
+            self._checked_at = time.monotonic()
+            if self.use_mmap:
+                self._persist()
+
+    def remove(self, speaker_id: str) -> bool:
+        """Retire un profil de la matrice (après suppression de son `.npy`)."""
+        with self._lock:
+            if self._signature is None:
+                self._ensure_loaded()
+            row = self._rows.get(speaker_id)
+            if row is None:
+                return False
+            ids = self._ids[:row] + self._ids[row + 1:]
+            self._set(ids, np.delete(self._matrix, row, axis=0))
+            self._signature = self._dir_signature()
+            self._checked_at = time.monotonic()
+            if self.use_mmap:
+                self._persist()
+            return True
+
+    def reload(self) -> None:
+        """Relit les profils sans attendre la prochaine vérification (enrôlement ou suppression externe)."""
+        with self._lock:
+            self._signature = None
+            self._ensure_loaded()
+
+    # ---------- Lecture ----------
+    def ids(self) -> List[str]:
+        """Identifiants des profils indexés."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._ids)
+
+    def get(self, speaker_id: str) -> Optional[np.ndarray]:
+        """Empreinte normalisée d'un profil, ou None."""
+        with self._lock:
+            self._ensure_loaded()
+            row = self._rows.get(speaker_id)
+            return None if row is None else np.array(self._matrix[row])
+
+    def top_k(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Profils les plus proches d'une empreinte (similarité cosinus décroissante).
+
+        Args:
+            embedding (np.ndarray): Empreinte à identifier
+            k (int): Nombre de profils retournés
+
+        Returns:
+            List[Tuple[str, float]]: (speaker_id, similarité)
+        """
+        return self.top_k_batch(np.ravel(embedding)[None, :], k)[0]
+
+    def top_k_batch(self, embeddings: np.ndarray, k: int = 1) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k pour un lot d'empreintes en un seul produit matriciel.
+
+        Args:
+            embeddings (np.ndarray): Empreintes [n, dimension]
+            k (int): Nombre de profils retournés par empreinte
+
+        Returns:
+            List[List[Tuple[str, float]]]: Résultats par empreinte, dans l'ordre du lot
+        """
+        queries = _normalize(np.atleast_2d(embeddings))
+        with self._lock:
+            self._ensure_loaded()
+            matrix, ids = self._matrix, self._ids
+        if not ids or queries.shape[1] != matrix.shape[1]:
+            return [[] for _ in range(len(queries))]
+        scores = np.clip(queries @ matrix.T, -1.0, 1.0)
+        k = min(k, len(ids))
+        if k < len(ids):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(ids)), scores.shape)
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row_scores[candidates], kind="stable")]
+            results.append([(ids[i], float(row_scores[i])) for i in ordered])
+        return results
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._ids)
+
+
+_indexes: Dict[Path, ProfileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_profile_index(profiles_dir: Path, use_mmap: Optional[bool] = None) -> ProfileIndex:
+    """
+    Index partagé d'un répertoire de profils (identification et authentification).
+
+    Args:
+        profiles_dir (Path): Répertoire des profils
+        use_mmap (Optional[bool]): Matrice consolidée en mmap (défaut: VOICE_IDENTITY_CONFIG,
+            qui fixe aussi `profile_refresh_s`)
+
+    Returns:
+        ProfileIndex: Instance unique pour ce répertoire
+    """
+    key = Path(profiles_dir).resolve()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            try:
+                from config.system_config import VOICE_IDENTITY_CONFIG as config
+            except ImportError:
+                config = {}
+            if use_mmap is None:
+                use_mmap = bool(config.get("profile_matrix_mmap", False))
+            refresh_interval_s = float(config.get("profile_refresh_s", DEFAULT_REFRESH_INTERVAL_S))
+            index = ProfileIndex(key, use_mmap=use_mmap, refresh_interval_s=refresh_interval_s)
+            _indexes[key] = index
+        return index
@@ -3,6 +3,8 @@
 """
 Couche 2 : Gestionnaire de profils vocaux
 Gère l'enrôlement, l'identification et la vérification de locuteurs.
+Les profils sont comparés via la matrice en mémoire de `profile_index`
+(plus de lecture des `.npy` à chaque énoncé).
 """
 
 # /// script
@@ -16,6 +18,7 @@ from pathlib import Path
 from typing import Optional, Dict, Tuple, List
 import numpy as np
 from .embedding_extractor import VoiceEmbeddingExtractor
+from .profile_index import ProfileIndex, get_profile_index
 from config.system_config import VOICE_PROFILES_DIR
 
 logger = logging.getLogger(__name__)
@@ -49,6 +52,11 @@ class VoiceProfileManager:
         
         self.logger.info(f"Gestionnaire de profils vocaux initialisé (répertoire: {self.profiles_dir})")
     
+    @property
+    def index(self) -> ProfileIndex:
+        """Matrice des profils du répertoire (partagée avec SpeakerAuth)."""
+        return get_profile_index(self.profiles_dir)
+    
     def _compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Calcule la similarité cosinus entre deux embeddings.
@@ -103,6 +111,9 @@ class VoiceProfileManager:
                 with open(metadata_path, 'w', encoding='utf-8') as f:
                     json.dump(metadata, f, ensure_ascii=False, indent=2)
             
+            # Indexer une fois les fichiers écrits (empreinte du répertoire relevée après)
+            self.index.upsert(speaker_id, embedding)
+            
             self.logger.info(f"Locuteur {speaker_id} enrôlé avec succès (profil: {profile_path})")
             return True
             
@@ -125,37 +136,91 @@ class VoiceProfileManager:
             embedding = self.extractor.extraire_empreinte(audio_path)
             if embedding is None:
                 return None
-            
-            # Parcourir tous les profils
-            best_match = None
-            best_score = 0.0
-            
-            for profile_file in self.profiles_dir.glob("*.npy"):
-                if profile_file.name.endswith("_metadata.json"):
-                    continue
+            return self._meilleur_profil(embedding)
                 
-                speaker_id = profile_file.stem
-                reference_embedding = np.load(profile_file)
-                
-                # Calculer la similarité
-                similarity = self._compute_similarity(embedding, reference_embedding)
-                
-                if similarity > best_score:
-                    best_score = similarity
-                    best_match = speaker_id
-            
-            # Retourner le meilleur match si au-dessus du seuil
-            if best_match and best_score >= self.similarity_threshold:
-                self.logger.info(f"Locuteur identifié: {best_match} (score: {best_score:.3f})")
-                return (best_match, best_score)
-            else:
-                self.logger.debug(f"Aucun locuteur identifié (meilleur score: {best_score:.3f}, seuil: {self.similarity_threshold})")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'identification: {e}")
+            return None
+    
+    def identify_array(self, audio: np.ndarray, sample_rate: int) -> Optional[Tuple[str, float]]:
+        """
+        Identifie un locuteur à partir d'un tampon audio en mémoire (sans fichier WAV).
+        
+        Args:
+            audio (np.ndarray): Échantillons float32 dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            
+        Returns:
+            Optional[Tuple[str, float]]: (speaker_id, score_similarité) du meilleur match, ou None
+        """
+        try:
+            embedding = self.extractor.extraire_empreinte_array(audio, sample_rate)
+            if embedding is None:
                 return None
-                
+            return self._meilleur_profil(embedding)
         except Exception as e:
             self.logger.error(f"Erreur lors de l'identification: {e}")
             return None
     
+    def identify_batch(self, audios: List[np.ndarray], sample_rate: int) -> List[Optional[Tuple[str, float]]]:
+        """
+        Identifie plusieurs énoncés en une seule comparaison matricielle.
+        
+        Args:
+            audios (List[np.ndarray]): Tampons float32 dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage commune
+            
+        Returns:
+            List[Optional[Tuple[str, float]]]: Meilleur match par énoncé (None si sous le seuil ou échec)
+        """
+        embeddings = [self.extractor.extraire_empreinte_array(audio, sample_rate) for audio in audios]
+        valid = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        results: List[Optional[Tuple[str, float]]] = [None] * len(audios)
+        if not valid:
+            return results
+        matches = self.index.top_k_batch(np.stack([embeddings[i] for i in valid]), k=1)
+        for i, top in zip(valid, matches):
+            if top and top[0][1] >= self.similarity_threshold:
+                results[i] = top[0]
+        return results
+    
+    def rank_array(self, audio: np.ndarray, sample_rate: int, k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Classe les profils les plus proches d'un énoncé (sans seuil).
+        
+        Args:
+            audio (np.ndarray): Échantillons float32 dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            k (int): Nombre de profils retournés
+            
+        Returns:
+            List[Tuple[str, float]]: (speaker_id, similarité) par score décroissant
+        """
+        embedding = self.extractor.extraire_empreinte_array(audio, sample_rate)
+        if embedding is None:
+            return []
+        return self.index.top_k(embedding, k)
+    
+    def _meilleur_profil(self, embedding: np.ndarray) -> Optional[Tuple[str, float]]:
+        """
+        Compare une empreinte à tous les profils enregistrés (un produit matrice-vecteur).
+        
+        Args:
+            embedding (np.ndarray): Empreinte à identifier
+            
+        Returns:
+            Optional[Tuple[str, float]]: Meilleur match au-dessus du seuil, ou None
+        """
+        top = self.index.top_k(embedding, k=1)
+        best_match, best_score = top[0] if top else (None, 0.0)
+        
+        # Retourner le meilleur match si au-dessus du seuil
+        if best_match and best_score >= self.similarity_threshold:
+            self.logger.info(f"Locuteur identifié: {best_match} (score: {best_score:.3f})")
+            return (best_match, best_score)
+        self.logger.debug(f"Aucun locuteur identifié (meilleur score: {best_score:.3f}, seuil: {self.similarity_threshold})")
+        return None
+    
     def verifier_locuteur(self, audio_path: str, speaker_id: str) -> Tuple[float, bool]:
         """
         Vérifie qu'un enregistrement correspond bien à un locuteur déclaré.
@@ -168,14 +233,12 @@ class VoiceProfileManager:
             Tuple[float, bool]: (score_similarité, est_vérifié)
         """
         try:
-            # Charger le profil de référence
-            profile_path = self.profiles_dir / f"{speaker_id}.npy"
-            if not profile_path.exists():
+            # Profil de référence (matrice en mémoire)
+            reference_embedding = self.index.get(speaker_id)
+            if reference_embedding is None:
                 self.logger.warning(f"Profil {speaker_id} non trouvé")
                 return (0.0, False)
             
-            reference_embedding = np.load(profile_path)
-            
             # Extraire l'empreinte de l'audio à vérifier
             embedding = self.extractor.extraire_empreinte(audio_path)
             if embedding is None:
@@ -199,11 +262,30 @@ class VoiceProfileManager:
         Returns:
             List[str]: Liste des speaker_id
         """
-        profiles = []
-        for profile_file in self.profiles_dir.glob("*.npy"):
-            if not profile_file.name.endswith("_metadata.json"):
-                profiles.append(profile_file.stem)
-        return profiles
+        return self.index.ids()
+    
+    def supprimer_locuteur(self, speaker_id: str) -> bool:
+        """
+        Supprime un profil vocal (empreinte, métadonnées et ligne de la matrice).
+        
+        Args:
+            speaker_id (str): Identifiant du locuteur
+            
+        Returns:
+            bool: True si un profil a été supprimé
+        """
+        profile_path = self.profiles_dir / f"{speaker_id}.npy"
+        existed = profile_path.exists()
+        try:
+            profile_path.unlink(missing_ok=True)
+            (self.profiles_dir / f"{speaker_id}_metadata.json").unlink(missing_ok=True)
+        except OSError as e:
+            self.logger.error(f"Erreur lors de la suppression de {speaker_id}: {e}")
+            return False
+        removed = self.index.remove(speaker_id)
+        if existed or removed:
+            self.logger.info(f"Profil vocal {speaker_id} supprimé")
+        return existed or removed
     
     def charger_metadonnees(self, speaker_id: str) -> Optional[Dict]:
         """
@@ -27,7 +27,7 @@ import gc
 import numpy as np
 import sounddevice as sd
 import scipy.io.wavfile as wav
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+from agents.wav2vec_encoder import audio_fingerprint, wav2vec2_registry
 from utils.monitoring import record_timing
 
 try:
@@ -140,9 +140,15 @@ class Wav2VecVoiceAgent:
             if MODEL_CONFIG.get("gpu_audio") and MODEL_CONFIG["gpu_audio"].get("USE_GPU_FOR_STT"):
                 use_gpu_stt = torch.cuda.is_available()
             self.device = "cuda" if use_gpu_stt else str(speech_cfg.get("device", "cpu"))
+            self.chunk_length_s = float(speech_cfg.get("chunk_length_s", 10))
+            self.stride_length_s = float(speech_cfg.get("stride_length_s", 2))
+            self.chunk_batch_size = int(speech_cfg.get("chunk_batch_size", 1))
         else:
             self.sample_rate = 16000
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.chunk_length_s = 10.0
+            self.stride_length_s = 2.0
+            self.chunk_batch_size = 1
         
         # Cache HuggingFace : s'assurer que le répertoire existe et est accessible
         self.hf_cache_dir = self.base_dir / "models" / "huggingface_cache"
@@ -159,9 +165,10 @@ class Wav2VecVoiceAgent:
         self._last_load_error: Optional[str] = None
         self._load_lock = threading.Lock()
         
-        # Modèle et processeur
+        # Modèle et processeur (instance partagée du registre wav2vec2)
         self.model = None
         self.processor = None
+        self._encoder = None
         self.preferred_model = preferred_model
         self.model_name = self.preferred_model  
         # Modèle de secours (base stable)
@@ -206,23 +213,20 @@ class Wav2VecVoiceAgent:
                 model_name = self.preferred_model
                 self.logger.info(f"🔄 Chargement modèle STT: {model_name} (cache: {self.hf_cache_dir})")
 
+                if force_reload and self._encoder is not None:
+                    wav2vec2_registry.release(self._encoder)
+                    self._encoder = None
+
+                # Modèle partagé avec l'identité vocale (une seule copie des poids)
                 try:
-                    self.processor = Wav2Vec2Processor.from_pretrained(model_name)
-                    self.model = Wav2Vec2ForCTC.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float32,
-                    )
+                    self._encoder = wav2vec2_registry.acquire(model_name, self.device)
                     self.logger.info(f"✅ Modèle STT chargé: {model_name}")
                 except Exception as e:
                     self.logger.error(f"❌ Échec chargement {model_name}: {e}")
                     if self.fallback_model and self.fallback_model != model_name:
                         self.logger.warning(f"⚠️ Tentative fallback: {self.fallback_model}")
                         try:
-                            self.processor = Wav2Vec2Processor.from_pretrained(self.fallback_model)
-                            self.model = Wav2Vec2ForCTC.from_pretrained(
-                                self.fallback_model,
-                                torch_dtype=torch.float32,
-                            )
+                            self._encoder = wav2vec2_registry.acquire(self.fallback_model, self.device)
                             model_name = self.fallback_model
                             self.model_name = self.fallback_model
                             self.logger.info(f"✅ Fallback actif: {self.fallback_model}")
@@ -232,9 +236,8 @@ class Wav2VecVoiceAgent:
                     else:
                         raise
 
-                if self.device == "cuda":
-                    self.model = self.model.to(self.device)
-                self.model.eval()
+                self.processor = self._encoder.processor
+                self.model = self._encoder.model
                 self._model_loaded = True
                 return True
 
@@ -250,6 +253,9 @@ class Wav2VecVoiceAgent:
             self.model = None
             self.processor = None
             self._model_loaded = False
+            # Le modèle n'est libéré que si l'identité vocale ne l'utilise plus
+            wav2vec2_registry.release(self._encoder)
+            self._encoder = None
             
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
@@ -319,19 +325,6 @@ class Wav2VecVoiceAgent:
             tuple: (texte transcrit, score de confiance)
         """
         try:
-            # Mesurer le temps de transcription
-            start_time = time.time()
-            t_checkpoint = start_time
-            
-            # Charger le modèle si nécessaire
-            if not self._ensure_model_loaded(force_reload):
-                err = getattr(self, "_last_load_error", None) or ""
-                hint = (" " + err.replace("\n", " ")[:80] + ("…" if len(err) > 80 else "")) if err else ""
-                return f"Erreur: Modèle non disponible{hint}", 0.0
-            else:
-                record_timing("asr", "load_model", time.time() - t_checkpoint)
-                t_checkpoint = time.time()
-            
             # Vérifier le fichier
             if not audio_path or not os.path.isfile(audio_path):
                 self.logger.error(f"Fichier audio introuvable: {audio_path}")
@@ -340,22 +333,61 @@ class Wav2VecVoiceAgent:
             self.logger.info(f"Transcription de: {audio_path}")
             
             # Charger l'audio
+            t_checkpoint = time.time()
             sample_rate, audio_data = wav.read(audio_path)
             record_timing("asr", "read_wav", time.time() - t_checkpoint)
-            t_checkpoint = time.time()
             
-            # Assurer mono
-            if len(audio_data.shape) > 1 and audio_data.shape[1] > 1:
-                # Moyenne des canaux → mono
-                audio_data = audio_data.mean(axis=1)
-
             # Conversion en float32 si nécessaire
             if audio_data.dtype == np.int16:
                 audio_data = audio_data.astype(np.float32) / 32768.0
             elif audio_data.dtype == np.int32:
                 audio_data = (audio_data.astype(np.float32) / 2147483648.0)
-            elif audio_data.dtype == np.float64:
+            
+            return self.transcribe_array(audio_data, sample_rate, force_reload=force_reload)
+            
+        except Exception as e:
+            self.logger.error(f"Erreur de transcription: {e}")
+            self.logger.error(traceback.format_exc())
+            return f"Erreur: {str(e)}", 0.0
+
+    def transcribe_array(self, audio_data: np.ndarray, sample_rate: int, force_reload: bool = False) -> Tuple[str, float]:
+        """
+        Transcrit un tampon audio en mémoire (sans passage par un fichier WAV).
+        
+        Args:
+            audio_data (np.ndarray): Échantillons float32 dans [-1, 1] (mono, ou [n, canaux])
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            force_reload (bool): Force le rechargement du modèle
+            
+        Returns:
+            tuple: (texte transcrit, score de confiance)
+        """
+        try:
+            # Mesurer le temps de transcription
+            start_time = time.time()
+            t_checkpoint = start_time
+            
+            # Charger le modèle si nécessaire
+            if not self._ensure_model_loaded(force_reload):
+                err = getattr(self, "_last_load_error", None) or ""
+                hint = (" " + err.replace("\n", " ")[:80] + ("…" if len(err) > 80 else "")) if err else ""
+                return f"Erreur: Modèle non disponible{hint}", 0.0
+            else:
+                record_timing("asr", "load_model", time.time() - t_checkpoint)
+                t_checkpoint = time.time()
+            
+            audio_data = np.asarray(audio_data)
+            if audio_data.size == 0:
+                return "Erreur: audio vide", 0.0
+            
+            # Assurer mono
+            if audio_data.ndim > 1:
+                # Moyenne des canaux → mono
+                audio_data = audio_data.mean(axis=1) if audio_data.shape[1] > 1 else audio_data[:, 0]
+            if audio_data.dtype != np.float32:
                 audio_data = audio_data.astype(np.float32)
+            # Empreinte du tampon reçu : l'identification du même énoncé réutilise cette passe
+            fingerprint = audio_fingerprint(audio_data, sample_rate)
             
             # Rééchantillonner si nécessaire
             if sample_rate != self.sample_rate:
@@ -371,23 +403,25 @@ class Wav2VecVoiceAgent:
             t_checkpoint = time.time()
             
             # Préprocesser avec le processor
-            inputs = self.processor(
-                audio_data,
-                sampling_rate=self.sample_rate,
-                return_tensors="pt",
-                padding=True
-            )
+            inputs = self._encoder.prepare(audio_data, self.sample_rate)
             record_timing("asr", "preprocess", time.time() - t_checkpoint)
             t_checkpoint = time.time()
-            # Forcer CPU/float32 pour éviter 'meta' device issues
-            inputs = {k: v.to("cpu", dtype=torch.float32) for k, v in inputs.items()}
-            if self.device == "cuda":
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Inférence
-            with torch.no_grad():
-                logits = self.model(**inputs).logits
-            record_timing("asr", "inference", time.time() - t_checkpoint)
+            
+            # Inférence : logits CTC + états cachés moyennés (empreinte vocale) en une passe,
+            # par fenêtres chevauchantes au-delà de chunk_length_s (mémoire bornée, coût linéaire)
+            chunk_samples = int(self.chunk_length_s * self.sample_rate)
+            if 0 < chunk_samples < len(audio_data):
+                logits = self._encoder.forward_chunked(
+                    inputs,
+                    chunk_samples,
+                    int(self.stride_length_s * self.sample_rate),
+                    batch_size=self.chunk_batch_size,
+                    fingerprint=fingerprint,
+                ).logits
+                record_timing("asr", "inference_chunked", time.time() - t_checkpoint)
+            else:
+                logits = self._encoder.forward(inputs, fingerprint=fingerprint).logits
+                record_timing("asr", "inference", time.time() - t_checkpoint)
             t_checkpoint = time.time()
             
             # Décoder avec CTC
@@ -429,6 +463,91 @@ class Wav2VecVoiceAgent:
             audio_path (str): Chemin vers le fichier audio à transcrire
             force_reload (bool): Force le rechargement du modèle
             
+        Returns:
+            tuple: (texte transcrit, score de confiance)
+        """
+        return self._transcribe_with_events(
+            lambda: self.transcribe_audio(audio_path, force_reload=False),
+            force_reload,
+            {'audio_path': audio_path},
+        )
+    
+    def transcribe_array_with_events(
+        self, audio_data: np.ndarray, sample_rate: int, force_reload: bool = False
+    ) -> Tuple[str, float]:
+        """
+        Transcrit un tampon audio en mémoire avec émission d'événements temps réel.
+        
+        Args:
+            audio_data (np.ndarray): Échantillons float32 dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage du tampon
+            force_reload (bool): Force le rechargement du modèle
+            
+        Returns:
+            tuple: (texte transcrit, score de confiance)
+        """
+        return self._transcribe_with_events(
+            lambda: self.transcribe_array(audio_data, sample_rate, force_reload=False),
+            force_reload,
+            {'audio_path': None, 'duration_s': len(audio_data) / float(sample_rate or 1)},
+        )
+    
+    def create_capture(self, sample_rate: Optional[int] = None, max_duration_s: float = 7.0, on_end_of_speech=None):
+        """
+        Ouvre une capture PTT en flux (VAD + transcription des segments pendant la parole).
+
+        Args:
+            sample_rate (Optional[int]): Fréquence des blocs micro (défaut: celle de l'agent)
+            max_duration_s (float): Durée maximale de capture
+            on_end_of_speech (Optional[Callable]): Appelé quand la capture s'arrête d'elle-même
+
+        Returns:
+            StreamingCapture: Session non démarrée, ou None si désactivée ou VAD indisponible
+        """
+        capture_cfg = (MODEL_CONFIG or {}).get("speech", {}).get("streaming_capture", {})
+        if not capture_cfg.get("enabled", False):
+            return None
+        try:
+            from agents.speech_capture import StreamingCapture
+            return StreamingCapture(
+                lambda audio, sr: self.transcribe_array(audio, sr),
+                sample_rate=int(sample_rate or self.sample_rate),
+                vad_profile=capture_cfg.get("vad_profile", "normal"),
+                segment_pause_ms=int(capture_cfg.get("segment_pause_ms", 300)),
+                min_segment_s=float(capture_cfg.get("min_segment_s", 1.0)),
+                max_duration_s=max_duration_s,
+                on_end_of_speech=on_end_of_speech,
+            )
+        except Exception as e:
+            self.logger.warning(f"Capture en flux indisponible ({e}), capture complète")
+            return None
+
+    def transcribe_capture_with_events(self, capture, timeout: Optional[float] = None) -> Tuple[str, float]:
+        """
+        Attend le texte d'une capture en flux avec émission d'événements temps réel.
+
+        Args:
+            capture (StreamingCapture): Capture arrêtée (fin de parole ou `stop()`)
+            timeout (Optional[float]): Délai maximal d'attente du dernier segment
+
+        Returns:
+            tuple: (texte transcrit, score de confiance)
+        """
+        return self._transcribe_with_events(
+            lambda: capture.result(timeout),
+            False,
+            {'audio_path': None, 'streaming': True},
+        )
+
+    def _transcribe_with_events(self, transcribe, force_reload: bool, source: dict) -> Tuple[str, float]:
+        """
+        Encadre une transcription par les événements STT (début, progression, fin).
+        
+        Args:
+            transcribe (Callable[[], Tuple[str, float]]): Transcription à exécuter
+            force_reload (bool): Force le rechargement du modèle
+            source (dict): Description de l'entrée (ajoutée à l'événement stt.start)
+            
         Returns:
             tuple: (texte transcrit, score de confiance)
         """
@@ -449,10 +568,10 @@ class Wav2VecVoiceAgent:
             
             event_bus.emit('stt.start', {
                 'timestamp': time.time(),
-                'audio_path': audio_path
+                **source
             })
             
-            self.logger.info(f"Transcription avec événements: {audio_path}")
+            self.logger.info(f"Transcription avec événements: {source.get('audio_path') or 'tampon mémoire'}")
             
             # Émettre progression
             event_bus.emit('stt.transcribing', {
@@ -478,7 +597,7 @@ class Wav2VecVoiceAgent:
             })
             
             # Effectuer transcription (réutilise la logique existante)
-            transcription, confidence = self.transcribe_audio(audio_path, force_reload=False)
+            transcription, confidence = transcribe()
             
             # Émettre complétion
             # Émettre événement agent.state_change pour STT (ACTIF après transcription)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Registre des modèles wav2vec2 partagés entre STT et identité vocale.
+
+La transcription (`Wav2VecVoiceAgent`), l'identification
+(`VoiceEmbeddingExtractor`) et l'authentification (`SpeakerEmbeddingModel`)
+utilisent le même checkpoint `jonatasgrosman/wav2vec2-large-xlsr-53-french`.
+Le registre en charge une seule copie (`Wav2Vec2ForCTC`, ~1.2 Go) par
+(modèle, device), comptée par références.
+
+Une passe STT calcule en une fois les logits CTC et les états cachés
+moyennés ; l'empreinte est mémorisée par empreinte du tampon audio pour
+que l'identification du même énoncé ne relance pas l'encodeur.
+
+Les énoncés longs passent par `forward_chunked` : fenêtres de
+`chunk_length_s` chevauchantes de `stride_length_s` de chaque côté, dont
+seules les trames centrales (contexte complet) sont conservées aux
+jointures. Mémoire bornée par la taille d'une fenêtre, coût linéaire en
+durée au lieu de quadratique (auto-attention).
+"""
+
+# /// script
+# dependencies = [
+#   "torch>=2.0.0",
+#   "transformers>=4.26.0",
+#   "numpy>=1.22.0",
+# ]
+# ///
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Empreintes des derniers énoncés transcrits (un tour PTT en pratique)
+_RECENT_EMBEDDINGS = 8
+
+
+def audio_fingerprint(audio: np.ndarray, sample_rate: int) -> str:
+    """
+    Empreinte d'un tampon audio (identifie un énoncé entre STT et identification).
+
+    Args:
+        audio (np.ndarray): Échantillons
+        sample_rate (int): Fréquence d'échantillonnage
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    data = np.ascontiguousarray(audio)
+    digest = hashlib.blake2b(data.tobytes(), digest_size=16)
+    digest.update(f"{data.dtype}:{data.shape}:{sample_rate}".encode("ascii"))
+    return digest.hexdigest()
+
+
+def pool_hidden_states(hidden: torch.Tensor, pooling: str = "mean") -> np.ndarray:
+    """
+    Réduit les états cachés [1, frames, dim] en un vecteur normalisé L2.
+
+    Args:
+        hidden (torch.Tensor): Sortie `last_hidden_state` de l'encodeur
+        pooling (str): "mean" ou "attention" (moyenne pondérée)
+
+    Returns:
+        np.ndarray: Vecteur [dim]
+    """
+    if pooling == "attention":
+        attention_weights = torch.softmax(hidden.mean(dim=-1), dim=1)
+        embedding = (hidden * attention_weights.unsqueeze(-1)).sum(dim=1).squeeze(0)
+    else:
+        embedding = hidden.mean(dim=1).squeeze(0)
+    embedding_np = embedding.float().cpu().numpy()
+    return embedding_np / (np.linalg.norm(embedding_np) + 1e-8)
+
+
+def plan_windows(
+    n_samples: int, chunk_samples: int, stride_samples: int, align: int = 1
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Découpe un tampon en fenêtres chevauchantes pour l'inférence par morceaux.
+
+    Chaque fenêtre garde `stride_samples` de contexte de part et d'autre de
+    la zone qui lui est attribuée ; les zones attribuées pavent le tampon
+    sans trou ni recouvrement. Débuts et zones sont alignés sur `align`
+    (pas de l'extracteur convolutif) pour que les trames se raccordent
+    exactement.
+
+    Args:
+        n_samples (int): Longueur du tampon
+        chunk_samples (int): Longueur d'une fenêtre
+        stride_samples (int): Contexte conservé de chaque côté
+        align (int): Nombre d'échantillons par trame de logits
+
+    Returns:
+        List[Tuple[int, int, int, int]]: (début, fin, début attribué, fin attribuée) par fenêtre
+    """
+    stride = max(align, stride_samples // align * align)
+    step = (chunk_samples - 2 * stride) // align * align
+    if step < align:
+        raise ValueError(f"Fenêtre {chunk_samples} trop courte pour un contexte de {stride} de chaque côté")
+    if n_samples <= chunk_samples:
+        return [(0, n_samples, 0, n_samples)]
+
+    windows = []
+    start = 0
+    while True:
+        if start + chunk_samples >= n_samples:
+            # Dernière fenêtre : alignée sur la fin du tampon
+            last = -(-(n_samples - chunk_samples) // align) * align
+            windows.append((last, n_samples, windows[-1][3], n_samples))
+            return windows
+        keep_start = windows[-1][3] if windows else 0
+        windows.append((start, start + chunk_samples, keep_start, start + chunk_samples - stride))
+        start += step
+
+
+@dataclass
+class EncoderOutput:
+    """Résultat d'une passe : logits CTC et empreinte moyenne."""
+    logits: torch.Tensor
+    pooled: np.ndarray
+
+
+class SharedWav2Vec2:
+    """Modèle wav2vec2 (encodeur + tête CTC) partagé par plusieurs agents."""
+
+    def __init__(self, model_name: str, device: str = "cpu"):
+        """
+        Charge le processeur et le modèle.
+
+        Args:
+            model_name (str): Checkpoint Hugging Face (ou chemin local)
+            device (str): "cpu" ou "cuda"
+        """
+        from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+        self.model_name = model_name
+        self.device = device
+        self.processor = Wav2Vec2Processor.from_pretrained(model_name)
+        self.model = Wav2Vec2ForCTC.from_pretrained(model_name, torch_dtype=torch.float32)
+        if device == "cuda":
+            self.model = self.model.to(device)
+        self.model.eval()
+        self._recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+
+    @property
+    def encoder(self) -> Any:
+        """Encodeur seul (`Wav2Vec2Model`, sortie `last_hidden_state`)."""
+        return self.model.wav2vec2
+
+    def prepare(self, audio: np.ndarray, sample_rate: int = 16000) -> Dict[str, torch.Tensor]:
+        """Prépare un tampon 16 kHz pour le modèle (processeur, float32, device)."""
+        inputs = self.processor(audio, sampling_rate=sample_rate, return_tensors="pt", padding=True)
+        # Forcer CPU/float32 pour éviter 'meta' device issues
+        inputs = {k: v.to("cpu", dtype=torch.float32) for k, v in inputs.items()}
+        if self.device == "cuda":
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        return inputs
+
+    def forward(self, inputs: Dict[str, torch.Tensor], fingerprint: Optional[str] = None) -> EncoderOutput:
+        """
+        Passe unique : états cachés puis tête CTC (équivalent à `Wav2Vec2ForCTC.forward`).
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): Entrées préparées par `prepare()`
+            fingerprint (Optional[str]): Empreinte du tampon d'origine (mémorise l'embedding)
+
+        Returns:
+            EncoderOutput: Logits CTC et empreinte moyenne normalisée
+        """
+        with torch.no_grad():
+            hidden = self.encoder(**inputs).last_hidden_state
+            logits = self.model.lm_head(self.model.dropout(hidden))
+        pooled = pool_hidden_states(hidden)
+        if fingerprint:
+            self._remember(fingerprint, pooled)
+        return EncoderOutput(logits=logits, pooled=pooled)
+
+    def forward_chunked(
+        self,
+        inputs: Dict[str, torch.Tensor],
+        chunk_samples: int,
+        stride_samples: int,
+        batch_size: int = 1,
+        fingerprint: Optional[str] = None,
+    ) -> EncoderOutput:
+        """
+        Passe par fenêtres chevauchantes ; logits CTC raccordés aux jointures.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): Entrées préparées par `prepare()` (tampon complet, normalisé une fois)
+            chunk_samples (int): Longueur d'une fenêtre (échantillons)
+            stride_samples (int): Contexte de chaque côté, écarté à la jointure
+            batch_size (int): Fenêtres de même longueur regroupées par passe
+            fingerprint (Optional[str]): Empreinte du tampon d'origine (mémorise l'embedding)
+
+        Returns:
+            EncoderOutput: Logits CTC [1, trames, vocab] et empreinte moyenne normalisée
+        """
+        values = inputs["input_values"]
+        mask = inputs.get("attention_mask")
+        ratio = int(np.prod(self.model.config.conv_stride))
+        windows = plan_windows(values.shape[-1], chunk_samples, stride_samples, align=ratio)
+
+        # Fenêtres consécutives de même longueur regroupées (la dernière est souvent plus courte)
+        batches: List[List[Tuple[int, int, int, int]]] = []
+        for window in windows:
+            if batches and len(batches[-1]) < batch_size and batches[-1][0][1] - batches[-1][0][0] == window[1] - window[0]:
+                batches[-1].append(window)
+            else:
+                batches.append([window])
+
+        logits_parts: List[torch.Tensor] = []
+        hidden_sum = None
+        hidden_frames = 0
+        for batch in batches:
+            batch_inputs = {"input_values": torch.cat([values[:, a:b] for a, b, _, _ in batch])}
+            if mask is not None:
+                batch_inputs["attention_mask"] = torch.cat([mask[:, a:b] for a, b, _, _ in batch])
+            with torch.no_grad():
+                hidden = self.encoder(**batch_inputs).last_hidden_state
+                logits = self.model.lm_head(self.model.dropout(hidden))
+            for i, (start, end, keep_start, keep_end) in enumerate(batch):
+                first = (keep_start - start) // ratio
+                last = logits.shape[1] if keep_end == values.shape[-1] else (keep_end - start) // ratio
+                logits_parts.append(logits[i:i + 1, first:last])
+                kept = hidden[i, first:last]
+                hidden_sum = kept.sum(dim=0) if hidden_sum is None else hidden_sum + kept.sum(dim=0)
+                hidden_frames += kept.shape[0]
+
+        pooled = pool_hidden_states((hidden_sum / max(hidden_frames, 1)).view(1, 1, -1))
+        if fingerprint:
+            self._remember(fingerprint, pooled)
+        return EncoderOutput(logits=torch.cat(logits_parts, dim=1), pooled=pooled)
+
+    def embed(self, inputs: Dict[str, torch.Tensor], pooling: str = "mean") -> np.ndarray:
+        """Empreinte seule (encodeur sans tête CTC)."""
+        with torch.no_grad():
+            hidden = self.encoder(**inputs).last_hidden_state
+        return pool_hidden_states(hidden, pooling)
+
+    def _remember(self, fingerprint: str, pooled: np.ndarray) -> None:
+        with self._recent_lock:
+            self._recent[fingerprint] = pooled
+            self._recent.move_to_end(fingerprint)
+            while len(self._recent) > _RECENT_EMBEDDINGS:
+                self._recent.popitem(last=False)
+
+    def pooled_for(self, fingerprint: str) -> Optional[np.ndarray]:
+        """Retourne l'empreinte calculée lors d'une passe STT sur le même tampon."""
+        with self._recent_lock:
+            return self._recent.get(fingerprint)
+
+
+class Wav2Vec2Registry:
+    """Registre des modèles wav2vec2 chargés (une instance par modèle et device)."""
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], SharedWav2Vec2] = {}
+        self._refcounts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model_name: str, device: str = "cpu") -> SharedWav2Vec2:
+        """
+        Retourne le modèle partagé, chargé au premier appel.
+
+        Args:
+            model_name (str): Checkpoint
+            device (str): "cpu" ou "cuda"
+
+        Returns:
+            SharedWav2Vec2: Instance partagée (à rendre par `release()`)
+        """
+        key = (model_name, device)
+        with self._lock:
+            shared = self._models.get(key)
+            if shared is None:
+                logger.info(f"Chargement wav2vec2 partagé: {model_name} ({device})")
+                shared = SharedWav2Vec2(model_name, device)
+                self._models[key] = shared
+            else:
+                logger.info(f"wav2vec2 partagé réutilisé: {model_name} ({device})")
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+            return shared
+
+    def release(self, shared: Optional[SharedWav2Vec2]) -> None:
+        """Rend une référence ; le modèle est libéré quand plus aucun agent ne l'utilise."""
+        if shared is None:
+            return
+        key = (shared.model_name, shared.device)
+        with self._lock:
+            if self._models.get(key) is not shared:
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] > 0:
+                return
+            del self._models[key]
+            del self._refcounts[key]
+        logger.info(f"wav2vec2 partagé libéré: {shared.model_name}")
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Modèles chargés et nombre d'agents qui les utilisent."""
+        with self._lock:
+            return {f"{name} ({device})": count for (name, device), count in self._refcounts.items()}
+
+
+wav2vec2_registry = Wav2Vec2Registry()
@@ -111,6 +111,27 @@ MODEL_CONFIG = {
         "repeat_penalty": 1.15,      # Augmenté de 1.1 à 1.15 pour éviter répétitions
         "max_tokens": 512,           # Réponses complètes pour le français (augmenté de 256 à 512)
         
+        # Cache de préfixe KV (réutilisation de l'état du prompt système entre les tours).
+        # Phi-3 mini (KV f16) : ~0,4 Mo par token ; bloc système ~800 tokens ≈ 300 Mo.
+        # 384 Mo gardent le préfixe système ; augmenter (jusqu'à ~800 Mo pour un n_ctx de
+        # 2048 plein) pour conserver aussi les tours déjà évalués si la RAM le permet.
+        "prompt_cache": True,
+        "prompt_cache_capacity_mb": 384,
+        
+        # Remplissage du contexte par budget de tokens (agents/context_packer.py)
+        "context_packing": {
+            "budget_tokens": None,   # None = tout l'espace libre (n_ctx - max_tokens - système - message)
+            "min_recent_turns": 2,   # Dernier échange prioritaire
+            "priorities": ["recent", "summary", "speaker", "history"],
+        },
+        
+        # Ordonnanceur des générations (agents/generation_scheduler.py)
+        # Priorités : voice > text > api > batch ; annulation vérifiée entre deux tokens
+        "scheduler": {
+            "max_queue": 8,          # Requêtes en attente max (au-delà : refus / éviction)
+            "preempt_batch": True,   # Une requête vocale/texte annule une génération batch en cours
+        },
+        
         "verbose": False,
     },
     # ═══════════════════════════════════════════════════════════
@@ -167,9 +188,19 @@ MODEL_CONFIG = {
         "model_path": str(MODELS_DIR / "wav2vec2-large-xlsr-53-french"),
         "sampling_rate": 16000,
         "device": "cpu",              # GPU réservé LLM (si activé)
-        "chunk_length_s": 10,
-        "stride_length_s": 2,
+        "chunk_length_s": 10,         # Au-delà : inférence par fenêtres chevauchantes (0 = passe unique)
+        "stride_length_s": 2,         # Contexte de chaque côté d'une fenêtre, écarté à la jointure
+        "chunk_batch_size": 1,        # Fenêtres regroupées par passe (>1 utile surtout sur GPU)
         "confidence_threshold_low": 0.4,  # En dessous : suggestion « répétez » (affichage optionnel)
+        "archive_utterances": True,  # Archiver chaque énoncé PTT en WAV (écriture en arrière-plan)
+        # Capture PTT en flux (agents/speech_capture.py) : segments transcrits pendant la parole,
+        # arrêt automatique à la fin de parole VAD (repli capture complète si webrtcvad absent)
+        "streaming_capture": {
+            "enabled": True,
+            "vad_profile": "normal",      # rapide / normal / qualite (silence de fin 1.0 / 1.5 / 2.0 s)
+            "segment_pause_ms": 300,      # Pause interne qui clôt un segment
+            "min_segment_s": 1.0,         # Segment plus court : rattaché au suivant
+        },
     },
     
     # ═══════════════════════════════════════════════════════════
@@ -230,6 +261,38 @@ RAG_CONFIG = {
     "similarity_threshold": 0.7,
     "embeddings_model": "sentence-transformers/all-MiniLM-L6-v2",
     "vector_db_path": str(VECTOR_DB_DIR),
+    # Cache d'embeddings (utils/embedding_cache) : matrice float32 en mmap, éviction LRU
+    "embedding_cache": {
+        "enabled": True,
+        "dir": str(DATA_DIR / "embeddings"),
+        "max_bytes": 256 * 1024 * 1024,
+        "flush_interval_s": 5.0,     # Écriture différée des lignes modifiées
+    },
+    # Ingestion (agents/rag_ingestion) : chargement en pool de processus, vectorisation par lots
+    "ingestion": {
+        "workers": 2,                # Processus de chargement/découpage (0 = un par cœur, 4 au plus ; 1 = en série)
+        "pool_min_files": 16,        # Fichiers à charger minimum pour lancer le pool (sinon en série)
+        "embed_batch_size": 64,      # Chunks par appel embed_documents / upsert
+        "queue_batches": 4,          # Lots prêts en attente (file bornée)
+        "start_method": "forkserver",  # Processus du pool : "forkserver"/"spawn" (fork dans un processus multi-thread : interblocages)
+    },
+    # Recherche hybride (agents/lexical_index) : BM25 puis vecteurs si nécessaire, fusion RRF
+    "hybrid": {
+        "enabled": True,
+        "candidates": 20,            # Chunks par classement avant fusion
+        "keyword_max_terms": 3,      # Requête courte (ou avec identifiant) : BM25 seul si couverte
+        "keyword_coverage": 1.0,     # Part des termes présents dans le meilleur chunk BM25
+        "rrf_k": 60,
+        "bm25_k1": 1.2,
+        "bm25_b": 0.75,
+        # Seuil BM25 brut d'un chunk retrouvé par la passe lexicale (la pertinence vectorielle garde
+        # min_similarity) : ~ un terme de la requête présent une fois, et dans au plus ~20 % des chunks
+        "bm25_min_score": 1.5,
+    },
+    # Contexte RAG (agents/rag_context) : phrases entières dans l'ordre de classement, sans doublons
+    "context": {
+        "budget_tokens": 450,        # Tokens de contexte documentaire dans le prompt
+    },
 }
 
 # ═══════════════════════════════════════════════════════════
@@ -243,6 +306,42 @@ UI_CONTROL_CONFIG = {
     "denylist": ["download", "upload", "payment"],
 }
 
+# ═══════════════════════════════════════════════════════════
+# SESSIONS DE CONVERSATION (API multi-utilisateurs)
+# ═══════════════════════════════════════════════════════════
+SESSION_CONFIG = {
+    "max_sessions": 64,          # Sessions gardées en mémoire (LRU)
+    "idle_timeout_s": 1800,      # Inactivité avant déchargement vers SQLite
+    "persist": True,             # Décharger/restaurer via data/database.py
+    "retention_days": 30,        # Sessions SQLite supprimées au-delà
+    "max_recent_turns": 10,
+    "max_summary_turns": 50,
+}
+
+# ═══════════════════════════════════════════════════════════
+# IDENTITÉ VOCALE (agents/voice_identity)
+# ═══════════════════════════════════════════════════════════
+VOICE_IDENTITY_CONFIG = {
+    # Matrice des profils consolidée dans voice_profiles/.index/matrix.npy et ouverte
+    # en mmap au démarrage (sinon : chargement des .npy une fois, en mémoire)
+    "profile_matrix_mmap": False,
+    # Recherche d'écritures externes dans voice_profiles/ (autre processus) au plus toutes les N s ;
+    # enrôlements et suppressions faits par QAIA mettent la matrice à jour immédiatement
+    "profile_refresh_s": 5.0,
+}
+
+# ═══════════════════════════════════════════════════════════
+# CORRECTION ORTHOGRAPHIQUE (post-traitement des réponses LLM)
+# ═══════════════════════════════════════════════════════════
+SPELL_CONFIG = {
+    "cache_size": 8192,          # Corrections mot à mot mémorisées (LRU)
+    "symmetric_delete": {
+        "enabled": False,        # Index à suppressions symétriques (~120 Mo, ~4 s de construction)
+        "max_distance": 2,
+        "prefix_length": 7,      # Suppressions indexées sur les 7 premiers caractères
+    },
+}
+
 # ═══════════════════════════════════════════════════════════
 # LOGGING
 # ═══════════════════════════════════════════════════════════
@@ -313,5 +412,15 @@ TTS_CONFIG = {
     "rate": 195,          # Vitesse de parole (mots/min) - pour pyttsx3
     "volume": 0.3,        # Volume réduit à 30% (était 0.9)
     "pitch": 1.2,         # Pitch multiplier pour voix féminine
-    "protection_window_ms": 1200  # Protection contre arrêt intempestif
+    "protection_window_ms": 1200,  # Protection contre arrêt intempestif
+    "streaming": True,    # Synthèse phrase par phrase pendant la génération LLM
+    "stream_min_chars": 20,  # Longueur min d'une phrase avant découpe (évite « 1. » isolé)
+    "length_scale": 1.2,  # Vitesse Piper (>1 = plus lent)
+    # Cache audio des phrases fréquentes (clé: texte normalisé + voix + length_scale)
+    "cache": {
+        "enabled": True,
+        "memory_mb": 32,
+        "disk_mb": 256,
+        "max_chars": 200,
+    },
 }
@@ -9,7 +9,7 @@
 # ///
 
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import logging
 import time
 import traceback
@@ -17,6 +17,11 @@ import traceback
 from agents.intent_detector import Intent
 from utils.security import validate_user_input
 
+# Intentions traitées sans LLM par process_message (confiance > 0.7)
+_DIRECT_INTENTS = (Intent.END_CONVERSATION, Intent.GREETING, Intent.CONFIRMATION)
+# Intention pas encore détectée (None = détection indisponible ou en échec)
+_NOT_DETECTED = object()
+
 
 @dataclass
 class DialogueResult:
@@ -110,25 +115,35 @@ class DialogueManager:
             Dict[str, Any]: Résultat standardisé (response/error, intent, etc.)
         """
         try:
-            # Validation sécurisée de l'input utilisateur
-            validation_result = validate_user_input(message, max_length=4000)
-            if not validation_result['is_valid']:
-                self.logger.warning(f"Input utilisateur rejeté: {validation_result['blocked_reason']}")
-                return {"error": f"Input invalide: {validation_result['blocked_reason']}"}
-
-            # Utiliser l'input nettoyé
-            clean_message = validation_result['cleaned_input']
-            if validation_result['warnings']:
-                self.logger.warning(f"Patterns suspects détectés dans l'input: {validation_result['warnings']}")
-
-            # Normalisation phonétique STT (corriger erreurs transcription)
-            try:
-                from utils.stt_text_processor import normalize_stt_text
-                clean_message = normalize_stt_text(clean_message)
-                self.logger.debug(f"Message STT normalisé: '{message[:50]}...' → '{clean_message[:50]}...'")
-            except Exception as e_norm:
-                self.logger.warning(f"Erreur normalisation STT: {e_norm}, utilisation message brut")
+            clean_message, input_error = self._clean_input(message)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du traitement du message: {e}")
+            self.logger.error(traceback.format_exc())
+            return {"error": f"Erreur interne: {e}"}
+        if input_error:
+            return {"error": input_error}
+        return self._route_message(clean_message, speaker_id, confirmation_pending)
+
+    def _route_message(
+        self,
+        clean_message: str,
+        speaker_id: Optional[str] = None,
+        confirmation_pending: Optional[Dict[str, str]] = None,
+        intent_result: Any = _NOT_DETECTED,
+    ) -> Dict[str, Any]:
+        """
+        Pipeline de `process_message` pour un message déjà validé.
+
+        Args:
+            clean_message (str): Message nettoyé (`_clean_input`)
+            speaker_id (Optional[str]): Identifiant locuteur
+            confirmation_pending (Optional[Dict[str, str]]): Commande en attente de confirmation
+            intent_result (Any): Intention déjà détectée (None si détection indisponible)
 
+        Returns:
+            Dict[str, Any]: Résultat standardisé (response/error, intent, etc.)
+        """
+        try:
             # Confirmation d'une commande en attente : exécuter si l'utilisateur dit oui
             if confirmation_pending:
                 verb = (confirmation_pending.get("command_verb") or "").strip().lower()
@@ -154,17 +169,11 @@ class DialogueManager:
                     self.append_history(role="assistant", content="Commande annulée.")
                     return {"response": "Commande annulée.", "intent": "command_cancelled"}
 
-            # Détecter l'intention si IntentDetector disponible
-            intent_detector = getattr(self, "intent_detector", None)
-            intent_result = None
-            if intent_detector is not None:
+            # Détecter l'intention si IntentDetector disponible (sauf si déjà fait)
+            if intent_result is _NOT_DETECTED:
+                intent_result = self._detect_intent(clean_message)
+            if intent_result is not None:
                 try:
-                    intent_result = intent_detector.detect(clean_message)
-                    self.logger.info(
-                        f"Intention détectée: {intent_result.intent.value} "
-                        f"(confiance: {intent_result.confidence:.2f})"
-                    )
-
                     # Gérer les intentions spéciales
                     if intent_result.intent == Intent.END_CONVERSATION and intent_result.confidence > 0.7:
                         return {
@@ -248,7 +257,7 @@ class DialogueManager:
                             "confidence": intent_result.confidence,
                         }
                 except Exception as e:
-                    self.logger.warning(f"Erreur détection intention: {e}")
+                    self.logger.warning(f"Erreur traitement intention: {e}")
 
             # Tentative de routage UI-control si activé
             ui_pipeline = self.get_ui_control_pipeline()
@@ -312,62 +321,22 @@ class DialogueManager:
                     self.append_history(role="user", content=clean_message)
 
                     # Émettre événement agent.state_change pour LLM (EN_COURS)
-                    try:
-                        from interface.events.event_bus import event_bus
-                        event_bus.emit('agent.state_change', {
-                            'name': 'LLM',
-                            'status': 'EN_COURS',
-                            'activity_percentage': 75.0,
-                            'details': 'Génération de réponse en cours...',
-                            'last_update': time.time()
-                        })
-                    except Exception:
-                        pass
-
-                    # Récupérer contexte enrichi via ContextManager si disponible
-                    context_manager = self.get_context_manager()
-                    if context_manager is not None:
-                        conversation_history = context_manager.get_context_for_llm(
-                            include_summary=True,
-                            max_turns=10
-                        )
-                        self.logger.debug(
-                            f"Contexte enrichi: {len(conversation_history)} tours "
-                            f"(résumé: {bool(context_manager.summary)})"
-                        )
-                    else:
-                        conversation_history = self.get_conversation_history()
-
-                    # Sanitizer l'historique avant envoi au LLM
-                    try:
-                        from utils.history_sanitizer import sanitize_conversation_history
-                        conversation_history = sanitize_conversation_history(conversation_history)
-                        self.logger.debug(f"Historique sanitizé: {len(conversation_history)} tours valides")
-                    except Exception as e_sanitize:
-                        self.logger.warning(
-                            f"Erreur sanitization historique: {e_sanitize}, utilisation historique brut"
-                        )
+                    self._emit_llm_state('EN_COURS', 75.0, 'Génération de réponse en cours...')
+
+                    conversation_history, summary = self._llm_history()
 
                     response_text = llm_agent.chat(
                         message=clean_message,
                         conversation_history=conversation_history,
-                        is_first_interaction=self.get_first_interaction()
+                        is_first_interaction=self.get_first_interaction(),
+                        summary=summary,
+                        speaker_context=speaker_context,
                     )
 
                     if self.get_first_interaction():
                         self.set_first_interaction(False)
 
-                    try:
-                        from interface.events.event_bus import event_bus
-                        event_bus.emit('agent.state_change', {
-                            'name': 'LLM',
-                            'status': 'ACTIF',
-                            'activity_percentage': 100.0,
-                            'details': f'Réponse générée ({len(response_text)} caractères)',
-                            'last_update': time.time()
-                        })
-                    except Exception:
-                        pass
+                    self._emit_llm_state('ACTIF', 100.0, f'Réponse générée ({len(response_text)} caractères)')
                 else:
                     # Utiliser le modèle LLM de fallback
                     system_prompt = self.build_system_prompt(context=context)
@@ -433,3 +402,209 @@ class DialogueManager:
             self.logger.error(f"Erreur lors du traitement du message: {e}")
             self.logger.error(traceback.format_exc())
             return {"error": f"Erreur interne: {e}"}
+
+    def _clean_input(self, message: str) -> Tuple[str, Optional[str]]:
+        """
+        Valide puis normalise un message utilisateur.
+
+        Args:
+            message (str): Message brut
+
+        Returns:
+            Tuple[str, Optional[str]]: Message nettoyé, erreur éventuelle
+        """
+        # Validation sécurisée de l'input utilisateur
+        validation_result = validate_user_input(message, max_length=4000)
+        if not validation_result['is_valid']:
+            self.logger.warning(f"Input utilisateur rejeté: {validation_result['blocked_reason']}")
+            return "", f"Input invalide: {validation_result['blocked_reason']}"
+
+        # Utiliser l'input nettoyé
+        clean_message = validation_result['cleaned_input']
+        if validation_result['warnings']:
+            self.logger.warning(f"Patterns suspects détectés dans l'input: {validation_result['warnings']}")
+
+        # Normalisation phonétique STT (corriger erreurs transcription)
+        try:
+            from utils.stt_text_processor import normalize_stt_text
+            clean_message = normalize_stt_text(clean_message)
+            self.logger.debug(f"Message STT normalisé: '{message[:50]}...' → '{clean_message[:50]}...'")
+        except Exception as e_norm:
+            self.logger.warning(f"Erreur normalisation STT: {e_norm}, utilisation message brut")
+        return clean_message, None
+
+    def _llm_history(self) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Historique (sanitizé) et résumé transmis au LLM.
+
+        Returns:
+            Tuple[List[Dict[str, str]], str]: Tours de conversation, résumé
+        """
+        # Récupérer contexte enrichi via ContextManager si disponible
+        # Sélection par budget de tokens côté prompt (agents/context_packer.py)
+        context_manager = self.get_context_manager()
+        summary = ""
+        if context_manager is not None:
+            conversation_history = context_manager.get_context_for_llm(
+                include_summary=False
+            )
+            summary = context_manager.summary
+            self.logger.debug(
+                f"Contexte enrichi: {len(conversation_history)} tours "
+                f"(résumé: {bool(summary)})"
+            )
+        else:
+            conversation_history = self.get_conversation_history()
+
+        # Sanitizer l'historique avant envoi au LLM
+        try:
+            from utils.history_sanitizer import sanitize_conversation_history
+            conversation_history = sanitize_conversation_history(conversation_history)
+            self.logger.debug(f"Historique sanitizé: {len(conversation_history)} tours valides")
+        except Exception as e_sanitize:
+            self.logger.warning(
+                f"Erreur sanitization historique: {e_sanitize}, utilisation historique brut"
+            )
+        return conversation_history, summary
+
+    def _detect_intent(self, clean_message: str) -> Any:
+        """
+        Détecte l'intention d'un message nettoyé.
+
+        Args:
+            clean_message (str): Message nettoyé
+
+        Returns:
+            Any: Résultat d'IntentDetector, None si indisponible ou en échec
+        """
+        intent_detector = getattr(self, "intent_detector", None)
+        if intent_detector is None:
+            return None
+        try:
+            intent_result = intent_detector.detect(clean_message)
+        except Exception as e:
+            self.logger.warning(f"Erreur détection intention: {e}")
+            return None
+        self.logger.info(
+            f"Intention détectée: {intent_result.intent.value} "
+            f"(confiance: {intent_result.confidence:.2f})"
+        )
+        return intent_result
+
+    def _needs_routing(self, clean_message: str, intent_result: Any) -> bool:
+        """
+        Indique si le message relève d'un traitement hors LLM (intentions
+        spéciales, commandes système, contrôle UI) de `process_message`.
+
+        Args:
+            clean_message (str): Message nettoyé
+            intent_result (Any): Intention détectée (`_detect_intent`)
+
+        Returns:
+            bool: True si le message doit passer par `_route_message`
+        """
+        if intent_result is not None:
+            if intent_result.intent in _DIRECT_INTENTS and intent_result.confidence > 0.7:
+                return True
+            if intent_result.intent == Intent.COMMAND and intent_result.confidence >= 0.5:
+                return True
+        ui_pipeline = self.get_ui_control_pipeline()
+        return bool(ui_pipeline and getattr(ui_pipeline, "can_handle", None) and ui_pipeline.can_handle(clean_message))
+
+    def _emit_llm_state(self, status: str, activity_percentage: float, details: str) -> None:
+        """Émet l'événement agent.state_change de l'agent LLM (ignoré si l'Event Bus est indisponible)."""
+        try:
+            from interface.events.event_bus import event_bus
+            event_bus.emit('agent.state_change', {
+                'name': 'LLM',
+                'status': status,
+                'activity_percentage': activity_percentage,
+                'details': details,
+                'last_update': time.time()
+            })
+        except Exception:
+            pass
+
+    def stream_message(
+        self,
+        message: str,
+        speaker_id: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Traite un message en flux : les tokens sont relayés au fil de la génération.
+
+        Les messages qui ne passent pas par le LLM (salutations, commandes,
+        contrôle UI...) ou l'absence de `LLMAgent.chat_stream` se replient sur
+        le pipeline de `process_message` (sans nouvelle validation ni
+        détection d'intention), dont la réponse est relayée en un seul fragment.
+
+        Args:
+            message (str): Message utilisateur
+            speaker_id (Optional[str]): Identifiant locuteur pour mémoire personnalisée
+
+        Yields:
+            Dict[str, Any]: {"type": "token", "text": ...} puis
+                {"type": "done", ...} (même résultat que `process_message`)
+        """
+        clean_message, input_error = self._clean_input(message)
+        if input_error:
+            yield {"type": "done", "error": input_error}
+            return
+
+        llm_agent = self.get_llm_agent()
+        intent_result = self._detect_intent(clean_message)
+        if llm_agent is None or not hasattr(llm_agent, "chat_stream") or self._needs_routing(clean_message, intent_result):
+            # Message déjà validé et intention déjà détectée : pas de second passage
+            result = self._route_message(clean_message, speaker_id, intent_result=intent_result)
+            if result.get("response"):
+                yield {"type": "token", "text": result["response"]}
+            yield {"type": "done", **result}
+            return
+
+        parts: List[str] = []
+        completed = False
+        try:
+            self.memory_manager.optimize_memory()
+            if not self.memory_manager.check_memory_usage():
+                self.logger.warning("Utilisation mémoire élevée avant la génération de réponse.")
+            speaker_context = self.get_speaker_context(speaker_id)
+            start_time = time.time()
+
+            self.append_history(role="user", content=clean_message)
+            self._emit_llm_state('EN_COURS', 75.0, 'Génération de réponse en cours...')
+            conversation_history, summary = self._llm_history()
+            for token in llm_agent.chat_stream(
+                message=clean_message,
+                conversation_history=conversation_history,
+                is_first_interaction=self.get_first_interaction(),
+                summary=summary,
+                speaker_context=speaker_context,
+            ):
+                parts.append(token)
+                yield {"type": "token", "text": token}
+            completed = True
+
+            if self.get_first_interaction():
+                self.set_first_interaction(False)
+            processing_time = time.time() - start_time
+            self.record_timing("llm", "response", processing_time)
+            response_text = "".join(parts).strip()
+            self._emit_llm_state('ACTIF', 100.0, f'Réponse générée ({len(response_text)} caractères)')
+            if response_text:
+                self.append_history(role="assistant", content=response_text)
+            result = DialogueResult(
+                response=response_text,
+                context=speaker_context or None,
+                intent=intent_result.intent.value if intent_result else None,
+                confidence=intent_result.confidence if intent_result else None,
+                processing_time=processing_time,
+            )
+            yield {"type": "done", **result.__dict__}
+        except Exception as e_llm:
+            self.logger.error(f"Erreur lors de la génération LLM en flux: {e_llm}")
+            self.logger.error(traceback.format_exc())
+            yield {"type": "done", "error": f"Erreur de génération LLM: {e_llm}"}
+        finally:
+            # Flux interrompu (client déconnecté, annulation) : garder la réponse partielle
+            if not completed and parts:
+                self.append_history(role="assistant", content="".join(parts).strip())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Sessions de conversation pour l'API multi-utilisateurs.
+
+`QAIACore` ne tenait qu'un historique, un `ConversationContext` et un
+drapeau de première interaction : tous les clients HTTP partageaient la
+même conversation. Le magasin tient une session par identifiant (session
+ou locuteur) :
+
+- en mémoire, bornée (LRU) et déchargée après inactivité ;
+- les sessions froides sont sérialisées dans SQLite (`data/database.py`)
+  puis restaurées au tour suivant, sans reconstruire le contexte.
+
+La session courante est propagée par contextvar (`session_store.activate()`
+autour d'un tour) ; hors session, `QAIACore` utilise sa session locale
+(interface desktop).
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agents.context_manager import ConversationContext
+from config.system_config import SESSION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversationSession:
+    """État de conversation d'un utilisateur."""
+    session_id: str
+    context: Optional[ConversationContext] = None
+    history: List[Dict[str, str]] = field(default_factory=list)
+    first_interaction: bool = True
+    speaker_contexts: Dict[str, str] = field(default_factory=dict)
+    last_access: float = field(default_factory=time.time)
+    active: int = field(default=0, repr=False)
+    lock: Any = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Sérialise la session (les contextes locuteur, recalculables, sont omis)."""
+        return {
+            "context": self.context.to_dict() if self.context is not None else None,
+            "history": self.history,
+            "first_interaction": self.first_interaction,
+        }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: Dict[str, Any]) -> "ConversationSession":
+        """Reconstruit une session sérialisée par `to_dict()`."""
+        context = data.get("context")
+        return cls(
+            session_id=session_id,
+            context=ConversationContext.from_dict(context) if context else None,
+            history=list(data.get("history") or []),
+            first_interaction=bool(data.get("first_interaction", True)),
+        )
+
+
+_current_session: "contextvars.ContextVar[Optional[ConversationSession]]" = contextvars.ContextVar(
+    "qaia_conversation_session", default=None
+)
+
+
+def current_session() -> Optional[ConversationSession]:
+    """Session activée pour le tour en cours (ou None hors API)."""
+    return _current_session.get()
+
+
+class SessionStore:
+    """Sessions en mémoire (LRU, inactivité) avec déchargement SQLite."""
+
+    def __init__(
+        self,
+        max_sessions: int = 64,
+        idle_timeout_s: float = 1800.0,
+        persist: bool = True,
+        retention_days: Optional[float] = 30,
+        max_recent_turns: int = 10,
+        max_summary_turns: int = 50,
+        database_factory: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Initialise le magasin (aucun accès base avant le premier déchargement).
+
+        Args:
+            max_sessions (int): Sessions gardées en mémoire
+            idle_timeout_s (float): Inactivité (s) avant déchargement
+            persist (bool): Décharger/restaurer via SQLite (sinon les sessions évincées sont perdues)
+            retention_days (Optional[float]): Sessions SQLite supprimées au-delà (None = jamais)
+            max_recent_turns (int): Tours détaillés du ConversationContext
+            max_summary_turns (int): Tours avant résumé du ConversationContext
+            database_factory (Optional[Callable[[], Any]]): Fabrique de `Database` (défaut: data.database),
+                appelée une fois ; la connexion est partagée entre threads
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout_s = idle_timeout_s
+        self.persist = persist
+        self.retention_days = retention_days
+        self.max_recent_turns = max_recent_turns
+        self.max_summary_turns = max_summary_turns
+        self._database_factory = database_factory
+        self._db: Any = None
+        self._db_lock = threading.Lock()  # Accès SQLite sérialisés (tours de threads différents)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        # Sessions en cours d'écriture (restaurées depuis la mémoire, pas depuis une base périmée)
+        self._spilling: Dict[str, ConversationSession] = {}
+        self._purged = False
+        self.created = 0
+        self.restored = 0
+        self.spilled = 0
+
+    # ---------- Accès ----------
+    def new_context(self) -> ConversationContext:
+        """Contexte conversationnel vierge d'une session."""
+        return ConversationContext(
+            max_recent_turns=self.max_recent_turns,
+            max_summary_turns=self.max_summary_turns,
+        )
+
+    def get(self, session_id: str) -> ConversationSession:
+        """
+        Retourne la session (mémoire, sinon SQLite, sinon nouvelle).
+
+        Args:
+            session_id (str): Identifiant de session ou de locuteur
+
+        Returns:
+            ConversationSession: Session (dernière utilisée en LRU)
+        """
+        with self._lock:
+            session = self._sessions.get(session_id) or self._spilling.get(session_id)
+            if session is not None:
+                self._remember(session)
+        if session is None:
+            loaded = self._load(session_id)
+            with self._lock:
+                # Une autre requête a pu créer la session pendant la lecture
+                session = self._sessions.get(session_id)
+                if session is None:
+                    session = loaded or ConversationSession(session_id, context=self.new_context())
+                    if loaded is not None:
+                        self.restored += 1
+                    else:
+                        self.created += 1
+                    self._remember(session)
+        self._spill(self._collect_evictions())
+        return session
+
+    def _remember(self, session: ConversationSession) -> None:
+        """Place la session en tête de LRU (verrou tenu)."""
+        session.last_access = time.time()
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+
+    @contextmanager
+    def activate(self, session_id: str) -> Iterator[ConversationSession]:
+        """
+        Active une session pour un tour (contextvar + verrou de session).
+
+        Les tours d'une même session sont sérialisés ; une session active
+        n'est jamais déchargée.
+
+        Args:
+            session_id (str): Identifiant de session
+
+        Yields:
+            ConversationSession: Session active
+        """
+        session = self.get(session_id)
+        with self._lock:
+            session.active += 1
+        try:
+            with session.lock:
+                reset = _current_session.set(session)
+                try:
+                    yield session
+                finally:
+                    _current_session.reset(reset)
+        finally:
+            with self._lock:
+                session.active -= 1
+                session.last_access = time.time()
+
+    def drop(self, session_id: str) -> bool:
+        """
+        Supprime une session (mémoire et SQLite).
+
+        Args:
+            session_id (str): Identifiant de session
+
+        Returns:
+            bool: True si la session existait en mémoire
+        """
+        with self._lock:
+            existed = self._sessions.pop(session_id, None) is not None
+        if self.persist:
+            with self._database() as db:
+                if db is not None:
+                    db.delete_session_state(session_id=session_id)
+        return existed
+
+    # ---------- Déchargement ----------
+    def _collect_evictions(self, now: Optional[float] = None, idle_only: bool = False) -> List[ConversationSession]:
+        """Retire de la mémoire les sessions inactives et le surplus LRU."""
+        now = now if now is not None else time.time()
+        victims = []
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                over_capacity = not idle_only and len(self._sessions) > self.max_sessions
+                idle = now - session.last_access > self.idle_timeout_s
+                if not (over_capacity or idle):
+                    break  # ordre LRU : les suivantes sont plus récentes
+                if session.active:
+                    continue
+                del self._sessions[session_id]
+                if self.persist:
+                    self._spilling[session_id] = session
+                victims.append(session)
+        return victims
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Décharge les sessions inactives depuis `idle_timeout_s`.
+
+        Args:
+            now (Optional[float]): Horodatage de référence (défaut: maintenant)
+
+        Returns:
+            int: Nombre de sessions déchargées
+        """
+        victims = self._collect_evictions(now, idle_only=True)
+        self._spill(victims)
+        return len(victims)
+
+    def flush(self) -> int:
+        """Enregistre toutes les sessions en mémoire (arrêt du service), sans les décharger."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        if self.persist:
+            for session in sessions:
+                self._save(session)
+        return len(sessions)
+
+    def _spill(self, sessions: List[ConversationSession]) -> None:
+        if not sessions:
+            return
+        for session in sessions:
+            if self.persist:
+                self._save(session)
+                with self._lock:
+                    self._spilling.pop(session.session_id, None)
+                    self.spilled += 1
+        logger.info(f"{len(sessions)} session(s) de conversation déchargée(s) ({len(self._sessions)} en mémoire)")
+
+    def _save(self, session: ConversationSession) -> None:
+        with session.lock:
+            state = json.dumps(session.to_dict(), ensure_ascii=False, default=str)
+        with self._database() as db:
+            if db is not None:
+                db.save_session_state(session.session_id, state)
+
+    def _load(self, session_id: str) -> Optional[ConversationSession]:
+        if not self.persist:
+            return None
+        with self._database() as db:
+            state = db.load_session_state(session_id) if db is not None else None
+        if not state:
+            return None
+        try:
+            return ConversationSession.from_dict(session_id, json.loads(state))
+        except Exception as e:
+            logger.warning(f"Session {session_id} illisible, nouvelle session: {e}")
+            return None
+
+    @contextmanager
+    def _database(self) -> Iterator[Any]:
+        """Connexion SQLite du magasin, ouverte au premier usage (None si indisponible), verrou tenu."""
+        with self._db_lock:
+            if self._db is None:
+                self._db = self._open_database()
+            yield self._db
+
+    def _open_database(self) -> Any:
+        try:
+            if self._database_factory is not None:
+                db = self._database_factory()
+            else:
+                from data.database import Database
+                db = Database(check_same_thread=False)
+        except Exception as e:
+            logger.warning(f"Base de données indisponible pour les sessions: {e}")
+            return None
+        if not self._purged and self.retention_days is not None:
+            self._purged = True
+            removed = db.delete_session_state(older_than_days=self.retention_days)
+            if removed:
+                logger.info(f"{removed} session(s) expirée(s) supprimée(s) de la base")
+        return db
+
+    def close(self) -> None:
+        """Ferme la connexion SQLite (arrêt du service, après `flush()`)."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Sessions en mémoire et compteurs de création/restauration/déchargement."""
+        with self._lock:
+            return {
+                "in_memory": len(self._sessions),
+                "active": sum(1 for s in self._sessions.values() if s.active),
+                "max_sessions": self.max_sessions,
+                "created": self.created,
+                "restored": self.restored,
+                "spilled": self.spilled,
+            }
+
+
+def _build_default_store() -> SessionStore:
+    """Instancie le magasin à partir de `SESSION_CONFIG`."""
+    return SessionStore(
+        max_sessions=int(SESSION_CONFIG.get("max_sessions", 64)),
+        idle_timeout_s=float(SESSION_CONFIG.get("idle_timeout_s", 1800)),
+        persist=bool(SESSION_CONFIG.get("persist", True)),
+        retention_days=SESSION_CONFIG.get("retention_days", 30),
+        max_recent_turns=int(SESSION_CONFIG.get("max_recent_turns", 10)),
+        max_summary_turns=int(SESSION_CONFIG.get("max_summary_turns", 50)),
+    )
+
+
+session_store = _build_default_store()
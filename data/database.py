@@ -24,11 +24,12 @@ DB_PATH = DATA_DIR / "qaia.db"
 class Database:
     """Gère les opérations de base de données pour QAIA."""
     
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, check_same_thread=True):
         """Initialise la connexion à la base de données.
         
         Args:
             db_path (str): Chemin vers le fichier de base de données SQLite
+            check_same_thread (bool): False si la connexion est partagée entre threads (accès sérialisés par l'appelant)
         """
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
@@ -37,7 +38,7 @@ class Database:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         try:
-            self.conn = sqlite3.connect(db_path)
+            self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
             self.cursor = self.conn.cursor()
             self._initialize_tables()
             self.logger.info("Base de données initialisée avec succès")
@@ -112,6 +113,30 @@ class Database:
         )
         ''')
         
+        # Migration: colonnes du manifeste d'ingestion RAG (ingestion incrémentale)
+        for column, column_type in (
+            ("mtime", "REAL"),
+            ("size", "INTEGER"),
+            ("content_hash", "TEXT"),
+            ("chunk_count", "INTEGER DEFAULT 0"),
+            ("indexed_at", "DATETIME"),
+        ):
+            try:
+                self.cursor.execute(f"ALTER TABLE documents ADD COLUMN {column} {column_type}")
+            except sqlite3.OperationalError:
+                # La colonne existe déjà
+                pass
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path)")
+        
+        # Sessions de conversation déchargées de la mémoire (API multi-utilisateurs)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_sessions (
+            session_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,  -- JSON (contexte, historique, drapeaux)
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
         self.conn.commit()
     
     def add_conversation(self, user_input, qaia_response, speaker_id=None):
@@ -275,6 +300,153 @@ class Database:
             self.logger.error(f"Erreur lors de la liste des locuteurs: {e}")
             return []
     
+    def get_document_manifest(self):
+        """Récupère le manifeste d'ingestion RAG (documents indexés).
+        
+        Returns:
+            dict: {path: {'mtime', 'size', 'content_hash', 'chunk_count'}} pour les documents indexés
+        """
+        try:
+            self.cursor.execute(
+                "SELECT path, mtime, size, content_hash, chunk_count FROM documents WHERE indexed = 1"
+            )
+            return {
+                row[0]: {
+                    'mtime': row[1],
+                    'size': row[2],
+                    'content_hash': row[3],
+                    'chunk_count': row[4] or 0,
+                }
+                for row in self.cursor.fetchall()
+            }
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture du manifeste documents: {e}")
+            return {}
+    
+    def upsert_document(self, path, filename, mtime, size, content_hash, chunk_count, commit=True):
+        """Ajoute ou met à jour l'entrée de manifeste d'un document indexé.
+        
+        Args:
+            path (str): Chemin du document (relatif au répertoire des documents)
+            filename (str): Nom du fichier
+            mtime (float): Date de modification (st_mtime)
+            size (int): Taille en octets
+            content_hash (str): Empreinte SHA-256 du contenu
+            chunk_count (int): Nombre de chunks stockés dans la base vectorielle
+            commit (bool): Valider la transaction immédiatement
+            
+        Returns:
+            bool: Succès de l'opération
+        """
+        try:
+            self.cursor.execute(
+                """UPDATE documents
+                   SET filename = ?, mtime = ?, size = ?, content_hash = ?, chunk_count = ?,
+                       indexed = 1, indexed_at = datetime('now')
+                   WHERE path = ?""",
+                (filename, mtime, size, content_hash, chunk_count, path)
+            )
+            if self.cursor.rowcount == 0:
+                self.cursor.execute(
+                    """INSERT INTO documents
+                       (filename, path, mtime, size, content_hash, chunk_count, indexed, indexed_at)
+                       VALUES (?, ?, ?, ?, ?, ?, 1, datetime('now'))""",
+                    (filename, path, mtime, size, content_hash, chunk_count)
+                )
+            if commit:
+                self.conn.commit()
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la mise à jour du document {path}: {e}")
+            return False
+    
+    def remove_document(self, path, commit=True):
+        """Supprime l'entrée de manifeste d'un document.
+        
+        Args:
+            path (str): Chemin du document (relatif au répertoire des documents)
+            commit (bool): Valider la transaction immédiatement
+            
+        Returns:
+            bool: Succès de l'opération
+        """
+        try:
+            self.cursor.execute("DELETE FROM documents WHERE path = ?", (path,))
+            if commit:
+                self.conn.commit()
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la suppression du document {path}: {e}")
+            return False
+    
+    def save_session_state(self, session_id, state):
+        """Enregistre l'état sérialisé d'une session de conversation.
+        
+        Args:
+            session_id (str): Identifiant de session
+            state (str): État JSON
+            
+        Returns:
+            bool: Succès de l'opération
+        """
+        try:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO conversation_sessions (session_id, state, updated_at) VALUES (?, ?, datetime('now'))",
+                (session_id, state)
+            )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'enregistrement de la session {session_id}: {e}")
+            return False
+    
+    def load_session_state(self, session_id):
+        """Récupère l'état sérialisé d'une session de conversation.
+        
+        Args:
+            session_id (str): Identifiant de session
+            
+        Returns:
+            str|None: État JSON ou None
+        """
+        try:
+            self.cursor.execute("SELECT state FROM conversation_sessions WHERE session_id = ?", (session_id,))
+            row = self.cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture de la session {session_id}: {e}")
+            return None
+    
+    def delete_session_state(self, session_id=None, older_than_days=None):
+        """Supprime une session enregistrée, ou celles inactives depuis N jours.
+        
+        Args:
+            session_id (str|None): Identifiant de session
+            older_than_days (float|None): Ancienneté minimale (si session_id est None)
+            
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        try:
+            if session_id is not None:
+                self.cursor.execute("DELETE FROM conversation_sessions WHERE session_id = ?", (session_id,))
+            elif older_than_days is not None:
+                self.cursor.execute(
+                    "DELETE FROM conversation_sessions WHERE updated_at < datetime('now', ?)",
+                    (f"-{float(older_than_days)} days",)
+                )
+            else:
+                return 0
+            self.conn.commit()
+            return self.cursor.rowcount
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la suppression de sessions: {e}")
+            return 0
+    
+    def commit(self):
+        """Valide la transaction en cours."""
+        self.conn.commit()
+    
     def set_setting(self, key, value):
         """Définit un paramètre de configuration.
         
@@ -6,6 +6,11 @@
 Streaming Text Display avec animation token-par-token
 Format: (HH:MM) Speaker: texte
 Espacement: 4px après chaque paire Q/R
+
+Les tokens sont accumulés hors du thread Tk (`queue_token`, espacement
+compris) puis insérés en un seul bloc, au plus une fois par
+`FLUSH_INTERVAL_MS` (~30 Hz) : plus de bascule d'état, d'insertion ni de
+passe de mise en page (`update_idletasks`) par token.
 """
 
 # /// script
@@ -17,8 +22,15 @@ Espacement: 4px après chaque paire Q/R
 import customtkinter as ctk
 import tkinter as tk
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import logging
+import threading
+import time
+
+try:
+    from utils.text_processor import should_add_space_before_token
+except ImportError:  # pragma: no cover - utils absent (widget autonome)
+    should_add_space_before_token = None
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +47,9 @@ class StreamingTextDisplay(ctk.CTkTextbox):
     COLOR_QAIA = "#4CAF50"       # Vert
     COLOR_TEXT = "#000000"       # Noir
     
+    # Intervalle minimal entre deux insertions de tokens (~30 Hz)
+    FLUSH_INTERVAL_MS = 33
+    
     def __init__(self, master, **kwargs):
         """
         Initialise le StreamingTextDisplay.
@@ -59,6 +74,12 @@ class StreamingTextDisplay(ctk.CTkTextbox):
         self._stream_start_index = "1.0"  # Index de début du message en cours
         self._previous_token = None  # Token précédent pour gestion espaces
         
+        # Tampon de tokens (alimenté depuis n'importe quel thread, vidé par le thread Tk)
+        self._buffer_lock = threading.Lock()
+        self._pending: List[str] = []
+        self._flush_scheduled = False
+        self._last_flush = 0.0
+        
         # Configuration des tags de couleur
         self._setup_tags()
         
@@ -78,23 +99,36 @@ class StreamingTextDisplay(ctk.CTkTextbox):
         # Désactiver à nouveau
         self.configure(state="disabled")
     
-    def start_generation(self, speaker: str, timestamp: Optional[str] = None):
+    def reset_stream(self):
+        """
+        Réinitialise le texte streamé et le tampon (thread-safe).
+        
+        À appeler depuis le thread producteur avant les premiers tokens quand
+        `start_generation` est planifié sur le thread Tk (`reset=False`).
+        """
+        with self._buffer_lock:
+            self._streamed_text = ""
+            self._previous_token = None
+            self._pending = []
+    
+    def start_generation(self, speaker: str, timestamp: Optional[str] = None, reset: bool = True):
         """
         Démarre un nouveau bloc de génération.
         
         Args:
             speaker: 'Vous' ou 'QAIA'
             timestamp: Timestamp format (HH:MM), généré auto si None
+            reset: Réinitialiser le tampon (False si `reset_stream()` a déjà été appelé
+                   par le producteur, des tokens pouvant être en attente)
         """
         if timestamp is None:
             timestamp = datetime.now().strftime("%H:%M")
         
+        if reset:
+            self.reset_stream()
         self._current_speaker = speaker
         self._current_timestamp = timestamp
-        self._is_streaming = True
-        self._streamed_text = ""  # Réinitialiser le texte streamé
         self._stream_start_index = self.index("end")  # Mémoriser l'index de début
-        self._previous_token = None  # Réinitialiser token précédent
         
         # Activer édition
         self.configure(state="normal")
@@ -112,66 +146,89 @@ class StreamingTextDisplay(ctk.CTkTextbox):
         # Auto-scroll
         self.see("end")
         
+        # Tokens arrivés avant l'en-tête
+        self._is_streaming = True
+        self._flush_pending()
+        
         logger.debug(f"Génération démarrée: {speaker} à {timestamp}")
     
-    def append_token(self, token: str, animate: bool = True):
+    def queue_token(self, token: str):
         """
-        Ajoute un token avec animation optionnelle.
-        Gère automatiquement les espaces entre tokens si nécessaire.
+        Ajoute un token au tampon (thread-safe, appelable hors du thread Tk).
+        
+        Les tokens `llm.token` sont déjà filtrés à la source
+        (`StreamingTokenFilter`) ; seule la gestion des espaces est faite ici.
+        L'insertion est regroupée par `_flush_pending` (au plus ~30 Hz).
         
         Args:
             token: Texte du token à ajouter
-            animate: Si True, anime l'ajout (effet machine à écrire)
         """
-        if not self._is_streaming:
-            logger.warning("append_token appelé sans start_generation actif")
+        if not token:
             return
         
-        # CRITIQUE: Filtrer les préfixes indésirables AVANT affichage
-        try:
-            from utils.text_processor import filter_streaming_token
-            filtered_token = filter_streaming_token(token)
-            if not filtered_token:
-                return  # Token filtré, ne pas afficher
-            token = filtered_token
-        except Exception as e:
-            logger.warning(f"Erreur filtrage token: {e}, utilisation token brut")
-        
-        # Gérer les espaces entre tokens si nécessaire
-        try:
-            from utils.text_processor import should_add_space_before_token
-            if should_add_space_before_token(token, self._previous_token):
-                token = " " + token
-        except Exception as e:
-            logger.debug(f"Erreur gestion espaces: {e}")
-        
-        # Accumuler le texte streamé
-        self._streamed_text += token
+        with self._buffer_lock:
+            # Gérer les espaces entre tokens si nécessaire
+            if should_add_space_before_token is not None:
+                try:
+                    if should_add_space_before_token(token, self._previous_token):
+                        token = " " + token
+                except Exception as e:
+                    logger.debug(f"Erreur gestion espaces: {e}")
+            
+            # Accumuler le texte streamé et mémoriser le token précédent
+            self._streamed_text += token
+            self._previous_token = token
+            self._pending.append(token)
+            
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+            delay_ms = int((self._last_flush - time.monotonic()) * 1000) + self.FLUSH_INTERVAL_MS
         
-        # Mémoriser le token précédent
-        self._previous_token = token
+        self.after(max(0, delay_ms), self._flush_pending)
+    
+    def _flush_pending(self):
+        """Insère les tokens en attente en une seule opération (thread Tk)."""
+        with self._buffer_lock:
+            self._flush_scheduled = False
+            if not self._is_streaming or not self._pending:
+                return  # start_generation videra le tampon après l'en-tête
+            text = "".join(self._pending)
+            self._pending = []
+            self._last_flush = time.monotonic()
         
-        # Activer édition
         self.configure(state="normal")
-        
-        # Insérer token
-        self.insert("end", token, "text")
-        
-        # Désactiver édition
+        self.insert("end", text, "text")
         self.configure(state="disabled")
         
         # Auto-scroll
         self.see("end")
+    
+    def append_token(self, token: str, animate: bool = True):
+        """
+        Ajoute un token et l'affiche immédiatement (thread Tk).
+        Gère automatiquement les espaces entre tokens si nécessaire.
+        
+        Pour un flux de tokens, préférer `queue_token` (insertions regroupées).
+        
+        Args:
+            token: Texte du token à ajouter
+            animate: Conservé pour compatibilité (plus de passe de mise en page par token)
+        """
+        if not self._is_streaming:
+            logger.warning("append_token appelé sans start_generation actif")
+            return
         
-        # Animation (pourrait être améliorée avec des delays)
-        if animate:
-            self.update_idletasks()
+        self.queue_token(token)
+        self._flush_pending()
     
     def complete_generation(self):
         """Termine la génération en cours et ajoute une nouvelle ligne."""
         if not self._is_streaming:
             return
         
+        # Derniers tokens en attente
+        self._flush_pending()
         self._is_streaming = False
         
         # Activer édition
@@ -214,6 +271,10 @@ class StreamingTextDisplay(ctk.CTkTextbox):
             if not new_text:
                 new_text = ""
         
+        # Le texte remplacé inclut les tokens encore en attente
+        with self._buffer_lock:
+            self._pending = []
+        
         self.configure(state="normal")
         
         # Supprimer uniquement la partie texte après le préfixe "(HH:MM) QAIA: "
@@ -293,9 +354,8 @@ class StreamingTextDisplay(ctk.CTkTextbox):
         self._current_speaker = None
         self._current_timestamp = None
         self._is_streaming = False
-        self._streamed_text = ""
         self._stream_start_index = "1.0"
-        self._previous_token = None
+        self.reset_stream()
         
         logger.debug("StreamingTextDisplay effacé")
     
@@ -315,5 +375,7 @@ class StreamingTextDisplay(ctk.CTkTextbox):
         Returns:
             Texte streamé du message en cours (sans timestamp ni speaker)
         """
-        return self._streamed_text.strip() if self._streamed_text else ""
+        with self._buffer_lock:
+            streamed_text = self._streamed_text
+        return streamed_text.strip() if streamed_text else ""
 
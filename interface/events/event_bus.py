@@ -5,6 +5,25 @@
 """
 Event Bus Central pour QAIA
 Architecture event-driven thread-safe pour communication inter-composants
+
+Chaque abonné (objet propriétaire des callbacks, ou fonction) a sa propre
+file et son propre thread : un callback lent (fenêtre de logs) ne bloque
+plus les autres (rendu des tokens). L'ordre des événements est conservé
+pour un même abonné, tous topics confondus (llm.start → llm.token →
+llm.complete).
+
+Politique par topic (`TOPIC_POLICIES`) :
+
+- "batch" (`llm.token`, `log.message`) : les événements en attente sont
+  livrés en lots, au plus un lot par tick (`tick_s`) et par abonné ; les
+  abonnés `batch=True` reçoivent la liste, les autres chaque événement ;
+- "latest" (`metrics.update`) : seul le dernier événement en attente est
+  livré ;
+- autres topics : livraison immédiate, un par un.
+
+Sous contrainte (file d'un abonné pleine), les événements des topics
+`DROPPABLE_TOPICS` sont abandonnés en premier ; les compteurs d'émission,
+de livraison, de coalescence et de pertes sont exposés par `get_stats()`.
 """
 
 # /// script
@@ -13,152 +32,322 @@ Architecture event-driven thread-safe pour communication inter-composants
 
 import threading
 import logging
-from collections import defaultdict
-from typing import Callable, Dict, List, Any
-import queue
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 import time
 
 logger = logging.getLogger(__name__)
 
+# Politique de livraison des topics à haute fréquence
+TOPIC_POLICIES: Dict[str, str] = {
+    "llm.token": "batch",
+    "log.message": "batch",
+    "metrics.update": "latest",
+}
+
+# Topics abandonnés en premier quand la file d'un abonné est pleine
+DROPPABLE_TOPICS = frozenset({"log.message", "metrics.update"})
+
+
+class _Subscriber:
+    """File et thread de livraison d'un abonné (objet propriétaire ou fonction)."""
+
+    def __init__(self, bus: "EventBus", name: str):
+        self.bus = bus
+        self.name = name
+        # topic -> [(callback, batch)]
+        self.callbacks: Dict[str, List[Tuple[Callable, bool]]] = defaultdict(list)
+        self.pending: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self.cond = threading.Condition()
+        self.last_batch: Dict[str, float] = {}
+        self.thread: Optional[threading.Thread] = None
+        self.closed = False
+        self.max_depth = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.closed = False
+            self.thread = threading.Thread(target=self._run, name=f"EventBus-{self.name}", daemon=True)
+            self.thread.start()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def offer(self, event_type: str, data: Dict[str, Any]) -> bool:
+        """Ajoute un événement à la file (sans bloquer) ; False si abandonné."""
+        bus = self.bus
+        dropped_type = None
+        accepted = True
+        with self.cond:
+            if len(self.pending) >= bus.max_pending:
+                victim = None
+                if event_type not in bus.droppable_topics:
+                    victim = next((i for i, (t, _) in enumerate(self.pending) if t in bus.droppable_topics), None)
+                if victim is not None:
+                    dropped_type = self.pending[victim][0]
+                    del self.pending[victim]
+                elif event_type in bus.droppable_topics or len(self.pending) >= 2 * bus.max_pending:
+                    dropped_type = event_type
+                    accepted = False
+            if dropped_type is not None:
+                self.dropped += 1
+            if accepted:
+                self.pending.append((event_type, data))
+                self.max_depth = max(self.max_depth, len(self.pending))
+                self.cond.notify()
+        if dropped_type is not None:
+            bus._count_drop(dropped_type, self.name)
+        return accepted
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                event_type = self.pending[0][0]
+                policy = self.bus.topic_policies.get(event_type)
+                if policy == "batch":
+                    # Au plus un lot par tick : laisser les événements s'accumuler
+                    # (chaque offer() réveille le thread : attendre l'échéance, pas la notification)
+                    deadline = self.last_batch.get(event_type, 0.0) + self.bus.tick_s
+                    while not self.closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                    if self.closed:
+                        return
+                    self.last_batch[event_type] = time.monotonic()
+                # Extraire la série d'événements consécutifs du même topic
+                run = []
+                if policy in ("batch", "latest"):
+                    while self.pending and self.pending[0][0] == event_type:
+                        run.append(self.pending.popleft()[1])
+                else:
+                    run.append(self.pending.popleft()[1])
+                callbacks = list(self.callbacks.get(event_type, ()))
+            self._deliver(event_type, policy, run, callbacks)
+
+    def _deliver(self, event_type: str, policy: Optional[str], run: List[Dict[str, Any]],
+                 callbacks: List[Tuple[Callable, bool]]) -> None:
+        bus = self.bus
+        if policy == "latest" and len(run) > 1:
+            bus._count(event_type, "coalesced", len(run) - 1)
+            run = run[-1:]
+        start = time.monotonic()
+        for callback, batch in callbacks:
+            payloads = [run] if batch else run
+            for payload in payloads:
+                try:
+                    callback(payload)
+                except Exception as e:
+                    logger.error(
+                        f"Erreur callback {getattr(callback, '__name__', callback)} "
+                        f"pour événement {event_type}: {e}"
+                    )
+        elapsed = time.monotonic() - start
+        bus._count(event_type, "delivered", len(run))
+        if len(run) > 1:
+            bus._count(event_type, "batches", 1)
+        if elapsed > bus.slow_callback_s:
+            bus._count(event_type, "slow", 1)
+
 
 class EventBus:
     """
     Event Bus central thread-safe utilisant le pattern Observer.
     Permet la communication asynchrone entre composants sans couplage fort.
     """
-    
-    def __init__(self):
-        """Initialise l'Event Bus."""
-        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+
+    def __init__(
+        self,
+        max_pending: int = 1000,
+        tick_s: float = 1 / 30,
+        topic_policies: Optional[Dict[str, str]] = None,
+        droppable_topics: Optional[frozenset] = None,
+        slow_callback_s: float = 0.1,
+    ):
+        """
+        Initialise l'Event Bus.
+
+        Args:
+            max_pending: Événements en attente par abonné avant abandon
+            tick_s: Intervalle minimal entre deux lots d'un topic "batch" (par abonné)
+            topic_policies: Politique par topic (défaut: TOPIC_POLICIES)
+            droppable_topics: Topics abandonnés en premier (défaut: DROPPABLE_TOPICS)
+            slow_callback_s: Durée au-delà de laquelle une livraison est comptée lente
+        """
+        self.max_pending = max_pending
+        self.tick_s = tick_s
+        self.topic_policies = dict(TOPIC_POLICIES if topic_policies is None else topic_policies)
+        self.droppable_topics = DROPPABLE_TOPICS if droppable_topics is None else frozenset(droppable_topics)
+        self.slow_callback_s = slow_callback_s
+        self._subscribers: Dict[int, _Subscriber] = {}
+        # topic -> abonnés (copie remplacée à chaque (dés)abonnement : emit sans verrou long)
+        self._routes: Dict[str, Tuple[_Subscriber, ...]] = {}
         self._lock = threading.Lock()
-        self._event_queue = queue.Queue(maxsize=1000)
         self._running = False
-        self._worker_thread = None
-        
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
         logger.info("Event Bus initialisé")
-    
+
     def start(self):
-        """Démarre le thread de traitement des événements."""
+        """Démarre les threads de livraison des abonnés."""
         if self._running:
             logger.warning("Event Bus déjà démarré")
             return
-        
+
         self._running = True
-        self._worker_thread = threading.Thread(
-            target=self._process_events,
-            name="EventBusWorker",
-            daemon=True
-        )
-        self._worker_thread.start()
-        logger.info("Event Bus worker thread démarré")
-    
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            subscriber.start()
+        logger.info("Event Bus démarré")
+
     def stop(self):
-        """Arrête le thread de traitement des événements."""
+        """Arrête les threads de livraison (les événements en attente sont abandonnés)."""
         self._running = False
-        if self._worker_thread:
-            self._worker_thread.join(timeout=2.0)
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            subscriber.close()
+        for subscriber in subscribers:
+            if subscriber.thread is not None and subscriber.thread is not threading.current_thread():
+                subscriber.thread.join(timeout=2.0)
         logger.info("Event Bus arrêté")
-    
+
     def emit(self, event_type: str, data: Dict[str, Any] = None):
         """
-        Émet un événement de manière thread-safe.
-        
+        Émet un événement de manière thread-safe (ne bloque jamais l'émetteur).
+
         Args:
             event_type: Type d'événement (ex: 'llm.token', 'metrics.update')
             data: Données associées à l'événement
         """
         if data is None:
             data = {}
-        
-        try:
-            # Ajouter timestamp si non présent
-            if 'timestamp' not in data:
-                data['timestamp'] = time.time()
-            
-            # Mettre en queue pour traitement asynchrone
-            self._event_queue.put_nowait({
-                'type': event_type,
-                'data': data
-            })
-            
-            logger.debug(f"Événement émis: {event_type}")
-            
-        except queue.Full:
-            logger.error(f"Queue événements pleine, événement {event_type} perdu")
-    
-    def subscribe(self, event_type: str, callback: Callable):
+
+        # Ajouter timestamp si non présent
+        if 'timestamp' not in data:
+            data['timestamp'] = time.time()
+
+        self._count(event_type, "emitted", 1)
+        for subscriber in self._routes.get(event_type, ()):
+            subscriber.offer(event_type, data)
+
+    def subscribe(self, event_type: str, callback: Callable, batch: bool = False):
         """
         Abonne un callback à un type d'événement.
-        
+
         Args:
             event_type: Type d'événement à écouter
             callback: Fonction appelée lors de l'événement
-                     Signature: callback(event_data: dict)
+                     Signature: callback(event_data: dict), ou
+                     callback(events: List[dict]) si batch=True
+            batch: Recevoir les événements par lots (topics "batch" : un lot par tick)
         """
+        owner = getattr(callback, "__self__", callback)
         with self._lock:
-            if callback not in self._subscribers[event_type]:
-                self._subscribers[event_type].append(callback)
-                logger.debug(f"Abonnement à {event_type}: {callback.__name__}")
-    
+            subscriber = self._subscribers.get(id(owner))
+            if subscriber is None:
+                name = type(owner).__name__ if owner is not callback else getattr(callback, "__name__", "callback")
+                subscriber = _Subscriber(self, name)
+                self._subscribers[id(owner)] = subscriber
+                if self._running:
+                    subscriber.start()
+            entries = subscriber.callbacks[event_type]
+            if any(cb == callback for cb, _ in entries):
+                return
+            entries.append((callback, batch))
+            self._rebuild_routes(event_type)
+        logger.debug(f"Abonnement à {event_type}: {getattr(callback, '__name__', callback)}")
+
     def unsubscribe(self, event_type: str, callback: Callable):
         """
         Désabonne un callback d'un type d'événement.
-        
+
         Args:
             event_type: Type d'événement
             callback: Fonction à désabonner
         """
+        owner = getattr(callback, "__self__", callback)
+        with self._lock:
+            subscriber = self._subscribers.get(id(owner))
+            if subscriber is None:
+                return
+            entries = subscriber.callbacks.get(event_type, [])
+            remaining = [(cb, batch) for cb, batch in entries if cb != callback]
+            if len(remaining) == len(entries):
+                return
+            if remaining:
+                subscriber.callbacks[event_type] = remaining
+            else:
+                subscriber.callbacks.pop(event_type, None)
+            self._rebuild_routes(event_type)
+            if not subscriber.callbacks:
+                del self._subscribers[id(owner)]
+                subscriber.close()
+        logger.debug(f"Désabonnement de {event_type}: {getattr(callback, '__name__', callback)}")
+
+    def _rebuild_routes(self, event_type: str) -> None:
+        """Recalcule les abonnés d'un topic (verrou tenu)."""
+        routes = tuple(s for s in self._subscribers.values() if s.callbacks.get(event_type))
+        if routes:
+            self._routes[event_type] = routes
+        else:
+            self._routes.pop(event_type, None)
+
+    # ---------- Compteurs ----------
+    def _count(self, event_type: str, counter: str, value: int) -> None:
+        with self._stats_lock:
+            self._stats[event_type][counter] += value
+
+    def _count_drop(self, event_type: str, subscriber: str) -> None:
+        with self._stats_lock:
+            stats = self._stats[event_type]
+            stats["dropped"] += 1
+            dropped = stats["dropped"]
+        # Journal limité (la perte de log.message ne doit pas générer d'autres logs en boucle)
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning(f"File de l'abonné {subscriber} pleine: {dropped} événement(s) {event_type} perdu(s)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Compteurs par topic (émis, livrés, lots, coalescés, perdus, lents)
+        et profondeur des files par abonné.
+        """
+        with self._stats_lock:
+            topics = {topic: dict(counters) for topic, counters in self._stats.items()}
         with self._lock:
-            if callback in self._subscribers[event_type]:
-                self._subscribers[event_type].remove(callback)
-                logger.debug(f"Désabonnement de {event_type}: {callback.__name__}")
-    
-    def _process_events(self):
-        """Thread worker qui traite les événements de la queue."""
-        logger.info("Event Bus worker en cours d'exécution")
-        
-        while self._running:
-            try:
-                # Récupérer événement avec timeout
-                event = self._event_queue.get(timeout=0.1)
-                
-                event_type = event['type']
-                event_data = event['data']
-                
-                # Récupérer les callbacks thread-safe
-                with self._lock:
-                    callbacks = self._subscribers[event_type].copy()
-                
-                # Exécuter tous les callbacks abonnés
-                for callback in callbacks:
-                    try:
-                        callback(event_data)
-                    except Exception as e:
-                        logger.error(
-                            f"Erreur callback {callback.__name__} "
-                            f"pour événement {event_type}: {e}"
-                        )
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Erreur traitement événement: {e}")
-    
+            subscribers = {
+                f"{s.name}#{i}": {"pending": len(s.pending), "max_depth": s.max_depth, "dropped": s.dropped}
+                for i, s in enumerate(self._subscribers.values())
+            }
+        return {"topics": topics, "subscribers": subscribers}
+
     def get_subscriber_count(self, event_type: str = None) -> int:
         """
         Retourne le nombre d'abonnés.
-        
+
         Args:
             event_type: Type d'événement spécifique, ou None pour tous
-            
+
         Returns:
             Nombre d'abonnés
         """
         with self._lock:
             if event_type:
-                return len(self._subscribers[event_type])
+                return sum(len(s.callbacks.get(event_type, ())) for s in self._subscribers.values())
             else:
-                return sum(len(callbacks) for callbacks in self._subscribers.values())
+                return sum(
+                    len(callbacks) for s in self._subscribers.values() for callbacks in s.callbacks.values()
+                )
 
 
 # Instance singleton globale
@@ -166,4 +355,3 @@ event_bus = EventBus()
 
 # Démarrer automatiquement
 event_bus.start()
-
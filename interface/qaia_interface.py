@@ -18,6 +18,7 @@ import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from pathlib import Path
+from typing import Optional
 from qaia_core import QAIACore
 import customtkinter as ctk
 from PIL import Image, ImageTk
@@ -26,6 +27,7 @@ from config.system_config import (
     DATA_DIR as QAIA_DATA_DIR,
     LOGS_DIR as QAIA_LOGS_DIR,
     MODEL_CONFIG,
+    TTS_CONFIG as QAIA_TTS_CONFIG,
 )
 import numpy as np
 try:
@@ -524,7 +526,7 @@ class QAIAInterface:
     def _subscribe_to_events(self):
         """S'abonne aux événements de l'Event Bus."""
         # Événements LLM
-        event_bus.subscribe('llm.token', self._on_llm_token)
+        event_bus.subscribe('llm.token', self._on_llm_tokens, batch=True)
         event_bus.subscribe('llm.start', self._on_llm_start)
         event_bus.subscribe('llm.complete', self._on_llm_complete)
         event_bus.subscribe('llm.error', self._on_llm_error)
@@ -543,26 +545,75 @@ class QAIAInterface:
         finalize = event_data.get('finalize', False)
         self.root.after(0, lambda f=finalize: self._stop_ptt_recording(finalize=f))
 
-    def _on_llm_token(self, event_data: dict):
-        """Callback pour événement llm.token."""
-        token = event_data.get('token', '')
+    def _on_llm_tokens(self, events: list):
+        """Callback pour un lot d'événements llm.token (au plus un lot par tick du bus)."""
+        tokens = [event_data.get('token', '') for event_data in events]
         
-        # Si on a un StreamingTextDisplay, ajouter le token
+        # TTS en flux: la phrase est prononcée dès qu'elle est complète
+        speech_stream = getattr(self, '_speech_stream', None)
+        if speech_stream is not None:
+            for token in tokens:
+                speech_stream.feed(token)
+        
+        # Si on a un StreamingTextDisplay, mettre les tokens en tampon (insertion cadencée ~30 Hz)
         if hasattr(self, 'conversation_area') and isinstance(self.conversation_area, StreamingTextDisplay):
-            self.root.after(0, lambda: self.conversation_area.append_token(token))
+            for token in tokens:
+                self.conversation_area.queue_token(token)
     
     def _on_llm_start(self, event_data: dict):
         """Callback pour événement llm.start."""
         # Marquer le début d'une génération en streaming
         self._llm_streaming_active = True
+        # Génération à laquelle appartient la session TTS (annulée : rien n'est prononcé)
+        token = getattr(self, '_generation_token', None)
+        self._speech_stream_token = token
+        # Ouvrir une session TTS en flux (llm.start peut être émis deux fois par génération)
+        if getattr(self, '_speech_stream', None) is None and not (token is not None and token.cancelled):
+            self._tts_streamed = False
+            self._speech_stream = self._open_speech_stream()
         # Mettre à jour le statut pour refléter que QAIA génère une réponse
         self._set_status("llm_typing")
-        # Démarrer une nouvelle génération QAIA
+        # Démarrer une nouvelle génération QAIA (tampon réinitialisé avant les premiers tokens)
         if hasattr(self, 'conversation_area') and isinstance(self.conversation_area, StreamingTextDisplay):
-            self.root.after(0, lambda: self.conversation_area.start_generation("QAIA"))
+            self.conversation_area.reset_stream()
+            self.root.after(0, lambda: self.conversation_area.start_generation("QAIA", reset=False))
+    
+    def _open_speech_stream(self):
+        """
+        Démarre une session de synthèse phrase par phrase si disponible.
+        
+        Returns:
+            SpeechStream|None: Session ouverte, None si TTS en flux désactivé/indisponible
+        """
+        if not QAIA_TTS_CONFIG.get('streaming', True):
+            return None
+        speech_agent = getattr(getattr(self, 'qaia', None), 'speech_agent', None)
+        if speech_agent is None or not hasattr(speech_agent, 'create_stream'):
+            return None
+        if not getattr(speech_agent, 'is_available', True):
+            return None
+        try:
+            return speech_agent.create_stream()
+        except Exception as e:
+            self.logger.warning(f"TTS en flux indisponible: {e}")
+            return None
     
     def _on_llm_complete(self, event_data: dict):
         """Callback pour événement llm.complete."""
+        # Génération abandonnée (nouvelle prise de parole ou saisie) : réponse coupée jamais prononcée
+        token = getattr(self, '_speech_stream_token', None)
+        self._speech_stream_token = None
+        generation_cancelled = token is not None and token.cancelled
+        # TTS en flux: prononcer la dernière phrase, pas de seconde synthèse du texte complet
+        speech_stream = getattr(self, '_speech_stream', None)
+        if speech_stream is not None:
+            if generation_cancelled:
+                speech_stream.cancel()
+            else:
+                speech_stream.finish()
+                self._tts_streamed = True
+            self._speech_stream = None
+        
         # CRITIQUE: Thread-safety pour empêcher les appels TTS multiples (TODO-11)
         with getattr(self, '_tts_lock', threading.Lock()):
             if getattr(self, '_tts_already_triggered', False):
@@ -585,8 +636,15 @@ class QAIAInterface:
                     
                     if cleaned_streamed:
                         qaia = getattr(self, "qaia", None)
+                        if getattr(self, "_tts_streamed", False):
+                            # Réponse déjà prononcée phrase par phrase
+                            with getattr(self, "_tts_lock", threading.Lock()):
+                                self._tts_already_triggered = False
+                        elif generation_cancelled:
+                            with getattr(self, "_tts_lock", threading.Lock()):
+                                self._tts_already_triggered = False
                         # Déclencher le TTS immédiatement (avant mise à jour UI) pour réduire le décalage voix/texte
-                        if qaia and hasattr(qaia, "speak"):
+                        elif qaia and hasattr(qaia, "speak"):
                             def _speak_streamed(txt: str):
                                 try:
                                     self.logger.info(f"TTS UI (streaming): déclenchement, longueur={len(txt)}")
@@ -638,6 +696,11 @@ class QAIAInterface:
         self.logger.error(f"Erreur LLM (event): {error_msg}")
         # S'assurer que le flag de streaming est réinitialisé en cas d'erreur
         self._llm_streaming_active = False
+        # Abandonner la session TTS en flux : sinon ses tokens en tampon seraient prononcés à la génération suivante
+        speech_stream = getattr(self, '_speech_stream', None)
+        if speech_stream is not None:
+            speech_stream.cancel()
+            self._speech_stream = None
         self._set_status("error_llm")
         if hasattr(self, "conversation_area") and isinstance(self.conversation_area, StreamingTextDisplay):
             # Si un bloc QAIA en streaming est déjà ouvert, remplacer son contenu par l'erreur
@@ -846,6 +909,7 @@ class QAIAInterface:
         self.ptt_active = False
         self.ptt_stream = None
         self.ptt_frames = []
+        self.ptt_capture = None
         if MODEL_CONFIG and "audio" in MODEL_CONFIG:
             self.ptt_sample_rate = int(MODEL_CONFIG["audio"].get("sampling_rate", 16000))
         else:
@@ -981,9 +1045,20 @@ class QAIAInterface:
             confirmation_pending = getattr(self, "_pending_command", None)
             if confirmation_pending:
                 self._pending_command = None
-            result = qaia.process_message(
-                text, speaker_id=speaker_id, confirmation_pending=confirmation_pending
-            )
+            # Tour vocal (PTT) prioritaire sur la saisie texte ; la requête précédente est abandonnée
+            from agents.generation_scheduler import CancellationToken, Priority, generation_scheduler
+            priority = Priority.VOICE if media_info and media_info.get('user_audio_duration_ms') is not None else Priority.TEXT
+            token = CancellationToken()
+            self._cancel_generation("nouvelle requête")
+            self._generation_token = token
+            with generation_scheduler.request(priority, token, source="ui"):
+                result = qaia.process_message(
+                    text, speaker_id=speaker_id, confirmation_pending=confirmation_pending
+                )
+            if token.cancelled:
+                self.logger.info(f"Réponse abandonnée ({token.reason})")
+                self.root.after(100, lambda: self._set_status("ready"))
+                return
             # Mémoriser une commande en attente de confirmation (oui/non)
             if result.get("intent") == "command_confirmation_pending":
                 self._pending_command = {
@@ -1154,13 +1229,18 @@ class QAIAInterface:
         Démarre la capture audio micro (mono 16 kHz) et prépare l'ASR.
 
         Gère l'initialisation du flux `sounddevice`, le préchauffage éventuel
-        de l'agent vocal et met à jour l'interface (boutons, statut).
+        de l'agent vocal et met à jour l'interface (boutons, statut). Avec la
+        capture en flux, les blocs passent par le VAD : les segments sont
+        transcrits pendant la parole et la fin de parole arrête la capture.
 
         Exceptions gérées:
             Toute erreur d'initialisation micro est journalisée et un message
             d'erreur utilisateur est affiché, sans faire crasher l'UI.
         """
         try:
+            # Nouvelle prise de parole : abandonner la génération en cours
+            self._cancel_generation("nouvelle prise de parole")
+
             # Préparer l'agent vocal en arrière-plan au premier usage
             def _prepare_voice():
                 try:
@@ -1172,6 +1252,9 @@ class QAIAInterface:
             threading.Thread(target=_prepare_voice, daemon=True).start()
 
             self.ptt_frames = []
+            # Capture en flux : segments transcrits pendant la parole, arrêt à la fin de parole VAD
+            capture = self._open_ptt_capture()
+            self.ptt_capture = capture
             self.ptt_active = True
             self.ptt_button.configure(text="⏹ Arrêter")
             self._set_status("ptt_recording")
@@ -1179,7 +1262,10 @@ class QAIAInterface:
 
             def _callback(indata, frames, time_info, status):  # noqa: ARG001
                 try:
-                    self.ptt_frames.append(indata.copy())
+                    if capture is not None:
+                        capture.feed(indata)
+                    else:
+                        self.ptt_frames.append(indata.copy())
                 except Exception:
                     pass
 
@@ -1201,6 +1287,9 @@ class QAIAInterface:
             self.ptt_button.configure(text="🎙 Parler")
             self._set_status("error_micro")
             self.logger.error(f"Erreur démarrage PTT: {e}")
+            if getattr(self, 'ptt_capture', None) is not None:
+                self.ptt_capture.stop(finalize=False)
+                self.ptt_capture = None
             
             # Cleanup via AudioManager si disponible
             if self.audio_manager is not None and self.ptt_stream is not None:
@@ -1212,6 +1301,28 @@ class QAIAInterface:
             if hasattr(self, 'conversation_area') and isinstance(self.conversation_area, StreamingTextDisplay):
                 self.conversation_area.add_message("QAIA", f"Erreur enregistrement: {e}")
 
+    def _open_ptt_capture(self):
+        """
+        Ouvre une capture PTT en flux si l'agent vocal la propose.
+
+        Returns:
+            Optional[StreamingCapture]: Session démarrée, ou None (capture complète jusqu'à l'arrêt)
+        """
+        voice_agent = getattr(self.qaia, 'voice_agent', None)
+        if voice_agent is None or not hasattr(voice_agent, 'create_capture'):
+            return None
+
+        def _on_end_of_speech():
+            # Fin de parole VAD : arrêt sans appui sur le bouton
+            self.root.after(0, lambda: self._stop_ptt_recording(finalize=True) if self.ptt_capture is capture else None)
+
+        capture = voice_agent.create_capture(
+            sample_rate=self.ptt_sample_rate,
+            max_duration_s=self.ptt_max_duration_ms / 1000.0,
+            on_end_of_speech=_on_end_of_speech,
+        )
+        return capture.start() if capture is not None else None
+
     def _stop_ptt_recording(self, finalize: bool = True):
         """
         Arrête la capture audio et, si demandé, lance la transcription.
@@ -1258,6 +1369,11 @@ class QAIAInterface:
                         pass
                 self.ptt_stream = None
 
+            # Capture en flux : clore le dernier segment (ou abandonner la session)
+            capture, self.ptt_capture = getattr(self, 'ptt_capture', None), None
+            if capture is not None:
+                capture.stop(finalize=finalize)
+
             self.ptt_active = False
             self.ptt_button.configure(text="🎙 Parler")
             self._set_status("stt_transcribing")
@@ -1266,42 +1382,72 @@ class QAIAInterface:
                 self.ptt_stopping = False
                 return
 
-            # Sauvegarder en WAV (nom unique) et lancer ASR dans un thread
-            def _transcribe_worker(frames_list):
+            # Transcrire directement le tampon float32 (le WAV n'est écrit que pour archivage)
+            def _transcribe_worker(frames_list, capture=None):
+                wav_path = None
                 try:
-                    if not frames_list:
-                        self.root.after(0, lambda: self._finish_ptt_with_error("Aucun audio capturé"))
-                        return
-                    audio = np.concatenate(frames_list, axis=0)
-                    # ═══════════════════════════════════════════════════════════
-                    # CONFIGURATION STT CPU (v2.2.0)
-                    # ═══════════════════════════════════════════════════════════
-                    # Conversion float32 -> int16 SANS double normalisation
-                    # La normalisation audio est gérée uniquement par wav2vec_agent
-                    # L'UI n'affaiblit plus le signal avant écriture WAV
-                    # PTT = durée max 7s (ptt_max_duration_ms = 7000)
-                    # ═══════════════════════════════════════════════════════════
-                    audio_mono = audio[:, 0] if audio.ndim > 1 else audio
-                    audio_clipped = np.clip(audio_mono, -1.0, 1.0)
-                    audio_int16 = (audio_clipped * 32767.0).astype(np.int16)
-
-                    # Écriture WAV via 'wave' (pas de dépendance externe)
-                    audio_dir = AUDIO_DIR
-                    audio_dir.mkdir(parents=True, exist_ok=True)
-                    unique_ts = int(time.time() * 1000)
-                    wav_path = audio_dir / f"utt_{unique_ts}.wav"
-                    with wave.open(str(wav_path), 'wb') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)  # 16-bit
-                        wf.setframerate(self.ptt_sample_rate)
-                        wf.writeframes(audio_int16.tobytes())
-
-                    # Identifier le locuteur (si service disponible)
+                    voice_agent = getattr(self.qaia, 'voice_agent', None)
+                    if capture is not None:
+                        # Capture en flux : les segments précédents sont déjà transcrits,
+                        # seul le dernier reste à attendre
+                        sample_rate = self.ptt_sample_rate
+                        result = voice_agent.transcribe_capture_with_events(capture)
+                        if capture.audio is None:
+                            self.root.after(0, lambda: self._finish_ptt_with_error("Aucun audio capturé"))
+                            return
+                        audio_mono = capture.audio
+                        identify_audio = capture.longest_segment
+                        wav_path = self._archive_utterance(audio_mono, sample_rate, asynchronous=True)
+                    else:
+                        if not frames_list:
+                            self.root.after(0, lambda: self._finish_ptt_with_error("Aucun audio capturé"))
+                            return
+                        audio = np.concatenate(frames_list, axis=0)
+                        # ═══════════════════════════════════════════════════════════
+                        # CONFIGURATION STT CPU (v2.2.0)
+                        # ═══════════════════════════════════════════════════════════
+                        # Tampon float32 transmis tel quel (pas de conversion int16 ni
+                        # relecture disque) : la normalisation audio est gérée uniquement
+                        # par wav2vec_agent
+                        # PTT = durée max 7s (ptt_max_duration_ms = 7000)
+                        # ═══════════════════════════════════════════════════════════
+                        audio_mono = audio[:, 0] if audio.ndim > 1 else audio
+                        audio_mono = np.clip(audio_mono, -1.0, 1.0).astype(np.float32, copy=False)
+                        sample_rate = self.ptt_sample_rate
+                        identify_audio = audio_mono
+
+                        array_api = voice_agent is not None and (
+                            hasattr(voice_agent, 'transcribe_array_with_events') or hasattr(voice_agent, 'transcribe_array')
+                        )
+                        # Archivage WAV en arrière-plan (synchrone seulement pour un agent sans API tampon)
+                        wav_path = self._archive_utterance(audio_mono, sample_rate, asynchronous=array_api)
+
+                        # Transcrire
+                        if not voice_agent:
+                            self.root.after(0, lambda: self._finish_ptt_with_error("Agent vocal indisponible"))
+                            return
+
+                        # Préférer la version avec événements (met à jour STT dans AgentsWindow)
+                        if hasattr(voice_agent, 'transcribe_array_with_events'):
+                            result = voice_agent.transcribe_array_with_events(audio_mono, sample_rate)
+                        elif hasattr(voice_agent, 'transcribe_array'):
+                            result = voice_agent.transcribe_array(audio_mono, sample_rate)
+                        elif wav_path and hasattr(voice_agent, 'transcribe_with_events'):
+                            result = voice_agent.transcribe_with_events(str(wav_path))
+                        elif wav_path and hasattr(voice_agent, 'transcribe_audio'):
+                            result = voice_agent.transcribe_audio(str(wav_path))
+                        else:
+                            self.root.after(0, lambda: self._finish_ptt_with_error("Agent vocal indisponible"))
+                            return
+
+                    # Identifier le locuteur (si service disponible) : après la transcription,
+                    # l'empreinte est reprise de la passe wav2vec2 du STT (encodeur partagé ;
+                    # capture en flux : segment le plus long)
                     speaker_id = None
                     speaker_identity = None
                     if hasattr(self, 'voice_identity_service') and self.voice_identity_service:
                         try:
-                            speaker_identity = self.voice_identity_service.identifier_locuteur(str(wav_path))
+                            speaker_identity = self.voice_identity_service.identify_array(identify_audio, sample_rate)
                             if speaker_identity:
                                 speaker_id = speaker_identity.get('speaker_id')
                                 self.logger.info(f"Locuteur identifié: {speaker_identity}")
@@ -1320,20 +1466,6 @@ class QAIAInterface:
                         except Exception as e:
                             self.logger.warning(f"Erreur identification vocale (non bloquant): {e}")
 
-                    # Transcrire
-                    voice_agent = getattr(self.qaia, 'voice_agent', None)
-                    if not voice_agent:
-                        self.root.after(0, lambda: self._finish_ptt_with_error("Agent vocal indisponible"))
-                        return
-
-                    # Préférer la version avec événements (met à jour STT dans AgentsWindow)
-                    if hasattr(voice_agent, 'transcribe_with_events'):
-                        result = voice_agent.transcribe_with_events(str(wav_path))
-                    elif hasattr(voice_agent, 'transcribe_audio'):
-                        result = voice_agent.transcribe_audio(str(wav_path))
-                    else:
-                        self.root.after(0, lambda: self._finish_ptt_with_error("Agent vocal indisponible"))
-                        return
                     # Normaliser le retour (éviter erreurs d'unpacking)
                     text, confidence = "", 0.0
                     try:
@@ -1365,7 +1497,7 @@ class QAIAInterface:
                             self.root.after(0, self.stop_tts)
                         return
 
-                    duration_ms = int(len(audio_int16) * 1000 / self.ptt_sample_rate)
+                    duration_ms = int(len(audio_mono) * 1000 / sample_rate)
 
                     # Afficher et enchaîner (avec feedback confiance si faible)
                     def _after_transcription():
@@ -1389,7 +1521,7 @@ class QAIAInterface:
                         
                         # Lancer traitement LLM avec speaker_id et confiance STT
                         media = {
-                            "user_audio_path": str(wav_path),
+                            "user_audio_path": str(wav_path) if wav_path else None,
                             "user_audio_duration_ms": duration_ms,
                             "speaker_id": speaker_id,
                             "stt_confidence": confidence,
@@ -1399,19 +1531,45 @@ class QAIAInterface:
                 except Exception as e:
                     err_msg = str(e)
                     self.root.after(0, lambda msg=err_msg: self._finish_ptt_with_error(msg))
-                finally:
-                    # Nettoyer systématiquement le fichier audio temporaire
-                    try:
-                        if wav_path and wav_path.exists():
-                            wav_path.unlink()
-                    except Exception:
-                        # Ne pas faire échouer la transcription pour un simple problème de nettoyage
-                        pass
 
-            threading.Thread(target=_transcribe_worker, args=(self.ptt_frames.copy(),), daemon=True).start()
+            threading.Thread(target=_transcribe_worker, args=(self.ptt_frames.copy(), capture), daemon=True).start()
         except Exception as e:
             self._finish_ptt_with_error(str(e))
 
+    def _archive_utterance(self, audio: np.ndarray, sample_rate: int, asynchronous: bool = True) -> Optional[Path]:
+        """
+        Archive un énoncé PTT en WAV 16 bits (hors du chemin critique STT).
+
+        Args:
+            audio (np.ndarray): Échantillons float32 mono dans [-1, 1]
+            sample_rate (int): Fréquence d'échantillonnage
+            asynchronous (bool): Écrire le fichier sur un thread d'arrière-plan
+
+        Returns:
+            Optional[Path]: Chemin du WAV (écrit ou en cours d'écriture), None si l'archivage est désactivé
+        """
+        if not MODEL_CONFIG.get("speech", {}).get("archive_utterances", True):
+            return None
+        wav_path = AUDIO_DIR / f"utt_{int(time.time() * 1000)}.wav"
+
+        def _write():
+            try:
+                AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+                # Écriture WAV via 'wave' (pas de dépendance externe)
+                with wave.open(str(wav_path), 'wb') as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)  # 16-bit
+                    wf.setframerate(sample_rate)
+                    wf.writeframes((audio * 32767.0).astype(np.int16).tobytes())
+            except Exception as e:
+                self.logger.warning(f"Archivage audio impossible ({wav_path.name}): {e}")
+
+        if asynchronous:
+            threading.Thread(target=_write, name="ptt-archive", daemon=True).start()
+        else:
+            _write()
+        return wav_path
+
     def _finish_ptt_with_error(self, reason: str):
         """
         Finalise un cycle PTT en erreur et rétablit l'UI.
@@ -1436,11 +1594,29 @@ class QAIAInterface:
         simplement journalisée sans interrompre l'UI.
         """
         try:
+            self._cancel_generation("stop")
             if hasattr(self.qaia, 'stop_speech'):
                 self.qaia.stop_speech()
                 self._set_status("tts_stopped")
         except Exception as e:
             self.logger.error(f"Erreur lors de l'interruption TTS: {e}")
+
+    def _cancel_generation(self, reason: str) -> None:
+        """
+        Annule la génération LLM lancée depuis l'interface (arrêt entre deux tokens)
+        et sa session TTS en flux (phrases en attente et phrase en cours de lecture).
+
+        Args:
+            reason (str): Motif journalisé
+        """
+        token = getattr(self, "_generation_token", None)
+        if token is not None and not token.cancelled:
+            token.cancel(reason)
+        self._generation_token = None
+        speech_stream = getattr(self, "_speech_stream", None)
+        if speech_stream is not None:
+            speech_stream.cancel()
+            self._speech_stream = None
     
     def show_health_status(self):
         """
@@ -45,7 +45,7 @@ class LogsWindow(ctk.CTkToplevel):
         self._build_ui()
         
         # S'abonner aux logs
-        event_bus.subscribe('log.message', self._on_log_message)
+        event_bus.subscribe('log.message', self._on_log_messages, batch=True)
         
         # Handler fermeture
         self.protocol("WM_DELETE_WINDOW", self._on_close)
@@ -68,35 +68,42 @@ class LogsWindow(ctk.CTkToplevel):
         self.log_viewer = LogViewer(self)
         self.log_viewer.pack(fill="both", expand=True, padx=10, pady=10)
     
-    def _on_log_message(self, event_data: dict):
+    def _on_log_messages(self, events: list):
         """
-        Callback événement log.message.
+        Callback lot d'événements log.message (au plus un lot par tick du bus).
         
         Args:
-            event_data: Données log (conforme à LogEntry)
+            events: Données log (conformes à LogEntry)
         """
-        try:
-            # Extraire données
-            level = event_data.get('level', 'INFO')
-            message = event_data.get('message', '')
-            source = event_data.get('source', '')
-            timestamp = event_data.get('timestamp', 0)
-            
-            # Formatter timestamp
-            from datetime import datetime
-            dt = datetime.fromtimestamp(timestamp)
-            timestamp_str = dt.strftime('%H:%M:%S')
-            
-            # Ajouter au log viewer
+        from datetime import datetime
+        
+        entries = []
+        for event_data in events:
+            try:
+                # Extraire données et formatter timestamp
+                timestamp = event_data.get('timestamp', 0)
+                entries.append((
+                    event_data.get('level', 'INFO'),
+                    event_data.get('message', ''),
+                    event_data.get('source', ''),
+                    datetime.fromtimestamp(timestamp).strftime('%H:%M:%S'),
+                ))
+            except Exception as e:
+                logger.error(f"Erreur ajout log: {e}")
+        
+        if entries:
+            # Un seul passage dans la boucle Tk par lot
+            self.after(0, lambda: self._add_logs(entries))
+    
+    def _add_logs(self, entries: list):
+        """Ajoute un lot d'entrées au log viewer (thread Tk)."""
+        for level, message, source, timestamp_str in entries:
             self.log_viewer.add_log(level, message, source, timestamp_str)
-            
-        except Exception as e:
-            logger.error(f"Erreur ajout log: {e}")
     
     def _on_close(self):
         """Handler fermeture fenêtre."""
         # Se désabonner des événements
-        event_bus.unsubscribe('log.message', self._on_log_message)
+        event_bus.unsubscribe('log.message', self._on_log_messages)
         
         logger.info("Fenêtre Logs fermée")
         self.destroy()
@@ -25,7 +25,7 @@ import torch
 import traceback
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 import psutil
 from utils.memory_manager import MemoryManager
 from agents.context_manager import ConversationContext
@@ -34,12 +34,13 @@ from utils.agent_manager import agent_manager
 from utils.monitoring import performance_monitor, start_monitoring, record_timing, update_active_agents
 from interface.events.event_bus import event_bus
 from core.dialogue_manager import DialogueManager
+from core.session_store import ConversationSession, current_session, session_store
 from core.command_executor import get_command_executor
 from ui_control.pipeline import UIControlPipeline
 
 # Importer llama-cpp-python (utilisé pour GGUF: Phi-3, etc.)
 try:
-    from llama_cpp import Llama
+    import llama_cpp  # noqa: F401 (instance gérée par agents/llm_runtime.py)
     LLAMA_CPP_AVAILABLE = True
 except ImportError:
     LLAMA_CPP_AVAILABLE = False
@@ -65,19 +66,9 @@ def build_system_prompt(context: Optional[str] = None) -> str:
     Returns:
         str: Prompt système formaté pour Phi-3
     """
-    system_config = QAIA_MODEL_CONFIG.get("system_prompt", {})
-    
-    # Construire le prompt de base
-    system_prompt = f"{system_config.get('identity', '')}\n\n{system_config.get('mission', '')}\n\nPrincipes:\n"
-    for principle in system_config.get('core_principles', []):
-        system_prompt += f"- {principle}\n"
-    system_prompt += f"\n{system_config.get('verification', '')}"
-    
-    # Ajouter le contexte RAG si fourni
-    if context:
-        system_prompt += f"\n\nContexte additionnel (utilise ces informations si pertinentes):\n{context}"
-    
-    return system_prompt
+    # Personnalité assemblée une seule fois par version de configuration
+    from agents.prompt_templates import build_context_system_prompt
+    return build_context_system_prompt(context)
 
 # Les imports des agents sont déplacés dans les méthodes spécifiques pour éviter les erreurs circulaires
 # Ils seront chargés dynamiquement lors de l'initialisation des agents
@@ -94,8 +85,6 @@ class QAIACore:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.logger.propagate = True
-        # Flag pour suivre si c'est la première interaction (pour présentation unique)
-        self._first_interaction = True
         self.memory_manager = MemoryManager()
         self.is_initialized = False
         self.vector_db = None
@@ -103,14 +92,16 @@ class QAIACore:
         self.agents = {}
         # ContextManager pour mémoire conversationnelle enrichie (résumés, entités)
         try:
-            self.context_manager = ConversationContext(
+            context_manager = ConversationContext(
                 max_recent_turns=10,
                 max_summary_turns=50
             )
             self.logger.info("✅ ContextManager initialisé")
         except Exception as e:
             self.logger.warning(f"⚠️ ContextManager non disponible: {e}, utilisation historique simple")
-            self.context_manager = None
+            context_manager = None
+        # Session locale (interface desktop) ; les clients API ont leur session (core/session_store.py)
+        self._local_session = ConversationSession("local", context=context_manager)
         
         # IntentDetector pour adapter le comportement selon l'intention
         try:
@@ -120,9 +111,6 @@ class QAIACore:
             self.logger.warning(f"⚠️ IntentDetector non disponible: {e}")
             self.intent_detector = None
         
-        # Historique simple en fallback (compatibilité)
-        self.conversation_history: List[Dict[str, str]] = []  # Historique en mémoire pour le LLM
-        
         try:
             self._setup_environment()
             self._import_dependencies()
@@ -277,29 +265,17 @@ class QAIACore:
                 self.logger.error(f"Fichier modèle GGUF non trouvé : {model_path}")
                 raise FileNotFoundError(f"Fichier modèle GGUF non trouvé : {model_path}")
 
-            n_gpu_layers = llm_config.get("n_gpu_layers", -1)
-            n_ctx = llm_config.get("n_ctx", 2048)
-            n_threads = llm_config.get("n_threads", 6)
-
             if not LLAMA_CPP_AVAILABLE:
                 self.logger.warning("llama-cpp-python non disponible, agents LLM uniquement")
                 self.models["language"] = None
                 return
 
-            try:
-                self.models["language"] = Llama(
-                    model_path=str(model_path),
-                    n_gpu_layers=n_gpu_layers,
-                    n_ctx=n_ctx,
-                    n_threads=n_threads,
-                    verbose=False
-                )
-                self.logger.info(f"Modèle {model_path.name} chargé avec succès (GGUF)")
-                return
-            except Exception as e1:
-                self.logger.warning(f"Échec du chargement GGUF: {e1}")
-                self.models["language"] = None
-                return
+            # Runtime llama.cpp unique : le repli du DialogueManager partage l'instance
+            # du moteur RAG (chargée à la première génération) au lieu d'une seconde copie
+            from agents.llm_runtime import llm_runtime
+            self.models["language"] = llm_runtime
+            self.logger.info(f"Modèle {model_path.name} servi par le runtime llama.cpp partagé (GGUF)")
+            return
         except Exception as e:
             self.logger.error(f"Erreur lors du chargement des modèles: {e}")
             self.logger.error(traceback.format_exc())
@@ -372,20 +348,85 @@ class QAIACore:
             self.logger.error(f"Erreur lors de l'interprétation de la commande: {e}")
             return "Désolé, je n'ai pas pu traiter votre demande."
     
+    # ---------- État de conversation (session courante) ----------
+    @property
+    def session(self) -> ConversationSession:
+        """Session de conversation courante (session API activée, sinon session locale)."""
+        return current_session() or self._local_session
+
+    @property
+    def context_manager(self) -> Optional[ConversationContext]:
+        return self.session.context
+
+    @context_manager.setter
+    def context_manager(self, value: Optional[ConversationContext]) -> None:
+        self.session.context = value
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Historique simple en fallback (compatibilité)."""
+        return self.session.history
+
+    @conversation_history.setter
+    def conversation_history(self, value: List[Dict[str, str]]) -> None:
+        self.session.history = value
+
+    @property
+    def _first_interaction(self) -> bool:
+        """Flag pour suivre si c'est la première interaction (pour présentation unique)."""
+        return self.session.first_interaction
+
+    @_first_interaction.setter
+    def _first_interaction(self, value: bool) -> None:
+        self.session.first_interaction = value
+
     def process_message(
         self,
         message: str,
         speaker_id: Optional[str] = None,
         confirmation_pending: Optional[Dict[str, str]] = None,
+        session_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Traite un message via le DialogueManager."""
+        """
+        Traite un message via le DialogueManager.
+
+        Args:
+            message (str): Message utilisateur
+            speaker_id (Optional[str]): Identifiant locuteur
+            confirmation_pending (Optional[Dict[str, str]]): Commande en attente de confirmation
+            session_id (Optional[str]): Session de conversation (API) ; None = session locale
+        """
         if not self.is_initialized:
             return {"error": "QAIA non initialisé"}
         if not hasattr(self, "dialogue_manager") or self.dialogue_manager is None:
             return {"error": "DialogueManager non initialisé"}
-        return self.dialogue_manager.process_message(
-            message, speaker_id=speaker_id, confirmation_pending=confirmation_pending
-        )
+        if session_id is None:
+            return self.dialogue_manager.process_message(
+                message, speaker_id=speaker_id, confirmation_pending=confirmation_pending
+            )
+        with session_store.activate(session_id):
+            return self.dialogue_manager.process_message(
+                message, speaker_id=speaker_id, confirmation_pending=confirmation_pending
+            )
+
+    def stream_message(
+        self,
+        message: str,
+        speaker_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Traite un message en flux via le DialogueManager (événements token/done)."""
+        if not self.is_initialized:
+            yield {"type": "done", "error": "QAIA non initialisé"}
+            return
+        if not hasattr(self, "dialogue_manager") or self.dialogue_manager is None:
+            yield {"type": "done", "error": "DialogueManager non initialisé"}
+            return
+        if session_id is None:
+            yield from self.dialogue_manager.stream_message(message, speaker_id=speaker_id)
+            return
+        with session_store.activate(session_id):
+            yield from self.dialogue_manager.stream_message(message, speaker_id=speaker_id)
 
     def _get_speaker_context(self, speaker_id: Optional[str]) -> str:
         """
@@ -398,6 +439,10 @@ class QAIACore:
             str: Contexte formaté ou chaîne vide
         """
         speaker_context = ""
+        # Contexte calculé une fois par session (pas de relecture de la base à chaque tour)
+        session = self.session
+        if speaker_id and speaker_id in session.speaker_contexts:
+            return session.speaker_contexts[speaker_id]
         if speaker_id:
             try:
                 from data.database import Database
@@ -416,6 +461,7 @@ class QAIACore:
                             f"Contexte conversationnel chargé pour speaker_id={speaker_id} "
                             f"({len(recent_convs)} conversations)"
                         )
+                session.speaker_contexts[speaker_id] = speaker_context
             except Exception as e:
                 self.logger.warning(
                     f"Erreur lors de la récupération de l'historique du locuteur {speaker_id}: {e}"
@@ -469,11 +515,13 @@ class QAIACore:
     def health_check(self) -> Dict[str, Any]:
         """Renvoie un diagnostic de santé des composants principaux."""
         try:
+            rag_engine = getattr(agent_manager.get_agent("rag"), "rag_engine", None)
             status = {
                 "llm_loaded": bool(getattr(self.llm_agent, "_model_loaded", False)) if hasattr(self, 'llm_agent') and self.llm_agent else False,
                 "voice_available": bool(getattr(self.voice_agent, "_initialized", False)) if hasattr(self, 'voice_agent') and self.voice_agent else False,
                 "speech_available": bool(getattr(self.speech_agent, "is_available", False)) if hasattr(self, 'speech_agent') and self.speech_agent else False,
                 "vector_db": self.vector_db is not None,
+                "rag_components": rag_engine.get_status() if rag_engine is not None else {},
                 "active_agents": list(agent_manager.get_active_agents()),
             }
             return {"status": "ok", "details": status}
@@ -604,6 +652,7 @@ class QAIACore:
             if "language" in self.models and self.models["language"] is not None:
                 try:
                     # llama.cpp (backend GGUF) : supprimer la référence pour GC
+                    # (l'instance appartient au runtime partagé, libérée avec le moteur RAG)
                     del self.models["language"]
                     self.models["language"] = None
                     self.logger.info("Référence au modèle LLM supprimée.")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark du filtrage des tokens streaming
+Compare le coût par token de l'ancien pipeline (filtre sans état recompilé,
+appliqué à chaque étage : StreamingCallback, process_query_stream,
+LLMAgent.chat_stream, StreamingTextDisplay) et du filtre incrémental
+StreamingTokenFilter (un seul passage par token).
+
+Usage: python scripts/benchmark_text_filter.py [--tokens 20000] [--repeat 5]
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le projet au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.text_processor import (  # noqa: E402
+    PATTERN_QAIA_PREFIX,
+    PATTERN_TIMESTAMP,
+    STREAMING_PREFIX_TOKENS,
+    StreamingTokenFilter,
+    clean_phi3_artifacts,
+    filter_streaming_token,
+)
+
+# Réponse type découpée en sous-mots BPE, préfixe parasite compris
+SAMPLE_TOKENS = [
+    "(", "17", ":", "30", ")", " Q", "AIA", ":", " Bon", "jour", " !", " Je", " suis", " Q", "A", "IA",
+    ",", " votre", " assist", "ante", " vocale", ".", " Je", " par", "le", " fran", "çais", " et",
+    " je", " peux", " vous", " aider", " (", "météo", ",", " agenda", ")", ".", "\n", "<|end|>",
+]
+
+
+def _legacy_filter(token):
+    """Filtre par token tel qu'avant le filtre incrémental (motifs recompilés à chaque appel)."""
+    if not token or not isinstance(token, str):
+        return None
+    token_clean = token.strip()
+    if not token_clean:
+        return None
+    prefix_pattern = re.compile(
+        rf'^\s*({PATTERN_TIMESTAMP}\s*)?{PATTERN_QAIA_PREFIX}\s*', flags=re.IGNORECASE
+    )
+    new_token = re.sub(prefix_pattern, '', token_clean)
+    if not new_token.strip():
+        return None
+    token_clean = new_token
+    for pattern in STREAMING_PREFIX_TOKENS:
+        if re.match(pattern, token_clean, re.IGNORECASE):
+            return None
+    for pattern in [rf'^{PATTERN_TIMESTAMP}', rf'^{PATTERN_QAIA_PREFIX}', r'^\(\d{1,2}:', r'^\d{1,2}:\d{2}\)']:
+        if re.match(pattern, token_clean, re.IGNORECASE):
+            return None
+    return token
+
+
+def legacy_pipeline(tokens):
+    """Callback + process_query_stream + chat_stream + widget : filtre appliqué à chaque étage."""
+    out = []
+    for token in tokens:
+        for _ in range(3):
+            token = _legacy_filter(token)
+            if token is None:
+                break
+        else:
+            token = _legacy_filter(clean_phi3_artifacts(token))
+            if token:
+                out.append(token)
+    return out
+
+
+def stateless_pipeline(tokens):
+    """Même enchaînement avec `filter_streaming_token` précompilé."""
+    out = []
+    for token in tokens:
+        for _ in range(4):
+            token = filter_streaming_token(token)
+            if token is None:
+                break
+        else:
+            out.append(token)
+    return out
+
+
+def incremental_pipeline(tokens):
+    """Un seul `StreamingTokenFilter.feed` par token."""
+    token_filter = StreamingTokenFilter()
+    out = [text for text in map(token_filter.feed, tokens) if text]
+    remaining = token_filter.flush()
+    if remaining:
+        out.append(remaining)
+    return out
+
+
+def _bench(name, pipeline, tokens, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline(tokens)
+        best = min(best, time.perf_counter() - start)
+    per_token_us = best / len(tokens) * 1e6
+    print(f"  {name:<28} {per_token_us:8.2f} µs/token   ({best * 1000:.1f} ms pour {len(tokens)} tokens)")
+    return per_token_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark du filtrage des tokens streaming")
+    parser.add_argument("--tokens", type=int, default=20000, help="Nombre de tokens simulés")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions (meilleur temps retenu)")
+    args = parser.parse_args()
+
+    tokens = (SAMPLE_TOKENS * (args.tokens // len(SAMPLE_TOKENS) + 1))[:args.tokens]
+
+    print("=" * 70)
+    print("BENCHMARK FILTRAGE TOKENS STREAMING")
+    print("=" * 70)
+    print("Réponse filtrée (incrémental):", repr("".join(incremental_pipeline(SAMPLE_TOKENS))))
+    print()
+    legacy = _bench("ancien pipeline (4 étages)", legacy_pipeline, tokens, args.repeat)
+    _bench("filtre précompilé (4 étages)", stateless_pipeline, tokens, args.repeat)
+    incremental = _bench("StreamingTokenFilter (1x)", incremental_pipeline, tokens, args.repeat)
+    print(f"\n🔹 Gain par token: x{legacy / incremental:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,14 @@
 # -*- coding: utf-8 -*-
 # \QAIA\
 
-"""Service API de chat conversationnel QAIA (FastAPI)."""
+"""Service API de chat conversationnel QAIA (FastAPI).
+
+`/chat` renvoie la réponse complète. `/chat/stream` (SSE) et `/ws/chat`
+(WebSocket) relaient les tokens au fil de la génération ; `/tts` diffuse
+l'audio Piper phrase par phrase. Les générations en flux tournent sur un
+thread dédié (la boucle asyncio et le pool de threads de FastAPI restent
+libres) et sont annulées à la déconnexion du client.
+"""
 
 # /// script
 # dependencies = [
@@ -11,14 +18,22 @@
 # ]
 # ///
 
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+import asyncio
+import json
 import logging
+import threading
+import uuid
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 
+from agents.generation_scheduler import CancellationToken, GenerationCancelled, Priority, generation_scheduler
+from core.session_store import session_store
 from qaia_core import QAIACore
 
 
@@ -28,10 +43,17 @@ class ChatRequest(BaseModel):
     Attributes:
         message (str): Message utilisateur en texte.
         speaker_id (Optional[str]): Identifiant locuteur pour mémoire personnalisée.
+        session_id (Optional[str]): Session de conversation (défaut: speaker_id,
+            sinon une nouvelle session est créée et renvoyée).
     """
 
     message: str
     speaker_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+    def resolve_session(self) -> str:
+        """Identifiant de la session de conversation de cette requête."""
+        return self.session_id or self.speaker_id or uuid.uuid4().hex
 
 
 class ChatResponse(BaseModel):
@@ -42,22 +64,19 @@ class ChatResponse(BaseModel):
         intent (Optional[str]): Intention détectée, si disponible.
         context (Optional[str]): Contexte additionnel renvoyé par le noyau.
         error (Optional[str]): Message d'erreur éventuel.
+        session_id (Optional[str]): Session de conversation à renvoyer au tour suivant.
     """
 
     response: str
     intent: Optional[str] = None
     context: Optional[str] = None
     error: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 class TTSRequest(BaseModel):
     """Requête TTS pour lecture vocale d'un texte.
 
-    Note:
-        Dans cette première version, l'endpoint TTS n'est pas encore
-        connecté à un retour audio navigateur et sert de point
-        d'extension futur.
-
     Attributes:
         text (str): Texte à vocaliser.
     """
@@ -67,16 +86,42 @@ class TTSRequest(BaseModel):
 
 logger = logging.getLogger("qaia_chat_service")
 
+# Période de déchargement des sessions inactives (secondes)
+_SESSION_SWEEP_INTERVAL = 60.0
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """Décharge périodiquement les sessions inactives ; les enregistre à l'arrêt puis ferme la base."""
+
+    async def sweep() -> None:
+        while True:
+            await asyncio.sleep(_SESSION_SWEEP_INTERVAL)
+            await run_in_threadpool(session_store.evict_idle)
+
+    task = asyncio.create_task(sweep())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await run_in_threadpool(session_store.flush)
+        session_store.close()
+
+
 app = FastAPI(
     title="QAIA Chat API",
     version="1.0.0",
     description="API de conversation texte avec QAIA (noyau QAIACore).",
+    lifespan=_lifespan,
 )
 
 BASE_DIR = Path(__file__).parent.parent
 
 _qaia_core: Optional[QAIACore] = None
 
+# Fin de flux (thread producteur → boucle asyncio)
+_STREAM_END = object()
+
 
 def get_qaia_core() -> QAIACore:
     """Retourne une instance unique de QAIACore (lazy load).
@@ -93,6 +138,94 @@ def get_qaia_core() -> QAIACore:
     return _qaia_core
 
 
+async def _relay(produce: Callable[[], Iterator[Any]], token: CancellationToken) -> AsyncIterator[Any]:
+    """Exécute un itérateur bloquant sur un thread dédié et relaie ses éléments.
+
+    Le thread s'arrête à l'élément suivant dès que le jeton est annulé ;
+    fermer ce générateur (client déconnecté) annule le jeton.
+
+    Args:
+        produce (Callable[[], Iterator[Any]]): Fabrique de l'itérateur (appelée dans le thread).
+        token (CancellationToken): Jeton d'annulation de la requête.
+
+    Yields:
+        Any: Éléments produits, dans l'ordre.
+    """
+
+    loop = asyncio.get_running_loop()
+    items: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            pass  # boucle fermée (arrêt du serveur)
+
+    def worker() -> None:
+        iterator = None
+        try:
+            iterator = produce()
+            for item in iterator:
+                if token.cancelled:
+                    break
+                put(item)
+        except GenerationCancelled as e:
+            # Annulation demandée (client déconnecté, nouvelle requête) : pas une erreur
+            logger.debug(f"Flux annulé: {e}")
+        except Exception as e:
+            logger.error(f"Erreur pendant le flux: {e}")
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            put(_STREAM_END)
+
+    threading.Thread(target=worker, name="qaia-api-stream", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            item = await items.get()
+            if item is _STREAM_END:
+                finished = True
+                break
+            yield item
+    finally:
+        if not finished:
+            token.cancel("client déconnecté")
+
+
+def _chat_events(payload: ChatRequest, token: CancellationToken) -> Iterator[Dict[str, Any]]:
+    """Événements de génération d'un message (priorité API, jeton de la requête).
+
+    Args:
+        payload (ChatRequest): Message et locuteur.
+        token (CancellationToken): Jeton d'annulation.
+
+    Yields:
+        Dict[str, Any]: Événements `token` puis `done` de `QAIACore.stream_message`.
+    """
+
+    session_id = payload.resolve_session()
+    try:
+        core = get_qaia_core()
+    except Exception as e:
+        logger.error(f"Noyau QAIA indisponible: {e}")
+        yield {"type": "done", "error": f"Noyau QAIA indisponible: {e}", "session_id": session_id}
+        return
+    with generation_scheduler.request(Priority.API, token, source="api-stream"):
+        for event in core.stream_message(payload.message, speaker_id=payload.speaker_id, session_id=session_id):
+            if event.get("type") == "done":
+                event = {**event, "session_id": session_id}
+            yield event
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """Formate un événement Server-Sent Events (`event:` = type, `data:` = JSON)."""
+
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.get("/health")
 def health() -> Dict[str, Any]:
     """Healthcheck complet du service de chat.
@@ -102,7 +235,10 @@ def health() -> Dict[str, Any]:
     """
 
     core = get_qaia_core()
-    return core.health_check()
+    status = core.health_check()
+    if isinstance(status, dict):
+        status["sessions"] = session_store.get_stats()
+    return status
 
 
 @app.post("/chat", response_model=ChatResponse)
@@ -117,10 +253,15 @@ def chat(payload: ChatRequest) -> ChatResponse:
     """
 
     core = get_qaia_core()
-    result = core.process_message(payload.message, speaker_id=payload.speaker_id)
+    session_id = payload.resolve_session()
+    # Requêtes API derrière les tours interactifs (voix, texte) dans la file de génération
+    if generation_scheduler.is_saturated(Priority.API):
+        raise HTTPException(status_code=503, detail="File de génération pleine, réessayez plus tard.")
+    with generation_scheduler.request(Priority.API, source="api"):
+        result = core.process_message(payload.message, speaker_id=payload.speaker_id, session_id=session_id)
 
     if not isinstance(result, dict):
-        return ChatResponse(response=str(result))
+        return ChatResponse(response=str(result), session_id=session_id)
 
     if "error" in result:
         return ChatResponse(
@@ -128,31 +269,158 @@ def chat(payload: ChatRequest) -> ChatResponse:
             error=str(result.get("error")),
             intent=result.get("intent"),
             context=result.get("context"),
+            session_id=session_id,
         )
 
     return ChatResponse(
         response=str(result.get("response", "")),
         intent=result.get("intent"),
         context=result.get("context"),
+        session_id=session_id,
+    )
+
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str) -> Dict[str, Any]:
+    """Oublie une session de conversation (mémoire et base).
+
+    Args:
+        session_id (str): Identifiant de session.
+
+    Returns:
+        Dict[str, Any]: Identifiant et présence en mémoire avant suppression.
+    """
+
+    return {"session_id": session_id, "in_memory": session_store.drop(session_id)}
+
+
+@app.post("/chat/stream")
+async def chat_stream(payload: ChatRequest) -> StreamingResponse:
+    """Traite un message et relaie la réponse token par token (Server-Sent Events).
+
+    Événements : `token` (`{"text": ...}`) au fil de la génération, puis
+    `done` (réponse complète, intention, erreur éventuelle).
+
+    Args:
+        payload (ChatRequest): Données de la requête (message, speaker_id).
+
+    Returns:
+        StreamingResponse: Flux `text/event-stream`.
+    """
+
+    if generation_scheduler.is_saturated(Priority.API):
+        raise HTTPException(status_code=503, detail="File de génération pleine, réessayez plus tard.")
+    token = CancellationToken()
+
+    async def events() -> AsyncIterator[str]:
+        async for event in _relay(lambda: _chat_events(payload, token), token):
+            yield _sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket) -> None:
+    """Conversation en flux sur WebSocket.
+
+    Le client envoie `{"message": ..., "speaker_id": ...}` et reçoit des
+    messages `{"type": "token", "text": ...}` puis `{"type": "done", ...}`.
+    Tout message reçu pendant une génération l'annule (`{"type": "cancel"}`,
+    ou un nouveau message, traité ensuite) ; la génération annulée se termine
+    par `{"type": "cancelled"}`.
+
+    Args:
+        websocket (WebSocket): Connexion cliente.
+    """
+
+    await websocket.accept()
+    # Une session par connexion, sauf session_id/speaker_id explicite
+    connection_session = uuid.uuid4().hex
+    pending: Optional[Dict[str, Any]] = None
+    try:
+        while True:
+            data = pending if pending is not None else await websocket.receive_json()
+            pending = None
+            if not isinstance(data, dict) or data.get("type") == "cancel":
+                continue
+            try:
+                payload = ChatRequest(**data)
+            except ValidationError as e:
+                await websocket.send_json({"type": "done", "error": f"Requête invalide: {e.errors()}"})
+                continue
+            if payload.session_id is None and payload.speaker_id is None:
+                payload.session_id = connection_session
+            if generation_scheduler.is_saturated(Priority.API):
+                await websocket.send_json({"type": "done", "error": "File de génération pleine, réessayez plus tard."})
+                continue
+
+            token = CancellationToken()
+            receiver = asyncio.ensure_future(websocket.receive_json())
+            receiver.add_done_callback(lambda _: token.cancel("annulée par le client"))
+            done_sent = False
+            try:
+                async for event in _relay(lambda: _chat_events(payload, token), token):
+                    await websocket.send_json(event)
+                    done_sent = event.get("type") == "done"
+            finally:
+                if not receiver.done():
+                    receiver.cancel()
+                elif not receiver.cancelled():
+                    receiver.exception()  # déconnexion pendant l'envoi : exception lue ici
+            if receiver.done() and not receiver.cancelled():
+                if receiver.exception() is not None:
+                    raise receiver.exception()
+                pending = receiver.result()
+            if not done_sent:
+                await websocket.send_json({"type": "cancelled", "reason": token.reason})
+    except WebSocketDisconnect:
+        logger.info("Client WebSocket déconnecté")
+
+
 @app.post("/tts")
-def tts(_payload: TTSRequest) -> Dict[str, str]:
-    """Point d'extension TTS pour lecture vocale côté serveur.
+async def tts(payload: TTSRequest) -> StreamingResponse:
+    """Synthèse vocale Piper diffusée phrase par phrase.
+
+    Le corps est un flux PCM 16 bits mono brut (`audio/L16`), un bloc par
+    phrase synthétisée ; la fréquence est indiquée par l'en-tête
+    `X-Sample-Rate`. Les phrases courantes sont servies par le cache audio
+    du SpeechAgent.
 
-    Note:
-        Actuellement, cette route ne renvoie qu'un message informatif.
-        La synthèse vocale complète (fichiers audio servis au navigateur)
-        pourra être ajoutée ultérieurement en s'appuyant sur TTS_CONFIG.
+    Args:
+        payload (TTSRequest): Texte à vocaliser.
 
     Returns:
-        Dict[str, str]: Message indiquant l'état de l'implémentation.
+        StreamingResponse: Flux PCM.
     """
 
-    raise HTTPException(
-        status_code=501,
-        detail="TTS web non encore implémenté. Utilisez l'interface QAIA locale pour la synthèse vocale.",
+    core = await run_in_threadpool(get_qaia_core)
+    speech_agent = getattr(core, "speech_agent", None)
+    piper_voice = getattr(speech_agent, "piper_voice", None)
+    if speech_agent is None or not getattr(speech_agent, "use_piper", False) or piper_voice is None:
+        raise HTTPException(status_code=503, detail="Synthèse Piper non disponible.")
+    sample_rate = int(getattr(getattr(piper_voice, "config", None), "sample_rate", 22050))
+
+    def chunks() -> Iterator[bytes]:
+        from agents.speech_stream import SentenceSegmenter
+
+        segmenter = SentenceSegmenter()
+        for sentence in segmenter.feed(payload.text) + segmenter.flush():
+            text = speech_agent._clean_text(sentence)
+            if not text or not text.strip():
+                continue
+            audio = speech_agent.synthesize(text)
+            if audio is not None and audio.pcm:
+                yield audio.pcm
+
+    token = CancellationToken()
+    return StreamingResponse(
+        _relay(chunks, token),
+        media_type=f"audio/L16;rate={sample_rate};channels=1",
+        headers={"X-Sample-Rate": str(sample_rate), "Cache-Control": "no-cache"},
     )
 
 
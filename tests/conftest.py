@@ -13,9 +13,33 @@
 from pathlib import Path
 import sys
 
+import pytest
+
 
 def pytest_sessionstart(session):
     """Ajoute la racine projet au PYTHONPATH pour les imports."""
     project_root = Path(__file__).resolve().parents[1]
     if str(project_root) not in sys.path:
         sys.path.insert(0, str(project_root))
+
+
+@pytest.fixture
+def word_counter():
+    """Tokenizer déterministe des gabarits de prompt: un token par mot."""
+    from agents import prompt_templates
+
+    prompt_templates.set_token_counter(lambda text: len(text.split()))
+    yield
+    prompt_templates.set_token_counter(None)
+
+
+@pytest.fixture
+def make_history():
+    """Fabrique d'historiques alternant user/assistant ("<prefix><i> mot mot ...")."""
+    def _history(n_turns, words=20, prefix=""):
+        filler = " ".join(["mot"] * words)
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"{prefix}{i} {filler}"}
+            for i in range(n_turns)
+        ]
+    return _history
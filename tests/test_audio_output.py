@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de la sortie audio en mémoire (PcmAudio, PcmPlayer)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+import time
+
+import numpy as np
+
+from agents import audio_output
+from agents.audio_output import PcmAudio, PcmPlayer
+
+
+class _FakeOutputStream:
+    instances = []
+
+    def __init__(self, samplerate, channels, dtype):
+        self.format = (samplerate, channels, dtype)
+        self.written = []
+        _FakeOutputStream.instances.append(self)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def abort(self):
+        pass
+
+    def close(self):
+        pass
+
+    def write(self, block):
+        self.written.append(block.copy())
+
+
+class _FakeSd:
+    OutputStream = _FakeOutputStream
+
+
+def _tone(seconds=0.5, rate=22050):
+    t = np.arange(int(seconds * rate)) / rate
+    return PcmAudio((np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16).tobytes(), rate)
+
+
+def test_wav_round_trip_in_memory(tmp_path):
+    audio = _tone()
+    restored = PcmAudio.from_wav_bytes(audio.to_wav_bytes())
+    assert restored == audio
+    assert abs(audio.duration - 0.5) < 1e-3
+    assert PcmAudio.from_wav_bytes(audio.save(tmp_path / "a.wav").read_bytes()) == audio
+
+
+def test_player_reuses_stream_and_applies_volume(monkeypatch):
+    monkeypatch.setattr(audio_output, "sd", _FakeSd, raising=False)
+    monkeypatch.setattr(audio_output, "SD_AVAILABLE", True)
+    _FakeOutputStream.instances.clear()
+
+    player = PcmPlayer(volume=0.5, block_ms=100)
+    audio = _tone()
+    assert player.play(audio)
+    assert player.play(audio)
+
+    assert len(_FakeOutputStream.instances) == 1  # flux persistant
+    stream = _FakeOutputStream.instances[0]
+    played = np.concatenate(stream.written)[: len(audio.pcm) // 2, 0]
+    original = np.frombuffer(audio.pcm, dtype=np.int16)
+    assert np.abs(played.astype(int) - original.astype(int) // 2).max() <= 1
+
+
+def test_stop_cancels_pending_playback(monkeypatch):
+    monkeypatch.setattr(audio_output, "sd", _FakeSd, raising=False)
+    monkeypatch.setattr(audio_output, "SD_AVAILABLE", True)
+    player = PcmPlayer()
+    generation = player._generation
+    player.stop()
+    assert player._play_blocking(_tone(), generation) is False
+
+
+def test_non_blocking_plays_keep_call_order(monkeypatch):
+    monkeypatch.setattr(audio_output, "sd", _FakeSd, raising=False)
+    monkeypatch.setattr(audio_output, "SD_AVAILABLE", True)
+    _FakeOutputStream.instances.clear()
+    player = PcmPlayer(block_ms=100)
+    tones = [PcmAudio(np.full(2205, i + 1, dtype=np.int16).tobytes(), 22050) for i in range(5)]
+
+    for tone in tones:
+        assert player.play(tone, wait=False)
+    assert player.is_playing  # lecture non bloquante : en cours ou en attente
+    assert player.play(_tone(0.01), wait=True)
+
+    assert not player.is_playing
+    firsts = [int(block[0, 0]) for block in _FakeOutputStream.instances[0].written[:5]]
+    assert firsts == [1, 2, 3, 4, 5]
+    player.close()
+
+
+def test_speech_agent_is_speaking_follows_non_blocking_playback(monkeypatch):
+    from agents.speech_agent import SpeechAgent
+
+    monkeypatch.setattr(audio_output, "sd", _FakeSd, raising=False)
+    monkeypatch.setattr(audio_output, "SD_AVAILABLE", True)
+    released = threading.Event()
+    monkeypatch.setattr(_FakeOutputStream, "write", lambda self, block: released.wait(2))
+    agent = SpeechAgent.__new__(SpeechAgent)
+    agent.is_speaking = False
+    agent._pcm_player = PcmPlayer()
+
+    assert agent.play_audio(_tone(0.01), wait=False)
+    assert agent.is_speaking
+    released.set()
+    deadline = time.time() + 2
+    while agent.is_speaking and time.time() < deadline:
+        time.sleep(0.01)
+    assert not agent.is_speaking
+    agent._pcm_player.close()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du traitement en flux (DialogueManager.stream_message, endpoints SSE/WebSocket)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0",
+#   "fastapi>=0.104.1",
+#   "httpx>=0.24.0"
+# ]
+# ///
+
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from agents.intent_detector import Intent
+from core.dialogue_manager import DialogueManager
+
+
+class _FakeLLMAgent:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.calls = []
+
+    def chat(self, message, **kwargs):
+        return "".join(self.tokens)
+
+    def chat_stream(self, message, **kwargs):
+        self.calls.append((message, kwargs))
+        yield from self.tokens
+
+
+def _manager(llm_agent, history, intent=None, detections=None):
+    manager = DialogueManager(
+        logger=logging.getLogger("test"),
+        memory_manager=SimpleNamespace(optimize_memory=lambda: None, check_memory_usage=lambda: True),
+        get_llm_agent=lambda: llm_agent,
+        get_models=lambda: {},
+        get_context_manager=lambda: None,
+        append_history=lambda role, content: history.append((role, content)),
+        get_conversation_history=lambda: [{"role": r, "content": c} for r, c in history],
+        get_first_interaction=lambda: False,
+        set_first_interaction=lambda value: None,
+        build_system_prompt=lambda context=None: "",
+        model_config={},
+        get_speaker_context=lambda speaker_id: "",
+        record_timing=lambda *args: None,
+    )
+    if intent is not None:
+        def detect(text):
+            if detections is not None:
+                detections.append(text)
+            return SimpleNamespace(intent=intent, confidence=0.9)
+        manager.intent_detector = SimpleNamespace(detect=detect)
+    return manager
+
+
+def test_stream_message_relays_tokens_then_done():
+    history = []
+    agent = _FakeLLMAgent(["Paris ", "est ", "la capitale."])
+    events = list(_manager(agent, history).stream_message("Quelle est la capitale de la France ?"))
+
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Paris ", "est ", "la capitale."]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["response"] == "Paris est la capitale."
+    assert history[-1] == ("assistant", "Paris est la capitale.")
+    assert agent.calls[0][1]["conversation_history"][-1]["role"] == "user"
+
+
+def test_stream_message_routes_special_intents_through_process_message():
+    history = []
+    agent = _FakeLLMAgent(["jamais"])
+    events = list(_manager(agent, history, intent=Intent.GREETING).stream_message("bonjour"))
+
+    assert agent.calls == []
+    assert events[0] == {"type": "token", "text": "Bonjour ! Comment puis-je vous aider aujourd'hui ?"}
+    assert events[-1]["type"] == "done" and events[-1]["intent"] == Intent.GREETING.value
+
+
+def test_routed_stream_validates_and_detects_intent_once(monkeypatch):
+    import core.dialogue_manager as dialogue_manager
+
+    validations, detections = [], []
+    validate = dialogue_manager.validate_user_input
+    monkeypatch.setattr(
+        dialogue_manager, "validate_user_input", lambda *a, **k: validations.append(a) or validate(*a, **k)
+    )
+    events = list(_manager(_FakeLLMAgent(["jamais"]), [], Intent.GREETING, detections).stream_message("bonjour"))
+
+    assert events[-1]["intent"] == Intent.GREETING.value
+    assert len(validations) == 1 and len(detections) == 1
+
+
+def test_streamed_answer_has_process_message_shape_and_events(monkeypatch):
+    from interface.events.event_bus import event_bus
+
+    states = []
+    monkeypatch.setattr(
+        event_bus, "emit", lambda name, data: states.append(data["status"]) if name == "agent.state_change" else None
+    )
+    agent = _FakeLLMAgent(["Il ", "fait beau."])
+    events = list(_manager(agent, [], Intent.QUESTION).stream_message("Quel temps fait-il ?"))
+
+    done = events[-1]
+    assert done["response"] == "Il fait beau."
+    assert (done["intent"], done["confidence"]) == (Intent.QUESTION.value, 0.9)
+    assert states == ["EN_COURS", "ACTIF"]
+
+
+def test_closed_stream_keeps_partial_answer():
+    history = []
+    stream = _manager(_FakeLLMAgent(["Première ", "partie", " perdue"]), history).stream_message("raconte")
+    assert next(stream)["text"] == "Première "
+    assert next(stream)["text"] == "partie"
+    stream.close()
+    assert history[-1] == ("assistant", "Première partie")
+
+
+def test_sse_and_websocket_endpoints(monkeypatch):
+    chat_service = pytest.importorskip("services.chat_service", exc_type=ImportError)
+    from fastapi.testclient import TestClient
+
+    class _Core:
+        def stream_message(self, message, speaker_id=None, session_id=None):
+            yield {"type": "token", "text": "Bon"}
+            yield {"type": "token", "text": "jour"}
+            yield {"type": "done", "response": "Bonjour"}
+
+    monkeypatch.setattr(chat_service, "_qaia_core", _Core())
+    client = TestClient(chat_service.app)
+
+    body = client.post("/chat/stream", json={"message": "salut", "session_id": "s1"}).text
+    assert body.startswith('event: token\ndata: {"text": "Bon"}\n\n')
+    assert 'event: done\ndata: {"response": "Bonjour", "session_id": "s1"}' in body
+
+    with client.websocket_connect("/ws/chat") as ws:
+        ws.send_json({"message": "salut"})
+        received = [ws.receive_json() for _ in range(3)]
+    assert [m["type"] for m in received] == ["token", "token", "done"]
+
+
+def test_cancelled_stream_is_not_logged_as_error(caplog):
+    chat_service = pytest.importorskip("services.chat_service", exc_type=ImportError)
+    import asyncio
+
+    from agents.generation_scheduler import CancellationToken, GenerationCancelled
+
+    def produce():
+        yield "début"
+        raise GenerationCancelled("nouvelle requête")
+
+    async def collect():
+        return [item async for item in chat_service._relay(produce, CancellationToken())]
+
+    with caplog.at_level(logging.DEBUG, logger=chat_service.logger.name):
+        assert asyncio.run(collect()) == ["début"]
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du remplissage du contexte LLM par budget de tokens."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import pytest
+
+from agents.context_manager import ConversationContext
+from agents.context_packer import ContextPacker
+
+
+pytestmark = pytest.mark.usefixtures("word_counter")
+
+
+def test_priorities_recent_then_summary_then_speaker(make_history):
+    packer = ContextPacker(budget_tokens=90, min_recent_turns=2)
+    summary = "user: ancien | assistant: réponse ancienne"
+    speaker = "Q: question passée\nR: réponse passée"
+
+    packed = packer.pack("Question ?", make_history(10, prefix="tour"), summary=summary, speaker_context=speaker)
+
+    # Les deux derniers tours passent avant le résumé et le contexte locuteur
+    assert "tour9" in packed.text and "tour8" in packed.text
+    assert "Résumé conversation précédente: user: ancien" in packed.text
+    assert "Q: question passée" in packed.text
+    assert packed.segments["recent"] > 0 and packed.segments["summary"] > 0
+    assert sum(packed.history_tokens) + packed.context_tokens <= 90
+    # Contexte placé après l'historique, juste avant le message
+    assert packed.text.index("Résumé") > packed.text.index("tour9")
+    assert packed.text.endswith("<|user|>\nQuestion ?<|end|>\n<|assistant|>\n")
+
+
+def test_summary_keeps_most_recent_parts_when_budget_is_tight():
+    packer = ContextPacker(budget_tokens=12, priorities=("summary",))
+    summary = " | ".join(f"user: partie{i} a b c" for i in range(10))
+
+    packed = packer.pack("Salut", [], summary=summary)
+
+    assert "partie9" in packed.text and "partie0" not in packed.text
+    assert packed.context_tokens <= 12
+
+
+def test_summary_turn_from_history_is_used():
+    ctx = ConversationContext(max_recent_turns=2, max_summary_turns=1)
+    for i in range(4):
+        ctx.add_turn("user" if i % 2 == 0 else "assistant", f"message {i}")
+
+    packed = ContextPacker().pack("Et ensuite ?", ctx.get_context_for_llm(include_summary=True))
+    assert "Résumé conversation précédente:" in packed.text
+    assert packed.text.count("<|system|>") == 2
+
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du cache d'embeddings (matrice mmap, lots, écriture différée, LRU par taille)."""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0",
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import numpy as np
+
+from utils.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+DIM = 8
+
+
+def _vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+
+def test_get_many_returns_hits_and_mask(tmp_path):
+    cache = EmbeddingCache(tmp_path, flush_interval_s=60)
+    vectors = _vectors(3)
+    assert cache.put_many(["a", "b", "c"], "model", vectors)
+
+    found, hit = cache.get_many(["c", "x", "a"], "model")
+
+    assert hit.tolist() == [True, False, True]
+    assert np.array_equal(found[0], vectors[2]) and np.array_equal(found[2], vectors[0])
+    assert not found[1].any()
+    # La clé inclut le modèle
+    assert not cache.get_many(["a"], "other-model")[1][0]
+
+
+def test_dirty_rows_are_written_behind_and_reopened(tmp_path):
+    cache = EmbeddingCache(tmp_path, flush_interval_s=60)
+    vectors = _vectors(100)
+    cache.put_many([f"t{i}" for i in range(100)], "model", vectors)
+    assert cache.get_stats()["dirty_rows"] == 100
+
+    cache.flush()
+    assert cache.get_stats()["dirty_rows"] == 0
+    cache.put("t5", "model", -vectors[5])
+    assert cache.get_stats()["dirty_rows"] == 1
+    cache.flush()
+
+    reopened = EmbeddingCache(tmp_path)
+    assert len(reopened) == 100
+    assert np.array_equal(reopened.get("t5", "model"), -vectors[5])
+    assert np.array_equal(reopened.get("t99", "model"), vectors[99])
+
+
+def test_lru_eviction_is_bounded_by_bytes(tmp_path):
+    row_bytes = DIM * 4 + 24
+    cache = EmbeddingCache(tmp_path, max_bytes=50 * row_bytes, flush_interval_s=60)
+    cache.put_many([f"old{i}" for i in range(40)], "model", _vectors(40))
+    cache.get_many(["old0", "old1"], "model")  # récemment utilisés
+
+    cache.put_many([f"new{i}" for i in range(20)], "model", _vectors(20, seed=1))
+
+    stats = cache.get_stats()
+    assert stats["total_size_bytes"] <= cache.max_bytes
+    assert stats["evictions"] > 0 and stats["capacity"] <= 70
+    assert cache.get_many(["old0", "old1", "new19"], "model")[1].all()
+    assert not cache.get_many(["old2"], "model")[1][0]
+
+
+class _CountingModel:
+    model_name = "fake"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] * DIM for text in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [float(len(text))] * DIM
+
+
+def test_cached_embeddings_only_computes_misses(tmp_path):
+    model = _CountingModel()
+    embedder = CachedEmbeddings(model, cache=EmbeddingCache(tmp_path))
+
+    first = embedder.embed_documents(["un", "deux"])
+    second = embedder.embed_documents(["deux", "trois", "un"])
+
+    assert model.embedded == ["un", "deux", "trois"]
+    assert second == [first[1], [5.0] * DIM, first[0]]
+    assert embedder.embed_query("un") == [2.0] * DIM
+    assert embedder.embed_query("un") == [2.0] * DIM
+    assert model.embedded == ["un", "deux", "trois", "un"]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'Event Bus (files par abonné, lots par tick, coalescence, pertes)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+import time
+
+import pytest
+
+from interface.events.event_bus import EventBus
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def bus():
+    bus = EventBus(tick_s=0.05)
+    bus.start()
+    yield bus
+    bus.stop()
+
+
+def test_batch_subscriber_receives_token_runs_per_tick(bus):
+    batches = []
+    bus.subscribe("llm.token", batches.append, batch=True)
+
+    for i in range(200):
+        bus.emit("llm.token", {"token": str(i)})
+
+    assert _wait_until(lambda: sum(len(b) for b in batches) == 200)
+    tokens = [e["token"] for b in batches for e in b]
+    assert tokens == [str(i) for i in range(200)]
+    # 200 tokens émis d'un coup : quelques lots, pas 200 callbacks
+    assert len(batches) < 20
+    stats = bus.get_stats()["topics"]["llm.token"]
+    assert stats["emitted"] == 200 and stats["delivered"] == 200
+
+
+def test_spread_burst_is_delivered_at_most_once_per_tick():
+    bus = EventBus(tick_s=0.1)
+    bus.start()
+    batches = []
+    bus.subscribe("llm.token", batches.append, batch=True)
+    try:
+        # 200 tokens espacés de 5 ms (~1 s) : ~10 ticks, chaque emit réveille le thread
+        for i in range(200):
+            bus.emit("llm.token", {"token": str(i)})
+            time.sleep(0.005)
+        assert _wait_until(lambda: sum(len(b) for b in batches) == 200)
+    finally:
+        bus.stop()
+    assert [e["token"] for b in batches for e in b] == [str(i) for i in range(200)]
+    assert len(batches) <= 16
+
+
+def test_plain_subscriber_keeps_every_token_and_cross_topic_order(bus):
+    class Ui:
+        def __init__(self):
+            self.seen = []
+
+        def on_start(self, data):
+            self.seen.append("start")
+
+        def on_token(self, data):
+            self.seen.append(data["token"])
+
+        def on_complete(self, data):
+            self.seen.append("complete")
+
+    ui = Ui()
+    bus.subscribe("llm.start", ui.on_start)
+    bus.subscribe("llm.token", ui.on_token)
+    bus.subscribe("llm.complete", ui.on_complete)
+
+    bus.emit("llm.start", {})
+    for token in "abc":
+        bus.emit("llm.token", {"token": token})
+    bus.emit("llm.complete", {})
+
+    assert _wait_until(lambda: len(ui.seen) == 5)
+    assert ui.seen == ["start", "a", "b", "c", "complete"]
+
+
+def test_latest_policy_coalesces_metrics(bus):
+    received = []
+    release = threading.Event()
+
+    def slow_metrics(data):
+        received.append(data["value"])
+        release.wait(1.0)
+
+    bus.subscribe("metrics.update", slow_metrics)
+    bus.emit("metrics.update", {"value": 0})
+    assert _wait_until(lambda: received == [0])
+    for value in range(1, 50):
+        bus.emit("metrics.update", {"value": value})
+    release.set()
+
+    assert _wait_until(lambda: received[-1] == 49)
+    assert received == [0, 49]
+    assert bus.get_stats()["topics"]["metrics.update"]["coalesced"] == 48
+
+
+def test_slow_subscriber_does_not_stall_others(bus):
+    blocked = threading.Event()
+    fast = []
+
+    bus.subscribe("stt.complete", lambda data: blocked.wait(2.0))
+    bus.subscribe("stt.complete", fast.append)
+    bus.emit("stt.complete", {"text": "bonjour"})
+
+    assert _wait_until(lambda: len(fast) == 1, timeout=0.5)
+    blocked.set()
+
+
+def test_droppable_topics_are_dropped_first_when_queue_is_full():
+    bus = EventBus(max_pending=10, tick_s=0.01)
+    blocked = threading.Event()
+    received = []
+
+    class Window:
+        def on_state(self, data):
+            received.append(data["n"])
+            blocked.wait(2.0)
+
+        def on_log(self, data):
+            pass
+
+    window = Window()
+    bus.subscribe("ui.state", window.on_state)
+    bus.subscribe("log.message", window.on_log)
+    bus.start()
+    try:
+        bus.emit("ui.state", {"n": -1})
+        assert _wait_until(lambda: received == [-1])
+        for _ in range(10):
+            bus.emit("log.message", {"message": "x"})
+        for n in range(5):
+            bus.emit("ui.state", {"n": n})
+        blocked.set()
+
+        assert _wait_until(lambda: len(received) == 6)
+        assert received == [-1, 0, 1, 2, 3, 4]
+        stats = bus.get_stats()
+        assert stats["topics"]["log.message"]["dropped"] == 5
+        assert "dropped" not in stats["topics"]["ui.state"]
+    finally:
+        bus.stop()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'ordonnanceur de générations (priorités, file bornée, annulation)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+import time
+
+import pytest
+
+from agents.generation_scheduler import (
+    CancellationToken,
+    GenerationCancelled,
+    GenerationQueueFull,
+    GenerationScheduler,
+    Priority,
+)
+
+
+def _queue_behind_active(scheduler, requests, order):
+    """Occupe le modèle puis met en file `requests` [(priorité, nom)]."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def holder():
+        with scheduler.slot("holder", Priority.TEXT):
+            started.set()
+            release.wait(2)
+
+    def waiter(priority, name):
+        try:
+            with scheduler.slot(name, priority):
+                order.append(name)
+        except (GenerationQueueFull, GenerationCancelled) as e:
+            order.append(f"{name}:{type(e).__name__}")
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    started.wait(2)
+    for priority, name in requests:
+        thread = threading.Thread(target=waiter, args=(priority, name))
+        thread.start()
+        threads.append(thread)
+        while scheduler.get_stats()["queued"] < len(threads) - 1 and not any(":" in o for o in order):
+            time.sleep(0.005)
+    return release, threads
+
+
+def test_waiting_requests_served_by_priority_then_arrival():
+    scheduler = GenerationScheduler(max_queue=8)
+    order = []
+    release, threads = _queue_behind_active(scheduler, [
+        (Priority.BATCH, "batch"), (Priority.API, "api"), (Priority.TEXT, "text"),
+        (Priority.VOICE, "voice1"), (Priority.VOICE, "voice2"),
+    ], order)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert order == ["voice1", "voice2", "text", "api", "batch"]
+    stats = scheduler.get_stats()
+    assert stats["priorities"]["voice"]["requests"] == 2
+    assert stats["priorities"]["batch"]["max_wait_s"] > 0
+
+
+def test_bounded_queue_rejects_or_evicts_lowest_priority():
+    scheduler = GenerationScheduler(max_queue=2)
+    order = []
+    release, threads = _queue_behind_active(scheduler, [
+        (Priority.API, "api"), (Priority.BATCH, "batch"),
+    ], order)
+    assert scheduler.is_saturated(Priority.BATCH)
+    assert not scheduler.is_saturated(Priority.API)
+
+    with pytest.raises(GenerationQueueFull):
+        with scheduler.slot("batch2", Priority.BATCH):
+            pass
+
+    # Une requête vocale évince la requête batch en attente
+    voice = threading.Thread(target=lambda: _served(scheduler, "voice", Priority.VOICE, order))
+    voice.start()
+    deadline = time.time() + 2
+    while "batch:GenerationQueueFull" not in order and time.time() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads + [voice]:
+        thread.join(2)
+
+    assert order == ["batch:GenerationQueueFull", "voice", "api"]
+    assert scheduler.get_stats()["priorities"]["batch"]["rejected"] == 2
+
+
+def _served(scheduler, name, priority, order):
+    with scheduler.slot(name, priority):
+        order.append(name)
+
+
+def test_cancel_while_waiting_and_batch_preemption():
+    scheduler = GenerationScheduler()
+    batch_token = CancellationToken()
+    started = threading.Event()
+    seen_cancel = []
+
+    def batch():
+        with scheduler.slot("batch", Priority.BATCH, batch_token) as token:
+            started.set()
+            while not token.cancelled:
+                time.sleep(0.005)
+            seen_cancel.append(token.reason)
+
+    thread = threading.Thread(target=batch)
+    thread.start()
+    started.wait(2)
+
+    waiting_token = CancellationToken()
+    waiting_token.cancel("stop")
+    with pytest.raises(GenerationCancelled):
+        with scheduler.slot("text", Priority.TEXT, waiting_token):
+            pass
+
+    # Requête interactive : la génération batch en cours est préemptée
+    with scheduler.request(Priority.VOICE):
+        with scheduler.slot("voice"):
+            pass
+    thread.join(2)
+    assert seen_cancel and "préemptée" in seen_cancel[0]
+    assert scheduler.get_stats()["priorities"]["batch"]["cancelled"] == 1
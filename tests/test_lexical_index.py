@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'index BM25 et de la recherche hybride (lexicale puis vectorielle, fusion RRF)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+from types import SimpleNamespace
+
+from agents.lexical_index import LexicalIndex, hybrid_search, reciprocal_rank_fusion, tokenize
+
+CONFIG = {"enabled": True, "candidates": 5, "keyword_max_terms": 3, "keyword_coverage": 1.0, "rrf_k": 60}
+
+
+def _doc(text, source="manuel.txt"):
+    return SimpleNamespace(page_content=text, metadata={"source": source})
+
+
+CORPUS = {
+    "c0": _doc("L'erreur ERR-404 apparaît quand le capteur thermique est débranché."),
+    "c1": _doc("Pour réinitialiser la pompe, maintenez le bouton rouge cinq secondes."),
+    "c2": _doc("La référence PX-2210 désigne le module de température extérieur.", "catalogue.txt"),
+    "c3": _doc("Le capteur de température mesure l'air ambiant toutes les minutes.", "catalogue.txt"),
+}
+
+
+def _index(path=None):
+    index = LexicalIndex(path)
+    index.add(list(CORPUS), list(CORPUS.values()))
+    return index
+
+
+class _VectorSearch:
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    def __call__(self, query, k):
+        self.calls += 1
+        return [(doc, 0.5) for doc in self.results[:k]]
+
+
+def test_tokenize_keeps_identifiers_and_folds_accents():
+    terms = tokenize("Erreur ERR-404 : température élevée, v2.3.0")
+    assert "err-404" in terms and "err" in terms and "404" in terms
+    assert "temperature" in terms and "elevee" in terms
+    assert "v2.3.0" in terms
+
+
+def test_bm25_ranks_and_follows_source_updates(tmp_path):
+    index = _index(tmp_path / "lexical_index.json")
+    assert index.search("module de température", k=1)[0][0].id == "c2"
+
+    assert index.remove_source("catalogue.txt") == 2
+    assert all(chunk.metadata["source"] == "manuel.txt" for chunk, _ in index.search("température capteur"))
+    index.save()
+
+    reopened = LexicalIndex.load(tmp_path / "lexical_index.json")
+    assert len(reopened) == 2
+    assert reopened.search("ERR-404", k=1)[0][0].id == "c0"
+
+
+def test_keyword_query_is_served_without_vector_search():
+    vector = _VectorSearch([CORPUS["c3"]])
+
+    docs = hybrid_search("code ERR-404", 2, _index(), vector, CONFIG)
+
+    assert vector.calls == 0
+    assert docs[0].doc.page_content == CORPUS["c0"].page_content
+    assert docs[0].vector_score is None and docs[0].bm25_score > 0
+
+
+def test_natural_language_query_fuses_both_rankings():
+    vector = _VectorSearch([CORPUS["c1"], CORPUS["c3"]])
+
+    docs = hybrid_search("comment redémarrer la pompe après une panne de courant", 2, _index(), vector, CONFIG)
+
+    assert vector.calls == 1
+    # c1 : premier des deux classements ; chaque passe garde son propre score
+    assert docs[0].doc.page_content == CORPUS["c1"].page_content
+    assert docs[0].vector_score == 0.5 and docs[0].bm25_score > 0
+    assert docs[1].doc.page_content == CORPUS["c3"].page_content
+    assert docs[1].bm25_score is None
+    assert len(docs) == 2
+
+
+def test_rrf_merges_same_chunk_from_both_rankings():
+    a, b, c = _doc("alpha"), _doc("beta"), _doc("gamma")
+    fused = reciprocal_rank_fusion([[a, b], [_doc("beta"), c]], k=3)
+    assert [doc.page_content for doc in fused] == ["beta", "alpha", "gamma"]
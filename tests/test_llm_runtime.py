@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du runtime llama.cpp partagé (sérialisation des générations)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+import time
+
+from agents.generation_scheduler import CancellationToken, GenerationScheduler, Priority
+from agents.llm_runtime import LlamaRuntime
+
+
+class _FakeLlama:
+    """Llama factice qui détecte les appels concurrents."""
+
+    def __init__(self):
+        self.active = 0
+        self.overlaps = 0
+
+    def __call__(self, stream=False, **kwargs):
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        time.sleep(0.02)
+        for char in kwargs["prompt"].upper():
+            yield {"choices": [{"text": char}]}
+        self.active -= 1
+
+
+class _FakeGenerator:
+    def __init__(self):
+        self.client = _FakeLlama()
+
+    def stream(self, prompt):
+        for token in prompt.split():
+            yield token
+
+
+def _runtime(monkeypatch, generator):
+    monkeypatch.setattr(LlamaRuntime, "generator", property(lambda self: generator))
+    return LlamaRuntime(scheduler=GenerationScheduler())
+
+
+def test_calls_are_serialized_on_one_instance(monkeypatch):
+    generator = _FakeGenerator()
+    runtime = _runtime(monkeypatch, generator)
+    results = []
+
+    def worker(i):
+        results.append(runtime(prompt=f"p{i}")["choices"][0]["text"])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ["P0", "P1", "P2", "P3"]
+    assert generator.client.overlaps == 0
+    stats = runtime.get_stats()
+    assert stats["priorities"]["text"]["requests"] == 4 and stats["queued"] == 0
+    assert stats["priorities"]["text"]["max_wait_s"] > 0
+
+
+def test_stream_holds_model_until_closed(monkeypatch):
+    runtime = _runtime(monkeypatch, _FakeGenerator())
+    stream = runtime.stream("un deux trois", source="test")
+    assert next(stream) == "un"
+    assert runtime.get_stats()["active"] == "test"
+
+    stream.close()
+    assert runtime.get_stats()["active"] is None
+
+
+def test_stream_stops_when_request_cancelled(monkeypatch):
+    runtime = _runtime(monkeypatch, _FakeGenerator())
+    token = CancellationToken()
+    with runtime.scheduler.request(Priority.VOICE, token):
+        tokens = []
+        for chunk in runtime.stream("un deux trois quatre"):
+            tokens.append(chunk)
+            token.cancel("stop")
+    assert tokens == ["un"]
+    assert runtime.get_stats()["priorities"]["voice"]["cancelled"] == 1
+
+
+def test_standalone_fallback_without_generator(monkeypatch):
+    runtime = _runtime(monkeypatch, None)
+    monkeypatch.setattr(runtime, "_load_standalone", lambda: _FakeLlama())
+    assert runtime(prompt="ok")["choices"][0]["text"] == "OK"
+    assert runtime.llm is runtime._standalone
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de la matrice des profils vocaux (top-k, lots, synchronisation, mmap)."""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0",
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import time
+
+import numpy as np
+
+from agents.voice_identity.profile_index import ProfileIndex
+
+
+def _profiles(tmp_path, count=200, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        np.save(tmp_path / f"speaker_{i:03d}.npy", vector * (i + 1))  # profils non normalisés
+    return vectors
+
+
+def test_top_k_matches_bruteforce_cosine(tmp_path):
+    vectors = _profiles(tmp_path)
+    index = ProfileIndex(tmp_path)
+    query = vectors[42] + 0.1 * np.random.default_rng(1).standard_normal(64).astype(np.float32)
+
+    top = index.top_k(query, k=3)
+
+    cosines = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = np.argsort(-cosines)[:3]
+    assert [speaker for speaker, _ in top] == [f"speaker_{i:03d}" for i in expected]
+    assert np.allclose([score for _, score in top], cosines[expected], atol=1e-5)
+    assert top[0][0] == "speaker_042"
+
+
+def test_batch_identification_equals_single_queries(tmp_path):
+    vectors = _profiles(tmp_path)
+    index = ProfileIndex(tmp_path)
+    queries = vectors[[3, 150, 77]]
+
+    batch = index.top_k_batch(queries, k=2)
+
+    singles = [index.top_k(query, k=2) for query in queries]
+    assert [[speaker for speaker, _ in r] for r in batch] == [[speaker for speaker, _ in r] for r in singles]
+    assert np.allclose([[score for _, score in r] for r in batch], [[score for _, score in r] for r in singles], atol=1e-5)
+    assert [result[0][0] for result in batch] == ["speaker_003", "speaker_150", "speaker_077"]
+
+
+def test_profiles_are_loaded_once_and_kept_in_sync(tmp_path, monkeypatch):
+    vectors = _profiles(tmp_path, count=5)
+    index = ProfileIndex(tmp_path)
+    assert len(index) == 5
+
+    # Plus aucune lecture disque par énoncé
+    monkeypatch.setattr(np, "load", lambda *a, **k: (_ for _ in ()).throw(AssertionError("np.load")))
+    index.top_k(vectors[0], k=1)
+
+    new_vector = np.ones(64, dtype=np.float32)
+    index.upsert("speaker_new", new_vector)
+    assert index.top_k(new_vector, k=1)[0][0] == "speaker_new"
+    assert index.remove("speaker_001")
+    assert "speaker_001" not in index.ids()
+    monkeypatch.undo()
+
+    # Écriture externe (autre processus) : invisible avant la prochaine vérification, sauf reload()
+    time.sleep(0.01)
+    np.save(tmp_path / "external.npy", -new_vector)
+    assert "external" not in index.ids()
+    index.reload()
+    assert index.top_k(-new_vector, k=1)[0] == ("external", 1.0)
+
+
+def test_directory_is_not_scanned_between_refresh_checks(tmp_path, monkeypatch):
+    import agents.voice_identity.profile_index as profile_index
+
+    vectors = _profiles(tmp_path, count=50)
+    index = ProfileIndex(tmp_path, refresh_interval_s=60.0)
+    index.top_k(vectors[0], k=1)
+
+    # Coût d'une identification indépendant du nombre de profils enrôlés
+    monkeypatch.setattr(profile_index.os, "scandir", lambda *a: (_ for _ in ()).throw(AssertionError("scandir")))
+    for vector in vectors[:10]:
+        index.top_k(vector, k=1)
+    assert len(index) == 50 and index.get("speaker_003") is not None
+
+
+def test_in_place_reenrollment_is_reloaded_but_metadata_is_not(tmp_path, monkeypatch):
+    vectors = _profiles(tmp_path, count=5)
+    index = ProfileIndex(tmp_path, refresh_interval_s=0.0)
+    assert index.top_k(vectors[2], k=1)[0][0] == "speaker_002"
+
+    # Enrôlement local : .npy puis métadonnées, upsert en dernier → pas de rechargement
+    new_vector = np.ones(64, dtype=np.float32)
+    np.save(tmp_path / "speaker_new.npy", new_vector)
+    (tmp_path / "speaker_new_metadata.json").write_text('{"prenom": "Ada"}', encoding="utf-8")
+    index.upsert("speaker_new", new_vector)
+    with monkeypatch.context() as patch:
+        patch.setattr(np, "load", lambda *a, **k: (_ for _ in ()).throw(AssertionError("np.load")))
+        assert index.top_k(new_vector, k=1)[0][0] == "speaker_new"
+
+    # Ré-enrôlement par un autre processus : même fichier réécrit, répertoire inchangé
+    time.sleep(0.02)
+    np.save(tmp_path / "speaker_002.npy", -new_vector * 3)
+    assert index.top_k(-new_vector, k=1)[0] == ("speaker_002", 1.0)
+
+
+def test_consolidated_matrix_is_reopened_with_mmap(tmp_path):
+    vectors = _profiles(tmp_path, count=10)
+    first = ProfileIndex(tmp_path, use_mmap=True)
+    expected = first.top_k(vectors[7], k=3)
+    assert (tmp_path / ".index" / "matrix.npy").exists()
+
+    second = ProfileIndex(tmp_path, use_mmap=True)
+    assert second.top_k(vectors[7], k=3) == expected
+    assert isinstance(second._matrix, np.memmap)
+
+    second.upsert("speaker_extra", vectors[7])
+    third = ProfileIndex(tmp_path, use_mmap=True)
+    assert "speaker_extra" in third.ids() and len(third) == 11
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du préfixe de prompt stable et du cache KV de préfixe."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+from agents.prompt_cache import PromptCache
+from agents.prompt_templates import build_chat_prompt, system_prefix
+
+
+class _FakeCache(dict):
+    """Comme LlamaRAMCache: clés converties en tuple de tokens."""
+
+    cache_size = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(tuple(key), value)
+
+
+class _FakeLlama:
+    """Imite l'API llama_cpp.Llama utilisée par PromptCache."""
+
+    def __init__(self):
+        self.cache = _FakeCache()
+        self.evaluated = []
+
+    def tokenize(self, text, special=False):
+        return list(text)
+
+    def reset(self):
+        self.evaluated = []
+
+    def eval(self, tokens):
+        self.evaluated.extend(tokens)
+
+    def save_state(self):
+        return tuple(self.evaluated)
+
+
+def test_prompt_prefix_is_stable_across_turns():
+    history = [
+        {"role": "user", "content": "Bonjour"},
+        {"role": "assistant", "content": "Bonjour, que puis-je faire ?"},
+    ]
+    first = build_chat_prompt("Bonjour", conversation_history=history[:1])
+    second = build_chat_prompt("Quelle heure est-il ?", conversation_history=history + [
+        {"role": "user", "content": "Quelle heure est-il ?"},
+    ])
+
+    prefix = system_prefix(False)
+    assert first.startswith(prefix) and second.startswith(prefix)
+    # Le message courant (déjà ajouté à l'historique) n'est pas dupliqué
+    assert first.count("<|user|>\nBonjour<|end|>") == 1
+    assert second.count("Quelle heure est-il ?") == 1
+    assert second.endswith("<|assistant|>\n")
+
+
+def test_prime_stores_prefix_state():
+    cache = PromptCache(capacity_bytes=1024)
+    client = _FakeLlama()
+    cache._client = client
+
+    prefix = system_prefix(False)
+    assert cache.prime(prefix)
+    tokens = tuple(prefix.encode("utf-8"))
+    assert client.cache[tokens] == tokens
+    assert cache.is_cached(build_chat_prompt("Salut"))
+    assert not cache.prime(prefix)  # déjà amorcé
+
+    cache.record_ttft(0.1, cached=True)
+    cache.record_ttft(0.5, cached=False)
+    stats = cache.get_stats()
+    assert stats["ttft_cached_count"] == 1
+    assert stats["ttft_uncached_avg"] == 0.5
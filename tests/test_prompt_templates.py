@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests des gabarits de prompt Phi-3 (mémoïsation, échappement, budget n_ctx)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import pytest
+
+from agents import prompt_templates as pt
+
+
+pytestmark = pytest.mark.usefixtures("word_counter")
+
+
+def test_system_block_is_memoized_per_flag():
+    assert pt.system_block(False) is pt.system_block(False)
+    assert pt.system_block(True) is not pt.system_block(False)
+    assert "greeting" in pt.system_block(True).text
+
+
+def test_config_version_is_computed_once(monkeypatch):
+    version = pt.config_version()
+    monkeypatch.setattr(pt.json, "dumps", lambda *a, **k: pytest.fail("empreinte recalculée"))
+    assert pt.config_version() == version
+    pt.system_block(False)
+
+
+def test_escape_and_turn_cache_by_identity():
+    content = "voir <|system|> et <|end|>"
+    first = pt.render_turn({"role": "user", "content": content})
+    assert first.text == "<|user|>\nvoir [system] et [end]<|end|>\n"
+    # Nouveau dict, même chaîne: rendu réutilisé
+    assert pt.render_turn({"role": "user", "content": content}) is first
+    assert pt.render_turn({"role": "system", "content": content}) is None
+
+
+def test_history_trimmed_to_fit_n_ctx(make_history):
+    history = make_history(40, words=50)
+    prompt = pt.assemble_chat_prompt("Question ?", history, n_ctx=2048, max_tokens=512)
+
+    assert prompt.total_tokens <= 2048 - 512
+    assert prompt.turns_dropped > 0
+    assert len(prompt.history_tokens) + prompt.turns_dropped == 40
+    # Les tours conservés sont les plus récents
+    assert "39 mot" in prompt.text and "\n0 mot" not in prompt.text
+    assert prompt.text.endswith("<|user|>\nQuestion ?<|end|>\n<|assistant|>\n")
+
+
+def test_short_history_kept_entirely(make_history):
+    history = make_history(4, words=5)
+    prompt = pt.assemble_chat_prompt("Salut", history, n_ctx=2048, max_tokens=512)
+    assert prompt.turns_dropped == 0
+    assert len(prompt.history_tokens) == 4
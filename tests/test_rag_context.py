@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'assemblage du contexte RAG (seuil par passe, ordre de classement, doublons, phrases entières, budget)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+from types import SimpleNamespace
+
+from agents.lexical_index import ScoredChunk
+from agents.prompt_templates import count_tokens
+from agents.rag_context import assemble_context, split_sentences
+
+
+def _doc(text, source="manuel.txt"):
+    return SimpleNamespace(page_content=text, metadata={"source": source})
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences("Première phrase. Deuxième ?\nTroisième ligne sans point") == [
+        "Première phrase.", "Deuxième ?", "Troisième ligne sans point",
+    ]
+
+
+def test_chunks_below_threshold_are_dropped():
+    context = assemble_context(
+        [
+            ScoredChunk(_doc("La pompe se réinitialise en cinq secondes."), vector_score=0.82),
+            ScoredChunk(_doc("Recette de la tarte aux pommes."), vector_score=0.12),
+        ],
+        min_similarity=0.4,
+        min_bm25=2.0,
+        budget_tokens=200,
+    )
+    assert context.text == "La pompe se réinitialise en cinq secondes."
+    assert context.chunks_below_threshold == 1 and context.chunks_used == 1
+    assert not assemble_context(
+        [ScoredChunk(_doc("Hors sujet."), vector_score=0.1)], min_similarity=0.4, min_bm25=2.0, budget_tokens=200
+    )
+
+
+def test_each_pass_is_thresholded_on_its_own_scale():
+    results = [
+        ScoredChunk(_doc("Code ERR-404 : capteur débranché."), bm25_score=6.3),
+        ScoredChunk(_doc("Le capteur mesure la température."), bm25_score=0.9),
+        ScoredChunk(_doc("Débranchez puis rebranchez le capteur."), vector_score=0.3, bm25_score=2.5),
+        ScoredChunk(_doc("Un vecteur faible."), vector_score=0.35, bm25_score=0.5),
+    ]
+
+    context = assemble_context(results, min_similarity=0.4, min_bm25=2.0, budget_tokens=200)
+
+    # Un BM25 faible n'est pas rattrapé par la pertinence vectorielle (et inversement)
+    assert context.text == "Code ERR-404 : capteur débranché.\nDébranchez puis rebranchez le capteur."
+    assert context.chunks_below_threshold == 2
+
+
+def test_overlapping_chunks_are_deduplicated_in_rank_order():
+    # Deux chunks voisins du découpeur : recouvrement sur la fin de la première phrase
+    first = _doc("Le capteur mesure l'air. Il se calibre au démarrage.")
+    second = _doc("se calibre au démarrage. Une alarme signale les écarts.")
+    other = _doc("Le capteur mesure l'air.", "copie.txt")
+
+    context = assemble_context(
+        [ScoredChunk(first, vector_score=0.6), ScoredChunk(second, bm25_score=9.0), ScoredChunk(other, vector_score=0.9)],
+        min_similarity=0.4,
+        min_bm25=2.0,
+        budget_tokens=200,
+    )
+
+    # Ordre fusionné conservé : le score brut le plus élevé (BM25 9.0) ne passe pas devant le premier rang
+    assert context.text == (
+        "Le capteur mesure l'air. Il se calibre au démarrage.\n"
+        "Une alarme signale les écarts."
+    )
+    assert context.duplicate_sentences == 2
+
+
+def test_whole_sentences_fit_the_token_budget():
+    sentences = [f"Phrase numéro {i} avec quelques mots de contenu utile." for i in range(40)]
+    docs = [ScoredChunk(_doc(" ".join(sentences)), vector_score=0.9)]
+
+    context = assemble_context(docs, min_similarity=0.4, budget_tokens=60)
+
+    assert context.truncated
+    assert 0 < context.tokens <= 60
+    assert context.tokens == count_tokens(context.text)
+    # Aucune phrase coupée : le contexte n'est fait que de phrases complètes du chunk
+    assert set(split_sentences(context.text)) <= set(sentences)
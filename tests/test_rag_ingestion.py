@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'ingestion incrémentale RAG (manifeste + synchronisation)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+from agents.rag_ingestion import AUTO_WORKERS_MAX, DocumentIngestor, iter_parsed_files, resolve_workers, scan_documents
+from data.database import Database
+
+
+class _FakeLoader:
+    """Loader minimal: un document par fichier."""
+
+    loads = []
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        _FakeLoader.loads.append(self.path)
+        content = Path(self.path).read_text(encoding="utf-8")
+        return [SimpleNamespace(page_content=content, metadata={"source": self.path})]
+
+
+class _FakeSplitter:
+    def split_documents(self, docs):
+        return list(docs)
+
+
+class _WordSplitter:
+    """Un chunk par mot (picklable pour le pool de processus)."""
+
+    def split_documents(self, docs):
+        return [
+            SimpleNamespace(page_content=word, metadata=dict(doc.metadata))
+            for doc in docs for word in doc.page_content.split()
+        ]
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.chunks = {}
+
+    def delete(self, where):
+        self.chunks = {k: v for k, v in self.chunks.items() if v.metadata["source"] != where["source"]}
+
+    def count(self):
+        return len(self.chunks)
+
+
+class _FakeVectorStore:
+    def __init__(self):
+        self._collection = _FakeCollection()
+        self.embedded = 0
+
+    def add_documents(self, docs, ids):
+        self.embedded += len(docs)
+        for doc_id, doc in zip(ids, docs):
+            self._collection.chunks[doc_id] = doc
+
+
+class _BatchCollection(_FakeCollection):
+    def upsert(self, ids, embeddings, documents, metadatas):
+        assert len(ids) == len(embeddings) == len(documents) == len(metadatas)
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            self.chunks[doc_id] = SimpleNamespace(page_content=text, metadata=metadata)
+
+
+class _BatchEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class _BatchVectorStore:
+    """Store exposant `embeddings` et `_collection.upsert` (comme langchain Chroma)."""
+
+    def __init__(self):
+        self._collection = _BatchCollection()
+        self.embeddings = _BatchEmbedder()
+
+
+def _make_ingestor(tmp_path: Path):
+    doc_dir = tmp_path / "documents"
+    doc_dir.mkdir()
+    db = Database(db_path=str(tmp_path / "qaia.db"))
+    ingestor = DocumentIngestor(doc_dir, db, _FakeSplitter(), {".txt": _FakeLoader})
+    return doc_dir, db, ingestor
+
+
+def test_only_new_or_changed_files_are_embedded(tmp_path: Path):
+    """Un second démarrage sans modification ne recharge aucun fichier."""
+    doc_dir, db, ingestor = _make_ingestor(tmp_path)
+    (doc_dir / "a.txt").write_text("alpha", encoding="utf-8")
+    (doc_dir / "b.txt").write_text("beta", encoding="utf-8")
+    store = _FakeVectorStore()
+
+    stats = ingestor.sync(store)
+    assert stats["indexed"] == 2
+    assert store._collection.count() == 2
+
+    _FakeLoader.loads.clear()
+    stats = ingestor.sync(store)
+    assert stats["indexed"] == 0
+    assert stats["unchanged"] == 2
+    assert _FakeLoader.loads == []
+
+    (doc_dir / "a.txt").write_text("alpha modifié", encoding="utf-8")
+    stats = ingestor.sync(store)
+    assert stats["indexed"] == 1
+    assert store._collection.count() == 2  # pas de doublon
+    db.close()
+
+
+def test_deleted_file_chunks_are_removed(tmp_path: Path):
+    """Les chunks d'un fichier supprimé sont retirés de la base et du manifeste."""
+    doc_dir, db, ingestor = _make_ingestor(tmp_path)
+    (doc_dir / "a.txt").write_text("alpha", encoding="utf-8")
+    store = _FakeVectorStore()
+    ingestor.sync(store)
+
+    (doc_dir / "a.txt").unlink()
+    stats = ingestor.sync(store)
+    assert stats["deleted"] == 1
+    assert store._collection.count() == 0
+    assert db.get_document_manifest() == {}
+    db.close()
+
+
+def test_touched_file_is_not_reembedded(tmp_path: Path):
+    """Un mtime modifié sans changement de contenu ne déclenche pas de vectorisation."""
+    doc_dir, db, ingestor = _make_ingestor(tmp_path)
+    path = doc_dir / "a.txt"
+    path.write_text("alpha", encoding="utf-8")
+    store = _FakeVectorStore()
+    ingestor.sync(store)
+
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+    plan = scan_documents(doc_dir, db.get_document_manifest(), (".txt",))
+    assert len(plan.touched) == 1 and not plan.to_index
+
+    embedded_before = store.embedded
+    ingestor.sync(store)
+    assert store.embedded == embedded_before
+    assert not scan_documents(doc_dir, db.get_document_manifest(), (".txt",)).has_changes
+    db.close()
+
+
+def _write_corpus(doc_dir: Path, files=7, words=10):
+    for i in range(files):
+        (doc_dir / f"doc{i}.txt").write_text(" ".join(f"mot{i}_{j}" for j in range(words)), encoding="utf-8")
+
+
+def test_chunks_are_embedded_in_fixed_size_batches_and_upserted(tmp_path: Path):
+    """Les chunks de plusieurs fichiers sont regroupés en lots de taille fixe."""
+    doc_dir = tmp_path / "documents"
+    doc_dir.mkdir()
+    _write_corpus(doc_dir)
+    db = Database(db_path=str(tmp_path / "qaia.db"))
+    ingestor = DocumentIngestor(
+        doc_dir, db, _WordSplitter(), {".txt": _FakeLoader}, workers=1, batch_size=16, queue_batches=1
+    )
+    store = _BatchVectorStore()
+
+    stats = ingestor.sync(store)
+
+    assert stats["indexed"] == 7 and stats["chunks"] == 70 and stats["chunks_per_s"] > 0
+    assert store.embeddings.batches == [16, 16, 16, 16, 6]
+    assert store._collection.count() == 70
+    manifest = db.get_document_manifest()
+    assert all(entry["chunk_count"] == 10 for entry in manifest.values())
+
+    # Réindexation d'un fichier raccourci : anciens chunks supprimés avant l'upsert
+    (doc_dir / "doc3.txt").write_text("court", encoding="utf-8")
+    ingestor.sync(store)
+    assert store._collection.count() == 61
+    db.close()
+
+
+def test_process_pool_gives_same_index_as_serial_loading(tmp_path: Path):
+    """Le chargement sur plusieurs processus produit le même index."""
+    results = []
+    for workers in (1, 2):
+        doc_dir = tmp_path / f"documents{workers}"
+        doc_dir.mkdir()
+        _write_corpus(doc_dir)
+        db = Database(db_path=str(tmp_path / f"qaia{workers}.db"))
+        ingestor = DocumentIngestor(
+            doc_dir, db, _WordSplitter(), {".txt": _FakeLoader}, workers=workers, batch_size=8,
+            pool_min_files=1,
+        )
+        store = _BatchVectorStore()
+        stats = ingestor.sync(store)
+        assert stats["indexed"] == 7 and stats["failed"] == 0
+        results.append({doc_id: doc.page_content for doc_id, doc in store._collection.chunks.items()})
+        db.close()
+    # Identifiants dérivés du chemin relatif : identiques quel que soit l'ordre de fin de chargement
+    assert results[0] == results[1]
+
+
+def test_small_batches_are_parsed_without_a_pool(tmp_path: Path, monkeypatch):
+    """Sous `pool_min_files`, les fichiers sont chargés en série ; `workers: 0` reste plafonné."""
+    import agents.rag_ingestion as rag_ingestion
+
+    def _no_pool(*args, **kwargs):
+        raise AssertionError("pool lancé pour un petit lot")
+
+    monkeypatch.setattr(rag_ingestion, "ProcessPoolExecutor", _no_pool)
+    _write_corpus(tmp_path, files=3, words=2)
+    parsed = list(iter_parsed_files(
+        sorted(tmp_path.glob("*.txt")), {".txt": _FakeLoader}, _WordSplitter(), workers=4, pool_min_files=16
+    ))
+    assert [len(chunks) for _, chunks, error in parsed if error is None] == [2, 2, 2]
+
+    monkeypatch.setattr(rag_ingestion.os, "cpu_count", lambda: 64)
+    assert resolve_workers(0) == AUTO_WORKERS_MAX
+
+
+def test_lexical_index_follows_vector_store(tmp_path: Path):
+    """L'index BM25 reçoit les mêmes ajouts et suppressions que la base vectorielle."""
+    from agents.lexical_index import LexicalIndex
+
+    doc_dir = tmp_path / "documents"
+    doc_dir.mkdir()
+    _write_corpus(doc_dir, files=3, words=4)
+    db = Database(db_path=str(tmp_path / "qaia.db"))
+    lexical = LexicalIndex(tmp_path / "lexical_index.json")
+    ingestor = DocumentIngestor(
+        doc_dir, db, _WordSplitter(), {".txt": _FakeLoader}, workers=1, batch_size=5, lexical_index=lexical
+    )
+    store = _BatchVectorStore()
+
+    ingestor.sync(store)
+    assert len(lexical) == store._collection.count() == 12
+    assert lexical.search("mot1_2", k=1)[0][0].metadata["source"].endswith("doc1.txt")
+
+    (doc_dir / "doc1.txt").unlink()
+    ingestor.sync(store)
+    assert len(lexical) == store._collection.count() == 8
+    assert not any(chunk.metadata["source"].endswith("doc1.txt") for chunk, _ in lexical.search("mot1_2"))
+    assert len(LexicalIndex.load(tmp_path / "lexical_index.json")) == 8
+    db.close()
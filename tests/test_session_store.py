@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du magasin de sessions de conversation (LRU, inactivité, déchargement SQLite)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import time
+
+from agents.context_manager import ConversationContext
+from core.session_store import SessionStore, current_session
+from data.database import Database
+
+
+def _store(tmp_path, **kwargs):
+    db_path = str(tmp_path / "qaia.db")
+    return SessionStore(database_factory=lambda: Database(db_path, check_same_thread=False), **kwargs)
+
+
+def test_context_roundtrip_keeps_turns_summary_and_entities():
+    context = ConversationContext(max_recent_turns=2, max_summary_turns=50)
+    for i, text in enumerate(["Bonjour Paris", "Salut", "Et Lyon ?"]):
+        context.add_turn("user" if i % 2 == 0 else "assistant", text)
+    context.summary = "résumé"
+
+    restored = ConversationContext.from_dict(context.to_dict())
+    assert restored.get_context_for_llm() == context.get_context_for_llm()
+    assert restored.find_entity("Paris").mentions == 1
+    assert restored.turn_count == 3 and len(restored.summary_history) == 1
+
+
+def test_lru_bound_spills_and_restores_sessions(tmp_path):
+    store = _store(tmp_path, max_sessions=2)
+    first = store.get("alice")
+    first.context.add_turn("user", "Je m'appelle Alice")
+    first.first_interaction = False
+    store.get("bob")
+    store.get("carol")  # alice (la moins récente) est déchargée
+
+    stats = store.get_stats()
+    assert stats["in_memory"] == 2 and stats["spilled"] == 1
+
+    restored = store.get("alice")
+    assert restored is not first
+    assert restored.context.get_context_for_llm()[-1]["content"] == "Je m'appelle Alice"
+    assert restored.first_interaction is False
+    assert store.get_stats()["restored"] == 1
+
+    store.drop("alice")
+    assert store.get("alice").context.turn_count == 0
+
+
+def test_idle_sessions_evicted_but_not_while_active(tmp_path):
+    store = _store(tmp_path, idle_timeout_s=60)
+    store.get("idle")
+    with store.activate("busy") as session:
+        assert current_session() is session
+        assert store.evict_idle(now=time.time() + 120) == 1
+        assert store.get_stats()["in_memory"] == 1
+    assert current_session() is None
+    assert store.evict_idle(now=time.time() + 120) == 1
+
+
+def test_one_database_connection_per_store(tmp_path):
+    opened = []
+
+    def factory():
+        opened.append(Database(str(tmp_path / "qaia.db"), check_same_thread=False))
+        return opened[-1]
+
+    store = SessionStore(database_factory=factory, max_sessions=1)
+    for name in ("alice", "bob", "carol", "alice"):
+        store.get(name)  # chaque accès décharge ou restaure une session
+    store.drop("bob")
+    assert len(opened) == 1 and store.get_stats()["restored"] == 1
+
+    store.close()
+    store.get("dave")  # rouverte au besoin après fermeture
+    assert len(opened) == 2
+    store.close()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de la capture vocale en flux (segments VAD transcrits pendant la parole, arrêt automatique)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0",
+#   "numpy>=1.22.0"
+# ]
+# ///
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("webrtcvad")
+
+from agents.speech_capture import StreamingCapture
+from agents.vad_engine import VADConfig, VADEngine
+
+SAMPLE_RATE = 16000
+
+
+class _EnergyVad:
+    """Décision parole/silence par énergie (signal synthétique déterministe)."""
+
+    def is_speech(self, frame_bytes, sample_rate):
+        samples = np.frombuffer(frame_bytes, dtype=np.int16)
+        return bool(np.abs(samples).mean() > 1000)
+
+
+def _make_vad():
+    vad = VADEngine(sample_rate=SAMPLE_RATE, config=VADConfig(max_silence_duration_ms=600))
+    vad.vad = _EnergyVad()
+    return vad
+
+
+def _tone(seconds):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds):
+    return np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32)
+
+
+class _FakeTranscriber:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, audio, sample_rate):
+        self.calls.append((time.time(), len(audio)))
+        time.sleep(self.delay)
+        return f"segment{len(self.calls)}", 0.8
+
+
+def _feed(capture, audio, block=1600):
+    for start in range(0, len(audio), block):
+        capture.feed(audio[start:start + block].reshape(-1, 1))
+
+
+def test_segments_are_transcribed_while_speaking_and_capture_stops_itself():
+    transcriber = _FakeTranscriber()
+    ended = threading.Event()
+    capture = StreamingCapture(
+        transcriber, vad=_make_vad(), sample_rate=SAMPLE_RATE,
+        segment_pause_ms=300, min_segment_s=0.5, max_duration_s=10.0,
+        on_end_of_speech=ended.set,
+    ).start()
+
+    _feed(capture, np.concatenate([_tone(1.0), _silence(0.4)]))
+    # Première pause : segment transcrit avant la fin de l'énoncé
+    deadline = time.time() + 2.0
+    while not transcriber.calls and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(transcriber.calls) == 1
+    assert not ended.is_set()
+
+    _feed(capture, np.concatenate([_tone(0.8), _silence(1.0)]))
+    assert ended.wait(2.0)
+    text, confidence = capture.result(timeout=2.0)
+
+    assert capture.auto_stopped
+    assert text == "segment1 segment2"
+    assert confidence == pytest.approx(0.8)
+    assert capture.eos_to_text is not None
+    # Silence final ramené au tampon post-parole
+    assert capture.duration_s < 1.0 + 0.4 + 0.8 + 0.6
+
+
+def test_manual_stop_without_detected_speech_transcribes_raw_audio():
+    transcriber = _FakeTranscriber(delay=0.0)
+    capture = StreamingCapture(transcriber, vad=_make_vad(), sample_rate=SAMPLE_RATE).start()
+
+    _feed(capture, _silence(0.5))
+    capture.stop()
+    text, _ = capture.result(timeout=2.0)
+
+    assert not capture.auto_stopped
+    assert text == "segment1"
+    assert transcriber.calls[0][1] == len(_silence(0.5))
+
+
+def test_cancelled_capture_is_not_transcribed():
+    transcriber = _FakeTranscriber(delay=0.0)
+    capture = StreamingCapture(transcriber, vad=_make_vad(), sample_rate=SAMPLE_RATE).start()
+
+    _feed(capture, _tone(1.0))
+    capture.stop(finalize=False)
+    text, _ = capture.result(timeout=2.0)
+
+    assert text == ""
+    assert transcriber.calls == []
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de la synthèse vocale en flux (découpage en phrases, pipeline)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents.speech_stream import SentenceSegmenter, SpeechStream, find_cut_point
+
+
+class _FakeSpeechAgent:
+    """Synthèse et lecture simulées (durées fixes)."""
+
+    def __init__(self):
+        self.played = []
+        self.events = []
+        self.play_seconds = 0.05
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _clean_text(self, text):
+        return text
+
+    def synthesize(self, text):
+        with self._lock:
+            self.events.append(("synth_start", text))
+        time.sleep(0.05)
+        return f"audio:{text}"
+
+    def play_audio(self, audio, text=""):
+        with self._lock:
+            self.events.append(("play_start", text))
+        self._stop.clear()
+        if self._stop.wait(self.play_seconds):
+            return False
+        self.played.append(audio)
+        return True
+
+    def stop_playback(self):
+        self._stop.set()
+
+
+def test_segmenter_cuts_sentences_incrementally():
+    segmenter = SentenceSegmenter(max_segment=280, min_chars=10)
+    emitted = []
+    for token in ["Bonjour ", "à toi", ". Comment", " vas-tu", " ?", " Très", " bien"]:
+        emitted.extend(segmenter.feed(token))
+    # La fin de phrase n'est confirmée qu'à l'arrivée du blanc suivant
+    assert emitted == ["Bonjour à toi.", "Comment vas-tu ?"]
+    assert segmenter.flush() == ["Très bien"]
+    assert segmenter.flush() == []
+
+
+def test_segmenter_ignores_short_fragments_and_long_runs():
+    segmenter = SentenceSegmenter(max_segment=40, min_chars=20)
+    assert segmenter.feed("1. Le premier point ") == []
+    text = "sans ponctuation " * 4
+    sentences = segmenter.feed(text)
+    assert sentences and all(len(s) <= 40 for s in sentences)
+
+
+def test_find_cut_point_prefers_period_then_comma():
+    text = "Une phrase assez longue ici. Et la suite, encore du texte pour dépasser"
+    assert text[:find_cut_point(text, 40)].endswith(".")
+    text = "Un texte sans point mais, avec une virgule et encore"
+    assert text[:find_cut_point(text, 30)].endswith(",")
+
+
+def test_stream_synthesizes_next_sentence_while_playing():
+    agent = _FakeSpeechAgent()
+    stream = SpeechStream(agent, SentenceSegmenter(min_chars=5)).start()
+    for token in "Première phrase. Deuxième phrase. Troisième".split(" "):
+        stream.feed(token + " ")
+    stream.finish()
+    assert stream.wait(timeout=5)
+
+    assert agent.played == ["audio:Première phrase.", "audio:Deuxième phrase.", "audio:Troisième"]
+    # La synthèse de la 2e phrase démarre avant la fin de la lecture de la 1re
+    order = [kind + ":" + text for kind, text in agent.events]
+    assert order.index("synth_start:Deuxième phrase.") < order.index("play_start:Deuxième phrase.")
+    assert stream.time_to_first_audio is not None
+
+
+def test_cancel_stops_pending_sentences():
+    agent = _FakeSpeechAgent()
+    stream = SpeechStream(agent, SentenceSegmenter(min_chars=5)).start()
+    for i in range(10):
+        stream.feed(f"Phrase numéro {i}. ")
+    stream.cancel()
+    assert stream.wait(timeout=5)
+    assert len(agent.played) < 10
+
+
+def test_cancel_interrupts_the_sentence_being_played():
+    agent = _FakeSpeechAgent()
+    agent.play_seconds = 5.0
+    stream = SpeechStream(agent, SentenceSegmenter(min_chars=5)).start()
+    stream.feed("Une longue phrase. ")
+    deadline = time.time() + 2
+    while not stream._playing and time.time() < deadline:
+        time.sleep(0.01)
+
+    start = time.time()
+    stream.cancel()
+    assert stream.wait(timeout=2)
+    assert time.time() - start < 1.0
+    assert agent.played == []
+
+
+def test_sentence_received_after_cancel_is_not_played():
+    agent = _FakeSpeechAgent()
+    stream = SpeechStream(agent)
+    worker = threading.Thread(target=stream._playback_worker)
+    worker.start()
+    time.sleep(0.05)  # lecture bloquée dans get()
+    # Phrase déposée par la synthèse juste après l'annulation
+    stream._cancelled.set()
+    stream._audio.put(("Phrase périmée.", "audio:Phrase périmée."))
+    worker.join(timeout=2)
+    assert not worker.is_alive() and agent.played == []
+
+
+def test_llm_error_discards_stream_before_next_generation():
+    pytest.importorskip("customtkinter")
+    from interface.qaia_interface import QAIAInterface
+
+    agent = _FakeSpeechAgent()
+    ui = SimpleNamespace(
+        logger=logging.getLogger(__name__),
+        _set_status=lambda status: None,
+        _open_speech_stream=lambda: SpeechStream(agent, SentenceSegmenter(min_chars=5)).start(),
+    )
+    QAIAInterface._on_llm_start(ui, {})
+    failed_stream = ui._speech_stream
+    failed_stream.feed("Réponse interrompue par l'erreur")
+    QAIAInterface._on_llm_error(ui, {"error": "contexte dépassé"})
+    assert ui._speech_stream is None
+
+    # Nouvelle génération : nouvelle session, le texte de la génération en erreur n'est pas prononcé
+    QAIAInterface._on_llm_start(ui, {})
+    assert ui._speech_stream is not failed_stream
+    QAIAInterface._on_llm_tokens(ui, [{"token": "Nouvelle réponse."}])
+    ui._speech_stream.finish()
+    assert ui._speech_stream.wait(timeout=5)
+    assert failed_stream.wait(timeout=5)
+    assert agent.played == ["audio:Nouvelle réponse."]
+
+
+def test_cancelled_generation_is_not_spoken():
+    pytest.importorskip("customtkinter")
+    from agents.generation_scheduler import CancellationToken
+    from interface.qaia_interface import QAIAInterface
+
+    agent = _FakeSpeechAgent()
+    ui = SimpleNamespace(
+        logger=logging.getLogger(__name__),
+        _set_status=lambda status: None,
+        _open_speech_stream=lambda: SpeechStream(agent, SentenceSegmenter(min_chars=5)).start(),
+        _generation_token=CancellationToken(),
+    )
+    QAIAInterface._on_llm_start(ui, {})
+    stream = ui._speech_stream
+    QAIAInterface._on_llm_tokens(ui, [{"token": "Réponse abandonnée par"}])
+
+    # Nouvelle prise de parole : session TTS annulée, la fin de la génération coupée n'est pas prononcée
+    QAIAInterface._cancel_generation(ui, "nouvelle prise de parole")
+    assert ui._speech_stream is None
+    QAIAInterface._on_llm_complete(ui, {})
+    assert stream.wait(timeout=5)
+    assert agent.played == []
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du correcteur orthographique (table compilée, cache par mot, index à suppressions symétriques)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import pytest
+
+from utils import spell_checker
+from utils.spell_checker import SymmetricDeleteIndex, _osa_distance, correct_common_errors
+
+
+def test_manual_corrections_single_pass_whole_words():
+    text = "Quest-ce que cest ? CEST une question, pas un cadran."
+    assert correct_common_errors(text) == "qu'est-ce que c'est ? C'EST une question, pas un cadran."
+
+
+def test_symmetric_delete_index_matches_brute_force():
+    words = ["bonjour", "bonsoir", "journée", "journal", "assistante", "assistance", "parle", "perle", "oui"]
+    index = SymmetricDeleteIndex(words, max_distance=2, prefix_length=5)
+
+    for query in ["bonjoru", "jounrée", "assitante", "parl", "ouii", "zzzzzz", "bonjour"]:
+        distances = {w: _osa_distance(query, w, 2) for w in words}
+        best = min(distances.values())
+        expected = {w for w, d in distances.items() if d == best} if best <= 2 else set()
+        assert index.candidates(query) == expected, query
+
+
+def test_unknown_word_correction_is_memoized():
+    pytest.importorskip("spellchecker")
+    if not spell_checker.SPELLCHECKER_AVAILABLE:
+        pytest.skip("pyspellchecker indisponible")
+    spell_checker._correct_word.cache_clear()
+
+    assert spell_checker.correct_spelling("Le developement est pret") == "Le développement est prêt"
+    misses = spell_checker._correct_word.cache_info().misses
+    assert spell_checker.correct_spelling("Le developement avance") == "Le développement avance"
+    assert spell_checker._correct_word.cache_info().misses == misses
+    assert spell_checker.correct_spelling("Je suis QAIA") == "Je suis QAIA"
+
+
+def test_accent_only_candidates_are_preferred():
+    pytest.importorskip("spellchecker")
+    if not spell_checker.SPELLCHECKER_AVAILABLE:
+        pytest.skip("pyspellchecker indisponible")
+    spell_checker._correct_word.cache_clear()
+
+    # pyspellchecker choisirait le candidat le plus fréquent ("entre", "pris")
+    assert spell_checker._correct_word("etre") == "être"
+    assert spell_checker._correct_word("pres") == "près"
+
+
+def test_frequency_ties_are_resolved_deterministically(monkeypatch):
+    pytest.importorskip("spellchecker")
+    if not spell_checker.SPELLCHECKER_AVAILABLE:
+        pytest.skip("pyspellchecker indisponible")
+    spell_checker._correct_word.cache_clear()
+    frequencies = spell_checker.spell_fr.word_frequency.dictionary
+    monkeypatch.setitem(frequencies, "qzyb", 7)
+    monkeypatch.setitem(frequencies, "qzya", 7)
+    monkeypatch.setattr(spell_checker, "_candidates", lambda word: {"qzyb", "qzya"})
+
+    assert spell_checker._correct_word("qzyx") == "qzya"
+    spell_checker._correct_word.cache_clear()
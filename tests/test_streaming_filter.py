@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du filtre incrémental des tokens streaming (préfixes multi-tokens, balises Phi-3)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import pytest
+
+from utils.text_processor import StreamingTokenFilter, filter_streaming_token, process_streamed_text
+
+
+def _run(tokens):
+    token_filter = StreamingTokenFilter()
+    out = [token_filter.feed(token) for token in tokens]
+    out.append(token_filter.flush())
+    return "".join(part for part in out if part)
+
+
+@pytest.mark.parametrize("tokens, expected", [
+    (["(", "17", ":", "30", ")", " Q", "AIA", ":", " Bon", "jour", " !"], "Bonjour !"),
+    (["QAIA", ":", " Salut"], "Salut"),
+    (["(17:30) QAIA: Bonjour"], "Bonjour"),
+    (["Fin", "<|", "end", "|>"], "Fin"),
+    (["Il est", " (", "12", ":", "30", ") QAIA:", " la suite"], "Il est  la suite"),
+])
+def test_prefixes_and_tags_split_across_tokens_are_removed(tokens, expected):
+    assert _run(tokens) == expected
+
+
+@pytest.mark.parametrize("tokens", [
+    ["Q", "u'", "est", "-ce"],
+    ["12", " euros", " (", "TTC", ")."],
+    ["Bonjour", "\n", "- a"],
+    ["Prix < 5", " ok"],
+    ["Ok", " (", "voir"],
+])
+def test_legitimate_text_is_kept(tokens):
+    assert _run(tokens) == "".join(tokens)
+
+
+def test_ambiguous_text_is_only_held_until_next_token():
+    token_filter = StreamingTokenFilter()
+    assert token_filter.feed("Voir") == "Voir"
+    assert token_filter.feed(" (") == " "
+    assert token_filter.feed("annexe") == "(annexe"
+
+
+def test_stateless_filter_returns_text_after_prefix():
+    assert filter_streaming_token("(15:33) QAIA: Bonjour") == "Bonjour"
+    assert filter_streaming_token("(") is None
+    assert filter_streaming_token("Bon") == "Bon"
+
+
+def test_streamed_text_bpe_corrections_in_one_pass():
+    text = "(10:00) QAIA: O ui je par le fran çais. Q A IA est là."
+    assert process_streamed_text(text).startswith("Oui parle français. QAIA est là")
+
+
+def test_streamed_generation_feeds_each_token_to_one_filter(monkeypatch):
+    """Flux `process_query_stream` : un seul `feed` par token (le callback ignore la génération)."""
+    from types import SimpleNamespace
+
+    import agents.llm_runtime as llm_runtime_module
+    import agents.prompt_cache as prompt_cache_module
+    import agents.rag_agent as rag_agent
+    from agents.callbacks.streaming_callback import StreamingCallback
+
+    feeds = []
+    original_feed = StreamingTokenFilter.feed
+
+    def _counting_feed(self, token):
+        feeds.append(token)
+        return original_feed(self, token)
+
+    monkeypatch.setattr(StreamingTokenFilter, "feed", _counting_feed)
+    callback = StreamingCallback()
+    tokens = ["(", "17", ":", "30", ")", " QAIA", ":", " Bon", "jour"]
+
+    def _stream(prompt, source="rag", tags=None):
+        # Générateur LangChain : callbacks appelés avec les tags de la génération
+        callback.on_llm_start({}, [prompt], tags=tags)
+        for token in tokens:
+            callback.on_llm_new_token(token, tags=tags)
+            yield token
+        callback.on_llm_end(None, tags=tags)
+
+    monkeypatch.setattr(llm_runtime_module, "llm_runtime", SimpleNamespace(stream=_stream))
+    monkeypatch.setattr(
+        prompt_cache_module, "prompt_cache",
+        SimpleNamespace(is_cached=lambda prompt: False, record_ttft=lambda *a: None),
+    )
+    monkeypatch.setattr(rag_agent, "rag_engine", SimpleNamespace(generator=object()))
+
+    out = "".join(rag_agent.process_query_stream("Bonjour", k_results=0))
+
+    assert out == "Bonjour"
+    assert feeds == tokens
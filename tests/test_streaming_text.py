@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du rendu tamponné de StreamingTextDisplay (insertions regroupées, ordre en-tête/tokens)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+
+import pytest
+
+pytest.importorskip("customtkinter")
+
+from interface.components.streaming_text import StreamingTextDisplay
+
+
+class _FakeDisplay(StreamingTextDisplay):
+    """StreamingTextDisplay sans Tk : texte en mémoire, `after` mis en file."""
+
+    def __init__(self):
+        self.text = ""
+        self.inserts = []
+        self.scheduled = []
+        self._current_speaker = None
+        self._current_timestamp = None
+        self._is_streaming = False
+        self._streamed_text = ""
+        self._stream_start_index = "1.0"
+        self._previous_token = None
+        self._buffer_lock = threading.Lock()
+        self._pending = []
+        self._flush_scheduled = False
+        self._last_flush = 0.0
+
+    def configure(self, **kwargs):
+        pass
+
+    def see(self, index):
+        pass
+
+    def index(self, index):
+        return f"1.0+{len(self.text)}c"
+
+    def insert(self, index, text, *tags):
+        self.text += text
+        self.inserts.append(text)
+
+    def after(self, delay_ms, callback):
+        self.scheduled.append((delay_ms, callback))
+
+    def run_scheduled(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for _, callback in scheduled:
+            callback()
+
+
+def test_tokens_are_flushed_in_one_insert():
+    display = _FakeDisplay()
+    display.start_generation("QAIA", "12:00")
+    header_inserts = len(display.inserts)
+
+    for token in ["Bonjour", ",", " comment", " allez", "-vous", " ?"]:
+        display.queue_token(token)
+
+    # Un seul flush planifié pour tout le lot
+    assert len(display.scheduled) == 1
+    display.run_scheduled()
+    assert len(display.inserts) == header_inserts + 1
+    assert display.text.endswith("Bonjour, comment allez-vous ?")
+    assert display.get_streamed_text() == "Bonjour, comment allez-vous ?"
+
+
+def test_tokens_queued_before_header_are_rendered_after_it():
+    display = _FakeDisplay()
+    display.reset_stream()
+    display.queue_token("Salut")
+    display.run_scheduled()  # flush avant start_generation : rien n'est inséré
+    assert display.text == ""
+
+    display.start_generation("QAIA", "12:00", reset=False)
+    display.queue_token(" !")
+    display.complete_generation()
+
+    assert display.text == "(12:00) QAIA: Salut !\n"
+
+
+def test_flush_delay_is_capped_by_interval():
+    display = _FakeDisplay()
+    display.start_generation("QAIA", "12:00")
+    display.queue_token("a")
+    display.run_scheduled()
+    display.queue_token("b")
+
+    delay_ms, _ = display.scheduled[0]
+    assert 0 < delay_ms <= StreamingTextDisplay.FLUSH_INTERVAL_MS
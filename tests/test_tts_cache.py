@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du cache audio TTS (clé normalisée, LRU mémoire/disque, écriture différée, compteurs)."""
+
+# /// script
+# dependencies = [
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+
+from agents.audio_output import PcmAudio
+from agents.tts_cache import TtsAudioCache, make_cache_key
+
+
+def _audio(n_samples=1000, value=1):
+    return PcmAudio(value.to_bytes(2, "little", signed=True) * n_samples, 22050)
+
+
+def test_key_normalizes_text_and_includes_voice_and_speed():
+    key = make_cache_key("Bonjour,  comment\nallez-vous ?", "siwis", 1.2)
+    assert key == make_cache_key(" Bonjour, comment allez-vous ? ", "siwis", 1.2)
+    assert key != make_cache_key("Bonjour, comment allez-vous ?", "upmc", 1.2)
+    assert key != make_cache_key("Bonjour, comment allez-vous ?", "siwis", 1.0)
+
+
+def test_memory_hit_and_disk_persistence(tmp_path):
+    cache = TtsAudioCache(tmp_path)
+    audio = _audio()
+    assert cache.get("Commande annulée.", "siwis", 1.2) is None
+    assert cache.put("Commande annulée.", "siwis", 1.2, audio)
+    assert cache.get("Commande annulée.", "siwis", 1.2) is audio
+    cache.flush()
+
+    # Nouvelle session : servi depuis le disque puis remonté en mémoire
+    reopened = TtsAudioCache(tmp_path)
+    assert reopened.get("Commande annulée.", "siwis", 1.2) == audio
+    assert reopened.get("Commande annulée.", "siwis", 1.2) == audio
+    stats = reopened.get_stats()
+    assert (stats["hits_disk"], stats["hits_memory"], stats["misses"]) == (1, 1, 0)
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_byte_bounded_eviction(tmp_path):
+    audio = _audio(1000)  # 2000 octets de PCM
+    wav_size = len(audio.to_wav_bytes())
+    cache = TtsAudioCache(tmp_path, max_memory_bytes=4500, max_disk_bytes=2 * wav_size)
+    for i in range(3):
+        cache.put(f"phrase {i}", "siwis", 1.2, audio)
+    cache.flush()
+    cache.get("phrase 1", "siwis", 1.2)
+    cache.put("phrase 3", "siwis", 1.2, audio)
+    cache.flush()
+
+    stats = cache.get_stats()
+    assert stats["memory_bytes"] <= 4500
+    assert stats["disk_bytes"] <= 2 * wav_size
+    assert len(list(tmp_path.glob("*.wav"))) == 2
+    cache.clear_memory()
+    # Les moins récemment utilisées ont été évincées du disque
+    assert cache.get("phrase 0", "siwis", 1.2) is None
+    assert cache.get("phrase 1", "siwis", 1.2) == audio
+
+
+def test_long_text_not_cached(tmp_path):
+    cache = TtsAudioCache(tmp_path, max_text_chars=10)
+    assert not cache.put("une phrase bien trop longue", "siwis", 1.2, _audio())
+    assert cache.get_stats()["disk_entries"] == 0
+
+
+def test_disk_write_is_off_the_put_path(tmp_path):
+    cache = TtsAudioCache(tmp_path)
+    release = threading.Event()
+    write_disk = cache._write_disk
+    cache._write_disk = lambda key, audio: (release.wait(5), write_disk(key, audio))
+
+    audio = _audio()
+    assert cache.put("Bonjour.", "siwis", 1.2, audio)
+    # Servi depuis la mémoire alors que le WAV n'est pas encore écrit
+    assert cache.get("Bonjour.", "siwis", 1.2) is audio
+    assert not list(tmp_path.glob("*.wav"))
+
+    release.set()
+    cache.flush()
+    assert len(list(tmp_path.glob("*.wav"))) == 1
+    assert cache.get_stats()["disk_entries"] == 1
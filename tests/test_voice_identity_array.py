@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests de l'identification vocale sur tampon mémoire (sans fichier WAV)."""
+
+# /// script
+# dependencies = [
+#   "numpy>=1.22.0",
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import logging
+
+import numpy as np
+
+from agents.voice_identity.identity_service import VoiceIdentityService
+from agents.voice_identity.profile_manager import VoiceProfileManager
+
+
+class _FakeExtractor:
+    """Empreinte = moyenne signée du tampon (aucun modèle chargé)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def extraire_empreinte_array(self, audio, sample_rate, pooling="mean"):
+        self.calls.append((audio.dtype, len(audio), sample_rate))
+        return np.array([1.0, 0.0]) if audio.mean() > 0 else np.array([0.0, 1.0])
+
+    def extraire_empreinte(self, audio_path, pooling="mean"):
+        raise AssertionError("aucune lecture de fichier attendue")
+
+
+def _manager(tmp_path):
+    manager = VoiceProfileManager.__new__(VoiceProfileManager)
+    manager.logger = logging.getLogger("test")
+    manager.profiles_dir = tmp_path
+    manager.similarity_threshold = 0.75
+    manager.extractor = _FakeExtractor()
+    np.save(tmp_path / "alice.npy", np.array([1.0, 0.0]))
+    np.save(tmp_path / "bob.npy", np.array([0.0, 1.0]))
+    return manager
+
+
+def test_identify_array_matches_profile_from_buffer(tmp_path):
+    manager = _manager(tmp_path)
+    audio = np.full(16000, 0.1, dtype=np.float32)
+
+    assert manager.identify_array(audio, 16000) == ("alice", 1.0)
+    assert manager.identify_array(-audio, 16000) == ("bob", 1.0)
+    assert manager.extractor.calls[0] == (np.float32, 16000, 16000)
+
+
+def test_identity_service_identify_array_adds_metadata(tmp_path):
+    manager = _manager(tmp_path)
+    (tmp_path / "alice_metadata.json").write_text('{"prenom": "Alice"}', encoding="utf-8")
+    service = VoiceIdentityService(profile_manager=manager)
+
+    identity = service.identify_array(np.full(8000, 0.2, dtype=np.float32), 16000)
+    assert identity["speaker_id"] == "alice"
+    assert identity["prenom"] == "Alice"
+
+    manager.similarity_threshold = 1.5
+    assert service.identify_array(np.full(8000, 0.2, dtype=np.float32), 16000) is None
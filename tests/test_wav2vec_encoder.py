@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""Tests du registre wav2vec2 partagé (passe unique logits + empreinte, inférence par fenêtres)."""
+
+# /// script
+# dependencies = [
+#   "torch>=2.0.0",
+#   "transformers>=4.26.0",
+#   "pytest>=7.0.0"
+# ]
+# ///
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC
+
+from agents import wav2vec_encoder
+from agents.wav2vec_encoder import SharedWav2Vec2, Wav2Vec2Registry, audio_fingerprint, plan_windows
+
+
+def _tiny_shared():
+    """Modèle wav2vec2 minuscule (poids aléatoires, aucun téléchargement)."""
+    torch.manual_seed(0)
+    config = Wav2Vec2Config(
+        vocab_size=12, hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=32, conv_dim=(8, 8), conv_stride=(5, 4), conv_kernel=(10, 4),
+        num_conv_pos_embeddings=4, num_conv_pos_embedding_groups=2,
+    )
+    shared = SharedWav2Vec2.__new__(SharedWav2Vec2)
+    shared.model_name, shared.device = "tiny", "cpu"
+    shared.model = Wav2Vec2ForCTC(config).eval()
+    shared._recent, shared._recent_lock = OrderedDict(), threading.Lock()
+    return shared
+
+
+def test_forward_matches_ctc_model_and_remembers_embedding():
+    shared = _tiny_shared()
+    audio = np.random.default_rng(0).standard_normal(1600).astype(np.float32) * 0.1
+    inputs = {"input_values": torch.from_numpy(audio).unsqueeze(0)}
+    fingerprint = audio_fingerprint(audio, 16000)
+
+    output = shared.forward(inputs, fingerprint=fingerprint)
+    with torch.no_grad():
+        expected = shared.model(**inputs).logits
+    assert torch.allclose(output.logits, expected, atol=1e-6)
+    assert abs(np.linalg.norm(output.pooled) - 1.0) < 1e-5
+    assert np.allclose(shared.embed(inputs), output.pooled, atol=1e-6)
+    assert shared.pooled_for(fingerprint) is output.pooled
+    assert shared.pooled_for(audio_fingerprint(audio * 2, 16000)) is None
+
+
+def test_registry_shares_and_refcounts(monkeypatch):
+    loads = []
+
+    class _FakeShared:
+        def __init__(self, model_name, device="cpu"):
+            self.model_name, self.device = model_name, device
+            loads.append(model_name)
+
+    monkeypatch.setattr(wav2vec_encoder, "SharedWav2Vec2", _FakeShared)
+    registry = Wav2Vec2Registry()
+    stt = registry.acquire("xlsr-fr")
+    identity = registry.acquire("xlsr-fr")
+    assert stt is identity and loads == ["xlsr-fr"]
+
+    registry.release(stt)
+    assert registry.get_stats() == {"xlsr-fr (cpu)": 1}
+    registry.release(identity)
+    assert registry.get_stats() == {}
+    assert registry.acquire("xlsr-fr") is not stt
+    assert loads == ["xlsr-fr", "xlsr-fr"]
+
+
+def test_plan_windows_tiles_buffer_with_aligned_context():
+    windows = plan_windows(10_000, chunk_samples=1600, stride_samples=320, align=20)
+    # Zones attribuées contiguës, du début à la fin du tampon
+    assert windows[0][2] == 0 and windows[-1][3] == 10_000
+    for (_, _, _, keep_end), (_, _, keep_start, _) in zip(windows, windows[1:]):
+        assert keep_end == keep_start
+    for start, end, keep_start, keep_end in windows:
+        assert end - start <= 1600 and start % 20 == 0 and keep_start % 20 == 0
+        # Contexte complet autour de chaque jointure
+        assert keep_start == 0 or keep_start - start >= 320
+        assert keep_end == 10_000 or end - keep_end >= 320
+    assert plan_windows(1000, 1600, 320) == [(0, 1000, 0, 1000)]
+
+
+def test_forward_chunked_merges_to_full_length_and_batches_consistently():
+    shared = _tiny_shared()
+    audio = np.random.default_rng(1).standard_normal(16_000).astype(np.float32) * 0.1
+    inputs = {"input_values": torch.from_numpy(audio).unsqueeze(0)}
+
+    full = shared.forward(inputs)
+    chunked = shared.forward_chunked(inputs, chunk_samples=3200, stride_samples=640, batch_size=1)
+    batched = shared.forward_chunked(
+        inputs, chunk_samples=3200, stride_samples=640, batch_size=4, fingerprint="long"
+    )
+
+    # Même nombre de trames qu'une passe complète, raccord sans trou ni doublon
+    assert chunked.logits.shape == full.logits.shape
+    assert torch.allclose(chunked.logits, batched.logits, atol=1e-5)
+    assert abs(np.linalg.norm(batched.pooled) - 1.0) < 1e-5
+    assert shared.pooled_for("long") is batched.pooled
+    # Chaque trame conservée provient de la zone centrale de sa fenêtre
+    for start, end, keep_start, keep_end in plan_windows(16_000, 3200, 640, align=20)[:-1]:
+        window = shared.forward({"input_values": inputs["input_values"][:, start:end]}).logits
+        expected = window[:, (keep_start - start) // 20:(keep_end - start) // 20]
+        assert torch.allclose(chunked.logits[:, keep_start // 20:keep_end // 20], expected, atol=1e-5)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# \QAIA\
+
+"""
+Chargement et découpage d'un document, exécutable dans un processus du pool
+d'ingestion RAG (`agents.rag_ingestion.iter_parsed_files`).
+
+Module volontairement léger : un processus lancé en `forkserver`/`spawn`
+importe le module de la fonction qu'il exécute. Le placer hors du paquet
+`agents` évite d'y charger `agents/__init__` (torch, transformers,
+langchain, modèles audio) pour analyser quelques fichiers.
+"""
+
+# /// script
+# dependencies = []
+# ///
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+_worker_loaders: Dict[str, Callable[[str], Any]] = {}
+_worker_splitter: Any = None
+
+
+def init_worker(loaders: Dict[str, Callable[[str], Any]], text_splitter: Any) -> None:
+    """Initialise un processus du pool (loaders et découpeur transmis une seule fois)."""
+    global _worker_loaders, _worker_splitter
+    _worker_loaders = loaders
+    _worker_splitter = text_splitter
+
+
+def parse_file(path: str, loaders: Dict[str, Callable[[str], Any]], text_splitter: Any) -> List[Any]:
+    """
+    Charge un fichier avec le loader de son extension puis le découpe en chunks.
+
+    Args:
+        path (str): Fichier à charger
+        loaders (Dict[str, Callable[[str], Any]]): Classe de loader par extension
+        text_splitter (Any): Découpeur langchain (None = documents non découpés)
+
+    Returns:
+        List[Any]: Documents ou chunks langchain ([] si l'extension n'est pas supportée)
+    """
+    loader_cls = loaders.get(Path(path).suffix.lower())
+    if loader_cls is None:
+        return []
+    docs = loader_cls(path).load()
+    if text_splitter is not None and docs:
+        return text_splitter.split_documents(docs)
+    return docs
+
+
+def parse_in_worker(path: str) -> List[Any]:
+    """`parse_file` dans un processus du pool."""
+    return parse_file(path, _worker_loaders, _worker_splitter)
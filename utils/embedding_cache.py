@@ -3,6 +3,17 @@
 """
 Cache d'embeddings pour QAIA
 Gère la mise en cache des embeddings pour optimiser les performances
+
+Stockage : une matrice float32 contiguë [lignes, dimension] en mmap
+(`vectors.f32`), alignée ligne à ligne avec les clés compactes (`keys.bin`,
+blake2b 16 octets de `modèle\\0texte`) et les dates d'accès (`access.f64`,
+0 = ligne libre). L'index clé → ligne est reconstruit en mémoire à
+l'ouverture.
+
+- `get_many` / `put_many` : un lot de textes = un accès indexé à la matrice
+- Écriture différée : seules les lignes modifiées (pages sales du mmap) sont
+  écrites, à intervalle (`flush_interval_s`), sur `flush()` ou à la sortie
+- Éviction LRU quand la taille totale dépasse `max_bytes`
 """
 
 # /// script
@@ -11,342 +22,505 @@ Gère la mise en cache des embeddings pour optimiser les performances
 # ]
 # ///
 
-import os
-import pickle
+import atexit
 import hashlib
 import json
 import time
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union, Tuple
+from typing import Dict, List, Any, Optional, Sequence, Set, Tuple
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+_KEY_BYTES = 16
+_META_FILE = "meta.json"
+_VECTORS_FILE = "vectors.f32"
+_KEYS_FILE = "keys.bin"
+_ACCESS_FILE = "access.f64"
+# Octets par ligne hors vecteur : clé + date d'accès
+_ROW_OVERHEAD = _KEY_BYTES + 8
+# Après éviction, la taille est ramenée à cette fraction de max_bytes
+_EVICTION_TARGET = 0.9
+
+
+def _cache_config() -> Dict[str, Any]:
+    try:
+        from config.system_config import RAG_CONFIG
+        return RAG_CONFIG.get("embedding_cache", {})
+    except ImportError:
+        return {}
+
+
 class EmbeddingCache:
     """Cache d'embeddings pour optimiser les performances"""
-    
-    def __init__(self, cache_dir: Optional[Path] = None, max_size: int = 1000):
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+        flush_interval_s: Optional[float] = None,
+    ):
         """
         Initialise le cache d'embeddings.
-        
+
         Args:
             cache_dir (Optional[Path]): Répertoire de cache
-            max_size (int): Taille maximale du cache
+            max_bytes (Optional[int]): Taille maximale (vecteurs + index), défaut RAG_CONFIG
+            flush_interval_s (Optional[float]): Intervalle d'écriture différée (0 = écriture à chaque ajout)
         """
-        self.cache_dir = cache_dir or Path(__file__).parent.parent / "cache" / "embeddings"
+        config = _cache_config()
+        self.cache_dir = Path(cache_dir or config.get("dir") or Path(__file__).parent.parent / "cache" / "embeddings")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
-        self.max_size = max_size
-        self.cache_data = {}
-        self.cache_metadata = {}
-        self.access_times = {}
-        
+        self.max_bytes = int(max_bytes if max_bytes is not None else config.get("max_bytes", 256 * 1024 * 1024))
+        self.flush_interval_s = float(
+            flush_interval_s if flush_interval_s is not None else config.get("flush_interval_s", 5.0)
+        )
+
+        self._lock = threading.RLock()
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._access: Optional[np.memmap] = None
+        self._rows: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._dirty: Set[int] = set()
+        self._meta_dirty = False
+        self._last_flush = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
         # Charger le cache existant
         self._load_cache()
-        
-    def _get_cache_key(self, text: str, model_name: str) -> str:
+
+    # ---------- Stockage ----------
+    @staticmethod
+    def _get_cache_key(text: str, model_name: str) -> bytes:
         """
-        Génère une clé de cache pour un texte et un modèle.
-        
+        Génère la clé compacte d'un texte pour un modèle.
+
         Args:
             text (str): Texte à cacher
             model_name (str): Nom du modèle
-            
+
         Returns:
-            str: Clé de cache
+            bytes: Empreinte blake2b de 16 octets
         """
-        content = f"{model_name}:{text}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
-    
-    def _get_cache_file_path(self, cache_key: str) -> Path:
+        content = f"{model_name}\0{text}".encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(content, digest_size=_KEY_BYTES).digest()
+
+    @property
+    def row_bytes(self) -> int:
+        """Octets occupés par une entrée (vecteur + clé + date d'accès)."""
+        return (self._dim or 0) * 4 + _ROW_OVERHEAD
+
+    @property
+    def max_entries(self) -> int:
+        """Nombre d'entrées tenant dans `max_bytes` (dimension connue)."""
+        return max(1, self.max_bytes // self.row_bytes) if self._dim else 0
+
+    def _open_maps(self) -> None:
+        """(Ré)ouvre les trois fichiers en mmap à la capacité courante."""
+        shape = (self._capacity,)
+        self._vectors = np.memmap(self.cache_dir / _VECTORS_FILE, dtype=np.float32, mode="r+", shape=(self._capacity, self._dim))
+        self._keys = np.memmap(self.cache_dir / _KEYS_FILE, dtype=np.uint8, mode="r+", shape=(self._capacity, _KEY_BYTES))
+        self._access = np.memmap(self.cache_dir / _ACCESS_FILE, dtype=np.float64, mode="r+", shape=shape)
+
+    def _resize_files(self, capacity: int) -> None:
+        """Étend les fichiers (zéros = lignes libres) ; le contenu existant n'est pas recopié."""
+        for name, row_size in (
+            (_VECTORS_FILE, self._dim * 4),
+            (_KEYS_FILE, _KEY_BYTES),
+            (_ACCESS_FILE, 8),
+        ):
+            with open(self.cache_dir / name, "ab") as f:
+                f.truncate(capacity * row_size)
+
+    def _load_cache(self):
+        """Ouvre la matrice persistée et reconstruit l'index clé → ligne"""
+        try:
+            meta_file = self.cache_dir / _META_FILE
+            if not meta_file.exists():
+                logger.info("Aucun cache d'embeddings existant trouvé")
+                return
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            self._dim = int(meta["dim"])
+            self._capacity = int(meta["capacity"])
+            self._resize_files(self._capacity)
+            self._open_maps()
+            used = np.flatnonzero(self._access > 0)
+            keys = self._keys[used].tobytes()
+            self._rows = {
+                keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]: int(row) for i, row in enumerate(used)
+            }
+            self._free = np.flatnonzero(self._access == 0)[::-1].tolist()
+            logger.info(f"Cache d'embeddings chargé: {len(self._rows)} entrées (dimension {self._dim})")
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du cache: {e}")
+            self._reset_memory()
+
+    def _reset_memory(self) -> None:
+        self._vectors = self._keys = self._access = None
+        self._dim = None
+        self._capacity = 0
+        self._rows = {}
+        self._free = []
+        self._dirty = set()
+
+    def _initialize(self, dim: int) -> None:
+        """Crée les fichiers au premier ajout (la dimension fixe la largeur de la matrice)."""
+        self._dim = int(dim)
+        self._capacity = 0
+        for name in (_VECTORS_FILE, _KEYS_FILE, _ACCESS_FILE):
+            (self.cache_dir / name).write_bytes(b"")
+        self._meta_dirty = True
+
+    def _grow(self, needed: int) -> None:
+        """Double la capacité jusqu'à disposer de `needed` lignes libres."""
+        if len(self._free) >= needed:
+            return
+        # Croissance bornée par max_bytes : l'éviction précède toujours l'agrandissement
+        capacity = min(max(64, self._capacity * 2), self.max_entries + needed)
+        capacity = max(capacity, self._capacity + needed - len(self._free))
+        if self._vectors is not None:
+            self._flush_maps()
+        self._vectors = self._keys = self._access = None
+        self._resize_files(capacity)
+        self._free = list(range(capacity - 1, self._capacity - 1, -1)) + self._free
+        self._capacity = capacity
+        self._open_maps()
+        self._meta_dirty = True
+
+    def _evict(self, incoming: int) -> None:
+        """Libère les lignes les moins récemment utilisées pour rester sous `max_bytes`."""
+        limit = self.max_entries
+        if len(self._rows) + incoming <= limit:
+            return
+        target = max(0, int(limit * _EVICTION_TARGET) - incoming)
+        count = len(self._rows) - target
+        if count <= 0:
+            return
+        used = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        if count < len(used):
+            victims = used[np.argpartition(self._access[used], count - 1)[:count]]
+        else:
+            victims = used
+        keys = self._keys[victims].tobytes()
+        for i in range(len(victims)):
+            self._rows.pop(keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES], None)
+        self._access[victims] = 0.0
+        self._keys[victims] = 0
+        self._free.extend(int(row) for row in victims)
+        self._dirty.update(int(row) for row in victims)
+        self._evictions += len(victims)
+        logger.debug(f"Cache d'embeddings: {len(victims)} entrée(s) évincée(s) (LRU)")
+
+    # ---------- Persistance ----------
+    def _flush_maps(self) -> None:
+        for array in (self._vectors, self._keys, self._access):
+            if array is not None:
+                array.flush()
+
+    def flush(self) -> None:
+        """Écrit les lignes modifiées depuis la dernière écriture (et les métadonnées si besoin)."""
+        with self._lock:
+            try:
+                if self._dirty:
+                    # msync : le noyau n'écrit que les pages touchées, donc les seules lignes sales
+                    self._flush_maps()
+                    self._dirty.clear()
+                if self._meta_dirty and self._dim is not None:
+                    tmp = self.cache_dir / (_META_FILE + ".tmp")
+                    tmp.write_text(
+                        json.dumps({"dim": self._dim, "capacity": self._capacity, "key_bytes": _KEY_BYTES}),
+                        encoding="utf-8",
+                    )
+                    tmp.replace(self.cache_dir / _META_FILE)
+                    self._meta_dirty = False
+                self._last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde du cache: {e}")
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    # ---------- Accès par lot ----------
+    def get_many(self, texts: Sequence[str], model_name: str) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Récupère le chemin du fichier de cache.
-        
+        Récupère les embeddings d'un lot de textes.
+
         Args:
-            cache_key (str): Clé de cache
-            
+            texts (Sequence[str]): Textes
+            model_name (str): Nom du modèle
+
         Returns:
-            Path: Chemin du fichier
+            Tuple[np.ndarray, np.ndarray]: (matrice [n, dimension], masque des textes trouvés) ;
+                les lignes absentes valent zéro
         """
-        return self.cache_dir / f"{cache_key}.pkl"
-    
-    def _get_metadata_file_path(self) -> Path:
+        with self._lock:
+            if self._dim is None:
+                self._misses += len(texts)
+                return np.zeros((len(texts), 0), dtype=np.float32), np.zeros(len(texts), dtype=bool)
+            rows = np.fromiter(
+                (self._rows.get(self._get_cache_key(text, model_name), -1) for text in texts),
+                dtype=np.int64,
+                count=len(texts),
+            )
+            hit = rows >= 0
+            result = np.zeros((len(texts), self._dim), dtype=np.float32)
+            if hit.any():
+                found = rows[hit]
+                result[hit] = self._vectors[found]
+                self._access[found] = time.time()
+                self._dirty.update(found.tolist())
+            n_hits = int(hit.sum())
+            self._hits += n_hits
+            self._misses += len(texts) - n_hits
+            return result, hit
+
+    def put_many(self, texts: Sequence[str], model_name: str, embeddings: Any) -> bool:
         """
-        Récupère le chemin du fichier de métadonnées.
-        
+        Ajoute (ou remplace) les embeddings d'un lot de textes.
+
+        Args:
+            texts (Sequence[str]): Textes
+            model_name (str): Nom du modèle
+            embeddings (Any): Matrice [n, dimension] (ou liste de vecteurs)
+
         Returns:
-            Path: Chemin du fichier
+            bool: True si succès
         """
-        return self.cache_dir / "metadata.json"
-    
-    def _load_cache(self):
-        """Charge le cache depuis le disque"""
-        try:
-            metadata_file = self._get_metadata_file_path()
-            if metadata_file.exists():
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    self.cache_metadata = json.load(f)
-                
-                # Charger les embeddings les plus récents
-                for cache_key, metadata in list(self.cache_metadata.items())[:self.max_size]:
-                    cache_file = self._get_cache_file_path(cache_key)
-                    if cache_file.exists():
-                        try:
-                            with open(cache_file, 'rb') as f:
-                                self.cache_data[cache_key] = pickle.load(f)
-                            self.access_times[cache_key] = metadata.get('last_access', time.time())
-                        except Exception as e:
-                            logger.warning(f"Erreur lors du chargement du cache {cache_key}: {e}")
-                            
-                logger.info(f"Cache d'embeddings chargé: {len(self.cache_data)} entrées")
-            else:
-                logger.info("Aucun cache d'embeddings existant trouvé")
-                
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement du cache: {e}")
-            self.cache_data = {}
-            self.cache_metadata = {}
-            self.access_times = {}
-    
-    def _save_cache(self):
-        """Sauvegarde le cache sur le disque"""
+        if not len(texts):
+            return True
         try:
-            # Sauvegarder les métadonnées
-            metadata_file = self._get_metadata_file_path()
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache_metadata, f, indent=2, ensure_ascii=False)
-            
-            # Sauvegarder les embeddings
-            for cache_key, embedding in self.cache_data.items():
-                cache_file = self._get_cache_file_path(cache_key)
-                with open(cache_file, 'wb') as f:
-                    pickle.dump(embedding, f)
-                    
-            logger.debug(f"Cache d'embeddings sauvegardé: {len(self.cache_data)} entrées")
-            
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+                raise ValueError(f"forme {matrix.shape} incompatible avec {len(texts)} texte(s)")
+            with self._lock:
+                if self._dim is None:
+                    self._initialize(matrix.shape[1])
+                elif matrix.shape[1] != self._dim:
+                    raise ValueError(f"dimension {matrix.shape[1]} ≠ {self._dim} (vider le cache après un changement de modèle)")
+
+                keys = [self._get_cache_key(text, model_name) for text in texts]
+                incoming = len({key for key in keys if key not in self._rows})
+                self._evict(incoming)
+                self._grow(incoming)
+
+                rows = np.empty(len(keys), dtype=np.int64)
+                for i, key in enumerate(keys):
+                    row = self._rows.get(key)
+                    if row is None:
+                        row = self._free.pop()
+                        self._rows[key] = row
+                    rows[i] = row
+                self._vectors[rows] = matrix
+                self._keys[rows] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, _KEY_BYTES)
+                self._access[rows] = time.time()
+                self._dirty.update(rows.tolist())
+                self._maybe_flush()
+            return True
         except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde du cache: {e}")
-    
-    def _cleanup_cache(self):
-        """Nettoie le cache en supprimant les entrées les plus anciennes"""
-        if len(self.cache_data) <= self.max_size:
-            return
-            
-        # Trier par temps d'accès
-        sorted_items = sorted(self.access_times.items(), key=lambda x: x[1])
-        
-        # Supprimer les entrées les plus anciennes
-        items_to_remove = len(self.cache_data) - self.max_size
-        for i in range(items_to_remove):
-            cache_key = sorted_items[i][0]
-            
-            # Supprimer du cache en mémoire
-            if cache_key in self.cache_data:
-                del self.cache_data[cache_key]
-            if cache_key in self.cache_metadata:
-                del self.cache_metadata[cache_key]
-            if cache_key in self.access_times:
-                del self.access_times[cache_key]
-            
-            # Supprimer le fichier de cache
-            cache_file = self._get_cache_file_path(cache_key)
-            if cache_file.exists():
-                try:
-                    cache_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la suppression du fichier {cache_file}: {e}")
-        
-        logger.info(f"Cache nettoyé: {items_to_remove} entrées supprimées")
-    
+            logger.error(f"Erreur lors de l'ajout au cache: {e}")
+            return False
+
+    # ---------- Accès unitaire ----------
     def get(self, text: str, model_name: str) -> Optional[np.ndarray]:
         """
         Récupère un embedding depuis le cache.
-        
+
         Args:
             text (str): Texte
             model_name (str): Nom du modèle
-            
+
         Returns:
             Optional[np.ndarray]: Embedding ou None si non trouvé
         """
         try:
-            cache_key = self._get_cache_key(text, model_name)
-            
-            if cache_key in self.cache_data:
-                # Mettre à jour le temps d'accès
-                self.access_times[cache_key] = time.time()
-                self.cache_metadata[cache_key]['last_access'] = time.time()
-                
-                logger.debug(f"Embedding trouvé dans le cache: {cache_key[:8]}...")
-                return self.cache_data[cache_key]
-            
-            return None
-            
+            vectors, hit = self.get_many([text], model_name)
+            return vectors[0] if hit[0] else None
         except Exception as e:
             logger.error(f"Erreur lors de la récupération du cache: {e}")
             return None
-    
+
     def put(self, text: str, model_name: str, embedding: np.ndarray) -> bool:
         """
         Ajoute un embedding au cache.
-        
+
         Args:
             text (str): Texte
             model_name (str): Nom du modèle
             embedding (np.ndarray): Embedding à cacher
-            
+
         Returns:
             bool: True si succès
         """
-        try:
-            cache_key = self._get_cache_key(text, model_name)
-            current_time = time.time()
-            
-            # Ajouter au cache
-            self.cache_data[cache_key] = embedding.copy()
-            self.access_times[cache_key] = current_time
-            self.cache_metadata[cache_key] = {
-                'text': text[:100] + "..." if len(text) > 100 else text,
-                'model_name': model_name,
-                'created_at': current_time,
-                'last_access': current_time,
-                'size': embedding.nbytes
-            }
-            
-            # Nettoyer le cache si nécessaire
-            self._cleanup_cache()
-            
-            # Sauvegarder périodiquement
-            if len(self.cache_data) % 10 == 0:
-                self._save_cache()
-            
-            logger.debug(f"Embedding ajouté au cache: {cache_key[:8]}...")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de l'ajout au cache: {e}")
-            return False
-    
+        return self.put_many([text], model_name, np.ravel(embedding)[None, :])
+
+    # ---------- Maintenance ----------
     def clear(self):
         """Vide le cache"""
-        try:
-            # Supprimer tous les fichiers de cache
-            for cache_file in self.cache_dir.glob("*.pkl"):
-                try:
-                    cache_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la suppression de {cache_file}: {e}")
-            
-            # Supprimer le fichier de métadonnées
-            metadata_file = self._get_metadata_file_path()
-            if metadata_file.exists():
-                try:
-                    metadata_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la suppression de {metadata_file}: {e}")
-            
-            # Vider la mémoire
-            self.cache_data.clear()
-            self.cache_metadata.clear()
-            self.access_times.clear()
-            
-            logger.info("Cache d'embeddings vidé")
-            
-        except Exception as e:
-            logger.error(f"Erreur lors du vidage du cache: {e}")
-    
+        with self._lock:
+            try:
+                self._reset_memory()
+                for name in (_META_FILE, _VECTORS_FILE, _KEYS_FILE, _ACCESS_FILE):
+                    path = self.cache_dir / name
+                    if path.exists():
+                        path.unlink()
+                self._meta_dirty = False
+                logger.info("Cache d'embeddings vidé")
+            except Exception as e:
+                logger.error(f"Erreur lors du vidage du cache: {e}")
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Récupère les statistiques du cache.
-        
+
         Returns:
             Dict[str, Any]: Statistiques
         """
-        try:
-            total_size = sum(metadata.get('size', 0) for metadata in self.cache_metadata.values())
-            
-            return {
-                'entries_count': len(self.cache_data),
-                'max_size': self.max_size,
-                'usage_percent': (len(self.cache_data) / self.max_size) * 100,
-                'total_size_bytes': total_size,
-                'total_size_mb': total_size / (1024 * 1024),
-                'cache_dir': str(self.cache_dir),
-                'oldest_entry': min(self.access_times.values()) if self.access_times else None,
-                'newest_entry': max(self.access_times.values()) if self.access_times else None
-            }
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la récupération des statistiques: {e}")
-            return {}
-    
+        with self._lock:
+            try:
+                total_size = len(self._rows) * self.row_bytes
+                access = self._access[list(self._rows.values())] if self._rows else np.zeros(0)
+                lookups = self._hits + self._misses
+                return {
+                    'entries_count': len(self._rows),
+                    'capacity': self._capacity,
+                    'dimension': self._dim,
+                    'max_bytes': self.max_bytes,
+                    'usage_percent': (total_size / self.max_bytes) * 100 if self.max_bytes else 0.0,
+                    'total_size_bytes': total_size,
+                    'total_size_mb': total_size / (1024 * 1024),
+                    'dirty_rows': len(self._dirty),
+                    'hits': self._hits,
+                    'misses': self._misses,
+                    'hit_rate': self._hits / lookups if lookups else 0.0,
+                    'evictions': self._evictions,
+                    'cache_dir': str(self.cache_dir),
+                    'oldest_entry': float(access.min()) if access.size else None,
+                    'newest_entry': float(access.max()) if access.size else None
+                }
+            except Exception as e:
+                logger.error(f"Erreur lors de la récupération des statistiques: {e}")
+                return {}
+
     def cleanup_old_entries(self, max_age_days: int = 30):
         """
         Nettoie les entrées anciennes du cache.
-        
+
         Args:
             max_age_days (int): Âge maximum en jours
         """
+        with self._lock:
+            try:
+                if not self._rows:
+                    return
+                used = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+                old = used[self._access[used] < time.time() - max_age_days * 24 * 60 * 60]
+                if not old.size:
+                    return
+                keys = self._keys[old].tobytes()
+                for i in range(len(old)):
+                    self._rows.pop(keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES], None)
+                self._access[old] = 0.0
+                self._keys[old] = 0
+                self._free.extend(old.tolist())
+                self._dirty.update(old.tolist())
+                logger.info(f"Cache nettoyé: {len(old)} entrées anciennes supprimées")
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur lors du nettoyage des entrées anciennes: {e}")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class CachedEmbeddings:
+    """
+    Modèle d'embedding (interface LangChain) dont les résultats passent par le cache.
+
+    Seuls les textes absents du cache sont envoyés au modèle, en un seul lot.
+    """
+
+    def __init__(self, model: Any, cache: Optional[EmbeddingCache] = None, model_name: Optional[str] = None):
+        """
+        Args:
+            model (Any): Modèle exposant `embed_documents` / `embed_query`
+            cache (Optional[EmbeddingCache]): Cache à utiliser (défaut: cache global)
+            model_name (Optional[str]): Nom du modèle dans les clés (défaut: `model.model_name`)
+        """
+        self.model = model
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self.model_name = model_name or getattr(model, "model_name", None) or type(model).__name__
+
+    def _embed(self, texts: List[str], kind: str, compute) -> np.ndarray:
+        # Requêtes et documents séparés : certains modèles préfixent différemment les deux
+        name = f"{self.model_name}:{kind}"
+        vectors, hit = self.cache.get_many(texts, name)
+        missing = np.flatnonzero(~hit)
+        if not missing.size:
+            return vectors
+        computed = np.asarray(compute([texts[i] for i in missing]), dtype=np.float32)
+        if vectors.shape[1] != computed.shape[1]:
+            # Cache encore vide (ou d'une autre dimension) : tous les textes sont manquants
+            vectors = np.zeros((len(texts), computed.shape[1]), dtype=np.float32)
+        vectors[missing] = computed
+        self.cache.put_many([texts[i] for i in missing], name, computed)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings d'un lot de documents (cache puis modèle pour les absents)."""
+        if not texts:
+            return []
+        return self._embed(list(texts), "document", self.model.embed_documents).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embedding d'une requête (cache puis modèle)."""
+        return self._embed([text], "query", lambda batch: [self.model.embed_query(batch[0])])[0].tolist()
+
+    def get_embedding(self, text: str) -> Optional[List[float]]:
+        """Embedding d'un texte, None en cas d'erreur (ancienne interface de `rag_agent`)."""
         try:
-            current_time = time.time()
-            max_age_seconds = max_age_days * 24 * 60 * 60
-            
-            entries_to_remove = []
-            for cache_key, last_access in self.access_times.items():
-                if current_time - last_access > max_age_seconds:
-                    entries_to_remove.append(cache_key)
-            
-            for cache_key in entries_to_remove:
-                # Supprimer du cache en mémoire
-                if cache_key in self.cache_data:
-                    del self.cache_data[cache_key]
-                if cache_key in self.cache_metadata:
-                    del self.cache_metadata[cache_key]
-                if cache_key in self.access_times:
-                    del self.access_times[cache_key]
-                
-                # Supprimer le fichier de cache
-                cache_file = self._get_cache_file_path(cache_key)
-                if cache_file.exists():
-                    try:
-                        cache_file.unlink()
-                    except Exception as e:
-                        logger.warning(f"Erreur lors de la suppression de {cache_file}: {e}")
-            
-            if entries_to_remove:
-                logger.info(f"Cache nettoyé: {len(entries_to_remove)} entrées anciennes supprimées")
-                self._save_cache()
-            
+            return self.embed_query(text)
         except Exception as e:
-            logger.error(f"Erreur lors du nettoyage des entrées anciennes: {e}")
-    
-    def __del__(self):
-        """Destructeur - sauvegarde le cache"""
-        try:
-            self._save_cache()
-        except:
-            pass
+            logger.error(f"Erreur d'embedding: {e}")
+            return None
+
+    def __getattr__(self, name: str) -> Any:
+        # Attributs du modèle sous-jacent (client, encode_kwargs...)
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
 
 # Instance globale
 _embedding_cache = None
+_embedding_cache_lock = threading.Lock()
 
 def get_embedding_cache() -> EmbeddingCache:
     """Récupère l'instance globale du cache d'embeddings"""
     global _embedding_cache
-    if _embedding_cache is None:
-        _embedding_cache = EmbeddingCache()
-    return _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+            # Écriture différée : lignes encore sales écrites à la sortie
+            atexit.register(_embedding_cache.flush)
+        return _embedding_cache
 
 def cache_embedding(text: str, model_name: str, embedding: np.ndarray) -> bool:
     """
     Fonction utilitaire pour cacher un embedding.
-    
+
     Args:
         text (str): Texte
         model_name (str): Nom du modèle
         embedding (np.ndarray): Embedding
-        
+
     Returns:
         bool: True si succès
     """
@@ -356,11 +530,11 @@ def cache_embedding(text: str, model_name: str, embedding: np.ndarray) -> bool:
 def get_cached_embedding(text: str, model_name: str) -> Optional[np.ndarray]:
     """
     Fonction utilitaire pour récupérer un embedding du cache.
-    
+
     Args:
         text (str): Texte
         model_name (str): Nom du modèle
-        
+
     Returns:
         Optional[np.ndarray]: Embedding ou None
     """
@@ -375,7 +549,7 @@ def clear_embedding_cache():
 def get_cache_stats() -> Dict[str, Any]:
     """
     Fonction utilitaire pour récupérer les statistiques du cache.
-    
+
     Returns:
         Dict[str, Any]: Statistiques
     """
@@ -386,20 +560,20 @@ def get_cache_stats() -> Dict[str, Any]:
 if __name__ == "__main__":
     # Test basique du cache
     cache = EmbeddingCache()
-    
+
     # Test d'ajout
     test_embedding = np.random.rand(384)  # Embedding de test
     success = cache.put("Test text", "test-model", test_embedding)
     print(f"Ajout au cache: {'Succès' if success else 'Échec'}")
-    
+
     # Test de récupération
     retrieved = cache.get("Test text", "test-model")
     print(f"Récupération du cache: {'Succès' if retrieved is not None else 'Échec'}")
-    
+
     # Test des statistiques
     stats = cache.get_stats()
     print(f"Statistiques: {stats}")
-    
+
     # Nettoyage
     cache.clear()
     print("Cache vidé")
@@ -58,6 +58,22 @@ def record_timing(component: str, metric: str, value: float) -> None:
         pass
 
 
+def record_metric(name: str, value: float, unit: str) -> None:
+    """
+    Enregistre une métrique générique au format centralisé.
+
+    Args:
+        name (str): Nom de la métrique (ex: "context.packed.recent")
+        value (float): Valeur
+        unit (str): Unité (ex: "tokens")
+    """
+    try:
+        metrics_collector.record_metric(name, value, unit)
+    except Exception:
+        # Ne jamais casser un flux de traitement pour une métrique
+        pass
+
+
 def get_timings() -> Dict[str, Dict[str, Any]]:
     """
     Retourne un aperçu des métriques enregistrées.
@@ -4,6 +4,12 @@
 Correcteur orthographique français pour les réponses LLM
 Corrige les erreurs courantes générées par Phi-3
 
+Les tables de corrections sont compilées une fois en une seule alternance
+(un passage sur le texte) ; la correction pyspellchecker d'un mot inconnu
+(recherche à distance d'édition 2, ~1 s) est mémorisée par mot (LRU). Un
+index à suppressions symétriques (`SymmetricDeleteIndex`, optionnel :
+`SPELL_CONFIG["symmetric_delete"]`) remplace la génération des candidats.
+
 # /// script
 # dependencies = [
 #   "pyspellchecker>=0.8.0",  # Correcteur orthographique
@@ -13,10 +19,19 @@ Corrige les erreurs courantes générées par Phi-3
 
 import re
 import logging
-from typing import Optional
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+try:
+    from config.system_config import SPELL_CONFIG
+except ImportError:
+    SPELL_CONFIG = {}
+
 # Dictionnaire de corrections manuelles pour erreurs courantes Phi-3
 CORRECTIONS_MANUELES = {
     "dran": "de",
@@ -58,6 +73,134 @@ MOTS_ANGLAIS_FRANCAIS = {
     "privacy ": "privacité ",
 }
 
+# Mots jamais corrigés (acronymes, noms propres)
+PROTECTED_WORDS = frozenset({'QAIA', 'qaia', 'Qaia'})
+
+
+def _compile_replacements(*tables: Dict[str, str]) -> Tuple[re.Pattern, Dict[str, str]]:
+    """
+    Compile des tables de remplacement en une alternance (mots entiers, insensible à la casse).
+    
+    Les clés les plus longues sont essayées en premier ("quest-ce que" avant "quest") ;
+    à clé égale, la première table l'emporte.
+    
+    Returns:
+        Tuple[re.Pattern, Dict[str, str]]: Motif et table clé minuscule → remplacement
+    """
+    replacements: Dict[str, str] = {}
+    for table in tables:
+        for error, correction in table.items():
+            key = error.strip().lower()
+            if key and key not in replacements:
+                replacements[key] = correction.strip()
+    alternation = "|".join(re.escape(key) for key in sorted(replacements, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE), replacements
+
+
+_MANUAL_RE, _MANUAL_REPLACEMENTS = _compile_replacements(CORRECTIONS_MANUELES, MOTS_ANGLAIS_FRANCAIS)
+_COMMON_RE, _COMMON_REPLACEMENTS = _compile_replacements(CORRECTIONS_MANUELES)
+# Mots isolés par des espaces (un mot collé à une ponctuation n'est pas corrigé)
+_WORD_RE = re.compile(r'(?<!\S)\w+(?!\S)')
+
+
+def _replace_manual(match: re.Match) -> str:
+    return _preserve_case(match.group(), _MANUAL_REPLACEMENTS[match.group().lower()])
+
+
+def _replace_common(match: re.Match) -> str:
+    return _preserve_case(match.group(), _COMMON_REPLACEMENTS[match.group().lower()])
+
+
+def _osa_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Distance d'édition avec transpositions adjacentes (Damerau restreinte), bornée.
+    
+    Returns:
+        int: Distance, ou max_distance + 1 si elle dépasse la borne
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class SymmetricDeleteIndex:
+    """
+    Index à suppressions symétriques (SymSpell) d'un dictionnaire.
+    
+    Chaque mot est indexé par les chaînes obtenues en supprimant jusqu'à
+    `max_distance` caractères de son préfixe ; une recherche ne génère que
+    les suppressions du mot inconnu au lieu des ~50 000 variantes
+    (suppressions, inversions, remplacements, insertions) à distance 2.
+    """
+    
+    def __init__(self, words: Iterable[str], max_distance: int = 2, prefix_length: int = 7):
+        """
+        Construit l'index.
+        
+        Args:
+            words (Iterable[str]): Mots du dictionnaire
+            max_distance (int): Distance d'édition maximale
+            prefix_length (int): Longueur du préfixe indexé (borne la mémoire)
+        """
+        self.max_distance = max_distance
+        self.prefix_length = max(prefix_length, max_distance + 1)
+        self._deletes: Dict[str, List[str]] = defaultdict(list)
+        for word in words:
+            for variant in self._variants(word):
+                self._deletes[variant].append(word)
+        self._deletes = dict(self._deletes)
+    
+    def _variants(self, word: str) -> Set[str]:
+        """Préfixe du mot et ses suppressions jusqu'à `max_distance`."""
+        prefix = word[:self.prefix_length]
+        variants = {prefix}
+        frontier = {prefix}
+        for _ in range(self.max_distance):
+            frontier = {v[:i] + v[i + 1:] for v in frontier if len(v) > 1 for i in range(len(v))}
+            variants |= frontier
+        return variants
+    
+    def candidates(self, word: str) -> Set[str]:
+        """
+        Mots du dictionnaire à la distance minimale (≤ max_distance) du mot.
+        
+        Args:
+            word (str): Mot (minuscules)
+            
+        Returns:
+            Set[str]: Candidats à distance minimale (vide si aucun)
+        """
+        best = self.max_distance + 1
+        found: Set[str] = set()
+        seen: Set[str] = set()
+        for variant in self._variants(word):
+            for candidate in self._deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = _osa_distance(word, candidate, min(best, self.max_distance))
+                if distance < best:
+                    best, found = distance, {candidate}
+                elif distance == best:
+                    found.add(candidate)
+        return found
+
+
 try:
     from spellchecker import SpellChecker
     
@@ -69,6 +212,79 @@ except ImportError:
     SPELLCHECKER_AVAILABLE = False
     logger.warning("pyspellchecker non disponible, utilisation uniquement des corrections manuelles")
 
+_symmetric_index: Optional[SymmetricDeleteIndex] = None
+
+
+def _build_symmetric_index(max_distance: int, prefix_length: int) -> None:
+    """Construit l'index du dictionnaire français (thread d'arrière-plan)."""
+    global _symmetric_index
+    import time
+    start = time.time()
+    index = SymmetricDeleteIndex(spell_fr.word_frequency.keys(), max_distance, prefix_length)
+    _symmetric_index = index
+    # Les corrections mémorisées avant l'index restent valables (mêmes candidats)
+    logger.info(f"Index à suppressions symétriques construit en {time.time() - start:.1f}s "
+                f"({len(index._deletes)} entrées)")
+
+
+_SYMMETRIC_CONFIG = SPELL_CONFIG.get("symmetric_delete", {})
+if SPELLCHECKER_AVAILABLE and _SYMMETRIC_CONFIG.get("enabled", False):
+    threading.Thread(
+        target=_build_symmetric_index,
+        args=(int(_SYMMETRIC_CONFIG.get("max_distance", 2)), int(_SYMMETRIC_CONFIG.get("prefix_length", 7))),
+        name="SpellIndex",
+        daemon=True,
+    ).start()
+
+
+def _candidates(word: str) -> Optional[Set[str]]:
+    """Candidats pyspellchecker (distance minimale), via l'index s'il est prêt."""
+    index = _symmetric_index
+    if index is None or any(char.isdigit() for char in word):
+        return spell_fr.candidates(word)
+    return index.candidates(word) or None
+
+
+def _strip_accents(word: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", word) if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=int(SPELL_CONFIG.get("cache_size", 8192)))
+def _correct_word(word: str) -> Optional[str]:
+    """
+    Correction d'un mot inconnu (minuscules), mémorisée.
+    
+    Diffère volontairement de `SpellChecker.correction` (candidat le plus
+    fréquent) : les candidats qui ne diffèrent du mot que par les accents
+    passent d'abord ("etre" → "être" et non "entre", "pres" → "près" et non
+    "pris"), puis le plus fréquent. Comme en amont, les candidats sont triés
+    avant `max` : à fréquence égale, le choix ne dépend pas de l'ordre du set.
+    
+    Returns:
+        Optional[str]: Correction, ou None si le mot est conservé
+    """
+    candidates = _candidates(word)
+    if not candidates:
+        return None
+    word_no_accents = _strip_accents(word)
+    same_letters = [c for c in candidates if _strip_accents(c) == word_no_accents]
+    best = max(sorted(same_letters or candidates), key=spell_fr.word_frequency.dictionary.__getitem__)
+    return best if best != word else None
+
+
+def _correct_match(match: re.Match) -> str:
+    part = match.group()
+    if part in PROTECTED_WORDS:
+        return part  # Ne pas corriger
+    lower = part.lower()
+    if lower in spell_fr.word_frequency.dictionary:
+        return part  # Mot correct
+    best = _correct_word(lower)
+    if best is None:
+        return part
+    # Préserver la casse originale
+    return best.capitalize() if part[0].isupper() else best
+
 
 def correct_spelling(text: str) -> str:
     """
@@ -87,58 +303,14 @@ def correct_spelling(text: str) -> str:
     if not text or not isinstance(text, str):
         return text
     
-    # Étape 1: Corrections manuelles (erreurs courantes Phi-3)
-    corrected = text
-    for error, correction in CORRECTIONS_MANUELES.items():
-        # Remplacer les occurrences (insensible à la casse, mais préserver la casse originale)
-        pattern = re.compile(re.escape(error), re.IGNORECASE)
-        corrected = pattern.sub(lambda m: _preserve_case(m.group(), correction), corrected)
-    
-    # Étape 2: Remplacer mots anglais par équivalents français
-    for english_word, french_word in MOTS_ANGLAIS_FRANCAIS.items():
-        # Remplacer en préservant la casse
-        pattern = re.compile(re.escape(english_word), re.IGNORECASE)
-        corrected = pattern.sub(lambda m: _preserve_case(m.group(), french_word), corrected)
+    # Étapes 1-2: Corrections manuelles (erreurs courantes Phi-3) et mots anglais → français,
+    # en un passage (casse préservée)
+    corrected = _MANUAL_RE.sub(_replace_manual, text)
     
-    # Étape 3: Corrections avec pyspellchecker si disponible
+    # Étape 3: Corrections avec pyspellchecker si disponible (mot à mot, mémorisées)
     if SPELLCHECKER_AVAILABLE:
         try:
-            # PROTÉGER les mots spéciaux (acronymes, noms propres) du correcteur
-            PROTECTED_WORDS = ['QAIA', 'qaia', 'Qaia']  # Ne pas corriger QAIA
-            
-            # Séparer en mots ET espaces (préserver les espaces)
-            parts = re.split(r'(\s+)', corrected)  # Split en gardant les séparateurs
-            corrected_parts = []
-            
-            for part in parts:
-                if re.match(r'^\s+$', part):  # C'est un espace/ponctuation
-                    corrected_parts.append(part)  # Garder tel quel
-                elif re.match(r'^\w+$', part):  # C'est un mot
-                    # PROTÉGER QAIA et autres mots spéciaux
-                    if part in PROTECTED_WORDS:
-                        corrected_parts.append(part)  # Ne pas corriger
-                    # Vérifier si le mot est mal orthographié
-                    elif part.lower() in spell_fr:
-                        corrected_parts.append(part)  # Mot correct
-                    else:
-                        # Chercher la correction la plus probable
-                        candidates = spell_fr.candidates(part.lower())
-                        if candidates:
-                            best = spell_fr.correction(part.lower())
-                            if best and best != part.lower():
-                                # Préserver la casse originale
-                                if part[0].isupper():
-                                    corrected_parts.append(best.capitalize())
-                                else:
-                                    corrected_parts.append(best)
-                            else:
-                                corrected_parts.append(part)
-                        else:
-                            corrected_parts.append(part)
-                else:
-                    corrected_parts.append(part)  # Ponctuation, garder tel quel
-            
-            corrected = ''.join(corrected_parts)
+            corrected = _WORD_RE.sub(_correct_match, corrected)
         except Exception as e:
             logger.warning(f"Erreur correcteur orthographique: {e}, utilisation texte non corrigé")
     
@@ -178,10 +350,5 @@ def correct_common_errors(text: str) -> str:
     if not text or not isinstance(text, str):
         return text
     
-    corrected = text
-    for error, correction in CORRECTIONS_MANUELES.items():
-        pattern = re.compile(re.escape(error), re.IGNORECASE)
-        corrected = pattern.sub(lambda m: _preserve_case(m.group(), correction), corrected)
-    
-    return corrected
+    return _COMMON_RE.sub(_replace_common, text)
 
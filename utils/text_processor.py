@@ -50,6 +50,44 @@ STREAMING_PREFIX_TOKENS = [
     r'^\d{2}:\d{2}\)$',     # Pattern spécifique "17:30)"
 ]
 
+# Motifs compilés une fois (filtrage streaming : plusieurs appels par token)
+_TOKEN_PREFIX_RE = re.compile(
+    rf'^\s*({PATTERN_TIMESTAMP}\s*)?{PATTERN_QAIA_PREFIX}\s*',
+    re.IGNORECASE,
+)
+# Tokens de préfixe isolés et débuts de préfixes, réunis en une alternance
+_TOKEN_ISOLATED_PREFIX_RE = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in STREAMING_PREFIX_TOKENS),
+    re.IGNORECASE,
+)
+_TOKEN_PREFIX_START_RE = re.compile(
+    rf'{PATTERN_TIMESTAMP}|{PATTERN_QAIA_PREFIX}|\(\d{{1,2}}:|\d{{1,2}}:\d{{2}}\)',
+    re.IGNORECASE,
+)
+
+# Filtre incrémental (StreamingTokenFilter)
+_PHI3_TAG_NAMES = "|".join(re.escape(tag[2:-2]) for tag in PHI3_TAGS)
+# Début de réponse : "(HH:MM)", "QAIA:" ou "(HH:MM) QAIA:"
+_STREAM_HEAD_RE = re.compile(
+    rf'\s*(?:{PATTERN_TIMESTAMP}\s*)?(?:QAIA\s*:\s*)?',
+    re.IGNORECASE,
+)
+# Début de réponse encore ambigu (préfixe possiblement incomplet)
+_STREAM_HEAD_PARTIAL_RE = re.compile(
+    r'\s*(?:\(\d{0,2}(?::\d{0,2})?\)?\s*)?(?:Q(?:A(?:I(?:A\s*)?)?)?)?',
+    re.IGNORECASE,
+)
+# N'importe où : balises Phi-3 et "(HH:MM) [QAIA:]"
+_STREAM_STRIP_RE = re.compile(
+    rf'<\|(?:{_PHI3_TAG_NAMES})\|>|{PATTERN_TIMESTAMP}[ \t]*(?:QAIA\s*:\s*)?',
+    re.IGNORECASE,
+)
+# Fin de tampon pouvant commencer une balise ou un préfixe (retenue jusqu'au token suivant)
+_STREAM_PARTIAL_TAIL_RE = re.compile(
+    r'(?:<(?:\|[a-z]*\|?)?|\(\d{0,2}(?::\d{0,2})?(?:\)[ \t]*(?:Q(?:A(?:I(?:A[ \t]*)?)?)?)?)?)$',
+    re.IGNORECASE,
+)
+
 
 # ============================================================================
 # FONCTIONS DE NETTOYAGE
@@ -257,11 +295,7 @@ def filter_streaming_token(token: str, context: Optional[Dict[str, Any]] = None)
     
     # CRITIQUE (TODO-4): Supprimer les préfixes DANS le token complet
     # Ex: "(15:33) QAIA: Bonjour" → "Bonjour"
-    prefix_pattern = re.compile(
-        rf'^\s*({PATTERN_TIMESTAMP}\s*)?{PATTERN_QAIA_PREFIX}\s*',
-        flags=re.IGNORECASE,
-    )
-    new_token = re.sub(prefix_pattern, '', token_clean)
+    new_token = _TOKEN_PREFIX_RE.sub('', token_clean, count=1)
     if not new_token.strip():
         # Token était uniquement un préfixe
         logger.debug(f"Token filtré (préfixe complet): '{token_clean}'")
@@ -270,30 +304,104 @@ def filter_streaming_token(token: str, context: Optional[Dict[str, Any]] = None)
         # Préfixe supprimé, utiliser le reste
         logger.debug(f"Préfixe supprimé du token: '{token_clean}' → '{new_token}'")
         token_clean = new_token
+        token = new_token
     
     # Vérifier si c'est un token de préfixe isolé à filtrer
-    for pattern in STREAMING_PREFIX_TOKENS:
-        if re.match(pattern, token_clean, re.IGNORECASE):
-            logger.debug(f"Token filtré (préfixe isolé): '{token_clean}'")
-            return None
+    if _TOKEN_ISOLATED_PREFIX_RE.match(token_clean):
+        logger.debug(f"Token filtré (préfixe isolé): '{token_clean}'")
+        return None
     
     # Vérifier si le token commence par un préfixe indésirable
-    # Patterns pour début de préfixes
-    prefix_start_patterns = [
-        rf'^{PATTERN_TIMESTAMP}',  # Commence par "(17:30)"
-        rf'^{PATTERN_QAIA_PREFIX}',  # Commence par "QAIA:"
-        r'^\(\d{1,2}:',  # Commence par "(17:"
-        r'^\d{1,2}:\d{2}\)',  # Commence par "17:30)"
-    ]
-    
-    for pattern in prefix_start_patterns:
-        if re.match(pattern, token_clean, re.IGNORECASE):
-            logger.debug(f"Token filtré (commence par préfixe): '{token_clean}'")
-            return None
+    # ("(17:30)", "QAIA:", "(17:", "17:30)")
+    if _TOKEN_PREFIX_START_RE.match(token_clean):
+        logger.debug(f"Token filtré (commence par préfixe): '{token_clean}'")
+        return None
     
     return token
 
 
+class StreamingTokenFilter:
+    """
+    Filtre incrémental d'un flux de tokens (une instance par génération).
+    
+    Remplace l'enchaînement `clean_phi3_artifacts` + `filter_streaming_token`
+    appliqué à chaque étage du pipeline. Les motifs sont compilés une fois ;
+    l'état se limite à la fin du flux encore ambiguë (quelques caractères) :
+    
+    - début de réponse : "(HH:MM)", "QAIA:" ou "(HH:MM) QAIA:" supprimés même
+      découpés sur plusieurs tokens ("(", "17", ":30", ")", " QAIA", ":") ;
+    - n'importe où : balises Phi-3 et "(HH:MM) QAIA:" répétés par le modèle.
+    
+    Contrairement au filtre par token, le texte légitime ("(", "12:30",
+    espaces, retours à la ligne) n'est pas perdu : il est seulement retenu
+    jusqu'à ce que le token suivant lève l'ambiguïté.
+    """
+    
+    def __init__(self):
+        self._held = ""
+        self._started = False
+        self._emitted = False
+    
+    def reset(self) -> None:
+        """Réinitialise l'état (nouvelle génération)."""
+        self._held = ""
+        self._started = False
+        self._emitted = False
+    
+    def feed(self, token: str) -> Optional[str]:
+        """
+        Filtre un token.
+        
+        Args:
+            token: Token brut du modèle
+            
+        Returns:
+            Texte à émettre, ou None si rien à émettre pour l'instant
+        """
+        if not token:
+            return None
+        text = self._held + token
+        self._held = ""
+        
+        if not self._started:
+            if _STREAM_HEAD_PARTIAL_RE.fullmatch(text):
+                # Préfixe possiblement incomplet : attendre le token suivant
+                self._held = text
+                return None
+            text = text[_STREAM_HEAD_RE.match(text).end():]
+            self._started = True
+        
+        tail = _STREAM_PARTIAL_TAIL_RE.search(text)
+        if tail is not None and tail.end() > tail.start():
+            self._held = text[tail.start():]
+            text = text[:tail.start()]
+        
+        return self._emit(_STREAM_STRIP_RE.sub('', text))
+    
+    def _emit(self, text: str) -> Optional[str]:
+        # Pas d'espaces en tête de réponse (reste d'un préfixe supprimé)
+        if not self._emitted:
+            text = text.lstrip()
+        if not text:
+            return None
+        self._emitted = True
+        return text
+    
+    def flush(self) -> Optional[str]:
+        """
+        Termine le flux : rend le texte retenu (préfixe jamais complété).
+        
+        Returns:
+            Texte restant, ou None
+        """
+        text, self._held = self._held, ""
+        if not self._started:
+            self._started = True
+            if _STREAM_HEAD_RE.fullmatch(text):
+                return None
+        return self._emit(_STREAM_STRIP_RE.sub('', text))
+
+
 def should_add_space_before_token(token: str, previous_token: Optional[str] = None) -> bool:
     """
     Détermine si un espace doit être ajouté avant un token.
@@ -319,8 +427,8 @@ def should_add_space_before_token(token: str, previous_token: Optional[str] = No
     if not previous_token:
         return False
     
-    # Si le token précédent se termine par un espace, ne pas en ajouter
-    if previous_token.endswith(' '):
+    # Si le token précédent se termine par un espace (ou un retour à la ligne), ne pas en ajouter
+    if previous_token[-1].isspace():
         return False
     
     # RÈGLE CRITIQUE: Ne PAS ajouter d'espace si les tokens forment un mot (sous-mots BPE)
@@ -484,6 +592,65 @@ def _remove_duplicate_consecutive_sentences(text: str) -> str:
     return " ".join(result).strip()
 
 
+# Fragments de prompts recopiés par le modèle (hallucinations)
+_HALLUCINATION_RE = re.compile(
+    "|".join([
+        r'---\s*##?\s*#?\s*Instruction.*?(?=\n\n|\Z)',  # Fragments markdown + instruction
+        r'###\s*Instruction.*?(?=\n\n|\Z)',  # Fragments markdown
+        r'Contraintes\s+supplémentaires.*?(?=\n\n|\Z)',  # Fragments de contraintes
+        r'Artemis.*?(?=\n\n|\Z)',  # Fragments avec nom d'exemple
+        r'N\s+I\s+N\s+A.*?(?=\n\n|\Z)',  # Fragments "N IN A"
+        r'conseiller\s+numérique.*?(?=\n\n|\Z)',  # Fragments de prompt
+    ]),
+    re.IGNORECASE | re.DOTALL,
+)
+
+# "(HH:MM) QAIA:" n'importe où dans le texte
+_INLINE_PREFIX_RE = re.compile(r'\s*\(\d{1,2}:\d{2}\)\s*QAIA\s*:?\s*', re.IGNORECASE)
+
+# Espaces mal placés dans les mots (sous-mots BPE) : "O ui" → "Oui", "Q A IA" → "QAIA"
+# L'ordre compte : la première alternative qui correspond l'emporte.
+_BPE_CORRECTIONS = [
+    # QAIA (CRITIQUE - problème BPE fréquent observé)
+    (r'\bQ\s+A\s+I\s+A\b', 'QAIA'),
+    (r'\bQ\s+A\s+IA\b', 'QAIA'),
+    (r'\bQ\s+AIA\b', 'QAIA'),
+    (r'\bQA\s+I\s+A\b', 'QAIA'),
+    (r'\bQ\s+A\s+I\b', 'QAI'),  # Partiel mais corrige quand même
+    # NINA (TODO-5: Problème BPE observé)
+    (r'\bN\s+I\s+N\s+A\b', 'NINA'),
+    (r'\bN\s+IN\s+A\b', 'NINA'),
+    (r'\bN\s+N\s+A\b', 'NINA'),
+    # Autres corrections BPE (TODO-5)
+    (r'\bdin\s+as\b', "d'ailleurs"),  # "din as" → "d'ailleurs"
+    (r'\bO\s+ui\b', 'Oui'),
+    (r'\bpar\s+le\s+le\b', 'parle le'),  # "par le le" → "parle le"
+    (r'\bpar\s+le\b', 'parle'),
+    (r'\bfran\s+çais\b', 'français'),
+    (r'\beffic\s+ac\s+ement\b', 'efficacement'),
+    (r'\bcon\s+ç\s+ue\b', 'conçue'),
+    (r'\blang\s+ues\b', 'langues'),
+    (r'\bang\s+lais\b', 'anglais'),
+    (r'\bact\s+uelle\b', 'actuelle'),
+    (r'\bcommun\s+ic\s+ation\b', 'communication'),
+]
+_BPE_CORRECTIONS_RE = re.compile(
+    "|".join(f"({pattern})" for pattern, _ in _BPE_CORRECTIONS),
+    re.IGNORECASE,
+)
+
+# Mot court espace mot court (probablement BPE)
+_SHORT_WORD_PAIR_RE = re.compile(r'\b([a-z]{1,4})\s+([a-z]{1,4})\b', re.IGNORECASE)
+
+
+def _bpe_replacement(match: re.Match) -> str:
+    """Remplacement de l'alternative BPE correspondante (casse de la première lettre conservée)."""
+    replacement = _BPE_CORRECTIONS[match.lastindex - 1][1]
+    if match.group(0)[0].isupper() and replacement[0].islower():
+        return replacement[0].upper() + replacement[1:]
+    return replacement
+
+
 def process_streamed_text(text: str) -> str:
     """
     Post-traitement pour texte accumulé pendant le streaming.
@@ -503,74 +670,21 @@ def process_streamed_text(text: str) -> str:
     
     # ÉTAPE 0: Supprimer les fragments d'hallucinations (fragments de prompts)
     # CRITIQUE: Détecter et supprimer les fragments comme "--- ## # Instruction..."
-    import re
-    hallucination_patterns = [
-        r'---\s*##?\s*#?\s*Instruction.*?(?=\n\n|\Z)',  # Fragments markdown + instruction
-        r'###\s*Instruction.*?(?=\n\n|\Z)',  # Fragments markdown
-        r'Contraintes\s+supplémentaires.*?(?=\n\n|\Z)',  # Fragments de contraintes
-        r'Artemis.*?(?=\n\n|\Z)',  # Fragments avec nom d'exemple
-        r'N\s+I\s+N\s+A.*?(?=\n\n|\Z)',  # Fragments "N IN A"
-        r'conseiller\s+numérique.*?(?=\n\n|\Z)',  # Fragments de prompt
-    ]
-    for pattern in hallucination_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = _HALLUCINATION_RE.sub('', text)
     
     # ÉTAPE 1: Supprimer les préfixes et doublons AVANT tout autre traitement
     # CRITIQUE: Le modèle génère encore "(18:28) QAIA:" malgré les instructions
     cleaned = remove_prefix_patterns(text)
     # Supprimer toute occurrence de "(HH:MM) QAIA:" n'importe où dans le texte (pas seulement au début)
-    cleaned = re.sub(
-        r'\s*\(\d{1,2}:\d{2}\)\s*QAIA\s*:?\s*',
-        ' ',
-        cleaned,
-        flags=re.IGNORECASE,
-    )
+    cleaned = _INLINE_PREFIX_RE.sub(' ', cleaned)
     cleaned = cleaned.strip()
 
     # Étape 1: Corriger les espaces mal placés dans les mots (BPE)
     # Les tokens BPE peuvent créer des espaces au milieu des mots
     # Exemples: "O ui" → "Oui", "par le" → "parle", "Q A IA" → "QAIA"
     
-    # Corrections spécifiques pour cas courants identifiés
-    corrections_espaces = {
-        # QAIA (CRITIQUE - problème BPE fréquent observé)
-        r'\bQ\s+A\s+I\s+A\b': 'QAIA',
-        r'\bQ\s+A\s+IA\b': 'QAIA',
-        r'\bQ\s+AIA\b': 'QAIA',
-        r'\bQA\s+I\s+A\b': 'QAIA',
-        r'\bQ\s+A\s+I\b': 'QAI',  # Partiel mais corrige quand même
-        # NINA (TODO-5: Problème BPE observé)
-        r'\bN\s+I\s+N\s+A\b': 'NINA',
-        r'\bN\s+IN\s+A\b': 'NINA',
-        r'\bN\s+N\s+A\b': 'NINA',
-        # Autres corrections BPE (TODO-5)
-        r'\bdin\s+as\b': "d'ailleurs",  # "din as" → "d'ailleurs"
-        r'\bDin\s+as\b': "D'ailleurs",
-        r'\bO\s+ui\b': 'Oui',
-        r'\bo\s+ui\b': 'oui',
-        r'\bpar\s+le\b': 'parle',
-        r'\bPar\s+le\b': 'Parle',
-        r'\bfran\s+çais\b': 'français',
-        r'\bFran\s+çais\b': 'Français',
-        r'\beffic\s+ac\s+ement\b': 'efficacement',
-        r'\bEffic\s+ac\s+ement\b': 'Efficacement',
-        r'\bcon\s+ç\s+ue\b': 'conçue',
-        r'\bCon\s+ç\s+ue\b': 'Conçue',
-        r'\blang\s+ues\b': 'langues',
-        r'\bLang\s+ues\b': 'Langues',
-        r'\bang\s+lais\b': 'anglais',
-        r'\bAng\s+lais\b': 'Anglais',
-        r'\bact\s+uelle\b': 'actuelle',
-        r'\bAct\s+uelle\b': 'Actuelle',
-        # Corrections supplémentaires pour cas observés
-        r'\bpar\s+le\s+le\b': 'parle le',  # "par le le" → "parle le"
-        r'\bcommun\s+ic\s+ation\b': 'communication',
-        r'\bCommun\s+ic\s+ation\b': 'Communication',
-    }
-    
-    corrected = cleaned  # Utiliser le texte déjà nettoyé des préfixes (ÉTAPE 0)
-    for pattern, replacement in corrections_espaces.items():
-        corrected = re.sub(pattern, replacement, corrected, flags=re.IGNORECASE)
+    # Corrections spécifiques pour cas courants identifiés (une passe, alternance compilée)
+    corrected = _BPE_CORRECTIONS_RE.sub(_bpe_replacement, cleaned)
     
     # Correction générale : supprimer espaces entre lettres minuscules consécutives
     # (sous-mots BPE qui forment un mot)
@@ -593,7 +707,7 @@ def process_streamed_text(text: str) -> str:
     
     # Appliquer correction générale (avec prudence)
     # Pattern: mot court espace mot court (probablement BPE)
-    corrected = re.sub(r'\b([a-z]{1,4})\s+([a-z]{1,4})\b', fix_bpe_spaces, corrected, flags=re.IGNORECASE)
+    corrected = _SHORT_WORD_PAIR_RE.sub(fix_bpe_spaces, corrected)
     
     # Étape 1b: Supprimer phrases consécutives quasi-dupliquées (modèle répète avec variantes BPE)
     # Ex: "Je suis là pour vous aider." suivi de "Suis là pourvus aider."